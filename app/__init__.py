@@ -2,9 +2,12 @@ from flask import Flask, session, redirect, url_for, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_mail import Mail
 from app.stored_session import StoredProcSessionInterface
-from app.utils.database import get_db_engine
+from app.utils.database import init_engine_registry
 from app.routes import register_routes
+import multiprocessing
 import os
+import threading
+import time
 import urllib.parse
 
 # Global objects (used across blueprints)
@@ -41,31 +44,65 @@ def create_app():
 
     db.init_app(app)
 
+    # -----------------------------
+    # Pooled engine (one per worker)
+    # -----------------------------
+    engine = init_engine_registry(app)
+
     # -----------------------------
     # Stored Procedure Session Setup
     # -----------------------------
-    engine = get_db_engine()
     app.session_interface = StoredProcSessionInterface(engine)
 
     # -----------------------------
     # Email Configuration
     # -----------------------------
+    # MAIL_SERVER / MAIL_PORT / MAIL_USE_TLS can point at a local SMTP stub
     app.config.update(
-        MAIL_SERVER="smtp.office365.com",
-        MAIL_PORT=587,
-        MAIL_USE_TLS=True,
+        MAIL_SERVER=os.getenv("MAIL_SERVER", "smtp.office365.com"),
+        MAIL_PORT=int(os.getenv("MAIL_PORT", "587")),
+        MAIL_USE_TLS=os.getenv("MAIL_USE_TLS", "1") == "1",
         MAIL_USERNAME=os.getenv("EMAIL"),
         MAIL_PASSWORD=os.getenv("WSNZADMINPASS"),
         MAIL_DEFAULT_SENDER=os.getenv("EMAIL"),
     )
     mail.init_app(app)
 
+    # Outbound email goes through the spool in app/utils/email_outbox.py;
+    # each worker runs a dispatcher (one at a time actually sends).
+    from app.utils.email_outbox import EMAIL_OUTBOX_ENABLED, outbox
+    if EMAIL_OUTBOX_ENABLED and multiprocessing.parent_process() is None:
+        outbox.start(app)
+
+    # -----------------------------
+    # Exports
+    # -----------------------------
+    # Multi-class exports above this many classes run as background jobs
+    app.config["EXPORT_BACKGROUND_CLASSES"] = int(os.getenv("EXPORT_BACKGROUND_CLASSES", "15"))
+
     # -----------------------------
     # Register Blueprints
     # -----------------------------
     register_routes(app)
-    
-    
+
+    # -----------------------------
+    # CLI (flask --app run batch-reports ... / geodata-refresh / email-outbox)
+    # -----------------------------
+    from app.utils.batch_reports import batch_reports_command
+    from app.utils.email_outbox import email_outbox_command
+    from app.utils.geo import geodata_refresh_command
+    app.cli.add_command(batch_reports_command)
+    app.cli.add_command(email_outbox_command)
+    app.cli.add_command(geodata_refresh_command)
+
+    # -----------------------------
+    # Report rendering warm-up
+    # -----------------------------
+    # Fonts registered + Agg/PDF backends loaded once per worker, off the
+    # request path; the first report waits on the same lock if it's early.
+    if os.getenv("REPORT_WARMUP", "1") == "1":
+        _start_report_warmup(app)
+
     # -----------------------------
     # Redirect Unauthenticated Users
     # -----------------------------
@@ -106,4 +143,19 @@ def create_app():
     def inject_user_email():
         return {"user_email": session.get("user_email")}
 
-    return app
\ No newline at end of file
+    return app
+
+
+def _start_report_warmup(app):
+    from app.report_utils.helpers import warm_up_report_rendering
+
+    def run():
+        started = time.perf_counter()
+        try:
+            info = warm_up_report_rendering(os.path.join(app.static_folder, "fonts"))
+            app.logger.info("🔥 report rendering warm-up %.0f ms | %s",
+                            (time.perf_counter() - started) * 1000, info)
+        except Exception as e:
+            app.logger.warning("⚠️ report rendering warm-up skipped: %s", e)
+
+    threading.Thread(target=run, name="wsfl-report-warmup", daemon=True).start()
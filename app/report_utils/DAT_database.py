@@ -3,27 +3,20 @@ import os
 from typing import Any, Dict, Optional
 
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
 from dotenv import load_dotenv
 
-load_dotenv()
-
-_ENGINE: Optional[Engine] = None
+from app.utils.database import get_engine_for_url
 
+load_dotenv()
 
 def get_engine() -> Engine:
-    """Create (or return) a module-level SQLAlchemy engine using DB_URL from .env."""
-    global _ENGINE
-    #print("con")
-    if _ENGINE is None:
-        
-        db_url = os.getenv("DB_URL")
-        #print(db_url)
-        if not db_url:
-            raise ValueError("DB_URL is not set in your .env file")
-        _ENGINE = create_engine(db_url, pool_pre_ping=True, pool_recycle=1800)
-    return _ENGINE
+    """Return the shared pooled engine for DB_URL from .env (see app.utils.database)."""
+    db_url = os.getenv("DB_URL")
+    if not db_url:
+        raise ValueError("DB_URL is not set in your .env file")
+    return get_engine_for_url(db_url)
 
 
 def read_sql_df(sql: str, params: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
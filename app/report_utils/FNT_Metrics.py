@@ -0,0 +1,389 @@
+"""
+Text metrics without Text artists.
+
+Measuring a string through a Text artist (get_window_extent) runs
+FT2Font.set_text, which loads every glyph again for every new string.
+Report pages measure hundreds of strings (table column widths, autoshrink
+loops), so this module keeps, per (font file, size, dpi, hinting), a table
+of glyph advance + vertical extent loaded once from the font file, and
+measures strings by adding them up.
+
+The arithmetic matches the Agg renderer exactly (same hinting flags, same
+kerning, same bbox rules), so fitting decisions don't change:
+
+    width   = sum(hinted advance) + kerning          (26.6 units / 64)
+    height  = max(glyph yMax) - min(glyph yMin)
+    descent = -min(glyph yMin)
+
+Strings the tables can't answer exactly (glyphs from a fallback font,
+mathtext) are measured by the real renderer instead.
+
+Usage:
+    prop = FontProperties(family="PP Mori", weight="semibold", size=12)
+    w_px, h_px = text_extent_px("Some label\\nsecond line", prop, dpi=fig.dpi)
+    fs = fit_fontsize(lambda fs: fits_at(fs), 18, 6)
+"""
+import os
+import threading
+
+from matplotlib import rcParams
+from matplotlib.backends.backend_agg import RendererAgg, get_hinting_flag
+from matplotlib.font_manager import FontProperties, fontManager
+from matplotlib.ft2font import FT2Font, Kerning
+
+_LOCK = threading.Lock()
+_FONTS = {}       # (path, hinting_factor, kerning_factor) -> FT2Font (ours, not the shared one)
+_TABLES = {}      # (path, size, dpi, flags, hinting_factor, kerning_factor) -> _GlyphTable
+_RENDERERS = {}   # dpi -> RendererAgg used for the exact fallback
+_STATS = {"strings": 0, "fallbacks": 0, "tables": 0}
+
+
+def _reset_lock_after_fork():
+    # every measurement takes _LOCK; one held by another thread at fork stays held
+    global _LOCK
+    _LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_lock_after_fork)
+
+
+class _GlyphTable:
+    __slots__ = ("font", "size", "dpi", "flags", "hinting_factor", "glyphs", "kerning")
+
+    def __init__(self, font, size, dpi, flags, hinting_factor):
+        self.font = font
+        self.size = size
+        self.dpi = dpi
+        self.flags = flags
+        self.hinting_factor = hinting_factor
+        self.glyphs = {}   # char -> (glyph index, advance, yMin, yMax) in 26.6, or None if missing
+        self.kerning = {}  # (left index, right index) -> 26.6
+
+    def _glyph(self, ch):
+        try:
+            return self.glyphs[ch]
+        except KeyError:
+            pass
+        font = self.font
+        font.set_size(self.size, self.dpi)
+        index = font.get_char_index(ord(ch))
+        if index == 0:
+            info = None
+        else:
+            g = font.load_char(ord(ch), flags=self.flags)
+            _, y0, _, y1 = g.bbox
+            info = (index, int(round(g.horiAdvance / self.hinting_factor)), y0, y1)
+        self.glyphs[ch] = info
+        return info
+
+    def _kern(self, left, right):
+        pair = (left, right)
+        try:
+            return self.kerning[pair]
+        except KeyError:
+            self.font.set_size(self.size, self.dpi)
+            k = self.kerning[pair] = self.font.get_kerning(left, right, Kerning.DEFAULT)
+            return k
+
+    def measure(self, s):
+        """(w, h, d) in pixels, or None if a glyph isn't in this font."""
+        pen = 0
+        ymin = ymax = None
+        prev = None
+        for ch in s:
+            info = self._glyph(ch)
+            if info is None:
+                return None
+            index, advance, y0, y1 = info
+            if prev is not None:
+                pen += self._kern(prev, index)
+            pen += advance
+            ymin = y0 if ymin is None or y0 < ymin else ymin
+            ymax = y1 if ymax is None or y1 > ymax else ymax
+            prev = index
+        if ymin is None:
+            return 0.0, 0.0, 0.0
+        return pen / 64.0, (ymax - ymin) / 64.0, -ymin / 64.0
+
+
+def _table_for(prop: FontProperties, dpi: float) -> _GlyphTable:
+    path = fontManager.findfont(prop)
+    hinting_factor = rcParams["text.hinting_factor"]
+    kerning_factor = rcParams["text.kerning_factor"]
+    flags = get_hinting_flag()
+    size = prop.get_size_in_points()
+    key = (path, size, float(dpi), flags, hinting_factor, kerning_factor)
+    table = _TABLES.get(key)
+    if table is None:
+        font_key = (path, hinting_factor, kerning_factor)
+        font = _FONTS.get(font_key)
+        if font is None:
+            font = _FONTS[font_key] = FT2Font(
+                path, hinting_factor=hinting_factor, _kerning_factor=kerning_factor,
+            )
+        table = _TABLES[key] = _GlyphTable(font, size, float(dpi), flags, hinting_factor)
+        _STATS["tables"] += 1
+    return table
+
+
+def _renderer_measure(s, prop, dpi):
+    renderer = _RENDERERS.get(dpi)
+    if renderer is None:
+        renderer = _RENDERERS[dpi] = RendererAgg(1, 1, dpi)
+    return renderer.get_text_width_height_descent(s, prop, ismath=False)
+
+
+def _is_math(s: str) -> bool:
+    # Text._preprocess_math: an even number (>0) of unescaped "$"
+    if not rcParams["text.parse_math"] or rcParams["text.usetex"]:
+        return rcParams["text.usetex"]
+    dollars = s.count("$") - s.count(r"\$")
+    return dollars > 0 and dollars % 2 == 0
+
+
+def line_metrics_px(s: str, prop: FontProperties, dpi: float):
+    """(width, height, descent) in pixels of one line, as the Agg renderer lays it out."""
+    with _LOCK:
+        _STATS["strings"] += 1
+        result = _table_for(prop, dpi).measure(s)
+        if result is None:
+            _STATS["fallbacks"] += 1
+            result = _renderer_measure(s, prop, dpi)
+    return result
+
+
+def text_extent_px(s: str, prop: FontProperties, dpi: float, linespacing: float = None):
+    """
+    (width, height) in pixels of s drawn as an unrotated Text with these font
+    properties: the same numbers get_window_extent() gives, without an artist.
+    """
+    s = "" if s is None else str(s)
+    if not s:
+        return 0.0, 0.0  # get_window_extent() of an empty Text
+    if linespacing is None:
+        linespacing = 1.2  # Text's default
+    if any(_is_math(line) for line in s.split("\n")):
+        with _LOCK:
+            _STATS["fallbacks"] += 1
+        return _math_extent(s, prop, dpi, linespacing)
+
+    # Mirrors Text._get_layout
+    _, lp_h, lp_d = line_metrics_px("lp", prop, dpi)
+    min_dy = (lp_h - lp_d) * linespacing
+    width = 0.0
+    thisy = 0.0
+    d = 0.0
+    for i, line in enumerate(s.split("\n")):
+        w, h, d = line_metrics_px(line, prop, dpi) if line else (0.0, 0.0, 0.0)
+        h = max(h, lp_h)
+        d = max(d, lp_d)
+        width = max(width, w)
+        if i == 0:
+            thisy = -(h - d)
+        else:
+            thisy -= max(min_dy, (h - d) * linespacing)
+        thisy -= d
+    return width, -thisy
+
+
+def _math_extent(s, prop, dpi, linespacing):
+    from matplotlib.figure import Figure
+    from matplotlib.text import Text
+
+    fig = Figure(dpi=dpi)
+    t = Text(0, 0, s, fontproperties=prop, linespacing=linespacing)
+    t.set_figure(fig)
+    bb = t.get_window_extent(renderer=_renderer_for_math(dpi))
+    return bb.width, bb.height
+
+
+def _renderer_for_math(dpi):
+    renderer = _RENDERERS.get(("math", dpi))
+    if renderer is None:
+        renderer = _RENDERERS[("math", dpi)] = RendererAgg(1, 1, dpi)
+    return renderer
+
+
+def fit_fontsize(fits, fontsize: float, min_fontsize: float, step: float = 1.0, *, monotonic: bool = True) -> float:
+    """
+    Largest size in fontsize, fontsize - step, ... (floored at min_fontsize)
+    for which fits(size) is true; min_fontsize if none is.
+
+    Binary search when fits() only gets easier as the size shrinks (fixed
+    text); monotonic=False scans down one step at a time instead, for text
+    that is re-wrapped per size and can stop fitting at a smaller size.
+    """
+    fontsize = float(fontsize)
+    min_fontsize = float(min_fontsize)
+    if fontsize <= min_fontsize or fits(fontsize):
+        return fontsize
+
+    # candidates fontsize - k*step for k = 1..n, the last one clamped to min_fontsize
+    n = 1
+    while fontsize - n * step > min_fontsize:
+        n += 1
+
+    def size_at(k):
+        return max(min_fontsize, fontsize - k * step)
+
+    if not monotonic:
+        for k in range(1, n):
+            if fits(size_at(k)):
+                return size_at(k)
+        return size_at(n)
+
+    lo, hi = 1, n  # answer is the smallest k in [lo, hi] that fits, else n
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if fits(size_at(mid)):
+            hi = mid
+        else:
+            lo = mid + 1
+    return size_at(lo)
+
+
+def metrics():
+    with _LOCK:
+        data = dict(_STATS)
+        data["glyphs_cached"] = sum(len(t.glyphs) for t in _TABLES.values())
+    return data
+
+
+# ---------- benchmark ----------
+def _artist_extent_px(s, prop, dpi, linespacing=None):
+    # how text was measured before the glyph tables: a Text artist per string
+    s = "" if s is None else str(s)
+    if not s:
+        return 0.0, 0.0
+    return _math_extent(s, prop, dpi, 1.2 if linespacing is None else linespacing)
+
+
+def _synthetic_target_rows(n: int) -> list:
+    import random
+
+    rng = random.Random(19)
+    rows = []
+    for i in range(n):
+        kind = "Student" if i % 3 else "Kaiako"
+        target = rng.randint(40, 4000)
+        actual = int(target * rng.uniform(0.2, 1.3))
+        rows.append({
+            "Description": f"Funder {i + 1:02d} {'Water Safety Trust' if i % 2 else 'Aquatic Services'}",
+            "TargetType": kind,
+            "Target": target,
+            "StudentCount": actual if kind == "Student" else None,
+            "KaiakoCount": actual if kind == "Kaiako" else None,
+            "IncompleteStudentCount": int(actual * rng.uniform(0, 0.2)),
+        })
+    return rows
+
+
+def run_benchmark(rows: int = 18, repeats: int = 3, region_name: str = None,
+                  calendar_year: int = 2025, term: int = 4, db_url: str = None) -> dict:
+    """
+    Page build times with the glyph tables ("tables") against measuring every
+    string through a Text artist as before ("artists").
+
+    funder_targets_counts is built from synthetic rows. region_report needs
+    the database and geodata, so it only runs for a region_name (read through
+    db_url, default DB_URL).
+    Pages are drawn in this process so both modes measure the same work.
+    """
+    import io
+    import tempfile
+    import time
+    from contextlib import contextmanager
+
+    import matplotlib.pyplot as plt
+
+    from app.report_utils import FNT_PolygonText, TAB_DataframeTable, pdf_builder
+    from app.utils.funder_targets_counts_report import build_funder_targets_counts_figure
+
+    @contextmanager
+    def measuring(fn):
+        saved = FNT_PolygonText.text_extent_px, TAB_DataframeTable.text_extent_px
+        FNT_PolygonText.text_extent_px = TAB_DataframeTable.text_extent_px = fn
+        try:
+            yield
+        finally:
+            FNT_PolygonText.text_extent_px, TAB_DataframeTable.text_extent_px = saved
+
+    def best_of(build):
+        build()  # warm caches (fonts, rates, geometry) outside the timing
+        best = float("inf")
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            pages = build()
+            best = min(best, (time.perf_counter() - t0) / max(1, pages))
+        return best
+
+    def targets_page():
+        fig, _ = build_funder_targets_counts_figure(target_rows)
+        fig.savefig(io.BytesIO(), format="pdf")
+        plt.close(fig)
+        return 1
+
+    target_rows = _synthetic_target_rows(rows)
+    reports = {"funder_targets_counts": targets_page}
+
+    tmpdir = None
+    if region_name:
+        from app import create_app
+        from app.utils.database import get_engine_for_url
+        from app.utils.region_report import build_region_report_pdf
+
+        engine = get_engine_for_url(db_url or os.getenv("DB_URL"))
+        tmpdir = tempfile.TemporaryDirectory(prefix="fnt_bench_")
+        app = create_app()
+
+        def region_page():
+            with app.app_context(), engine.connect() as conn:
+                preview, meta = build_region_report_pdf(
+                    conn=conn,
+                    region_name=region_name,
+                    calendar_year=calendar_year,
+                    term=term,
+                    out_pdf_path=os.path.join(tmpdir.name, "region.pdf"),
+                )
+            if preview is not None:
+                plt.close(preview)
+            return meta["pages"]
+
+        reports["region_report"] = region_page
+
+    saved_workers = pdf_builder.PDF_PAGE_WORKERS
+    pdf_builder.PDF_PAGE_WORKERS = 1  # pool workers wouldn't see the swapped measurement
+    results = {}
+    try:
+        for report, build in reports.items():
+            timings = {}
+            for mode, fn in (("artists", _artist_extent_px), ("tables", text_extent_px)):
+                with measuring(fn):
+                    timings[mode] = round(best_of(build) * 1000, 1)
+            results[report] = timings
+    finally:
+        pdf_builder.PDF_PAGE_WORKERS = saved_workers
+        if tmpdir is not None:
+            tmpdir.cleanup()
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Benchmark report page builds with and without the glyph tables.")
+    ap.add_argument("--rows", type=int, default=18, help="synthetic funder target rows")
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--region", default=None, help='also time region_report, e.g. "Otago Region"')
+    ap.add_argument("--db-url", default=None, help="database for region_report (defaults to $DB_URL)")
+    ap.add_argument("--year", type=int, default=2025)
+    ap.add_argument("--term", type=int, default=4)
+    args = ap.parse_args()
+
+    res = run_benchmark(args.rows, args.repeats, args.region, args.year, args.term, args.db_url)
+    for report, r in res.items():
+        print(f"{report:>22}: artists {r['artists']:.1f} ms/page  tables {r['tables']:.1f} ms/page"
+              f"  ({r['artists'] / r['tables']:.2f}x)")
+    if "region_report" not in res:
+        print("         region_report: skipped (pass --region)")
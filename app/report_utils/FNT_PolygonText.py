@@ -1,15 +1,8 @@
 import textwrap
 import matplotlib.patches as mpatches
+from matplotlib.font_manager import FontProperties
 
-def _get_renderer(ax):
-    # Works across backends
-    fig = ax.figure
-    try:
-        return fig.canvas.get_renderer()
-    except Exception:
-        fig.canvas.draw()
-        return fig.canvas.get_renderer()
-
+from app.report_utils.FNT_Metrics import fit_fontsize, text_extent_px
 
 def draw_text_in_polygon(
     ax,
@@ -63,7 +56,6 @@ def draw_text_in_polygon(
 
     # convert box width/height to pixels for fitting math
     fig = ax.figure
-    rend = _get_renderer(ax)
     (x0_px, y0_px) = ax.transAxes.transform((box_minx, box_miny))
     (x1_px, y1_px) = ax.transAxes.transform((box_maxx, box_maxy))
     box_w_px = max(1.0, x1_px - x0_px)
@@ -93,16 +85,48 @@ def draw_text_in_polygon(
     def make_text(fs_pt: float) -> str:
         return apply_wrap(text, fs_pt)
 
-    # Create artists lazily so we can update them in autoshrink loop
-    txt_single = None
-    txt_bold = None
-    txt_rest = None
-
-    fs = float(fontsize)
+    # Sizes are measured arithmetically (FNT_Metrics, same numbers as
+    # get_window_extent) and the artists are only created once, at the
+    # chosen size.
+    dpi = fig.dpi
+    layouts = {}
 
-    def measure_artist(t):
-        bb = t.get_window_extent(renderer=rend)
-        return bb.width, bb.height
+    def layout(fs: float):
+        """(text, block width px, block height px, first-line height px) at fs."""
+        if fs in layouts:
+            return layouts[fs]
+        s = make_text(fs)
+        if not bold_first_line:
+            w_px, h_px = text_extent_px(
+                s, FontProperties(family=fontfamily, weight=fontweight, size=fs), dpi, linespacing
+            )
+            result = (s, w_px, h_px, None)
+        else:
+            lines = s.splitlines() if s else [""]
+            first = lines[0] if lines else ""
+            rest = "\n".join(lines[1:]) if len(lines) > 1 else ""
+            w1_px, h1_px = text_extent_px(
+                first, FontProperties(family=fontfamily, weight=first_line_weight, size=fs), dpi, linespacing
+            )
+            w2_px, h2_px = text_extent_px(
+                rest, FontProperties(family=fontfamily, weight=rest_weight, size=fs), dpi, linespacing
+            ) if rest else (0.0, 0.0)
+            # A small vertical gap between first line and rest (as a fraction of line height)
+            gap_px = 0.15 * h1_px if rest else 0.0
+            result = ((first, rest), max(w1_px, w2_px), h1_px + gap_px + h2_px, h1_px)
+        layouts[fs] = result
+        return result
+
+    def fits(fs: float) -> bool:
+        _, w_px, h_px, _ = layout(fs)
+        return (w_px <= box_w_px) and (h_px <= box_h_px)
+
+    if autoshrink:
+        # wrapped text is re-wrapped per size, so it isn't monotonic in fs
+        fs = fit_fontsize(fits, fontsize, min_fontsize, monotonic=not wrap)
+    else:
+        fs = float(fontsize)
+    s, _, total_h_px, h1_px = layout(fs)
 
     def px_to_axes_dy(dy_px: float) -> float:
         # Convert a pixel delta (vertical) to axes coords delta at current axes transform
@@ -112,99 +136,54 @@ def draw_text_in_polygon(
         _, y_axes2 = ax.transAxes.inverted().transform((x_ref2, y_ref2))
         return (y_axes2 - y_axes)
 
-    while True:
-        s = make_text(fs)
-
-        if not bold_first_line:
-            if txt_single is None:
-                txt_single = ax.text(
-                    cx, cy, s,
-                    transform=ax.transAxes,
-                    ha="center", va="center",
-                    color=color, fontsize=fs,
-                    fontweight=fontweight, fontfamily=fontfamily,
-                    linespacing=linespacing,
-                    zorder=zorder + 1,
-                    clip_on=False,
-                )
-            else:
-                txt_single.set_text(s)
-                txt_single.set_fontsize(fs)
-
-            w_px, h_px = measure_artist(txt_single)
-            fits = (w_px <= box_w_px) and (h_px <= box_h_px)
-
-            if fits or not autoshrink or fs <= min_fontsize:
-                if clip_to_polygon:
-                    txt_single.set_clip_path(poly_patch)
-                return txt_single
-
-            fs = max(min_fontsize, fs - 1.0)
-            continue
-
-        # ----- bold-first-line mode -----
-        lines = s.splitlines() if s else [""]
-        first = lines[0] if lines else ""
-        rest = "\n".join(lines[1:]) if len(lines) > 1 else ""
-
-        # Create texts with va="top" so we can place them from a known top y
-        if txt_bold is None:
-            txt_bold = ax.text(
-                cx, cy, first,
-                transform=ax.transAxes,
-                ha="center", va="top",
-                color=color, fontsize=fs,
-                fontweight=first_line_weight, fontfamily=fontfamily,
-                linespacing=linespacing,
-                zorder=zorder + 2,
-                clip_on=False,
-            )
-        else:
-            txt_bold.set_text(first)
-            txt_bold.set_fontsize(fs)
-
-        if txt_rest is None:
-            txt_rest = ax.text(
-                cx, cy, rest,
-                transform=ax.transAxes,
-                ha="center", va="top",
-                color=color, fontsize=fs,
-                fontweight=rest_weight, fontfamily=fontfamily,
-                linespacing=linespacing,
-                zorder=zorder + 1,
-                clip_on=False,
-            )
-        else:
-            txt_rest.set_text(rest)
-            txt_rest.set_fontsize(fs)
-
-        # Measure heights in px
-        _, h1_px = measure_artist(txt_bold)
-        w2_px, h2_px = measure_artist(txt_rest) if rest else (0.0, 0.0)
-
-        # A small vertical gap between first line and rest (as a fraction of line height)
-        gap_px = 0.15 * h1_px if rest else 0.0
-
-        total_h_px = h1_px + gap_px + h2_px
-
-        # Position the *combined* block centered at cy
-        top_y_axes = cy + px_to_axes_dy(total_h_px / 2.0)
-
-        txt_bold.set_position((cx, top_y_axes))
-        if rest:
-            y_rest_axes = top_y_axes - px_to_axes_dy(h1_px + gap_px)
-            txt_rest.set_position((cx, y_rest_axes))
-
-        # Now measure combined width/height “as drawn”
-        # (height is total_h_px by construction; width is max of both)
-        w1_px, _ = measure_artist(txt_bold)
-        fits = (max(w1_px, w2_px) <= box_w_px) and (total_h_px <= box_h_px)
+    if not bold_first_line:
+        txt_single = ax.text(
+            cx, cy, s,
+            transform=ax.transAxes,
+            ha="center", va="center",
+            color=color, fontsize=fs,
+            fontweight=fontweight, fontfamily=fontfamily,
+            linespacing=linespacing,
+            zorder=zorder + 1,
+            clip_on=False,
+        )
+        if clip_to_polygon:
+            txt_single.set_clip_path(poly_patch)
+        return txt_single
+
+    # ----- bold-first-line mode -----
+    first, rest = s
+
+    # Position the *combined* block centered at cy, placing both from a known top y
+    top_y_axes = cy + px_to_axes_dy(total_h_px / 2.0)
+
+    txt_bold = ax.text(
+        cx, top_y_axes, first,
+        transform=ax.transAxes,
+        ha="center", va="top",
+        color=color, fontsize=fs,
+        fontweight=first_line_weight, fontfamily=fontfamily,
+        linespacing=linespacing,
+        zorder=zorder + 2,
+        clip_on=False,
+    )
 
-        if fits or not autoshrink or fs <= min_fontsize:
-            if clip_to_polygon:
-                txt_bold.set_clip_path(poly_patch)
-                if txt_rest is not None:
-                    txt_rest.set_clip_path(poly_patch)
-            return (txt_bold, txt_rest)
+    y_rest_axes = cy
+    if rest:
+        gap_px = 0.15 * h1_px
+        y_rest_axes = top_y_axes - px_to_axes_dy(h1_px + gap_px)
+    txt_rest = ax.text(
+        cx, y_rest_axes, rest,
+        transform=ax.transAxes,
+        ha="center", va="top",
+        color=color, fontsize=fs,
+        fontweight=rest_weight, fontfamily=fontfamily,
+        linespacing=linespacing,
+        zorder=zorder + 1,
+        clip_on=False,
+    )
 
-        fs = max(min_fontsize, fs - 1.0)
\ No newline at end of file
+    if clip_to_polygon:
+        txt_bold.set_clip_path(poly_patch)
+        txt_rest.set_clip_path(poly_patch)
+    return (txt_bold, txt_rest)
@@ -9,10 +9,11 @@ import numpy as np
 
 import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle
-from matplotlib.text import Text
 from matplotlib.textpath import TextPath
 from matplotlib.font_manager import FontProperties
 
+from app.report_utils.FNT_Metrics import text_extent_px
+
 Align = Literal["left", "center", "right"]
 
 
@@ -701,29 +702,14 @@ def table_pos(
 # ============================================================
 # Dynamic column width helper
 # ============================================================
-def _get_renderer(fig):
-    rend = fig.canvas.get_renderer()
-    if rend is None:
-        fig.canvas.draw()
-        rend = fig.canvas.get_renderer()
-    return rend
-
-
 def _text_width_px(ax, s: str, *, fontsize: float, family: Optional[str], weight: str = "normal") -> float:
     txt = (s or "")
     fig = ax.figure
 
     try:
-        renderer = _get_renderer(fig)
-        t = Text(x=0, y=0, text=txt)
-        t.set_figure(fig)  # critical so DPI exists
-        t.set_fontsize(fontsize)
-        if family is not None:
-            t.set_fontfamily(family)
-        if weight is not None:
-            t.set_fontweight(weight)
-        bb = t.get_window_extent(renderer=renderer)
-        return float(bb.width)
+        # same number as a Text artist's get_window_extent().width, no artist
+        prop = FontProperties(family=family, weight=weight, size=fontsize)
+        return float(text_extent_px(txt, prop, fig.dpi)[0])
     except Exception:
         try:
             fp = FontProperties(family=family, weight=weight, size=fontsize)
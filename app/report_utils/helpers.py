@@ -1,11 +1,78 @@
 def format_title(text):
     return text.title().replace("_", " ")
+import io
+import os
+import threading
 from pathlib import Path
 import re
 import matplotlib.font_manager as fm
 import matplotlib.pyplot as plt
 
 
+# ---------- fonts ----------
+# Registering a font dir (glob + fontManager.addfont per file + a ttflist
+# scan) happens once per process per (dir, pattern); later calls only set
+# rcParams. warm_up_report_rendering() does the first registration and a
+# throwaway Agg/PDF draw at worker start so the first report doesn't pay it.
+_FONT_LOCK = threading.Lock()
+_FONT_DIRS = {}  # (resolved dir, patterns) -> FontDirInfo
+_ADDED_FONTS = set()  # addfont() appends to ttflist every time, so never twice
+
+
+class FontDirInfo:
+    __slots__ = ("paths", "family", "mori_families")
+
+    def __init__(self, paths, family, mori_families):
+        self.paths = paths                  # registered files, in glob order
+        self.family = family                # family name of the first file
+        self.mori_families = mori_families  # every family matplotlib knows containing "mori"
+
+
+def _reset_font_lock_after_fork():
+    global _FONT_LOCK
+    _FONT_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_font_lock_after_fork)
+
+
+def register_font_dir(font_dir, patterns=("*.otf", "*.ttf")) -> FontDirInfo:
+    """Add the fonts in font_dir to matplotlib once per process; returns what was found."""
+    font_dir = Path(font_dir)
+    if isinstance(patterns, str):
+        patterns = (patterns,)
+    key = (str(font_dir.resolve()), tuple(patterns))
+    info = _FONT_DIRS.get(key)
+    if info is not None:
+        return info
+
+    with _FONT_LOCK:
+        info = _FONT_DIRS.get(key)
+        if info is not None:
+            return info
+
+        paths = [p for pattern in patterns for p in sorted(font_dir.glob(pattern))]
+        for p in paths:
+            resolved = str(p.resolve())
+            if resolved not in _ADDED_FONTS:
+                fm.fontManager.addfont(resolved)
+                _ADDED_FONTS.add(resolved)
+        family = fm.FontProperties(fname=str(paths[0])).get_name() if paths else None
+        mori_families = sorted({
+            f.name for f in fm.fontManager.ttflist
+            if "mori" in f.name.lower()
+        })
+        info = FontDirInfo(tuple(paths), family, tuple(mori_families))
+        _FONT_DIRS[key] = info
+
+    if paths:
+        print(f"✅ Registered {len(paths)} fonts from {font_dir} ({', '.join(mori_families) or family})")
+    else:
+        print(f"⚠️ No {'/'.join(patterns)} files found in {font_dir.resolve()}")
+    return info
+
+
 def load_ppmori_fonts(font_dir: str | Path) -> str:
     """
     Register PP Mori OTF fonts with Matplotlib and set rcParams font.family
@@ -13,43 +80,56 @@ def load_ppmori_fonts(font_dir: str | Path) -> str:
 
     Returns the chosen family name.
     """
-    font_dir = Path(font_dir)
-    print(f"🔎 font_dir = {font_dir.resolve()} | exists={font_dir.exists()}")
-
-    otfs = sorted(font_dir.glob("PPMori-*.otf"))
-    if not otfs:
-        print(f"⚠️ No PPMori-*.otf files found in {font_dir}")
+    info = register_font_dir(font_dir, "PPMori-*.otf")
+    if not info.paths:
         return "sans-serif"
 
-    for p in otfs:
-        fm.fontManager.addfont(str(p))
-
-    # Rebuild/scan and discover family names that contain "mori"
-    mori_families = sorted({
-        f.name for f in fm.fontManager.ttflist
-        if "mori" in f.name.lower()
-    })
-
-    print("✅ Matplotlib sees these 'mori' families:")
-    for n in mori_families:
-        print("   -", n)
-
     # Prefer exact family if present
     preferred = None
     for cand in ["PPMori", "PP Mori", "PP Mori Text"]:
-        if cand in mori_families:
+        if cand in info.mori_families:
             preferred = cand
             break
 
-    chosen = preferred or (mori_families[0] if mori_families else "sans-serif")
+    chosen = preferred or (info.mori_families[0] if info.mori_families else "sans-serif")
 
     plt.rcParams.update({
         "font.family": chosen,
         "font.size": 12,
     })
-
-    print(f"🎯 Using font.family = {chosen}")
     return chosen
+
+
+def warm_up_report_rendering(font_dir="app/static/fonts") -> dict:
+    """
+    Register the report fonts and draw one small figure to PNG and PDF, so
+    the Agg/PDF backends and the findfont/glyph caches are loaded before the
+    first real report.
+
+    Runs on a background thread while requests may already be rendering:
+    draws on its own Figure/FigureCanvasAgg (no pyplot figure manager) with
+    explicit FontProperties, and never touches the global rcParams.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    register_font_dir(font_dir, "PPMori-*.otf")  # load_ppmori_fonts' set
+    info = register_font_dir(font_dir)           # use_ppmori's set
+    family = info.family or "sans-serif"
+    regular = fm.FontProperties(family=family, size=10)
+    bold = fm.FontProperties(family=family, size=10, weight="bold")
+    fm.findfont(regular)
+    fm.findfont(bold)
+
+    fig = Figure(figsize=(2, 1), dpi=100)
+    FigureCanvasAgg(fig)
+    fig.text(0.5, 0.5, "Warm up 0123456789%", ha="center", va="center", fontproperties=regular)
+    fig.text(0.5, 0.2, "Bold", ha="center", fontproperties=bold)
+    for fmt in ("png", "pdf"):
+        fig.savefig(io.BytesIO(), format=fmt)
+    return {"fonts": len(info.paths), "family": family}
+
+
 def choose_text_color(hex_color):
     # Convert hex to R, G, B (0-255)
     r_hex = int(hex_color[1:3], 16)
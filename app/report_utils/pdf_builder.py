@@ -1,10 +1,41 @@
 # app/report_utils/pdf_builder.py
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Literal, Tuple, Optional
+from typing import Any, Callable, Dict, List, Literal, Tuple, Optional
 
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 
+try:
+    from pypdf import PdfWriter
+except ImportError:  # optional: without it every report renders in-process
+    PdfWriter = None
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+# Page-parallel rendering (open_pdf(..., parallel=True) + render_pages)
+PDF_PAGE_WORKERS = max(1, int(_env_float("PDF_PAGE_WORKERS", min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = max(2, int(_env_float("PDF_PARALLEL_MIN_PAGES", 4)))
+# forkserver/spawn: reports render on gunicorn request threads, and a plain
+# fork would copy locks other threads hold (text metrics, caches) into the child
+PDF_PAGE_START_METHOD = os.getenv("PDF_PAGE_START_METHOD", "forkserver")
+# how long close() waits for the pool before drawing the rest in-process
+PDF_PAGE_TIMEOUT_S = max(1.0, _env_float("PDF_PAGE_TIMEOUT_S", 45))
+
 
 # ISO paper sizes in inches (portrait)
 ISO_IN = {
@@ -78,12 +109,22 @@ def open_pdf(
     orientation: Literal["portrait", "landscape"] = "portrait",
     dpi: int = 300,
     custom_size_in: Optional[Tuple[float, float]] = None,
+    parallel: bool = False,
 ):
-    """Open a PdfPages object and return (pdf, width_in, height_in, dpi)."""
+    """
+    Open a PdfPages object and return (pdf, width_in, height_in, dpi).
+
+    parallel=True returns a ParallelPdfPages instead when page-parallel
+    rendering is available here (see render_pages); it takes the same
+    savefig()/close() calls, so save_page/close_pdf work unchanged.
+    """
     out = Path(filename)
     out.parent.mkdir(parents=True, exist_ok=True)
     width_in, height_in = _page_dims(page_size, orientation, custom_size_in)
-    pdf = PdfPages(out)
+    if parallel and _parallel_available():
+        pdf = ParallelPdfPages(out)
+    else:
+        pdf = PdfPages(out)
     return pdf, width_in, height_in, dpi
 
 
@@ -149,10 +190,272 @@ def save_page(
 
 
 def close_pdf(pdf):
-    """Close PdfPages safely across matplotlib versions."""
+    """
+    Close PdfPages safely across matplotlib versions. A ParallelPdfPages
+    close (waiting for the pool, the merge) is where its document gets
+    written, so its errors are raised rather than printed.
+    """
     if pdf is None:
         return
+    if isinstance(pdf, ParallelPdfPages):
+        pdf.close()
+        return
     try:
         pdf.close()
     except Exception as e:
-        print(f"⚠️ close_pdf: could not close PDF cleanly: {e}")
\ No newline at end of file
+        print(f"⚠️ close_pdf: could not close PDF cleanly: {e}")
+
+
+# -----------------------------
+# Page-parallel rendering
+# -----------------------------
+@dataclass
+class PageSpec:
+    """
+    One page described as data: draw(fig=fig, ax=ax, **kwargs) draws it onto
+    a blank new_page(). draw must be a module-level function and kwargs
+    picklable (DataFrames, shapely geometry, paths, plain values), because
+    the page may be drawn in another process.
+    """
+    draw: Callable[..., None]
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    footer_png: Optional[str] = None
+    footer_max_height_frac: float = 0.25
+    full_bleed: bool = True
+
+
+def _parallel_available() -> bool:
+    # Not inside a pool worker (batch reports already use every core)
+    return (
+        PdfWriter is not None
+        and PDF_PAGE_WORKERS > 1
+        and multiprocessing.parent_process() is None
+    )
+
+
+def _draw_and_save(pdf, spec: PageSpec, width_in: float, height_in: float, dpi: int, *, keep: bool = False):
+    fig, ax = new_page(width_in, height_in, dpi)
+    spec.draw(fig=fig, ax=ax, **spec.kwargs)
+    save_page(
+        pdf,
+        fig,
+        footer_png=spec.footer_png,
+        width_in=width_in,
+        height_in=height_in,
+        footer_max_height_frac=spec.footer_max_height_frac,
+        full_bleed=spec.full_bleed,
+    )
+    return fig if keep else None
+
+
+def _init_page_worker():
+    # forkserver/spawn workers start without the report fonts (skipped under fork)
+    from app.report_utils.helpers import warm_up_report_rendering
+    warm_up_report_rendering(str(Path(__file__).resolve().parents[1] / "static" / "fonts"))
+
+
+def _render_rc() -> dict:
+    """The caller's rcParams (fonts set by use_ppmori etc.), for the pool workers."""
+    return {k: v for k, v in plt.rcParams.items() if not k.startswith("backend")}
+
+
+def _render_chunk(specs: List[PageSpec], width_in: float, height_in: float, dpi: int, path: str,
+                  rc: Optional[dict] = None) -> str:
+    """Pool worker: draw specs, in order, into their own PDF at path."""
+    with plt.rc_context(rc or {}):
+        pdf = PdfPages(path)
+        try:
+            for spec in specs:
+                _draw_and_save(pdf, spec, width_in, height_in, dpi)
+        finally:
+            pdf.close()
+    return path
+
+
+# One pool per process, started on first use and kept for later reports
+_POOL_LOCK = threading.Lock()
+_POOL = None
+
+
+def _page_pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None or getattr(_POOL, "_broken", False):
+            ctx = multiprocessing.get_context(PDF_PAGE_START_METHOD)
+            method = ctx.get_start_method()
+            if method == "forkserver":
+                ctx.set_forkserver_preload([__name__])
+            _POOL = ProcessPoolExecutor(
+                max_workers=PDF_PAGE_WORKERS,
+                mp_context=ctx,
+                initializer=None if method == "fork" else _init_page_worker,
+            )
+        return _POOL
+
+
+def _discard_page_pool(pool: ProcessPoolExecutor):
+    """Terminate a pool with a stuck worker; the next report starts a fresh one."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL = None
+    for proc in list((getattr(pool, "_processes", None) or {}).values()):
+        if proc.is_alive():
+            proc.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _reset_pool_after_fork():
+    # the parent's pool (and its lock) belong to the parent
+    global _POOL_LOCK, _POOL
+    _POOL_LOCK = threading.Lock()
+    _POOL = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+
+class ParallelPdfPages:
+    """
+    PdfPages stand-in whose pages can be drawn by a process pool.
+
+    The document is kept as ordered segments: pages saved in-process through
+    savefig() go into a local segment file, render_pages() queues chunks of
+    PageSpecs on the pool. close() waits for the pool and merges the segment
+    PDFs in order with pypdf. A chunk whose worker fails, or that isn't
+    back within PDF_PAGE_TIMEOUT_S, is drawn again in-process, so a broken
+    or stuck pool costs time, not the report.
+    """
+
+    def __init__(self, filename):
+        self.filename = Path(filename)
+        self._tmpdir = Path(tempfile.mkdtemp(prefix=".pages-", dir=self.filename.parent))
+        self._segments = []  # ("local", path) | ("pool", future, specs, (w, h, dpi), rc, path)
+        self._local = None   # PdfPages of the open local segment
+        self._pool = None
+        self.pages_parallel = 0
+
+    def _segment_path(self) -> str:
+        return str(self._tmpdir / f"segment_{len(self._segments):04d}.pdf")
+
+    def _close_local(self):
+        if self._local is not None:
+            self._local.close()
+            self._local = None
+
+    def savefig(self, figure=None, **kwargs):
+        if self._local is None:
+            path = self._segment_path()
+            self._local = PdfPages(path)
+            self._segments.append(("local", path))
+        self._local.savefig(figure, **kwargs)
+
+    def reserve(self) -> PdfPages:
+        """A PdfPages for the next segment, to be filled (and closed) by the caller."""
+        self._close_local()
+        path = self._segment_path()
+        self._segments.append(("local", path))
+        return PdfPages(path)
+
+    def submit(self, specs: List[PageSpec], width_in: float, height_in: float, dpi: int, workers: int):
+        self._close_local()
+        if self._pool is None:
+            self._pool = _page_pool()
+        rc = _render_rc()
+        # a couple of chunks per worker: keeps them busy without embedding
+        # the fonts once per page
+        size = max(1, math.ceil(len(specs) / (workers * 2)))
+        for i in range(0, len(specs), size):
+            chunk = specs[i:i + size]
+            path = self._segment_path()
+            try:
+                future = self._pool.submit(_render_chunk, chunk, width_in, height_in, dpi, path, rc)
+            except Exception as e:  # broken / shut down pool: drawn in-process by close()
+                future = None
+                print(f"⚠️ page pool unavailable ({e})")
+            self._segments.append(("pool", future, chunk, (width_in, height_in, dpi), rc, path))
+        self.pages_parallel += len(specs)
+
+    def _wait(self, future, deadline) -> bool:
+        """True once the chunk's segment is written by the pool."""
+        if future is None:
+            return False
+        try:
+            future.result(timeout=max(0.0, deadline - time.monotonic()))
+            return True
+        except TimeoutError:
+            print(f"⚠️ page workers not done after {PDF_PAGE_TIMEOUT_S:.0f}s; restarting the page pool")
+            future.cancel()
+            if self._pool is not None:
+                _discard_page_pool(self._pool)
+                self._pool = None
+        except Exception as e:
+            print(f"⚠️ page worker failed ({e})")
+        return False
+
+    def close(self):
+        try:
+            self._close_local()
+            deadline = time.monotonic() + PDF_PAGE_TIMEOUT_S
+            writer = PdfWriter()
+            for segment in self._segments:
+                path = segment[-1]
+                if segment[0] == "pool":
+                    _, future, chunk, dims, rc, path = segment
+                    if not self._wait(future, deadline):
+                        print(f"⚠️ drawing {len(chunk)} page(s) in-process")
+                        _render_chunk(chunk, *dims, path, rc)
+                if os.path.exists(path):  # an empty PdfPages writes no file
+                    writer.append(path)
+            with open(self.filename, "wb") as fh:
+                writer.write(fh)
+        finally:
+            self._segments = []
+            self._pool = None
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+
+def render_pages(
+    pdf,
+    specs: List[PageSpec],
+    *,
+    width_in: float,
+    height_in: float,
+    dpi: int = 300,
+    keep_first: bool = False,
+    workers: Optional[int] = None,
+):
+    """
+    Append specs to pdf in order.
+
+    With a ParallelPdfPages and at least PDF_PARALLEL_MIN_PAGES pages, the
+    pages go to the process pool (PDF_PAGE_WORKERS); otherwise they are drawn
+    here, one after another, exactly like new_page + save_page.
+
+    keep_first=True draws the first page in this process (while the pool
+    works on the rest) and returns its figure, for the preview PNG.
+    Returns None otherwise.
+    """
+    specs = list(specs)
+    if not specs:
+        return None
+
+    workers = max(1, min(int(workers or PDF_PAGE_WORKERS), PDF_PAGE_WORKERS))
+    rest = specs[1:] if keep_first else specs
+    if isinstance(pdf, ParallelPdfPages) and workers > 1 and len(rest) >= PDF_PARALLEL_MIN_PAGES:
+        first_pdf = pdf.reserve() if keep_first else None
+        pdf.submit(rest, width_in, height_in, dpi, workers)
+        if first_pdf is None:
+            return None
+        try:
+            return _draw_and_save(first_pdf, specs[0], width_in, height_in, dpi, keep=True)
+        finally:
+            first_pdf.close()
+
+    first_fig = None
+    for i, spec in enumerate(specs):
+        fig = _draw_and_save(pdf, spec, width_in, height_in, dpi, keep=keep_first and i == 0)
+        if fig is not None:
+            first_fig = fig
+    return first_fig
@@ -7,6 +7,7 @@ import os
 from sqlalchemy import create_engine, text
 from app.routes.auth import login_required
 from app.utils.database import get_db_engine
+from app.utils.reference_data import reference_rows
 from app.utils.wsfl_email import create_user_and_send, send_account_invites, temp_password
 import bcrypt
 from app.extensions import mail
@@ -148,10 +149,11 @@ def add_user():
 
             total_sent = 0
             total_failed = 0
+            statuses = []
 
             # Send admin invites (if any)
             if admin_recipients:
-                sent_a, failed_a = send_account_invites(
+                sent_a, failed_a, status_a = send_account_invites(
                     mail,
                     admin_recipients,
                     make_admin=True,
@@ -160,11 +162,12 @@ def add_user():
                 )
                 total_sent += sent_a
                 total_failed += failed_a
+                statuses.append(status_a)
 
 
             # Send standard invites (if any)
             if standard_recipients:
-                sent_s, failed_s = send_account_invites(
+                sent_s, failed_s, status_s = send_account_invites(
                     mail,
                     standard_recipients,
                     make_admin=False,
@@ -173,9 +176,11 @@ def add_user():
                 )
                 total_sent += sent_s
                 total_failed += failed_s
+                statuses.append(status_s)
 
             if total_sent > 0:
-                msg = f"{total_sent} invite(s) sent."
+                status = "queued" if "queued" in statuses else "sent"
+                msg = f"{total_sent} invite(s) {status}."
                 if total_failed:
                     msg += f" {total_failed} invite(s) could not be sent."
                 flash(msg, "success" if total_failed == 0 else "warning")
@@ -190,9 +195,7 @@ def add_user():
         schools = []
         try:
             with engine.begin() as conn:
-                schools = conn.execute(
-                    text("EXEC FlaskHelperFunctions @Request = 'SchoolDropdownAll'")
-                ).fetchall()
+                schools = reference_rows("SchoolDropdownAll", conn=conn)
         except Exception as fetch_err:
             current_app.logger.warning(f"School dropdown load failed: {fetch_err}")
             flash(
@@ -27,7 +27,19 @@ from flask import (
 import re
 from app.extensions import mail
 from app.routes.auth import login_required
-from app.utils.database import get_db_engine, log_alert, get_terms, get_years
+from app.utils.database import get_db_engine, log_alert, get_terms, get_years, pool_stats
+from app.utils.email_outbox import outbox
+from app.utils.class_cache import class_result_cache
+from app.utils.entitlements import entitlement_cache, entitlements_for, invalidate_entitlements
+from app.utils.rates_data import rates_cache
+from app.utils.reference_data import invalidate_reference_data, reference_cache, reference_rows
+from app.utils.figure_export import render_timings
+from app.utils.icon_cache import icon_cache
+from app.utils.region_geometry import region_geometry
+from app.utils.survey_answers import survey_submit_metrics
+from app.utils.survey_definitions import survey_cache
+from app.utils.report_cache import mark_report_data_changed, report_cache
+from app.report_utils import FNT_Metrics
 
 # Blueprint
 admin_bp = Blueprint("admin_bp", __name__)
@@ -278,8 +290,7 @@ def profile():
         school_type_options, eLearning_status = [], []
         engine = get_db_engine()
         with engine.connect() as conn:
-            result = conn.execute(text("EXEC FlaskHelperFunctions 'SchoolTypeDropdown'"))
-            school_type_options = [dict(row._mapping) for row in result]
+            school_type_options = reference_rows("SchoolTypeDropdown", conn=conn)
 
             result = conn.execute(
                 text("EXEC GetElearningStatus :Email"),
@@ -666,6 +677,7 @@ def assign_provider():
             except Exception:
                 current_app.logger.info("assign_provider SP returned no result set")
 
+        invalidate_entitlements()
         current_app.logger.info("assign_provider completed successfully")
         return jsonify(success=True)
 
@@ -794,12 +806,16 @@ def add_provider():
             new_id      = row.get("NewID")
             funder_name = row.get("FunderName")
 
-            return jsonify({
-                "success": True,
-                "new_id": new_id,
-                "funder_name": funder_name,
-                "provider_name": provider_name
-            })
+        # Committed: provider dropdowns and entity lists need reloading
+        invalidate_reference_data("providers")
+        invalidate_entitlements()
+
+        return jsonify({
+            "success": True,
+            "new_id": new_id,
+            "funder_name": funder_name,
+            "provider_name": provider_name
+        })
 
     except Exception as e:
         current_app.logger.exception("❌ add_provider failed")
@@ -860,24 +876,7 @@ def manage_providers():
 
     # ADM always allowed; FUN only for own funder_id
     try:
-        engine = get_db_engine()
-        with engine.begin() as conn:
-            rows = conn.execute(
-                text("""
-                    SET NOCOUNT ON;
-                    EXEC dbo.FlaskGetEntities
-                        @EntityType      = 'Funder',
-                        @Role            = :Role,
-                        @ID              = :ID,
-                        @IncludeInactive = 0;
-                """),
-                {
-                    "Role": role,
-                    "ID": int(uid) if str(uid).isdigit() else None,
-                }
-            ).mappings().all()
-
-        allowed_funder_ids = {int(r["ID"]) for r in rows}
+        allowed_funder_ids = entitlements_for(role, uid).ids("Funder")
 
         if funder_id not in allowed_funder_ids:
             flash("Invalid funder selected.", "warning")
@@ -1035,6 +1034,7 @@ def update_provider():
                 "new_lat": new_lat,  # None is OK
                 "new_lon": new_lon
             })
+        invalidate_reference_data("providers")
         flash("Provider updated successfully.", "success")
     except Exception as e:
         current_app.logger.exception("❌ UpdateProvider failed")
@@ -1086,6 +1086,9 @@ def delete_provider():
     try:
         with engine.begin() as conn:
             conn.execute(text("EXEC FlaskDeleteProvider @ProviderID = :pid"), {"pid": pid})
+        invalidate_reference_data("providers")
+        invalidate_entitlements()
+        mark_report_data_changed()
         flash("Provider deleted.", "success")
     except Exception as e:
         current_app.logger.exception("❌ DeleteProvider failed")
@@ -1320,6 +1323,7 @@ def edit_school_type():
                     """),
                     {"moe": moenumber, "stype": new_type},
                 )
+            invalidate_reference_data("school_types", "schools")
             flash("School type updated successfully.", "success")
         except Exception as e:
             current_app.logger.exception("❌ SchoolType POST DB update failed")
@@ -1364,9 +1368,7 @@ def edit_school_type():
     try:
         with engine.begin() as conn:
             # Dropdown
-            school_types = conn.execute(
-                text("EXEC FlaskSchoolTypeChanger @Request = 'GetSchoolTypeDropdown'")
-            ).mappings().all()
+            school_types = reference_rows("GetSchoolTypeDropdown", conn=conn)
 
             # Paged directory — consume multiple result sets
             exec_sql = """
@@ -2088,6 +2090,7 @@ def move_school_term():
                     "new_year": new_year,
                 }
             )
+        mark_report_data_changed()
 
         return jsonify({"success": True})
     except Exception as e:
@@ -2408,4 +2411,33 @@ def school_summary():
         table_data=table_data,
         table_columns=table_columns,
         structured=structured
-    )
\ No newline at end of file
+    )
+
+# -----------------------------
+# Runtime metrics (per worker)
+# -----------------------------
+@admin_bp.route("/admin/metrics", methods=["GET"])
+@login_required
+def runtime_metrics():
+    if session.get("user_role") != "ADM":
+        return jsonify({"ok": False, "error": "Not authorised"}), 403
+
+    session_metrics = getattr(current_app.session_interface, "metrics", None)
+
+    return jsonify({
+        "ok": True,
+        "db_pool": pool_stats(),
+        "session_store": session_metrics() if callable(session_metrics) else None,
+        "class_cache": class_result_cache.metrics(),
+        "reference_data": reference_cache.metrics(),
+        "entitlements": entitlement_cache.metrics(),
+        "report_cache": report_cache.metrics(),
+        "report_render": render_timings.metrics(),
+        "rates_data": rates_cache.metrics(),
+        "icon_cache": icon_cache.metrics(),
+        "text_metrics": FNT_Metrics.metrics(),
+        "region_geometry": region_geometry.metrics(),
+        "survey_definitions": survey_cache.metrics(),
+        "survey_submit": survey_submit_metrics(),
+        "email_outbox": outbox.metrics(),
+    })
@@ -4,6 +4,8 @@ from sqlalchemy import text
 
 from app.routes.overview import get_funders_by_provider
 from app.utils.database import get_db_engine, log_alert
+from app.utils.entitlements import entitlements_for
+from app.utils.reference_data import ethnicity_options
 
 api_bp = Blueprint("api_bp", __name__)
 
@@ -72,53 +74,12 @@ def get_entities():
                 return jsonify({"ok": True, "entities": [dict(r) for r in rows]})
         if debug:
             current_app.logger.info("🔌 DB engine acquired")
-        user_id = session.get("user_id")
-        try:
-            user_id = int(user_id) if user_id is not None else None
-        except (TypeError, ValueError):
-            # If it's something weird, just treat as None and let SP logic decide
-            user_id = None
-        with engine.begin() as conn:
-
-            sql = text("""
-                SET NOCOUNT ON;
-                EXEC dbo.FlaskGetEntities
-                    @EntityType      = :EntityType,
-                    @Role            = :Role,
-                    @ID              = :ID,
-                    @IncludeInactive = :IncludeInactive;
-            """)
-
-            params = {
-                "EntityType": entity_type,
-                "Role": user_role,
-                "ID": user_id,
-                "IncludeInactive": include_inactive,
-            }
-
-            if debug:
-                current_app.logger.info("🧾 SQL Params:")
-                for k, v in params.items():
-                    current_app.logger.info(f"   {k} = {v}")
 
-            res = conn.execute(sql, params)
-            rows = res.mappings().all()
+        # FlaskGetEntities, resolved once per user/type and cached (see entitlements)
+        entities = entitlements_for(user_role, user_id).entities(entity_type, include_inactive)
 
         if debug:
-            current_app.logger.info(f"📦 Rows returned: {len(rows)}")
-            if rows:
-                current_app.logger.info("🧪 First row sample:", dict(rows[0]))
-
-        # ----------------------------
-        # Format for frontend
-        # ----------------------------
-        entities = [
-            {
-                "id": int(r["ID"]),
-                "description": str(r["Description"]),
-            }
-            for r in rows
-        ]
+            current_app.logger.info(f"📦 Rows returned: {len(entities)}")
 
         if debug:
             current_app.logger.info(f"✅ Entities formatted: {len(entities)} items")
@@ -155,10 +116,7 @@ def get_entities():
 @api_bp.route("/ethnicities")
 @login_required
 def ethnicities():
-    engine = get_db_engine()
-    with engine.begin() as conn:
-        rows = conn.execute(text("EXEC FlaskHelperFunctions @Request='EthnicityDropdown'")).fetchall()
-    return jsonify([{"id": r._mapping["EthnicityID"], "desc": r._mapping["Description"]} for r in rows])
+    return jsonify(ethnicity_options())
 
 
 @api_bp.route("/provider_funders")
@@ -8,6 +8,7 @@ import pandas as pd
 from sqlalchemy import text
 
 from app.utils.database import get_db_engine
+from app.utils.reference_data import reference_rows
 
 apr_bp = Blueprint("apr_bp", __name__)
 
@@ -126,10 +127,7 @@ def apr_page():
 
 
             # dropdowns always loaded
-            df_dropdowns = pd.read_sql(
-                "EXEC dbo.APR_AllDropdowns",
-                conn
-            )
+            df_dropdowns = pd.DataFrame(reference_rows("APR_AllDropdowns", conn=conn))
 
     except Exception as e:
 
@@ -28,6 +28,8 @@ from app.utils.custom_email import (
     verify_reset_token,
 )
 from app.utils.database import get_db_engine, log_alert
+from app.utils.email_outbox import email_status
+from app.utils.entitlements import forget_user
 # Blueprint
 auth_bp = Blueprint("auth_bp", __name__)
 __all__ = ["auth_bp", "login_required"]
@@ -139,7 +141,8 @@ def login():
                 flash("Something went wrong. Please contact support.", "danger")
                 return render_template("login.html", next=next_url)
 
-            # 4) Build session
+            # 4) Build session (and re-resolve entitlements for this login)
+            forget_user(user_info.Role, user_info.ID)
             session.update({
                 "logged_in": True,
                 "user_role": user_info.Role,
@@ -278,7 +281,7 @@ def forgot_password():
             # Send email
             
             try:
-                send_reset_email(mail, email, token)
+                outbox_id = send_reset_email(mail, email, token)
             except Exception as mail_err:
                 current_app.logger.exception("❌ Password reset email send failed")
                 try:
@@ -294,7 +297,10 @@ def forgot_password():
                 flash("We couldn’t send the reset email. Please try again later.", "danger")
                 return redirect(url_for('auth_bp.forgot_password'))
 
-            flash('A password reset link has been sent to your email.', 'success')
+            if email_status(outbox_id) == "queued":
+                flash('A password reset link is on its way to your email.', 'success')
+            else:
+                flash('A password reset link has been sent to your email.', 'success')
             return redirect(url_for('auth_bp.login'))
 
         except Exception as e:
@@ -3,6 +3,7 @@ from flask import Blueprint, current_app, render_template, request, session, red
 from sqlalchemy import text
 from app.routes.auth import login_required
 from app.utils.database import get_db_engine, log_alert, get_terms, get_years
+from app.utils.reference_data import reference_rows
 import pandas as pd
 from collections import defaultdict
 import uuid
@@ -30,8 +31,7 @@ def compute_has_groups(engine, user_role, user_id):
                 ).fetchone()
                 return bool(row)
             if user_role == "ADM":
-                row = conn.execute(text("EXEC FlaskGetAllGroups")).fetchone()
-                return bool(row)
+                return bool(reference_rows("FlaskGetAllGroups", conn=conn))
         return False
     except Exception:
         # Fail-safe: don't break page if proc is missing
@@ -585,13 +585,11 @@ def get_entities():
                         raw_providers = session.get("group_entities", {}).get("PRO", [])
                         entities = [{"id": e["id"], "name": e["name"]} for e in raw_providers]
                     elif user_role == "FUN":
-                        stmt = text("EXEC FlaskHelperFunctions @Request = :Request, @Number = :FunderID")
-                        result = conn.execute(stmt, {"Request": "ProvidersByFunder", "FunderID": user_id})
-                        entities = [{"id": r._mapping["ProviderID"], "name": r._mapping["Description"]} for r in result]
+                        rows = reference_rows("ProvidersByFunder", conn=conn, Number=user_id)
+                        entities = [{"id": r["ProviderID"], "name": r["Description"]} for r in rows]
                     else:  # ADM or fallback
-                        stmt = text("EXEC FlaskHelperFunctions @Request = 'ProviderDropdown'")
-                        result = conn.execute(stmt)
-                        entities = [{"id": r._mapping["ProviderID"], "name": r._mapping["Description"]} for r in result]
+                        rows = reference_rows("ProviderDropdown", conn=conn)
+                        entities = [{"id": r["ProviderID"], "name": r["Description"]} for r in rows]
                 except Exception as e:
                     log_alert(
                         email=session.get("user_email"),
@@ -607,9 +605,8 @@ def get_entities():
                     if user_role == "FUN":
                         entities = [{"id": user_id, "name": desc}]
                     else:  # ADM or fallback
-                        stmt = text("EXEC FlaskHelperFunctions @Request = 'FunderDropdown'")
-                        result = conn.execute(stmt)
-                        entities = [{"id": r._mapping["FunderID"], "name": r._mapping["Description"]} for r in result]
+                        rows = reference_rows("FunderDropdown", conn=conn)
+                        entities = [{"id": r["FunderID"], "name": r["Description"]} for r in rows]
                 except Exception as e:
                     log_alert(
                         email=session.get("user_email"),
@@ -625,9 +622,8 @@ def get_entities():
                     if user_role == "GRP":
                         entities = [{"id": user_id, "name": desc}]
                     elif user_role == "ADM":
-                        stmt = text("EXEC FlaskGetAllGroups")
-                        result = conn.execute(stmt)
-                        entities = [{"id": r._mapping["ID"], "name": r._mapping["Name"]} for r in result]
+                        rows = reference_rows("FlaskGetAllGroups", conn=conn)
+                        entities = [{"id": r["ID"], "name": r["Name"]} for r in rows]
                     elif user_role == "FUN":
                         stmt = text("EXEC FlaskGetGroupsByFunder @FunderID = :fid")
                         result = conn.execute(stmt, {"fid": user_id})
@@ -647,10 +643,8 @@ def get_entities():
             elif entity_type == "School":
                 try:
                     if user_role == "ADM":
-                        stmt = text("EXEC FlaskHelperFunctions @Request = 'SchoolDropdown'")
-                        result = conn.execute(stmt)
-                        rows = result.fetchall()
-                        entities = [{"id": r._mapping["MOENumber"], "name": r._mapping["SchoolName"]} for r in rows]
+                        rows = reference_rows("SchoolDropdown", conn=conn)
+                        entities = [{"id": r["MOENumber"], "name": r["SchoolName"]} for r in rows]
 
                     elif user_role == "PRO":
                         stmt = text("EXEC FlaskHelperFunctions @Request = 'SchoolDropdownProvider', @Number = :fid")
@@ -806,12 +800,7 @@ def admin_dashboard():
 
         with engine.begin() as conn:
             # Dropdown options for the form
-            if entity_type == "Funder":
-                result = conn.execute(text("EXEC FlaskHelperFunctions @Request = 'FunderDropdown'"))
-            else:
-                result = conn.execute(text("EXEC FlaskHelperFunctions @Request = 'ProviderDropdown'"))
-
-            entity_options = [dict(row._mapping) for row in result]
+            entity_options = reference_rows("FunderDropdown" if entity_type == "Funder" else "ProviderDropdown", conn=conn)
 
             # If the form hasn't been submitted yet, just render the shell
             if not form_submitted:
@@ -1111,10 +1100,7 @@ def funder_schools():
             # Resolve funder for ADM vs FUN
             # ----------------------------
             if user_role == "ADM":
-                funders = conn.execute(
-                    text("EXEC FlaskHelperFunctions @Request = :r"),
-                    {"r": "FunderDropdown"}
-                ).mappings().all()
+                funders = reference_rows("FunderDropdown", conn=conn)
 
                 fid_raw = (request.form.get("FunderID") or "").strip()
                 if fid_raw.isdigit():
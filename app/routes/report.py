@@ -1,10 +1,10 @@
 # report.py
 
 # Standard library
-import base64
 from datetime import datetime
 import os
 import re
+import time
 import traceback
 import uuid
 import pandas as pd
@@ -35,7 +35,10 @@ from sqlalchemy import text
 
 # App utilities
 from app.routes.auth import login_required
+from app.utils.background_jobs import DONE, FAILED, job_file, job_for_owner, submit_job
+from app.utils.batch_reports import BATCH_FORMATS, BATCH_REPORT_TYPES, run_batch
 from app.utils.database import get_db_engine, log_alert
+from app.utils.figure_export import export_figure, preview_path, render_timings
 from app.utils.funder_missing_plot import (
     add_full_width_footer_svg,
     create_funder_missing_figure,
@@ -43,10 +46,10 @@ from app.utils.funder_missing_plot import (
 from app.utils.one_bar_one_line import provider_portrait_with_target, use_ppmori
 from app.utils.missing_classes_report import build_missing_classes_pdf
 from app.utils.region_report import build_region_report_pdf
+from app.utils.rates_data import rates_frame
+from app.utils.report_cache import REPORT_DIR, report_cache
 import app.utils.report_three_bar_landscape as r3  # kept for other report types
 from app.utils.competency_icons import build_icon_reoprt 
-REPORT_DIR = Path("/tmp/wsfl_reports")
-REPORT_DIR.mkdir(parents=True, exist_ok=True)
 from openpyxl.styles import PatternFill, Font
 from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.table import Table, TableStyleInfo
@@ -191,13 +194,316 @@ def log_report_run(
     except Exception as e:
         current_app.logger.warning(f"⚠ Failed to log report: {e}")
         
+# ---------- Background report jobs ----------
+# show_report requests posted with background=1 for one of the PDF builders
+# (_PDF_BUILDER_REPORT_TYPES) that miss the report cache are queued on the
+# shared background job pool (app.utils.background_jobs) instead of tying up
+# a gunicorn thread. The job replays the same POST through new_reports() in
+# its own request context, seeded with a copy of the submitter's session, so
+# every report type goes through exactly the same code as the inline path.
+def _submit_report_job(selected_type):
+    form = request.form.copy()
+    form.pop("background", None)
+    form["ajax"] = "1"
+
+    path = request.path
+    snapshot = dict(session)
+    # Each job writes its own artifacts rather than overwriting the last report
+    for key in ("report_id", "report_png_filename", "report_pdf_filename"):
+        snapshot.pop(key, None)
+
+    def run_report(job):
+        app = current_app._get_current_object()
+        with app.test_request_context(
+            path,
+            method="POST",
+            data=form,
+            headers={"X-Requested-With": "fetch", "Accept": "application/json"},
+        ):
+            session.update(snapshot)
+            job.update(message="Building report")
+            resp = app.make_response(new_reports())
+            data = resp.get_json(silent=True) or {}
+            if resp.status_code >= 400 or not data.get("ok"):
+                raise RuntimeError(data.get("error") or f"HTTP {resp.status_code}")
+
+            data.update({
+                "report_id": session.get("report_id") if data.get("display") else None,
+                "png_filename": session.get("report_png_filename"),
+                "pdf_filename": session.get("report_pdf_filename"),
+            })
+            return data
+
+    job_id = submit_job(
+        "report",
+        session.get("user_email"),
+        run_report,
+        meta={"report_type": selected_type},
+    )
+    return jsonify({
+        "ok": True,
+        "job_id": job_id,
+        "status_url": url_for("report_bp.report_job_status", job_id=job_id),
+    }), 202
+
+
+def _preview_url(report_id):
+    return url_for("report_bp.report_preview", report_id=report_id)
+
+
+def _report_job_state(job_id):
+    try:
+        return job_for_owner(job_id, session.get("user_email"))
+    except ValueError:
+        return None
+
+
+def _requested_report():
+    """
+    (report_id, png_name, pdf_name) for a download: the finished report job
+    named by ?job_id=, otherwise the last report built in this session.
+    """
+    job_id = request.args.get("job_id")
+    if not job_id:
+        return (
+            session.get("report_id"),
+            session.get("report_png_filename"),
+            session.get("report_pdf_filename"),
+        )
+    state = _report_job_state(job_id)
+    report = state.get("result") if state and state.get("status") == DONE else None
+    if not isinstance(report, dict) or not report.get("report_id"):
+        return None, None, None
+    return report["report_id"], report.get("png_filename"), report.get("pdf_filename")
+
+
+@report_bp.route("/Reporting/jobs/<job_id>", methods=["GET"])
+@login_required
+def report_job_status(job_id):
+    state = _report_job_state(job_id)
+    if not state or state.get("kind") != "report":
+        return jsonify({"ok": False, "error": "Report not found or expired."}), 404
+
+    status = state.get("status")
+    payload = {
+        "ok": status != FAILED,
+        "job_id": job_id,
+        "status": status,
+        "message": state.get("message", ""),
+        "elapsed_s": state.get("elapsed_s"),
+        "error": state.get("error") if status == FAILED else None,
+    }
+    if status != DONE:
+        return jsonify(payload)
+
+    report = state.get("result") or {}
+    payload.update({k: v for k, v in report.items() if k not in payload})
+    report_id = report.get("report_id")
+    png_path = REPORT_DIR / f"{report_id}.png" if report_id else None
+    if png_path is not None and png_path.exists():
+        payload["preview_url"] = _preview_url(report_id)
+        payload["download_pdf_url"] = url_for("report_bp.download_pdf", job_id=job_id)
+        payload["download_png_url"] = url_for("report_bp.download_png", job_id=job_id)
+        # Keep the plain download buttons pointing at the newest report
+        session["report_id"] = report_id
+        session["report_png_filename"] = report.get("png_filename")
+        session["report_pdf_filename"] = report.get("pdf_filename")
+    return jsonify(payload)
+
+
+# ---------- Batch reports (ADM) ----------
+# One report type for every funder/provider/region, see app.utils.batch_reports.
+# Runs as a background job; the result is the batch manifest.
+@report_bp.route("/Reporting/batch", methods=["POST"])
+@login_required
+def submit_report_batch():
+    if session.get("user_role") != "ADM" or session.get("user_admin") != 1:
+        return jsonify({"ok": False, "error": "Not authorised"}), 403
+
+    report_type = request.form.get("report_option")
+    fmt = request.form.get("format", "zip")
+    if report_type not in BATCH_REPORT_TYPES:
+        return jsonify({"ok": False, "error": "That report can't be run as a batch."}), 400
+    if fmt not in BATCH_FORMATS:
+        return jsonify({"ok": False, "error": "Unknown output format."}), 400
+    try:
+        year = int(request.form.get("year", session.get("nearest_year")))
+        term = int(request.form.get("term", session.get("nearest_term")))
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "Invalid year or term."}), 400
+
+    snapshot = dict(session)
+    filename = f"{slugify_filename(f'{report_type}_T{term}_{year}')}.{fmt}"
+
+    def run(job):
+        manifest = run_batch(
+            report_type, year, term, job.path(filename),
+            session_data=snapshot, fmt=fmt, progress=job.progress,
+        )
+        # Tracebacks stay in the ZIP manifest, not in job.json
+        for item in manifest["items"]:
+            item.pop("traceback", None)
+        return manifest
+
+    job_id = submit_job(
+        "report_batch",
+        session.get("user_email"),
+        run,
+        meta={"report_type": report_type, "year": year, "term": term, "format": fmt},
+        pool="batch",
+    )
+    current_app.logger.info("📦 batch %s queued as job %s by %s", report_type, job_id, session.get("user_email"))
+    return jsonify({
+        "ok": True,
+        "job_id": job_id,
+        "status_url": url_for("report_bp.report_batch_status", job_id=job_id),
+    }), 202
+
+
+def _batch_job_state(job_id):
+    if session.get("user_role") != "ADM":
+        return None
+    state = _report_job_state(job_id)
+    return state if state and state.get("kind") == "report_batch" else None
+
+
+@report_bp.route("/Reporting/batch/<job_id>", methods=["GET"])
+@login_required
+def report_batch_status(job_id):
+    state = _batch_job_state(job_id)
+    if not state:
+        return jsonify({"ok": False, "error": "Batch not found or expired."}), 404
+
+    status = state.get("status")
+    payload = {
+        "ok": status != FAILED,
+        "job_id": job_id,
+        "status": status,
+        "current": state.get("current", 0),
+        "total": state.get("total", 0),
+        "message": state.get("message", ""),
+        "elapsed_s": state.get("elapsed_s"),
+        "error": state.get("error") if status == FAILED else None,
+    }
+    if status == DONE:
+        payload["manifest"] = state.get("result")
+        payload["download_url"] = url_for("report_bp.download_report_batch", job_id=job_id)
+    return jsonify(payload)
+
+
+@report_bp.route("/Reporting/batch/<job_id>/download", methods=["GET"])
+@login_required
+def download_report_batch(job_id):
+    state = _batch_job_state(job_id)
+    manifest = state.get("result") if state and state.get("status") == DONE else None
+    if not isinstance(manifest, dict) or not manifest.get("file"):
+        return ("Not found", 404)
+    try:
+        path = job_file(job_id, manifest["file"])
+    except ValueError:
+        return ("Not found", 404)
+    if not os.path.exists(path):
+        return ("Not found", 404)
+    return send_file(
+        path,
+        download_name=manifest["file"],
+        as_attachment=True,
+        mimetype="application/pdf" if manifest.get("format") == "pdf" else "application/zip",
+    )
+
+
+# ---------- Rendered report cache ----------
+# Reports built from the requester's own email scope aren't shared.
+_UNCACHED_REPORT_TYPES = {
+    "funder_missing_data",
+    "funder_missing_classes",
+    "provider_missing_classes",
+}
+# Read survey answers: their cache key also carries the survey data stamp
+_SURVEY_REPORT_TYPES = {"funder_teacher_review_summary"}
+# Built as multi-page PDFs by app.utils.* builders (slow; the rest are one chart)
+_PDF_BUILDER_REPORT_TYPES = {
+    "funder_student_count",
+    "funder_progress_summary",
+    "funder_teacher_review_summary",
+    "provider_missing_classes",
+    "funder_missing_classes",
+    "national_competency_icons",
+    "region_coverage_report",
+    "funder_competency_icons",
+}
+# _execute_report drops the funder filter for ADM on these
+_ROLE_SENSITIVE_REPORT_TYPES = {"provider_ytd_vs_target"}
+
+
+def _report_cache_params(selected_type, selected_year, selected_term, role, funder_id,
+                         selected_funder_name, region_id, selected_provider_id, selected_school_id):
+    """Everything that changes a cacheable report's output (ids plus the labels drawn on it)."""
+    form = request.form
+    return {
+        "type": selected_type,
+        "year": selected_year,
+        "term": selected_term,
+        "role": role if selected_type in _ROLE_SENSITIVE_REPORT_TYPES else None,
+        "funder_id": funder_id,
+        "funder_name": selected_funder_name,
+        "region": region_id,
+        "region_name": (form.get("region_name") or "").strip(),
+        "provider_id": selected_provider_id,
+        "provider_name": (form.get("provider_name") or "").strip(),
+        "school_id": selected_school_id,
+        "school_name": (form.get("school_name") or "").strip(),
+        "survey_version": (
+            report_cache.survey_data_version() if selected_type in _SURVEY_REPORT_TYPES else None
+        ),
+    }
+
+
+def _cached_report_response(cached):
+    """AJAX response for a cache hit; points the session downloads at the cached files."""
+    report_id = cached.pop("report_id")
+    session["report_id"] = report_id
+    session["report_png_filename"] = cached.pop("png_filename", None) or "report.png"
+    session["report_pdf_filename"] = cached.pop("pdf_filename", None) or "report.pdf"
+    cached["preview_url"] = _preview_url(report_id)
+    cached["cached"] = True
+    return jsonify(cached)
+
+
+# ---------- Preview image ----------
+_REPORT_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+@report_bp.route("/Reporting/preview/<report_id>.png")
+@login_required
+def report_preview(report_id):
+    """
+    Downsampled preview for the page. Artifacts are never rewritten under
+    the same id, so the browser may cache it for as long as it likes.
+    """
+    if not _REPORT_ID_RE.match(report_id or "") or report_id != session.get("report_id"):
+        return ("Not found", 404)
+
+    path = preview_path(REPORT_DIR, report_id)
+    if not path.exists():
+        path = REPORT_DIR / f"{report_id}.png"  # built before previews existed
+        if not path.exists():
+            return ("Not found", 404)
+
+    resp = send_file(path, mimetype="image/png", max_age=86400, conditional=True, etag=True)
+    resp.cache_control.public = False
+    resp.cache_control.private = True
+    resp.cache_control.immutable = True
+    return resp
+
+
 # ---------- Download endpoints with log_alert ----------
 @report_bp.route("/Reporting/download_pdf")
 @login_required
 def download_pdf():
     try:
-        report_id = session.get("report_id")
-        pdf_name = session.get("report_pdf_filename") or "report.pdf"
+        report_id, _, pdf_name = _requested_report()
+        pdf_name = pdf_name or "report.pdf"
 
         # No report generated this session
         if not report_id:
@@ -239,12 +545,12 @@ def download_pdf():
 @login_required
 def download_png():
     try:
-        report_id = session.get("report_id")
+        report_id, png_name, _ = _requested_report()
         if not report_id:
             flash("No PNG report has been generated yet.", "warning")
             return redirect(url_for("report_bp.new_reports"))
 
-        png_name = session.get("report_png_filename") or "report.png"
+        png_name = png_name or "report.png"
         png_path = REPORT_DIR / f"{report_id}.png"
 
         if not png_path.exists():
@@ -300,15 +606,17 @@ def _persist_preview_for_existing_report(
     selected_year: int,
     selected_funder_name: str | None,
     base_label_prefix: str,
+    report_type: str | None = None,
 ):
-    png_path = REPORT_DIR / f"{report_id}.png"
-    print(base_label_prefix)
-    if(base_label_prefix==f"FunderWeightedAverageLYvsYTD"):
-        fig.savefig(png_path, format="png", dpi=200, bbox_inches="tight", pad_inches=0)
-        
-    else: 
-        fig.savefig(png_path, format="png", dpi=200)
-        
+    # The builder already wrote the PDF; only the preview images are needed here
+    export_figure(
+        fig,
+        REPORT_DIR,
+        report_id,
+        report_type=report_type or base_label_prefix,
+        pdf=False,
+        tight=base_label_prefix == "FunderWeightedAverageLYvsYTD",
+    )
     plt.close(fig)
 
     funder_chunk = slugify_filename(selected_funder_name or "Funder")
@@ -318,7 +626,7 @@ def _persist_preview_for_existing_report(
     session["report_png_filename"] = f"{base_label}.png"
     session["report_pdf_filename"] = f"{base_label}.pdf"
 
-    return base64.b64encode(png_path.read_bytes()).decode("ascii")
+    return _preview_url(report_id)
 
 def _get_sticky_ids():
     """
@@ -434,7 +742,7 @@ def _validate_required_entities(
             funder_name=session.get("desc"),
             results=None,
             plot_payload=None,
-            plot_png_b64=None,
+            preview_url=None,
             selected_term=selected_term,
             selected_year=selected_year,
             selected_type=selected_type,
@@ -481,7 +789,7 @@ def _validate_required_entities(
             funder_name=session.get("desc"),
             results=None,
             plot_payload=None,
-            plot_png_b64=None,
+            preview_url=None,
             selected_term=selected_term,
             selected_year=selected_year,
             selected_type=selected_type,
@@ -517,7 +825,7 @@ def _validate_required_entities(
             funder_name=session.get("desc"),
             results=None,
             plot_payload=None,
-            plot_png_b64=None,
+            preview_url=None,
             selected_term=selected_term,
             selected_year=selected_year,
             selected_type=selected_type,
@@ -553,36 +861,20 @@ def _execute_report(
 
     # 1) Funder YTD vs Target (data only)
     if selected_type == "funder_ytd_vs_target":
-        sql = text(
-            """
-            SET NOCOUNT ON;
-            EXEC dbo.GetFunderNationalRates_All
-                 @Term = :Term,
-                 @CalendarYear = :CalendarYear;
-            """
+        rates = rates_frame(
+            "FunderNationalRates", conn, Term=selected_term, CalendarYear=selected_year
         )
-        params = {"Term": selected_term, "CalendarYear": selected_year}
-        res = conn.execute(sql, params)
-        rows = res.mappings().all()
 
         if funder_id:
-            funder_rows = [
-                r
-                for r in rows
-                if (int(r.get("FunderID", 0) or 0) == funder_id)
-                or (r.get("ResultType") == "WSNZ Target")
-            ]
+            funder_rows = rates.rows_any(
+                {"FunderID": funder_id},
+                {"ResultType": "WSNZ Target"},
+            )
 
             if not funder_rows:
-                unique_comps = {
-                    (
-                        r["CompetencyID"],
-                        r["CompetencyDesc"],
-                        r["YearGroupID"],
-                        r["YearGroupDesc"],
-                    )
-                    for r in rows
-                }
+                unique_comps = rates.unique(
+                    ["CompetencyID", "CompetencyDesc", "YearGroupID", "YearGroupDesc"]
+                )
                 funder_rows = []
                 for cid, cdesc, yid, ydesc in unique_comps:
                     funder_rows.append(
@@ -612,7 +904,7 @@ def _execute_report(
 
             results = funder_rows
         else:
-            results = rows
+            results = rates.rows()
 
         current_app.logger.info("🔎 rows=%d | type=%s", len(results or []), selected_type)
     elif selected_type == "national_competency_icons":
@@ -665,30 +957,14 @@ def _execute_report(
         fig = preview_fig
     # 2) National LY vs National YTD vs Target
     elif selected_type == "national_ly_vs_national_ytd_vs_target":
-        sql = text(
-            """
-            SET NOCOUNT ON;
-            EXEC GetNationalRates
-                @CalendarYear = :CalendarYear,
-                @Term         = :Term;
-            """
-        )
-        params = {"CalendarYear": selected_year, "Term": selected_term}
-        res = conn.execute(sql, params)
-        results = res.mappings().all()
+        results = rates_frame(
+            "NationalRates", conn, CalendarYear=selected_year, Term=selected_term
+        ).rows()
         current_app.logger.info("🔎 rows=%d | type=%s", len(results or []), selected_type)
     elif selected_type == "national_ytd_kaiako":
-        sql = text(
-            """
-            SET NOCOUNT ON;
-            EXEC GetNationalRates_Kaiako
-                @CalendarYear = :CalendarYear,
-                @Term         = :Term;
-            """
-        )
-        params = {"CalendarYear": selected_year, "Term": selected_term}
-        res = conn.execute(sql, params)
-        results = res.mappings().all()
+        results = rates_frame(
+            "NationalRatesKaiako", conn, CalendarYear=selected_year, Term=selected_term
+        ).rows()
         current_app.logger.info("🔎 rows=%d | type=%s", len(results or []), selected_type)
     elif selected_type == "funder_weighted_average":
         engine = get_db_engine()
@@ -751,33 +1027,15 @@ def _execute_report(
         fig = preview_fig
             
     elif selected_type == "region_ly_vs_target":
-        sql = text(
-            """
-            SET NOCOUNT ON;
-            EXEC GetRegionalCouncilRates
-                @CalendarYear = :CalendarYear,
-                @Term         = :Term,
-                @Region = :Region;
-            """
-        )
-        params = {"CalendarYear": 2025, "Term": 2,"Region":region_id}
-        res = conn.execute(sql, params)
-        results = res.mappings().all()
+        results = rates_frame(
+            "RegionalCouncilRates", conn, CalendarYear=2025, Term=2, Region=region_id
+        ).rows()
         current_app.logger.info("🔎 rows=%d | type=%s", len(results or []), selected_type)
     elif selected_type == "region_ytd":
-        
-        sql = text(
-            """
-            SET NOCOUNT ON;
-            EXEC [GetRegionalCouncilRates_kaiako]
-                @CalendarYear = :CalendarYear,
-                @Term         = :Term,
-                @Region = :Region;
-            """
-        )
-        params = {"CalendarYear": selected_year, "Term": selected_term,"Region":region_id}
-        res = conn.execute(sql, params)
-        results = res.mappings().all()
+        results = rates_frame(
+            "RegionalCouncilRatesKaiako", conn,
+            CalendarYear=selected_year, Term=selected_term, Region=region_id,
+        ).rows()
         current_app.logger.info("🔎 rows=%d | type=%s", len(results or []), selected_type)
     # ✅ IMPORTANT: return list-of-row-mappings (NOT DataFrame)
     elif selected_type == "funder_targets_counts":
@@ -786,17 +1044,9 @@ def _execute_report(
         current_app.logger.info("🔎 rows=%d | type=%s", len(results or []), selected_type)
 
     elif selected_type == "national_ytd_vs_target":
-        sql = text(
-            """
-            SET NOCOUNT ON;
-            EXEC GetNationalRates
-                @CalendarYear = :CalendarYear,
-                @Term         = :Term;
-            """
-        )
-        params = {"CalendarYear": selected_year, "Term": selected_term}
-        res = conn.execute(sql, params)
-        results = res.mappings().all()
+        results = rates_frame(
+            "NationalRates", conn, CalendarYear=selected_year, Term=selected_term
+        ).rows()
         current_app.logger.info("🔎 rows=%d | type=%s", len(results or []), selected_type)
 
     # 3) Funder Missing Data (builds fig here)
@@ -848,30 +1098,16 @@ def _execute_report(
 
     # 4) Funder LY vs National LY vs Target (data only)
     elif selected_type == "ly_funder_vs_ly_national_vs_target":
-        sql = text(
-            """
-            SET NOCOUNT ON;
-            EXEC dbo.GetFunderNationalRates_All
-                @Term = :Term,
-                @CalendarYear = :CalendarYear;
-            """
-        )
-        params = {"Term": 2, "CalendarYear": 2025}
-        res = conn.execute(sql, params)
+        rates = rates_frame("FunderNationalRates", conn, Term=2, CalendarYear=2025)
 
-        raw_rows = res.mappings().all()
+        funder_rates = {"ResultType": "Funder Rate (YTD)"}
+        if funder_id:
+            funder_rates["FunderID"] = funder_id
         filtered_rows = []
-        for r in raw_rows:
-            funder_matches = not funder_id or int(r.get("FunderID", 0) or 0) == funder_id
-            keep = (
-                (funder_matches and r.get("ResultType") == "Funder Rate (YTD)")
-                or r.get("ResultType") == "WSNZ Target"
-                or r.get("ResultType") == "National Rate (YTD)"
-            )
-            if not keep:
-                continue
-
-            d = dict(r)
+        for d in rates.rows_any(
+            funder_rates,
+            {"ResultType": ("WSNZ Target", "National Rate (YTD)")},
+        ):
             if d.get("ResultType") == "National Rate (YTD)":
                 d["ResultType"] = "National Rate (LY)"
             elif d.get("ResultType") == "Funder Rate (YTD)":
@@ -882,70 +1118,24 @@ def _execute_report(
         results = filtered_rows
         current_app.logger.info("🔎 rows=%d | type=%s", len(results or []), selected_type)
     elif selected_type == "funder_ytd_vs_funder_ly":
-        sql = text(
-            """
-            SET NOCOUNT ON;
-            EXEC dbo.GetFunderNationalRates_All
-                @Term = :Term,
-                @CalendarYear = :CalendarYear;
-            """
+        rates = rates_frame(
+            "FunderNationalRates", conn, Term=selected_term, CalendarYear=selected_year
         )
-        params = {"Term": selected_term, "CalendarYear": selected_year}
-        res = conn.execute(sql, params)
-
-        raw_rows = res.mappings().all()
-        filtered_rows = []
-        for r in raw_rows:
-            funder_matches = not funder_id or int(r.get("FunderID", 0) or 0) == funder_id
-            keep = (
-                (funder_matches and r.get("ResultType") == "Funder Rate (YTD)")
-                or (funder_matches and r.get("ResultType") == "Funder Rate (LY)")
-            )
-            if not keep:
-                continue
-
-            d = dict(r)
-            
-            filtered_rows.append(d)
-
-        results = filtered_rows
+        where = {"ResultType": ("Funder Rate (YTD)", "Funder Rate (LY)")}
+        if funder_id:
+            where["FunderID"] = funder_id
+        results = rates.rows(**where)
         current_app.logger.info("🔎 rows=%d | type=%s", len(results or []), selected_type)
     # 5) Provider vs Funder (data only)
     elif selected_type == "provider_ytd_vs_target_vs_funder":
-        sql = text(
-            """
-            SET NOCOUNT ON;
-            EXEC dbo.GetProviderNationalRates
-                @Term         = :Term,
-                @CalendarYear = :CalendarYear,
-                @ProviderID   = :ProviderID,
-                @FunderID     = :FunderID;
-            """
-        )
-        params = {
-            "Term": selected_term,
-            "CalendarYear": selected_year,
-            "ProviderID": int(selected_provider_id),
-            "FunderID": int(funder_id) if funder_id is not None else None,
-        }
-        res = conn.execute(sql, params)
-        rows = res.mappings().all()
-
-        if len(rows) == 0:
-            res2 = conn.exec_driver_sql(
-                "SET NOCOUNT ON; EXEC dbo.GetProviderNationalRates @Term=?, @CalendarYear=?, @ProviderID=?, @FunderID=?",
-                (
-                    selected_term,
-                    selected_year,
-                    int(selected_provider_id),
-                    funder_id if funder_id is not None else None,
-                ),
-            )
-            if getattr(res2, "cursor", None) and res2.cursor.description:
-                cols = [d[0] for d in res2.cursor.description]
-                rows = [dict(zip(cols, row)) for row in res2.fetchall()]
-
-        results = rows
+        # ProviderNationalRates retries via exec_driver_sql if text() gets no result set
+        results = rates_frame(
+            "ProviderNationalRates", conn,
+            Term=selected_term,
+            CalendarYear=selected_year,
+            ProviderID=int(selected_provider_id),
+            FunderID=int(funder_id) if funder_id is not None else None,
+        ).rows()
         current_app.logger.info("🔎 rows=%d | type=%s", len(results or []), selected_type)
     elif selected_type == "funder_missing_classes":
     # --- PDF report (multi-page) for FUNDERS ---
@@ -1045,46 +1235,25 @@ def _execute_report(
         if role == "ADM":
             funder_id = None
 
-        sql = text(
-            """
-            SET NOCOUNT ON;
-            EXEC dbo.GetProviderNationalRates
-                 @Term         = :Term,
-                 @CalendarYear = :CalendarYear,
-                 @ProviderID   = :ProviderID,
-                 @FunderID     = :FunderID;
-            """
-        )
-        params = {
-            "Term": selected_term,
-            "CalendarYear": selected_year,
-            "ProviderID": int(selected_provider_id),
-            "FunderID": int(funder_id) if funder_id is not None else None,
-        }
-        res = conn.execute(sql, params)
-        rows = res.mappings().all()
+        rows = rates_frame(
+            "ProviderNationalRates", conn,
+            Term=selected_term,
+            CalendarYear=selected_year,
+            ProviderID=int(selected_provider_id),
+            FunderID=int(funder_id) if funder_id is not None else None,
+        ).rows()
         results = rows
 
         current_app.logger.info("🧪 Rows fetched: %d", len(rows))
 
     # 7) School YTD vs Target (data only)
     elif selected_type == "school_ytd_vs_target":
-        sql = text(
-            """
-            SET NOCOUNT ON;
-            EXEC dbo.GetSchoolNationalRates
-                 @CalendarYear = :CalendarYear,
-                 @Term         = :Term,
-                 @MoeNumber    = :MoeNumber;
-            """
-        )
-        params = {
-            "CalendarYear": selected_year,
-            "Term": selected_term,
-            "MoeNumber": int(selected_school_id),
-        }
-        res = conn.execute(sql, params)
-        results = res.mappings().all()
+        results = rates_frame(
+            "SchoolNationalRates", conn,
+            CalendarYear=selected_year,
+            Term=selected_term,
+            MoeNumber=int(selected_school_id),
+        ).rows()
         current_app.logger.info("🔎 rows=%d | type=%s", len(results or []), selected_type)
     elif selected_type == "funder_student_count":
         from app.utils.funder_student_counts import build_funder_student_counts_pdf
@@ -1484,14 +1653,13 @@ def _persist_figure_and_session(
 ):
     report_id = uuid.uuid4().hex
 
-    png_path = REPORT_DIR / f"{report_id}.png"
-    pdf_path = REPORT_DIR / f"{report_id}.pdf"
-    if(selected_type != "funder_weighted_average"):
-        fig.savefig(png_path, format="png", dpi=200)
-        fig.savefig(pdf_path, format="pdf")
-    else:
-        fig.savefig(png_path, format="png", dpi=200, bbox_inches="tight", pad_inches=0)
-        fig.savefig(pdf_path, format="pdf", bbox_inches="tight", pad_inches=0)
+    export_figure(
+        fig,
+        REPORT_DIR,
+        report_id,
+        report_type=selected_type,
+        tight=selected_type == "funder_weighted_average",
+    )
     plt.close(fig)
 
     provider_name = (request.form.get("provider_name") or "").strip()
@@ -1576,8 +1744,8 @@ def _persist_figure_and_session(
     session["report_png_filename"] = f"{base_label}.png"
     session["report_pdf_filename"] = f"{base_label}.pdf"
 
-    plot_png_b64 = base64.b64encode(png_path.read_bytes()).decode("ascii")
-    return plot_png_b64
+    return _preview_url(report_id)
+
 _table_counter = 1
 
 def _convert_to_table(ws, table_name_prefix="Table"):
@@ -1664,7 +1832,7 @@ def new_reports():
 
     results = None
     plot_payload = None
-    plot_png_b64 = None
+    preview_url = None
     no_data_banner = None
     display = False
 
@@ -2085,7 +2253,7 @@ def new_reports():
                         funder_name=selected_funder_name,
                         results=None,
                         plot_payload=None,
-                        plot_png_b64=None,
+                        preview_url=None,
                         selected_term=selected_term,
                         selected_year=selected_year,
                         selected_type=selected_type,
@@ -2109,9 +2277,55 @@ def new_reports():
                 if validation_response:
                     return validation_response
 
+                # Same inputs + same data version -> reuse the rendered report
+                cache_key = None
+                if is_ajax and selected_type not in _UNCACHED_REPORT_TYPES:
+                    cache_key = report_cache.key_for(_report_cache_params(
+                        selected_type, selected_year, selected_term, role, funder_id,
+                        selected_funder_name, region_id, selected_provider_id, selected_school_id,
+                    ))
+                    cached = report_cache.get(cache_key)
+                    if cached:
+                        current_app.logger.info("♻️ report cache hit | type=%s", selected_type)
+                        log_report_run(
+                            engine=engine,
+                            report_name=selected_type,
+                            year=selected_year,
+                            term=selected_term,
+                            region_name=region_id,
+                            funder_id=funder_id,
+                            provider_id=selected_provider_id,
+                            school_id=selected_school_id,
+                            params_json=json.dumps({
+                                "report_type": selected_type,
+                                "calendar_year": selected_year,
+                                "term": selected_term,
+                                "region": region_id,
+                                "funder_id": funder_id,
+                                "provider_id": selected_provider_id,
+                                "school_id": selected_school_id,
+                                "cached": True,
+                            }, default=str),
+                        )
+                        return _cached_report_response(cached)
+
+                # Only the multi-page PDF builders are worth a job + poll; a
+                # cache hit or a quick chart comes back inline
+                if (
+                    is_ajax
+                    and request.form.get("background") == "1"
+                    and selected_type in _PDF_BUILDER_REPORT_TYPES
+                ):
+                    return _submit_report_job(selected_type)
+
+                # Fresh report_id per build: the builders reuse session["report_id"],
+                # and the previous one may be a cached (shared) artifact
+                session.pop("report_id", None)
+
                 fig = None
 
                 current_app.logger.info("▶ executing report type=%s", selected_type)
+                build_started = time.perf_counter()
 
                 results, fig, no_data_banner_inner, early = _execute_report(
                     conn=conn,
@@ -2176,8 +2390,9 @@ def new_reports():
                     )
                     if extra_banner:
                         no_data_banner = extra_banner
-                
-                if selected_type in {"funder_student_count", "funder_progress_summary", "funder_teacher_review_summary", "provider_missing_classes","funder_missing_classes",  "national_competency_icons",  "region_coverage_report","funder_competency_icons"}:
+                render_timings.record(selected_type, "build", time.perf_counter() - build_started)
+
+                if selected_type in _PDF_BUILDER_REPORT_TYPES:
                     if fig is not None:
                         PREFIX_MAP = {
                             "funder_student_count": "Funder_Student_Count",
@@ -2204,13 +2419,14 @@ def new_reports():
                             else selected_funder_name
                         )
 
-                        plot_png_b64 = _persist_preview_for_existing_report(
+                        preview_url = _persist_preview_for_existing_report(
                             report_id=session["report_id"],
                             fig=fig,
                             selected_term=selected_term,
                             selected_year=selected_year,
                             selected_funder_name=name_for_file,
                             base_label_prefix=prefix,
+                            report_type=selected_type,
                         )
                         display = True
                         params_json = json.dumps({
@@ -2238,7 +2454,7 @@ def new_reports():
                 else:
                     # Existing behaviour for all other report types
                     if fig is not None:
-                        plot_png_b64 = _persist_figure_and_session(
+                        preview_url = _persist_figure_and_session(
                             fig,
                             selected_type,
                             selected_term,
@@ -2297,16 +2513,22 @@ def new_reports():
                             "funder_missing_classes",
                         }
                     )
-                    return jsonify(
-                        {
-                            "ok": True,
-                            "plot_png_b64": plot_png_b64,
-                            "header_html": header_html,
-                            "display": bool(display),
-                            "allow_png": bool(allow_png),
-                            "notice": no_data_banner,
-                        }
-                    )
+                    payload = {
+                        "ok": True,
+                        "header_html": header_html,
+                        "display": bool(display),
+                        "allow_png": bool(allow_png),
+                        "notice": no_data_banner,
+                    }
+                    if cache_key is not None and display:
+                        report_cache.put(cache_key, session["report_id"], {
+                            **payload,
+                            "png_filename": session.get("report_png_filename"),
+                            "pdf_filename": session.get("report_pdf_filename"),
+                        })
+                    else:
+                        report_cache.enforce_quota()
+                    return jsonify({**payload, "preview_url": preview_url})
 
 
         except Exception as e:
@@ -2387,7 +2609,7 @@ def new_reports():
         funder_name=selected_funder_name,
         results=results,
         plot_payload=plot_payload,
-        plot_png_b64=plot_png_b64,
+        preview_url=preview_url,
         selected_term=selected_term,
         selected_year=selected_year,
         selected_type=selected_type,
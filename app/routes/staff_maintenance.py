@@ -27,6 +27,9 @@ from app.routes.auth import login_required
 from app.utils.custom_email import  send_class_list_reminder_email, send_elearning_reminder_email
 
 from app.utils.database import get_db_engine, log_alert, get_years, get_terms
+from app.utils.email_outbox import email_status
+from app.utils.entitlements import invalidate_entitlements
+from app.utils.reference_data import reference_rows
 from app.utils.wsfl_email import send_account_invites
 
 # Blueprint
@@ -69,8 +72,7 @@ def staff_maintenance():
         try:
             with engine.begin() as conn:
                 if user_role == "ADM":
-                    result = conn.execute(text("EXEC FlaskGetAllGroups"))
-                    group_list = [{"id": row.ID, "name": row.Name} for row in result]
+                    group_list = [{"id": row["ID"], "name": row["Name"]} for row in reference_rows("FlaskGetAllGroups", conn=conn)]
                     has_groups = len(group_list) > 0
                 elif user_role == "FUN":  
                     result = conn.execute(
@@ -334,6 +336,8 @@ def add_school_to_provider():
                 },
             )
 
+        # Provider/funder users' school lists change with the assignment
+        invalidate_entitlements()
         return jsonify(ok=True, message="School added to provider.")
 
     except Exception as e:
@@ -676,7 +680,7 @@ def invite_user():
             }
         ]
         current_app.logger.debug("Recipients: {recipients}")
-        send_account_invites(
+        _, _, status = send_account_invites(
             mail,
             recipients=recipients,
             make_admin=(admin == 1),
@@ -684,7 +688,7 @@ def invite_user():
             invited_by_org=inviter_desc or None,
         )
 
-        flash(f"✅ Invitation sent to {email}.", "success")
+        flash(f"✅ Invitation to {email} {status}.", "success")
 
     except Exception as e:
         # Log to AUD_Alerts (best effort)
@@ -887,10 +891,7 @@ def disable_user():
 @login_required
 def get_active_courses():
     try:
-        with get_db_engine().connect() as conn:
-            result = conn.execute(text("EXEC [FlaskHelperFunctionsSpecific] @Request = 'ActiveCourses'"))
-            rows = [dict(row._mapping) for row in result]
-            return jsonify(rows)
+        return jsonify(reference_rows("ActiveCourses"))
     except Exception as e:
         log_alert(
             email=session.get("user_email"),
@@ -1038,11 +1039,9 @@ def staff_eLearning():
                 {"RoleType": role_code, "ID": str(selected_entity_id), "Email": user_email},
             ).fetchall()
 
-            active_courses = conn.execute(
-                text("EXEC FlaskHelperFunctionsSpecific @Request = 'ActiveCourses'")
-            ).fetchall()
+            active_courses = reference_rows("ActiveCourses", conn=conn)
 
-        course_ids = [str(r.ELearningCourseID) for r in active_courses]
+        course_ids = [str(r["ELearningCourseID"]) for r in active_courses]
 
         grouped = {}
         for r in el_rows:
@@ -1189,7 +1188,7 @@ def send_elearning_reminder():
             ]
         if from_org == "None":
             from_org = "Water Safety New Zealand"
-        send_elearning_reminder_email(
+        outbox_id = send_elearning_reminder_email(
             mail=mail,
             email=email,
             firstname=firstname,
@@ -1199,7 +1198,7 @@ def send_elearning_reminder():
             course_statuses=course_statuses,
         )
 
-        flash(f"📧 eLearning reminder sent to {firstname}.", "info")
+        flash(f"📧 eLearning reminder to {firstname} {email_status(outbox_id)}.", "info")
 
     except Exception as e:
         log_alert(
@@ -1249,12 +1248,13 @@ def send_school_reminder_email():
             requested_by = f"{session.get('user_firstname') or ''} {session.get('user_surname') or ''}".strip()
 
             sent_count = 0
+            outbox_ids = []
             for r in rows:
                 recipient_email = (r.get("Email") or "").strip()
                 if not recipient_email:
                     continue
 
-                send_class_list_reminder_email(
+                outbox_ids.append(send_class_list_reminder_email(
                     mail=mail,
                     school_name=school_name,
                     recipient_email=recipient_email,
@@ -1264,13 +1264,13 @@ def send_school_reminder_email():
                     requested_by=requested_by,
                     requester_email=session.get("user_email"),
                     from_entity=from_entity,
-                )
+                ))
                 sent_count += 1
 
             if sent_count == 0:
                 flash("No valid recipient email addresses were found.", "warning")
             else:
-                flash(f"Reminder email sent to {sent_count} staff members.", "success")
+                flash(f"Reminder email to {sent_count} staff members {email_status(*outbox_ids)}.", "success")
 
     except Exception as e:
         flash("Error sending reminder email.", "danger")
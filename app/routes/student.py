@@ -6,6 +6,7 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from app.routes.auth import login_required
 from app.utils.database import get_db_engine, log_alert
+from app.utils.reference_data import ethnicity_options
 
 students_bp = Blueprint("students_bp", __name__)
 
@@ -42,14 +43,7 @@ def student_search_page():
                 pass
             return _forbidden_page()
 
-        engine = get_db_engine()
-        with engine.connect() as conn:
-            rows = conn.execute(
-                text("EXEC FlaskHelperFunctions @Request='EthnicityDropdown'")
-            ).mappings().all()
-
-        ethnicities = [{"id": r.get("EthnicityID"), "desc": r.get("Description")} for r in rows]
-        return render_template("student_search.html", ethnicities=ethnicities)
+        return render_template("student_search.html", ethnicities=ethnicity_options())
 
     except Exception as e:
         try:
@@ -4,8 +4,8 @@ import hashlib
 import json
 import math
 import re
+import time
 import traceback
-from collections import namedtuple
 from datetime import timezone
 from zoneinfo import ZoneInfo
 import pandas as pd
@@ -37,6 +37,16 @@ from app.utils.custom_email import (
     send_survey_reminder_email,
 )
 from app.utils.database import get_db_engine, log_alert
+from app.utils.email_outbox import email_status
+from app.utils.entitlements import entitlements_for
+from app.utils.report_cache import mark_survey_data_changed
+from app.utils.survey_answers import answer_rows, guest_answer_rows, save_submission
+from app.utils.survey_definitions import (
+    dropdown_options,
+    invalidate_survey_definitions,
+    survey_definition,
+    survey_id_for_route,
+)
 from app.utils.wsfl_email import send_account_invites
 
 # Blueprint
@@ -44,69 +54,40 @@ survey_bp = Blueprint("survey_bp", __name__)
 
 @survey_bp.route("/Form/<string:routename>")
 def survey_by_routename(routename):
-    engine = get_db_engine()
-    Label = namedtuple("Label", ["pos", "text"])
-    questions = []
-    seen_ids = {}
-
     try:
         current_app.logger.info("📝 survey_by_routename start | route=%s | user=%s",
                                 routename, session.get("user_email"))
 
-        with engine.connect() as conn:
-            res = conn.execute(
-                text("EXEC SVY_GetSurveyIDByRouteName @RouteName = :routename"),
-                {"routename": routename}
-            )
-            row = res.fetchone()
-            res.close()
+        survey_id = survey_id_for_route(routename)
+        if survey_id is None:
+            current_app.logger.warning("🔎 Survey not found | route=%s", routename)
+            flash(f"Survey '{routename}' not found.", "danger")
+            return redirect("/Profile")
 
-            if not row:
-                current_app.logger.warning("🔎 Survey not found | route=%s", routename)
-                flash(f"Survey '{routename}' not found.", "danger")
-                return redirect("/Profile")
+        current_app.logger.info("✅ resolved survey_id=%s for route=%s", survey_id, routename)
 
-            survey_id = getattr(row, "SurveyID", row[0])
-            current_app.logger.info("✅ resolved survey_id=%s for route=%s", survey_id, routename)
+        user_role = session.get("user_role")
+        user_id = session.get("user_id")
+        current_app.logger.info("🔐 user_role=%s user_id=%s", user_role, user_id)
 
+        if survey_id == 3:
+            # Teacher Assessment — funders + WSNZ admins only
+            allowed_roles = {"FUN", "ADM"}
 
-            user_role = session.get("user_role")
-            user_id = session.get("user_id")
-            current_app.logger.info("🔐 user_role=%s user_id=%s", user_role, user_id)
+            if user_role not in allowed_roles and "clm" not in session.get("desc", "").lower():
+                flash(
+                    "This assessment is restricted to funders and WSNZ Administrators.",
+                    "warning"
+                )
+                return redirect(url_for("survey_bp.list_my_surveys"))
 
-            if survey_id == 3:
-                # Teacher Assessment — funders + WSNZ admins only
-                allowed_roles = {"FUN", "ADM"}
+        if survey_id == 4:
+            # Admin-only survey
+            if user_role != "ADM":
+                flash("This assessment is restricted to WSNZ Admins.", "warning")
+                return redirect(url_for("survey_bp.list_my_surveys"))
 
-                if user_role not in allowed_roles and "clm" not in session.get("desc", "").lower():
-                    flash(
-                        "This assessment is restricted to funders and WSNZ Administrators.",
-                        "warning"
-                    )
-                    return redirect(url_for("survey_bp.list_my_surveys"))
-
-            if survey_id == 4:
-                # Admin-only survey
-                if user_role != "ADM":
-                    flash("This assessment is restricted to WSNZ Admins.", "warning")
-                    return redirect(url_for("survey_bp.list_my_surveys"))
-
-            qrows = conn.execute(
-                text("EXEC SVY_GetSurveyQuestions @SurveyID = :survey_id"),
-                {"survey_id": survey_id}
-            ).fetchall()
-
-        for qid, qtext, qcode, pos, label in qrows:
-            if qid not in seen_ids:
-                seen_ids[qid] = {"id": qid, "text": qtext, "type": qcode, "labels": []}
-                questions.append(seen_ids[qid])
-            if qcode == "LIK" and label is not None:
-                seen_ids[qid]["labels"].append(Label(pos, label))
-
-        # Ensure likert labels are ordered
-        for q in questions:
-            if q["labels"]:
-                q["labels"].sort(key=lambda L: (L.pos is None, L.pos))
+        questions = survey_definition(survey_id).template_questions()
 
         current_app.logger.info("📦 survey %s built | questions=%d", survey_id, len(questions))
 
@@ -137,14 +118,7 @@ def survey_by_routename(routename):
 @survey_bp.route("/api/surveys/<int:survey_id>/questions/<int:question_id>/options")
 def api_dropdown_options(survey_id, question_id):
     try:
-        with get_db_engine().connect() as conn:
-            result = conn.execute(
-                text("EXEC dbo.SVY_GetOptions @SurveyID=:sid, @QuestionID=:qid"),
-                {"sid": survey_id, "qid": question_id}
-            ).mappings()
-            rows = [dict(r) for r in result]
-
-        payload = [{"id": r["OptionID"], "value": r["OptionValue"], "label": r["Label"]} for r in rows]
+        payload = dropdown_options(survey_id, question_id)
         current_app.logger.info("📥 options | survey_id=%s qid=%s count=%d", survey_id, question_id, len(payload))
         return jsonify(payload)
 
@@ -177,46 +151,7 @@ def submit_survey(routename):
             routename,
             email,
         )
-
-        # -------------------------------------------------
-        # Helper execution wrappers (CLOSE RESULTS PROPERLY)
-        # -------------------------------------------------
-
-        def exec_one(conn, stmt, params=None):
-            r = conn.execute(stmt, params or {})
-            try:
-                return r.fetchone()
-            finally:
-                r.close()
-
-        def exec_scalar(conn, stmt, params=None):
-            r = conn.execute(stmt, params or {})
-            try:
-                row = r.fetchone()
-                return None if not row else row[0]
-            finally:
-                r.close()
-
-        def exec_all_mappings(conn, stmt, params=None):
-            r = conn.execute(stmt, params or {})
-            try:
-                return r.mappings().all()
-            finally:
-                r.close()
-
-        def exec_noresult(conn, stmt, params=None):
-            r = conn.execute(stmt, params or {})
-            try:
-                # consume any pending result sets safely
-                while True:
-                    if r.returns_rows:
-                        r.fetchall()
-                    if not r.nextset():
-                        break
-            except Exception:
-                pass
-            finally:
-                r.close()
+        started = time.perf_counter()
 
         # -------------------------------------------------
         # Parse form into question dictionary
@@ -240,191 +175,37 @@ def submit_survey(routename):
 
         engine = get_db_engine()
 
-        with engine.begin() as conn:
-
-            # -------------------------------------------------
-            # Resolve SurveyID
-            # -------------------------------------------------
+        # -------------------------------------------------
+        # Resolve SurveyID + build answer rows (cached definition)
+        # -------------------------------------------------
 
+        with engine.connect() as conn:
             if routename.startswith("guest/") and routename.split("/", 1)[1].isdigit():
                 survey_id = int(routename.split("/", 1)[1])
             else:
-                row = exec_one(
-                    conn,
-                    text("EXEC SVY_GetSurveyIDByRouteName @RouteName = :r"),
-                    {"r": routename},
-                )
-                if not row:
+                survey_id = survey_id_for_route(routename, conn=conn)
+                if survey_id is None:
                     return f"Survey '{routename}' not found", 400
-                survey_id = row[0]
 
             current_app.logger.info("✅ resolved SurveyID=%s", survey_id)
 
-            # -------------------------------------------------
-            # Upsert respondent
-            # -------------------------------------------------
-
-            exec_noresult(
-                conn,
-                text("""
-                    EXEC SVY_InsertRespondent
-                        @SurveyID = :sid,
-                        @Email    = :email,
-                        @RespondentID = NULL;
-                """),
-                {"sid": survey_id, "email": email},
-            )
-
-            respondent_id = exec_scalar(
-                conn,
-                text("""
-                    EXEC SVY_GetRespondentID
-                        @SurveyID = :sid,
-                        @Email    = :email;
-                """),
-                {"sid": survey_id, "email": email},
-            )
-
-            if not respondent_id:
-                raise RuntimeError("Could not retrieve RespondentID")
-
-            current_app.logger.info("👤 RespondentID=%s", respondent_id)
-
-            # -------------------------------------------------
-            # Load Question Types
-            # -------------------------------------------------
-
-            qtypes = exec_all_mappings(
-                conn,
-                text("""
-                    EXEC SVY_GetQuestionTypesBySurveyID
-                        @SurveyID = :sid
-                """),
-                {"sid": survey_id},
-            )
-
-            qtype_map = {
-                str(r["QuestionID"]): r["QuestionCode"]
-                for r in qtypes
-            }
-
-            current_app.logger.info("🗺️ loaded %d question types", len(qtype_map))
-
-            truthy = {"1", "true", "t", "yes", "y", "on"}
-            falsy  = {"0", "false", "f", "no", "n", "off"}
-
-            inserted = 0
-
-            # -------------------------------------------------
-            # Insert Answers
-            # -------------------------------------------------
-
-            for qid_str, payload in answers.items():
-
-                qtype = qtype_map.get(qid_str)
-                if not qtype:
-                    continue
-
-                qid = int(qid_str)
-                val = payload.get("value")
-                opt_id_raw = payload.get("id")
-                opt_id = int(opt_id_raw) if (opt_id_raw and opt_id_raw.isdigit()) else None
-
-                # ----- Likert
-                if qtype == "LIK":
-                    if val:
-                        exec_noresult(
-                            conn,
-                            text("""
-                                EXEC SVY_InsertAnswer2
-                                    @RespondentID = :rid,
-                                    @QuestionID   = :qid,
-                                    @AnswerLikert = :val;
-                            """),
-                            {"rid": respondent_id, "qid": qid, "val": int(val)},
-                        )
-                        inserted += 1
-
-                # ----- Dropdown
-                elif qtype == "DDL":
-                    row = exec_one(
-                        conn,
-                        text("""
-                            DECLARE @Resolved INT, @IsValid BIT;
-                            EXEC dbo.SVY_ResolveAndValidateOption
-                                @SurveyID=:sid,
-                                @QuestionID=:qid,
-                                @PostedOptionID=:opt,
-                                @PostedValue=:v,
-                                @ResolvedOptionID=@Resolved OUTPUT,
-                                @IsValid=@IsValid OUTPUT;
-                            SELECT @Resolved AS Resolved;
-                        """),
-                        {"sid": survey_id, "qid": qid, "opt": opt_id, "v": val},
-                    )
-
-                    resolved_opt = row[0] if row else None
-
-                    if resolved_opt is not None:
-                        exec_noresult(
-                            conn,
-                            text("""
-                                EXEC SVY_InsertAnswer2
-                                    @RespondentID   = :rid,
-                                    @QuestionID     = :qid,
-                                    @AnswerOptionID = :opt,
-                                    @AnswerText     = :val;
-                            """),
-                            {
-                                "rid": respondent_id,
-                                "qid": qid,
-                                "opt": int(resolved_opt),
-                                "val": (val or None),
-                            },
-                        )
-                        inserted += 1
-
-                # ----- Boolean / YesNo / Checkbox
-                elif qtype in ("BOOL", "YN", "CHK"):
-                    if val is not None:
-                        v = str(val).strip().lower()
-                        if v in truthy:
-                            b = 1
-                        elif v in falsy:
-                            b = 0
-                        else:
-                            b = 1 if v else 0
+            qtype_map = survey_definition(survey_id, conn=conn).type_map()
+            rows = answer_rows(answers, survey_id, qtype_map, conn=conn)
 
-                        exec_noresult(
-                            conn,
-                            text("""
-                                EXEC SVY_InsertAnswer2
-                                    @RespondentID  = :rid,
-                                    @QuestionID    = :qid,
-                                    @AnswerBoolean = :b;
-                            """),
-                            {"rid": respondent_id, "qid": qid, "b": b},
-                        )
-                        inserted += 1
+        # -------------------------------------------------
+        # Respondent + answers (one transaction)
+        # -------------------------------------------------
 
-                # ----- Text
-                else:
-                    if val:
-                        exec_noresult(
-                            conn,
-                            text("""
-                                EXEC SVY_InsertAnswer2
-                                    @RespondentID = :rid,
-                                    @QuestionID   = :qid,
-                                    @AnswerText   = :val;
-                            """),
-                            {"rid": respondent_id, "qid": qid, "val": val},
-                        )
-                        inserted += 1
+        respondent_id, path = save_submission(engine, survey_id, email, rows)
+        mark_survey_data_changed()
+        inserted = len(rows)
 
+        current_app.logger.info("👤 RespondentID=%s", respondent_id)
         current_app.logger.info(
-            "✅ submit_survey done | answers_inserted=%d",
+            "✅ submit_survey done | answers_inserted=%d | path=%s | %.0f ms",
             inserted,
+            path,
+            (time.perf_counter() - started) * 1000,
         )
 
         flash("✅ Survey submitted successfully!", "success")
@@ -477,43 +258,11 @@ def submit_guest_survey(survey_id):
         responses = {k[1:]: v for k, v in form_data.items() if k.startswith("q")}
         current_app.logger.info("📦 parsed guest responses: %d questions", len(responses))
 
-        with engine.begin() as conn:
-            conn.execute(text("""
-                EXEC SVY_InsertRespondent 
-                    @SurveyID = :survey_id,
-                    @Email = :email,
-                    @RespondentID = NULL;
-            """), {"survey_id": survey_id, "email": email})
-
-            respondent_id = conn.execute(text("""
-                EXEC SVY_GetRespondentID 
-                    @SurveyID = :survey_id,
-                    @Email = :email;
-            """), {"survey_id": survey_id, "email": email}).scalar()
-
-            if not respondent_id:
-                raise Exception("Could not retrieve RespondentID")
-            current_app.logger.info("👤 Guest RespondentID=%s", respondent_id)
-
-            inserted = 0
-            for qid_str, value in responses.items():
-                qid = int(qid_str)
-                if value.isdigit():
-                    conn.execute(text("""
-                        EXEC SVY_InsertAnswer2 
-                            @RespondentID = :rid, 
-                            @QuestionID = :qid, 
-                            @AnswerLikert = :val;
-                    """), {"rid": respondent_id, "qid": qid, "val": int(value)})
-                    inserted += 1
-                else:
-                    conn.execute(text("""
-                        EXEC SVY_InsertAnswer2 
-                            @RespondentID = :rid, 
-                            @QuestionID = :qid, 
-                            @AnswerText = :val;
-                    """), {"rid": respondent_id, "qid": qid, "val": value})
-                    inserted += 1
+        rows = guest_answer_rows(responses)
+        respondent_id, path = save_submission(engine, survey_id, email, rows)
+        mark_survey_data_changed()
+        inserted = len(rows)
+        current_app.logger.info("👤 Guest RespondentID=%s | path=%s", respondent_id, path)
 
         current_app.logger.info("✅ submit_guest_survey done | answers_inserted=%d", inserted)
         flash("✅ Survey submitted successfully!")
@@ -825,30 +574,9 @@ def view_my_survey_response(respondent_id):
                 authorised_entity_ids = set()
 
                 try:
-                    entity_rows = (
-                        conn.execute(
-                            text("""
-                                SET NOCOUNT ON;
-                                EXEC dbo.FlaskGetEntities
-                                    @EntityType      = :EntityType,
-                                    @Role            = :Role,
-                                    @ID              = :ID,
-                                    @IncludeInactive = :IncludeInactive;
-                            """),
-                            {
-                                "EntityType": entity_type,
-                                "Role": viewer_role,
-                                "ID": viewer_id,
-                                "IncludeInactive": 0,
-                            },
-                        )
-                        .mappings()
-                        .all()
+                    authorised_entity_ids = entitlements_for(viewer_role, viewer_id).ids(
+                        entity_type, conn=conn
                     )
-
-                    authorised_entity_ids = {
-                        r.get("ID") for r in entity_rows if r.get("ID") is not None
-                    }
                     entity_allowed = (entity_id in authorised_entity_ids)
 
                     current_app.logger.info(
@@ -1128,24 +856,8 @@ def guest_survey_by_id(survey_id):
     if not session.get("guest_user"):
         return redirect(url_for("auth_bp.login"))
 
-    engine = get_db_engine()
-    Label = namedtuple("Label", ["pos", "text"])
-    questions = []
-    seen_ids = {}
-
     try:
-        with engine.connect() as conn:
-            rows = conn.execute(text("""
-                EXEC SVY_GetSurveyQuestions @SurveyID = :survey_id
-            """), {"survey_id": survey_id}).fetchall()
-
-        for qid, qtext, qcode, pos, label in rows:
-            if qid not in seen_ids:
-                question = {"id": qid, "text": qtext, "type": qcode, "labels": []}
-                questions.append(question)
-                seen_ids[qid] = question
-            if qcode == "LIK" and label:
-                question["labels"].append(Label(pos, label))
+        questions = survey_definition(survey_id).template_questions()
 
         return render_template(
             f"survey_form_{survey_id}.html",
@@ -1211,7 +923,7 @@ def send_survey_invite():
             invited_by_org = s
 
     try:
-        send_survey_invite_email(
+        outbox_id = send_survey_invite_email(
             mail=mail,
             recipient_email=recipient_email,
             first_name=first_name,
@@ -1222,7 +934,7 @@ def send_survey_invite():
             requester_email=requester_email,
             invited_by_org=invited_by_org,
         )
-        flash(f"📧 Invitation sent to {recipient_email}", "success")
+        flash(f"📧 Invitation to {recipient_email} {email_status(outbox_id)}.", "success")
 
     except Exception as e:
         traceback.print_exc()
@@ -1254,10 +966,10 @@ def email_survey_link():
         requested_by = request.form["requested_by"]
         from_org = request.form["from_org"]
 
-        send_survey_invitation_email(
+        outbox_id = send_survey_invitation_email(
             mail, email, firstname, lastname, role, user_id, survey_id, requested_by, from_org
         )
-        flash(f"📧 Invitation sent to {firstname}.", "info")
+        flash(f"📧 Invitation to {firstname} {email_status(outbox_id)}.", "info")
 
     except Exception as e:
         current_app.logger.exception("❌ Exception occurred in email_survey_link():")
@@ -1299,7 +1011,7 @@ def send_survey_reminder():
             or current_app.config["MAIL_DEFAULT_SENDER"]
         )
 
-        send_survey_reminder_email(
+        outbox_id = send_survey_reminder_email(
             mail=mail,
             email=email,
             firstname=firstname,
@@ -1308,7 +1020,7 @@ def send_survey_reminder():
             from_org=from_org,
         )
 
-        flash(f"📧 Reminder sent to {firstname}.", "info")
+        flash(f"📧 Reminder to {firstname} {email_status(outbox_id)}.", "info")
 
     except Exception as e:
         current_app.logger.exception("❌ Exception occurred in send_survey_reminder()")
@@ -1411,26 +1123,7 @@ from sqlalchemy import text
 # Helper: allowed entity IDs
 # -----------------------------
 def _allowed_entity_ids(entity_type: str, user_role: str, user_id: int, include_inactive: int = 0):
-    engine = get_db_engine()
-    with engine.begin() as conn:
-        rows = conn.execute(
-            text("""
-                SET NOCOUNT ON;
-                EXEC dbo.FlaskGetEntities
-                    @EntityType      = :EntityType,
-                    @Role            = :Role,
-                    @ID              = :ID,
-                    @IncludeInactive = :IncludeInactive;
-            """),
-            {
-                "EntityType": entity_type,
-                "Role": user_role,
-                "ID": user_id,
-                "IncludeInactive": include_inactive,
-            }
-        ).mappings().all()
-
-    return {int(r["ID"]) for r in rows}
+    return entitlements_for(user_role, user_id).ids(entity_type, include_inactive)
 
 
 # -----------------------------
@@ -1780,6 +1473,7 @@ def likert_create():
                 {"n": name, "lbls": json.dumps(labels)}
             ).fetchone()
 
+        invalidate_survey_definitions()
         return jsonify({"ok": True, "id": int(row.LikertScaleID)})
 
     except Exception as e:
@@ -1991,7 +1685,7 @@ def bulk_emails_send():
     if action in ("invite_standard", "invite_admin"):
         make_admin = (action == "invite_admin") or grant_admin
         try:
-            sent_count, failed_count = send_account_invites(
+            sent_count, failed_count, status = send_account_invites(
                 mail,
                 recipients,
                 make_admin=make_admin,
@@ -2022,6 +1716,7 @@ def bulk_emails_send():
                 "action": action,
                 "sent_count": sent_count,
                 "failed_count": failed_count,
+                "status": status,
             }
         )
 
@@ -2029,6 +1724,7 @@ def bulk_emails_send():
    
     sent   = []
     failed = []
+    outbox_ids = []
 
     for rec in recipients:
         email     = (rec.get("email") or "").strip()
@@ -2064,7 +1760,7 @@ def bulk_emails_send():
                         for row in result
                     ]
                 
-                send_elearning_reminder_email(
+                outbox_id = send_elearning_reminder_email(
                     mail=mail,
                     email=email,
                     firstname=firstname,
@@ -2077,7 +1773,7 @@ def bulk_emails_send():
             elif action == "selfreview":
                 # If account is active -> reminder; if disabled -> invite
                 if is_active:
-                    send_survey_reminder_email(
+                    outbox_id = send_survey_reminder_email(
                         mail=mail,
                         email=email,
                         firstname=firstname,
@@ -2086,7 +1782,7 @@ def bulk_emails_send():
                         from_org=from_org,
                     )
                 else:
-                    send_survey_invite_email(
+                    outbox_id = send_survey_invite_email(
                         mail=mail,
                         recipient_email=email,
                         first_name=firstname,
@@ -2099,6 +1795,7 @@ def bulk_emails_send():
                     )
 
             sent.append(email)
+            outbox_ids.append(outbox_id)
 
         except Exception as e:
             current_app.logger.exception("BulkEmails/send failed for %s", email)
@@ -2127,5 +1824,6 @@ def bulk_emails_send():
             "sent": sent,
             "failed_count": len(failed),
             "failed": failed,
+            "status": email_status(*outbox_ids),
         }
     )
\ No newline at end of file
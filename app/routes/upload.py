@@ -3,16 +3,45 @@ import io
 import json
 import threading
 import warnings
+import numpy as np
 import pandas as pd
 from flask import Blueprint, current_app, render_template, request, session, flash, redirect, url_for, send_file, jsonify, abort
 from app.utils.database import get_db_engine, log_alert, get_terms, get_years
+from app.utils.classlist_normalise import (
+    ISO_DATE_FORMAT,
+    autodetect_date_column,
+    coerce_nsn,
+    coerce_year_level,
+    normalise_date_column,
+    normalise_headers,
+    strip_macrons_frame,
+    strip_macrons_records,
+    year_level_display,
+)
+from app.utils.excel_export import (
+    FormatCache,
+    error_field_mask,
+    frame_rows,
+    send_workbook,
+    truthy_mask,
+    write_row_runs,
+)
+from app.utils.reference_data import reference_rows
+from app.utils.report_cache import mark_report_data_changed
+from app.utils.upload_staging import (
+    discard_upload,
+    load_frame,
+    load_records,
+    new_upload_id,
+    stage_frame,
+    stage_records,
+)
 from werkzeug.utils import secure_filename
 from app.routes.auth import login_required
 from sqlalchemy import text
-from io import StringIO, BytesIO
+from io import BytesIO
 import os 
 import tempfile
-import unicodedata
 import re
 import datetime
 import traceback
@@ -29,47 +58,6 @@ def sanitize_filename(s):
     s = str(s)  # <--- convert anything to a string first
     return s.replace(" ", "_").replace("/", "_")  # remove problematic characters
 
-def remove_macrons(s):
-    if not isinstance(s, str):
-        return s
-    normalized = unicodedata.normalize("NFD", s)
-    return ''.join(c for c in normalized if unicodedata.category(c) != 'Mn')
-
-def autodetect_date_column(series):
-   
-
-    formats = [
-        "%Y-%m-%d",
-        "%d-%m-%Y",
-        "%m-%d-%Y"
-    ]
-
-    best_parse = None
-    max_valid = -1
-
-    series = series.astype(str).str.replace(r"[ T]?00:00:00(?:\.0+)?", "", regex=True).str.strip()
-    series = series.str.replace(r"[^\d\s]", "-", regex=True)
-    for fmt in formats:
-        try:
-            parsed = pd.to_datetime(series, format=fmt, errors='coerce')
-            valid_count = parsed.notna().sum()
-            if valid_count > max_valid:
-                best_parse = parsed
-                max_valid = valid_count
-        except Exception as e:
-            current_app.logger.exception(f"Error trying format ")
-            continue
-
-    if best_parse is None or max_valid == 0:
-        best_parse = pd.to_datetime(series, errors='coerce')
-
-    final_result = best_parse.dt.strftime("%Y-%m-%d")
-
-    if final_result.isna().any():
-        current_app.logger.info("\n❌ Unparsed values found at indices:")
-        current_app.logger.info(final_result[final_result.isna()].index.tolist())
-
-    return final_result
 def is_iso_format(series):
     iso_regex = r"^\d{4}-\d{2}-\d{2}$"
     return series.astype(str).str.match(iso_regex).all()
@@ -138,11 +126,7 @@ def classlistupload():
                 funders = [{"Description": session.get("desc"), "FunderID": session.get("user_id")}]
             elif role== "ADM":
                 # PRO users: funders supporting this provider
-                result = conn.execute(
-                    text("EXEC FlaskHelperFunctions :Request"),
-                    {"Request": "FunderDropdown"}
-                )
-                funders = [dict(row._mapping) for row in result]
+                funders = reference_rows("FunderDropdown", conn=conn)
                 
             elif role== "PRO":
                 # PRO users: funders supporting this provider
@@ -304,24 +288,17 @@ def classlistupload():
                     flash(f"Failed to read uploaded file: {str(e)}", "danger")
                     return redirect(url_for("upload_bp.classlistupload"))
                 # --- normalise headers + common variants (prevents phantom cols) ---
-                df.columns = [str(c).strip() for c in df.columns]
-                df.rename(columns={
-                    "BirthDate": "Birthdate",
-                    "Birth Date": "Birthdate",
-                    "Year Level": "YearLevel",
-                    "Yearlevel": "YearLevel",
-                    "Year_Level": "YearLevel",
-                }, inplace=True)
+                normalise_headers(df)
                 # Replace NaN and NaT with None
                 if "Birthdate" in df.columns:
                     current_app.logger.info("\n📅 Starting Birthdate normalization...")
 
                     try:
                        
-                        # Use autodetect_date_column to handle format
-                        df["Birthdate"] = autodetect_date_column(df["Birthdate"])
+                        # Format is inferred once from a sample, then parsed in one pass
+                        df["Birthdate"], birthdate_format = normalise_date_column(df["Birthdate"])
 
-                        session["birthdate_format"] = "autodetected"
+                        session["birthdate_format"] = birthdate_format or "autodetected"
 
                     except Exception as e:
                         current_app.logger.exception("❌ Error during Birthdate normalization")
@@ -338,23 +315,23 @@ def classlistupload():
                 
                 if "BirthDate" in df_cleaned.columns:
                     df_cleaned.rename(columns={"BirthDate": "Birthdate"}, inplace=True)
-                # Save raw JSON version for later validation (as string)
-                for col in df_cleaned.columns:
-                    df_cleaned[col] = df_cleaned[col].apply(lambda x: remove_macrons(x) if isinstance(x, str) else x)
+                df_cleaned = strip_macrons_frame(df_cleaned)
 
-                session["raw_csv_json"] = df_cleaned.to_json(orient="records")
+                # Stage the cleaned upload server-side; the session only keeps its ID
+                if session.get("upload_id"):
+                    discard_upload(session["upload_id"])
+                upload_id = new_upload_id()
+                stage_frame(upload_id, "raw", df_cleaned)
+                session["upload_id"] = upload_id
+                session.pop("raw_csv_json", None)  # legacy session copies
+                session.pop("preview_data", None)
 
-                # Save top 10 rows preview to session
-                preview_data = df_cleaned.head(10).to_dict(orient="records")
-                for row in preview_data:
-                    if "YearLevel" not in row:      # <-- don't create it
-                        continue
-                    yl = row.get("YearLevel")
-                    if isinstance(yl, (int, float)) and not pd.isnull(yl):
-                        row["YearLevel"] = str(int(yl))
-                    elif yl is None or pd.isnull(yl):
-                        row["YearLevel"] = ""
-                session["preview_data"] = preview_data
+                # Top 10 rows for the preview table
+                preview_df = df_cleaned.head(10).copy()
+                if "YearLevel" in preview_df.columns:      # <-- don't create it
+                    preview_df["YearLevel"] = year_level_display(preview_df["YearLevel"])
+                preview_data = preview_df.to_dict(orient="records")
+                stage_records(upload_id, "preview_data", preview_data)
 
 
                 # Save original column headers
@@ -364,11 +341,12 @@ def classlistupload():
             elif action == "validate":
                 
                 validated = True
-                if not session.get("raw_csv_json"):
+                upload_id = session.get("upload_id")
+                raw_df = load_frame(upload_id, "raw") if upload_id else None
+                if raw_df is None:
                     flash("No CSV file has been uploaded for validation.", "danger")
                 else:
                     try:
-                        raw_df = pd.read_json(StringIO(session["raw_csv_json"]), convert_dates=False)
 
                         column_mappings = json.loads(column_mappings_json)
                         
@@ -381,6 +359,11 @@ def classlistupload():
                         }
 
                         usable_columns = [col for col in raw_df.columns if str(col) in reverse_mapping]
+                        # Birthdate was already normalised to ISO at preview time
+                        birthdate_source = next(
+                            (str(c) for c in usable_columns if reverse_mapping[str(c)].strip().lower() == "birthdate"),
+                            None,
+                        )
                         df = raw_df[usable_columns].rename(columns={col: reverse_mapping[str(col)] for col in usable_columns})
 
                         
@@ -395,15 +378,13 @@ def classlistupload():
                         if "BirthDate" in df.columns:
                             df.rename(columns={"BirthDate": "BirthDate"}, inplace=True)
                         if "YearLevel" in df.columns:
-                            df["YearLevel"] = df["YearLevel"].astype(str).str.extract(r"(\d+)")[0]
-                            df["YearLevel"] = pd.to_numeric(df["YearLevel"], errors='coerce').astype("Int64")
+                            df["YearLevel"] = coerce_year_level(df["YearLevel"])
                         if "NSN" in df.columns:
-                            df["NSN"] = pd.to_numeric(df["NSN"], errors="coerce").astype("Int64")
+                            df["NSN"] = coerce_nsn(df["NSN"])
                         df.rename(columns={"BirthDate": "Birthdate"}, inplace=True)
                         if "Birthdate" in df.columns:
-                            birthdate_format = session.get("birthdate_format", "dayfirst")  # fallback to dayfirst
-                            use_dayfirst = birthdate_format == "dayfirst"
-                            df["Birthdate"] = autodetect_date_column(df["Birthdate"])
+                            known_fmt = ISO_DATE_FORMAT if birthdate_source == "Birthdate" else None
+                            df["Birthdate"] = autodetect_date_column(df["Birthdate"], known_fmt)
 
 
                         df_json = df.to_json(orient="records")
@@ -427,7 +408,6 @@ def classlistupload():
                                     }
                                 )
                                 preview_data = [dict(row._mapping) for row in result]
-                                session["preview_data"] = preview_data
                         except Exception as e:
                             current_app.logger.exception("❌ SQL execution error:", e)
 
@@ -442,7 +422,8 @@ def classlistupload():
                         for row in preview_data:
                             if isinstance(row.get("Birthdate"), (datetime.date, datetime.datetime)):
                                 row["Birthdate"] = row["Birthdate"].strftime("%Y-%m-%d")
-                            
+                        stage_records(upload_id, "preview_data", preview_data)
+
                         current_app.logger.info("🔍 Inspecting Birthdate values in preview_data (post):")
                         for i, row in enumerate(preview_data[:5]):
                             bd = row.get("Birthdate")
@@ -502,11 +483,86 @@ def classlistupload():
 # -----------------------------
 # /classlistdownload  (Excel)
 # -----------------------------
+RESULTS_COLUMN_WIDTHS = {
+    'NSN': 14, 'FirstName': 20, 'PreferredName': 20, 'LastName': 20,
+    'Birthdate': 18, 'Ethnicity': 14, 'Match': 12, 'ErrorMessage': 40
+}
+
+
+def write_classlist_results(workbook, df, columns_to_write, sheet_name='Results'):
+    """
+    Validation results sheet: error cells red (orange when the student still
+    matched), Birthdate as a real date, and a Ready / Fix required badge in
+    the last column. Masks are worked out per column up front, then each row
+    goes out with write_row.
+    """
+    worksheet = workbook.add_worksheet(sheet_name)
+    fmts = FormatCache(workbook)
+
+    wrap_top = {'text_wrap': True, 'valign': 'top'}
+    flagged  = {'font_color': '#FFFFFF', 'bold': True, 'valign': 'top'}
+    wrap_top_format    = fmts.get(wrap_top)
+    red_format         = fmts.get(flagged, bg_color='#D63A3A')
+    orange_format      = fmts.get(flagged, bg_color='#EF9D32')
+    red_date_format    = fmts.get(flagged, bg_color='#D63A3A', num_format='yyyy-mm-dd')
+    orange_date_format = fmts.get(flagged, bg_color='#EF9D32', num_format='yyyy-mm-dd')
+    date_format        = fmts.get({'num_format': 'yyyy-mm-dd', 'valign': 'top'})
+    badge = {'bold': True, 'align': 'center', 'valign': 'top', 'font_color': '#FFFFFF', 'border': 1}
+    badge_format_error = fmts.get(badge, bg_color='#D63A3A')
+    badge_format_ready = fmts.get(badge, bg_color='#49B00D')
+    header_format      = fmts.get({'bold': True, 'valign': 'top', 'font_color': '#FFFFFF',
+                                   'bg_color': '#000000', 'border': 1})
+
+    max_col = len(columns_to_write)
+    for col_num, col_name in enumerate(columns_to_write):
+        worksheet.set_column(col_num, col_num, RESULTS_COLUMN_WIDTHS.get(col_name, None), wrap_top_format)
+    worksheet.set_column(max_col, max_col, 15, wrap_top_format)
+
+    worksheet.write_row(0, 0, columns_to_write, header_format)
+    worksheet.autofilter(0, 0, len(df), max_col - 1)
+    worksheet.freeze_panes(1, 0)
+
+    # Vectorised per-row / per-cell state
+    is_match = truthy_mask(df['Match']) if 'Match' in df.columns else np.zeros(len(df), dtype=bool)
+    err_mask = error_field_mask(df, columns_to_write)
+
+    data = df[columns_to_write].copy()
+    if 'ErrorMessage' in data.columns:
+        msg = data['ErrorMessage']
+        data['ErrorMessage'] = msg.where(~msg.astype(str).str.strip().str.lower().eq('true'), "")
+    if 'Birthdate' in data.columns:
+        bd = data['Birthdate'].astype(str)
+        parsed = pd.to_datetime(bd.where(bd.str.match(r"^\d{4}-\d{2}-\d{2}$")), format=ISO_DATE_FORMAT, errors='coerce')
+        data['Birthdate'] = pd.Series(
+            [d.to_pydatetime() if pd.notna(d) else "" for d in parsed], index=data.index, dtype=object
+        )
+    rows = frame_rows(data)
+
+    birth_idx = columns_to_write.index('Birthdate') if 'Birthdate' in columns_to_write else -1
+    badge_col = max_col - 1
+    base_formats = [date_format if j == birth_idx else wrap_top_format for j in range(max_col)]
+
+    for i, values in enumerate(rows):
+        row_formats = list(base_formats)
+        if err_mask[i].any():
+            for j in np.flatnonzero(err_mask[i]):
+                if j == birth_idx:
+                    row_formats[j] = orange_date_format if is_match[i] else red_date_format
+                else:
+                    row_formats[j] = orange_format if is_match[i] else red_format
+        values[badge_col] = 'Ready' if is_match[i] else 'Fix required'
+        row_formats[badge_col] = badge_format_ready if is_match[i] else badge_format_error
+        write_row_runs(worksheet, i + 1, 0, values, row_formats)
+
+    return worksheet
+
+
 @upload_bp.route('/classlistdownload', methods=['POST'])
 @login_required
 def classlistdownload():
     try:
-        if not session.get("preview_data"):
+        preview_data = load_records(session.get("upload_id"), "preview_data")
+        if not preview_data:
             flash("No data available to export.", "danger")
             return redirect(url_for("upload_bp.classlistupload"))
 
@@ -516,120 +572,22 @@ def classlistdownload():
         ]
 
         # Reconstruct DataFrame
-        df = pd.DataFrame(session["preview_data"])
-        df["Birthdate"] = autodetect_date_column(df["Birthdate"])
+        df = pd.DataFrame(preview_data)
+        df["Birthdate"] = autodetect_date_column(df["Birthdate"], ISO_DATE_FORMAT)
         df = df.fillna("")
 
         # Ensure only desired columns and in the correct order
         columns_to_write = [col for col in desired_order if col in df.columns]
 
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df[columns_to_write].to_excel(writer, sheet_name='Results', index=False, startrow=1, header=False)
-            workbook  = writer.book
-            worksheet = writer.sheets['Results']
-
-            # Write header row manually (we used header=False above)
-            for col_num, col_name in enumerate(columns_to_write):
-                worksheet.write(0, col_num, col_name)
-
-            # Excel column name helper
-            def excel_col_letter(n):
-                name = ''
-                while n >= 0:
-                    name = chr(n % 26 + 65) + name
-                    n = n // 26 - 1
-                return name
-
-            max_row = len(df) + 1
-            max_col = len(columns_to_write)
-            last_col_letter = excel_col_letter(max_col - 1)
-
-            worksheet.add_table(f"A1:{last_col_letter}{max_row}", {
-                'columns': [{'header': col} for col in columns_to_write],
-                'style': 'Table Style Light 8',
-                'name': 'MyTable'
-            })
-
-            # Formats
-            wrap_top_format    = workbook.add_format({'text_wrap': True, 'valign': 'top'})
-            red_format         = workbook.add_format({'bg_color': '#D63A3A', 'font_color': '#FFFFFF', 'bold': True, 'valign': 'top'})
-            orange_format      = workbook.add_format({'bg_color': "#EF9D32", 'font_color': '#FFFFFF', 'bold': True, 'valign': 'top'})
-            orange_date_format = workbook.add_format({
-                'bg_color': "#EF9D32", 'font_color': '#FFFFFF', 'bold': True, 'valign': 'top',
-                'num_format': 'yyyy-mm-dd'
-            })
-            red_date_format    = workbook.add_format({
-                'bg_color': '#D63A3A', 'font_color': '#FFFFFF', 'bold': True, 'valign': 'top',
-                'num_format': 'yyyy-mm-dd'
-            })
-            badge_format_error = workbook.add_format({'bold': True, 'align': 'center', 'valign': 'top', 'font_color': '#FFFFFF', 'bg_color': "#D63A3A", 'border': 1})
-            badge_format_ready = workbook.add_format({'bold': True, 'align': 'center', 'valign': 'top', 'font_color': '#FFFFFF', 'bg_color': "#49B00D", 'border': 1})
-            date_format        = workbook.add_format({'num_format': 'yyyy-mm-dd', 'valign': 'top'})
-
-            # Write formatted cells
-            for row in range(1, len(df) + 1):
-                error_fields = df.loc[row - 1, 'ErrorFields'] if 'ErrorFields' in df.columns else ""
-
-                match_value  = df.loc[row - 1, 'Match']
-                error_columns = [field.strip() for field in error_fields.split(',')] if pd.notna(error_fields) else []
-
-                for col in range(len(columns_to_write)):
-                    col_name = columns_to_write[col]
-                    value    = df.iloc[row - 1][col_name]
-
-                    if col_name == 'ErrorMessage' and (value is True or str(value).strip().lower() == 'true'):
-                        value = ""
-
-                    is_error_col = col_name.lower() in [e.lower() for e in error_columns]
-                    is_match     = str(match_value).strip().lower() in ["1", "true", "yes"]
-                    fmt = (orange_format if is_match else red_format) if is_error_col else wrap_top_format
-
-                    if col_name == "Birthdate":
-                        try:
-                            # Expecting YYYY-MM-DD
-                            if isinstance(value, str) and re.match(r"^\d{4}-\d{2}-\d{2}$", value):
-                                dt = datetime.datetime.strptime(value, "%Y-%m-%d")
-                                fmt = (orange_date_format if is_match else red_date_format) if is_error_col else date_format
-                                worksheet.write_datetime(row, col, dt, fmt)
-                            else:
-                                worksheet.write(row, col, "", fmt)
-                        except Exception:
-                            worksheet.write(row, col, "", fmt)
-                    else:
-                        worksheet.write(row, col, value, fmt)
-
-                # Badge
-                badge_col   = len(columns_to_write) - 1
-                badge_value = 'Ready' if str(match_value).strip().lower() in ["1", "true", "yes"] else 'Fix required'
-                badge_format = badge_format_ready if badge_value == 'Ready' else badge_format_error
-                worksheet.write(row, badge_col, badge_value, badge_format)
-
-            # Column widths
-            column_widths = {
-                'NSN': 14, 'FirstName': 20, 'PreferredName': 20, 'LastName': 20,
-                'Birthdate': 18, 'Ethnicity': 14, 'Match': 12, 'ErrorMessage': 40
-            }
-            for col_num, col_name in enumerate(columns_to_write):
-                worksheet.set_column(col_num, col_num, column_widths.get(col_name, None), wrap_top_format)
-
-            worksheet.set_column(max_col, max_col, 15, wrap_top_format)
-            for row in range(max_row):
-                worksheet.set_row(row, None, wrap_top_format)
-
-        output.seek(0)
-        current_app.logger.info(session)
         classname   = sanitize_filename(session.get("selected_class"))
         teachername = sanitize_filename(session.get("selected_teacher"))
         year        = sanitize_filename(session.get("selected_year"))
         term        = sanitize_filename(session.get("selected_term"))
 
         filename = f"{classname or 'Class'}_{teachername or 'Teacher'}_{year or 'Year'}_T{term or 'Term'}.xlsx"
-        return send_file(
-            output,
+        return send_workbook(
+            lambda wb: write_classlist_results(wb, df, columns_to_write),
             download_name=filename,
-            as_attachment=True,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
 
     except Exception as e:
@@ -656,7 +614,8 @@ def classlistdownload():
 @login_required
 def classlistdownload_csv():
     try:
-        if not session.get("preview_data"):
+        preview_data = load_records(session.get("upload_id"), "preview_data")
+        if not preview_data:
             flash("No data available to export.", "danger")
             return redirect(url_for("upload_bp.classlistupload"))
 
@@ -665,8 +624,8 @@ def classlistdownload_csv():
             "Ethnicity","YearLevel","ErrorMessage","Match"
         ]
 
-        df = pd.DataFrame(session["preview_data"])
-        df["Birthdate"] = autodetect_date_column(df["Birthdate"])
+        df = pd.DataFrame(preview_data)
+        df["Birthdate"] = autodetect_date_column(df["Birthdate"], ISO_DATE_FORMAT)
         df = df.fillna("")
 
         # Keep only desired columns and order
@@ -717,7 +676,7 @@ def submitclass():
         year        = session.get("selected_year")
         teacher     = session.get("selected_teacher")
         classname   = session.get("selected_class")
-        preview_data = session.get("preview_data")
+        preview_data = load_records(session.get("upload_id"), "preview_data")
         selected_provider = session.get("selected_provider")  # may be None
         selected_provider2 = session.get("selected_provider2")
         selected_delivery_model = session.get("selected_delivery_model")
@@ -749,10 +708,7 @@ def submitclass():
             return redirect(url_for("upload_bp.classlistupload"))
 
         # Clean strings
-        for row in preview_data:
-            for k, v in row.items():
-                if isinstance(v, str):
-                    row[k] = remove_macrons(v)
+        strip_macrons_records(preview_data)
 
         input_json = json.dumps(preview_data)
 
@@ -795,6 +751,7 @@ def submitclass():
 
                 }
             )
+        mark_report_data_changed()
         current_app.logger.info(
             "📤 /submitclass payload | role=%s | funder_id=%r | moe_number=%r | term=%r | year=%r | "
             "teacher=%r | classname=%r | provider=%r | provider2=%r| actualprovider2=%r  | delivery_model=%r | "
@@ -6,9 +6,12 @@
 import base64
 import io
 import json
+import os
 import re
+import time
 import traceback
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date, datetime, timedelta, timezone
 from urllib.parse import urlencode
 import qrcode
@@ -20,6 +23,7 @@ import xlrd
 # ---------------------------
 import matplotlib
 matplotlib.use("Agg")  # Prevent GUI backend errors on servers
+import numpy as np
 import pandas as pd
 import pyodbc
 from flask import (
@@ -45,6 +49,21 @@ from sqlalchemy.exc import DBAPIError, SQLAlchemyError
 # ---------------------------
 from app.routes.auth import login_required
 from app.utils.database import get_db_engine, get_terms, get_years, log_alert
+from app.utils.class_cache import class_cache_key, class_cache_prefix, class_result_cache
+from app.utils.classlist_normalise import map_field_headers
+from app.utils.background_jobs import job_file, job_for_owner, submit_job
+from app.utils.reference_data import ethnicity_options, reference_rows
+from app.utils.entitlements import entitlements_for
+from app.utils.report_cache import mark_report_data_changed
+from app.utils.excel_export import (
+    XLSX_MIMETYPE,
+    FormatCache,
+    build_workbook_file,
+    frame_rows,
+    new_workbook,
+    send_workbook,
+    write_frame_rows,
+)
 
 # ---------------------------
 # Blueprint
@@ -140,6 +159,94 @@ def _ensure_authorised_for_class(engine, class_id: int) -> None:
     if session.get("user_role") is None:
         abort(403, description="You are not authorised to view that page.")
 
+
+def _ensure_authorised_for_classes(engine, class_ids, moe_number: int) -> None:
+    """
+    Batch check for multi-class exports: every class is looked up inside
+    moe_number (FlaskGetVisibleClassExportList filters on it), so one school
+    check covers the whole set.
+    """
+    role = (session.get("user_role") or "").upper()
+    if not role or not class_ids:
+        abort(403, description="You are not authorised to view that page.")
+
+    if role == "MOE":
+        session_moe = session.get("moe_number") or session.get("user_id") or session.get("ID")
+        try:
+            allowed = int(session_moe) == int(moe_number)
+        except (TypeError, ValueError):
+            allowed = False
+    elif role == "ADM":
+        allowed = True
+    else:
+        allowed = entitlements_for().is_allowed("School", moe_number)
+
+    if not allowed:
+        abort(403, description="You are not authorised to view that page.")
+
+
+# Batched FlaskExportAchievementsChanges: one call for a CSV of class IDs,
+# rows tagged with ClassID. Falls back to one call per class if the batch
+# proc isn't deployed (re-tried after _BATCH_RETRY_SECONDS).
+_BATCH_CHANGES_PROC = "FlaskExportAchievementsChangesBatch"
+_BATCH_RETRY_SECONDS = 600
+_batch_changes_unavailable_until = 0.0
+
+
+def _load_achievement_changes(engine, class_ids, term: int, year: int) -> dict:
+    """Return {class_id: df_long} for every requested class (empty frame if no rows)."""
+    global _batch_changes_unavailable_until
+    class_ids = [int(c) for c in class_ids]
+
+    if time.monotonic() >= _batch_changes_unavailable_until:
+        try:
+            with engine.connect() as conn:
+                df_all = pd.read_sql(
+                    text(f"""
+                        EXEC {_BATCH_CHANGES_PROC}
+                            @ClassIDs = :class_ids,
+                            @Term = :term,
+                            @Year = :year
+                    """),
+                    conn,
+                    params={
+                        "class_ids": ",".join(str(c) for c in class_ids),
+                        "term": term,
+                        "year": year
+                    }
+                )
+            if "ClassID" not in df_all.columns:
+                raise ValueError(f"{_BATCH_CHANGES_PROC} did not return a ClassID column")
+
+            df_all["ClassID"] = pd.to_numeric(df_all["ClassID"], errors="coerce")
+            empty = df_all.iloc[0:0].drop(columns=["ClassID"])
+            groups = {
+                int(cid): g.drop(columns=["ClassID"]).reset_index(drop=True)
+                for cid, g in df_all.dropna(subset=["ClassID"]).groupby("ClassID", sort=False)
+            }
+            return {cid: groups.get(cid, empty.copy()) for cid in class_ids}
+
+        except (DBAPIError, ValueError) as e:
+            _batch_changes_unavailable_until = time.monotonic() + _BATCH_RETRY_SECONDS
+            current_app.logger.warning(
+                "⚠️ %s unavailable, falling back to per-class calls: %s", _BATCH_CHANGES_PROC, e
+            )
+
+    frames = {}
+    with engine.connect() as conn:
+        for class_id in class_ids:
+            frames[class_id] = pd.read_sql(
+                text("""
+                    EXEC FlaskExportAchievementsChanges
+                        @ClassID = :cid,
+                        @Term = :term,
+                        @Year = :year
+                """),
+                conn,
+                params={"cid": class_id, "term": term, "year": year}
+            )
+    return frames
+
 def _get_class_meta(engine, class_id: int):
     # Try proc (preferred)
     try:
@@ -203,87 +310,375 @@ def generate_qr_code_png(data, box_size=2):
     img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
     return f"data:image/png;base64,{img_str}"
 
-def excel_bytes_writer(df: pd.DataFrame, sheet_name: str = "Sheet1"):
+EXCEL_WIDTH_MAP = {
+    "NSN": 8,
+    "YearLevelID": 8,
+    "LastName": 16,
+    "Surname": 16,
+    "FirstName": 14,
+    "PreferredName": 14,
+    "DateOfBirth": 11,
+}
+
+
+def write_compact_sheet(wb, df: pd.DataFrame, sheet_name: str = "Sheet1"):
     """
-    Writes a compact, readable Excel:
+    Writes a compact, readable sheet:
     - Wrapped headers (supports \n in header text)
     - Narrow default widths (12), slightly wider for name columns
     - Centered numbers/booleans, wrapped text for others
     """
-    bio = io.BytesIO()
-    sheet = (sheet_name or "Sheet1")[:31]
+    ws = wb.add_worksheet((sheet_name or "Sheet1")[:31])
+    fmts = FormatCache(wb)
+
+    header_fmt = fmts.get({
+        "bold": True, "valign": "top", "text_wrap": True,
+        "border": 1, "bg_color": "#F2F2F2"
+    })
+    text_fmt = fmts.get({"valign": "top", "text_wrap": True})
+    num_fmt  = fmts.get({"valign": "vcenter", "align": "center"})
+
+    # Apply widths + sensible default cell formats
+    default_width = 12
+    for j, col in enumerate(df.columns):
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            col_fmt = num_fmt
+        else:
+            col_fmt = text_fmt
+        ws.set_column(j, j, EXCEL_WIDTH_MAP.get(str(col), default_width), col_fmt)
 
+    # Header row a bit taller for wraps; freeze it
+    ws.set_row(0, 32)
+    ws.write_row(0, 0, [str(c) for c in df.columns], header_fmt)
+    ws.freeze_panes(1, 0)
+
+    write_frame_rows(ws, frame_rows(df), start_row=1)
+    return ws
+
+
+def excel_bytes_writer(df: pd.DataFrame, sheet_name: str = "Sheet1"):
+    """write_compact_sheet into a temp file (rewound, ready for send_file)."""
+    return build_workbook_file(lambda wb: write_compact_sheet(wb, df, sheet_name))
+
+
+_ACHIEVEMENT_STATES = {"0", "1", "2", "0.0", "1.0", "2.0"}
+
+
+def _convert_achievement_states(df: pd.DataFrame, cols):
+    """
+    0/1/2 achievement columns -> '' / 'Y' / 'Y' (in place). Returns a
+    rows x len(df.columns) bool mask of the cells that were 2 (achieved in
+    the selected term, highlighted yellow).
+    """
+    mask = np.zeros((len(df), len(df.columns)), dtype=bool)
+    positions = {c: j for j, c in enumerate(df.columns)}
+    for col in cols:
+        raw = df[col].astype(str).str.strip().where(df[col].notna(), "")
+        if not set(raw.unique()).issubset(_ACHIEVEMENT_STATES | {""}):
+            continue
+        mask[:, positions[col]] = raw.isin(("2", "2.0")).to_numpy()
+        df[col] = raw.map({"2": "Y", "2.0": "Y", "1": "Y", "1.0": "Y"}).fillna("")
+    return mask
+
+
+def _split_header_from_meta(col_name, col_meta):
+    meta_row = col_meta.get(col_name)
+    if meta_row:
+        return meta_row.get("base", str(col_name)), meta_row.get("sub", "")
+
+    s = str(col_name).strip()
+    m = re.match(r"^(.*?)\s*(?:\((.*?)\))?\s*$", s)
+    base = ((m.group(1) if m else s) or "").strip()
+    sub = ((m.group(2) or "") if m and m.lastindex and m.lastindex >= 2 else "").strip()
+    return base, sub
+
+
+def _sort_tuple_from_key(sk):
     try:
-        with pd.ExcelWriter(bio, engine="xlsxwriter") as writer:
-            df.to_excel(writer, index=False, sheet_name=sheet)
+        yg, comp = str(sk).split("_", 1)
+        return int(yg), int(comp)
+    except Exception:
+        return 999, 999
 
-            wb = writer.book
-            ws = writer.sheets[sheet]
 
-            # Formats
-            header_fmt = wb.add_format({
-                "bold": True, "valign": "top", "text_wrap": True,
-                "border": 1, "bg_color": "#F2F2F2"
-            })
-            text_fmt   = wb.add_format({"valign": "top", "text_wrap": True})
-            num_fmt    = wb.add_format({"valign": "vcenter", "align": "center"})
+def _clean_export_col(c):
+    s = str(c)
+    s = re.sub(r"<br\s*/?>", " ", s, flags=re.I)
+    return s.strip()
 
-            # Re-write headers with wrapping (supports \n inserted earlier)
-            for j, col in enumerate(df.columns):
-                ws.write(0, j, str(col), header_fmt)
-
-            # Make header row a bit taller for wraps
-            ws.set_row(0, 32)
-
-            # Column width plan
-            default_width = 12
-            width_map = {
-                "NSN": 8,
-                "YearLevelID": 8,
-                "LastName": 16,
-                "Surname": 16,
-                "FirstName": 14,
-                "PreferredName": 14,
-                "DateOfBirth": 11,
+
+def _achievement_changes_frame(df_long):
+    """
+    Pivot FlaskExportAchievementsChanges rows (one per student/competency)
+    into the wide per-class export frame. Returns (df, col_meta) where
+    col_meta maps each competency column to its sort key and split header.
+    """
+    col_meta = {}
+
+    if df_long is None or df_long.empty:
+        return pd.DataFrame(columns=["LastName", "PreferredName", "YearLevel"]), col_meta
+
+    required_cols = {
+        "SortKey", "NSN", "PreferredName", "LastName",
+        "YearLevelID", "CompetencyName", "CompetencyStatus"
+    }
+
+    missing = required_cols.difference(df_long.columns)
+    if missing:
+        raise ValueError(
+            f"Stored procedure is missing expected columns: {', '.join(sorted(missing))}"
+        )
+
+    df_long["SortKey"] = df_long["SortKey"].astype(str).str.strip()
+    df_long["CompetencyName"] = df_long["CompetencyName"].astype(str).str.strip()
+    df_long["CompetencyStatus"] = pd.to_numeric(
+        df_long["CompetencyStatus"],
+        errors="coerce"
+    ).fillna(0).astype(int)
+
+    df = (
+        df_long.pivot_table(
+            index=["NSN", "LastName", "PreferredName", "YearLevelID"],
+            columns=["SortKey", "CompetencyName"],
+            values="CompetencyStatus",
+            aggfunc="max",
+            fill_value=0
+        )
+        .reset_index()
+    )
+
+    df.columns.name = None
+
+    # Fix tuple identity columns e.g. ('LastName', '')
+    df.columns = [
+        c[0] if isinstance(c, tuple) and (c[1] is None or c[1] == "") else c
+        for c in df.columns
+    ]
+
+    id_cols_raw = [c for c in df.columns if not isinstance(c, tuple)]
+    ach_cols_raw = [c for c in df.columns if isinstance(c, tuple)]
+
+    ach_cols_raw = sorted(
+        ach_cols_raw,
+        key=lambda c: (
+            _sort_tuple_from_key(c[0])[0],
+            _sort_tuple_from_key(c[0])[1],
+            str(c[1]).lower()
+        )
+    )
+
+    df = df[id_cols_raw + ach_cols_raw]
+
+    flat_cols = []
+    used = set()
+
+    for c in df.columns:
+        if isinstance(c, tuple):
+            sort_key, display = c
+            display = str(display).strip()
+
+            flat_name = display
+            i = 2
+            while flat_name in used:
+                flat_name = f"{display} [{i}]"
+                i += 1
+
+            used.add(flat_name)
+
+            m = re.match(r"^(.*?)\s*\((.*?)\)\s*$", display)
+            if m:
+                base = (m.group(1) or "").strip()
+                sub = (m.group(2) or "").strip()
+            else:
+                base = display
+                sub = ""
+
+            col_meta[flat_name] = {
+                "sort_key": sort_key,
+                "base": base,
+                "sub": sub
             }
 
-            # Apply widths + sensible default cell formats
-            for j, col in enumerate(df.columns):
-                col_name = str(col)
-                width = width_map.get(col_name, default_width)
+            flat_cols.append(flat_name)
+        else:
+            flat_cols.append(c)
 
-                # Choose a default format for the column
-                series = df[col]
-                if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
-                    col_fmt = num_fmt
-                else:
-                    col_fmt = text_fmt
+    df.columns = flat_cols
 
-                ws.set_column(j, j, width, col_fmt)
+    df.drop(columns=["NSN"], errors="ignore", inplace=True)
+    df.rename(columns={c: _clean_export_col(c) for c in df.columns}, inplace=True)
 
-            # Freeze header
-            ws.freeze_panes(1, 0)
+    if "YearLevelID" in df.columns:
+        df.rename(columns={"YearLevelID": "YearLevel"}, inplace=True)
 
-        bio.seek(0)
-        return bio
+    def display_col_sort_key(col_name):
+        meta_row = col_meta.get(col_name, {})
+        sort_key = meta_row.get("sort_key", "")
 
-    except Exception:
-        # Fallback (no styling) if xlsxwriter is missing
-        bio = io.BytesIO()
-        with pd.ExcelWriter(bio, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, sheet_name=sheet)
-            # Optional: set simple widths in openpyxl
-            try:
-                from openpyxl.utils import get_column_letter
-                ws = writer.sheets[sheet]
-                for j, col in enumerate(df.columns, start=1):
-                    col_name = str(col)
-                    width = width_map.get(col_name, default_width)
-                    ws.column_dimensions[get_column_letter(j)].width = width
-            except Exception:
-                pass
-        bio.seek(0)
-        return bio
+        try:
+            yg, comp = str(sort_key).split("_", 1)
+            return int(yg), int(comp), meta_row.get("base", str(col_name)).lower()
+        except Exception:
+            return 999, 999, str(col_name).lower()
+
+    id_cols = [c for c in ["LastName", "PreferredName", "YearLevel"] if c in df.columns]
+    ach_cols = [c for c in df.columns if c not in id_cols]
+    ach_cols = sorted(ach_cols, key=display_col_sort_key)
+
+    df = df[id_cols + ach_cols]
+
+    sort_cols = [c for c in ["LastName", "PreferredName", "YearLevel"] if c in df.columns]
+    if sort_cols:
+        df = df.sort_values(by=sort_cols, kind="stable").reset_index(drop=True)
+
+    return df, col_meta
+
+
+def _build_class_sheet(class_row, df_long, term: int, year: int) -> dict:
+    """Everything one class sheet needs, built off the request thread (pure pandas)."""
+    class_id = int(class_row["ClassID"])
+    class_name = class_row.get("ClassName", "")
+    teacher_name = class_row.get("TeacherName", "")
+    school_name = class_row.get("SchoolName", "")
+
+    df, col_meta = _achievement_changes_frame(df_long)
+
+    id_cols = [c for c in ["LastName", "PreferredName", "YearLevel"] if c in df.columns]
+    rest_cols = [c for c in df.columns if c not in id_cols]
+    highlight_mask = _convert_achievement_states(df, rest_cols)
+
+    title_lines = [
+        f"{school_name} — {class_name}".strip(" —"),
+        f"Teacher: {teacher_name}" if teacher_name else "",
+        f"Term {term}, {year}",
+        "Yellow Y = achieved in this term"
+    ]
+
+    return {
+        "class_id": class_id,
+        "class_name": class_name,
+        "df": df,
+        "col_meta": col_meta,
+        "id_cols": id_cols,
+        "highlight_mask": highlight_mask,
+        "title_text": "\n".join([line for line in title_lines if line]),
+    }
+
+
+def _build_class_sheets(class_meta_df, changes_by_class: dict, term: int, year: int, progress=None) -> list:
+    """
+    _build_class_sheet for every class on a bounded thread pool
+    (EXPORT_BUILD_WORKERS, default 4). Results come back in class_meta_df
+    order so the (serial) workbook writes stay deterministic.
+    """
+    rows = [row for _, row in class_meta_df.iterrows()]
+    total = len(rows)
+    if not total:
+        return []
+
+    def build(row):
+        return _build_class_sheet(row, changes_by_class.get(int(row["ClassID"])), term, year)
+
+    try:
+        workers = int(os.getenv("EXPORT_BUILD_WORKERS", "4"))
+    except ValueError:
+        workers = 4
+    workers = max(1, min(workers, total))
+
+    if workers == 1:
+        sheets = []
+        for i, row in enumerate(rows, start=1):
+            sheets.append(build(row))
+            if progress:
+                progress(i, total)
+        return sheets
+
+    sheets = [None] * total
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wsfl-export") as pool:
+        futures = {pool.submit(build, row): i for i, row in enumerate(rows)}
+        for fut in as_completed(futures):
+            sheets[futures[fut]] = fut.result()
+            done += 1
+            if progress:
+                progress(done, total)
+    return sheets
+
+
+def _write_achievement_changes_sheet(wb, fmts, sheet_name, df, col_meta, id_cols,
+                                     title_text, highlight_mask, title_last_col, freeze=True):
+    """
+    Title + rotated competency headers (row 0), subheaders (row 1), then the
+    Y grid from row 2 with this term's achievements highlighted yellow.
+    Written strictly top to bottom for constant_memory workbooks.
+    """
+    TITLE_ROW = 0
+    HEADER_BASE_ROW = 0
+    HEADER_SUB_ROW = 1
+    DATA_START_ROW = 2
+    DATA_START_COL = len(id_cols)
+
+    ws = wb.add_worksheet(sheet_name)
+    last_col = max(0, len(df.columns) - 1)
+
+    title_fmt = fmts.get({
+        "bold": True, "font_size": 12, "align": "left",
+        "valign": "top", "text_wrap": True
+    })
+    header_rotated_fmt = fmts.get({
+        "bold": True, "valign": "bottom", "align": "center", "text_wrap": True,
+        "border": 1, "bg_color": "#F2F2F2", "rotation": 90
+    })
+    header_sub_fmt = fmts.get({
+        "bold": True, "valign": "vcenter", "align": "center", "text_wrap": True,
+        "border": 1, "bg_color": "#F2F2F2"
+    })
+    id_header_fmt = fmts.get({
+        "bold": True, "valign": "vcenter", "align": "left", "text_wrap": False,
+        "border": 1, "bg_color": "#F2F2F2"
+    })
+    cell_text_fmt = fmts.get({"valign": "vcenter", "text_wrap": False})
+    cell_center_fmt = fmts.get({"valign": "vcenter", "align": "center"})
+    highlight_y_fmt = fmts.get({
+        "valign": "vcenter", "align": "center", "bg_color": "#FFF59D", "border": 1
+    })
+
+    # Column widths
+    width_map = {"LastName": 16, "PreferredName": 16, "YearLevel": 10}
+    for j, col in enumerate(df.columns):
+        if col in id_cols:
+            width = width_map.get(col, 14)
+            fmt = cell_text_fmt if col != "YearLevel" else cell_center_fmt
+        else:
+            width = 6
+            fmt = cell_center_fmt
+        ws.set_column(j, j, width, fmt)
+
+    # Row heights
+    ws.set_row(HEADER_BASE_ROW, 120)
+    ws.set_row(HEADER_SUB_ROW, 24)
+    ws.set_default_row(17)
+
+    ws.merge_range(TITLE_ROW, 0, TITLE_ROW, title_last_col, title_text, title_fmt)
+
+    headers = [_split_header_from_meta(df.columns[j], col_meta) for j in range(DATA_START_COL, last_col + 1)]
+    if headers:
+        ws.write_row(HEADER_BASE_ROW, DATA_START_COL, [b for b, _ in headers], header_rotated_fmt)
+
+    # ID headers: LastName, PreferredName, YearLevel
+    ws.write_row(HEADER_SUB_ROW, 0, list(id_cols), id_header_fmt)
+    if headers:
+        ws.write_row(HEADER_SUB_ROW, DATA_START_COL, [sub for _, sub in headers], header_sub_fmt)
+
+    write_frame_rows(
+        ws, frame_rows(df), start_row=DATA_START_ROW,
+        highlight_mask=highlight_mask, highlight_format=highlight_y_fmt,
+    )
+
+    if freeze:
+        ws.freeze_panes(DATA_START_ROW, DATA_START_COL)
+    return ws
 
 # =========================
 # Print/ PDF Pipeline Helpers
@@ -325,9 +720,8 @@ def _build_print_context(engine,moe_number:int, class_id: int, term: int, year:
     Build the same context dict that print_class_view uses to render print_view.html.
     Reuses cache when possible; regenerates if needed.
     """
-    cache_key = f"{class_id}_{term}_{year}_{filter_type}"
-    class_cache = session.get("class_cache", {})
-    cache = class_cache.get(cache_key)
+    cache_key = class_cache_key(class_id, term, year, filter_type, session.get("user_email"))
+    cache = class_result_cache.get(cache_key)
 
     # If missing, rebuild like print_class_view
     if not cache or "student_competencies" not in cache:
@@ -373,15 +767,13 @@ def _build_print_context(engine,moe_number:int, class_id: int, term: int, year:
             ).fillna(0).astype(int).replace({1: "✓", 0: ""}).reset_index()
 
             expiry_time = datetime.now(timezone.utc) + timedelta(minutes=15)
-            class_cache[cache_key] = {
+            class_result_cache.put(cache_key, {
                 "timestamp": datetime.now(timezone.utc).isoformat(),
                 "expires": expiry_time.isoformat(),
-                "students": df_combined.to_dict(),
                 "competencies": comp_df.to_dict(orient="records"),
                 "filter": filter_type,
                 "student_competencies": df_combined.to_dict(orient="records"),
-            }
-            session["class_cache"] = class_cache
+            })
 
     else:
         df_combined = pd.DataFrame(cache["student_competencies"]).replace({1: "✓", 0: ""})
@@ -432,34 +824,9 @@ def _build_print_context(engine,moe_number:int, class_id: int, term: int, year:
         "now": datetime.now,
         "qr_data_uri": qr_data_uri,
     }
-def _allowed_school_ids(conn, include_inactive: int = 0) -> set[int]:
-    user_id   = session.get("user_id")
-    user_role = session.get("user_role")
-
-    try:
-        user_id = int(user_id) if user_id is not None else None
-    except (TypeError, ValueError):
-        user_id = None
-
-    rows = conn.execute(
-        text("""
-            SET NOCOUNT ON;
-            EXEC dbo.FlaskGetEntities
-                @EntityType      = :EntityType,
-                @Role            = :Role,
-                @ID              = :ID,
-                @IncludeInactive = :IncludeInactive;
-        """),
-        {
-            "EntityType": "School",
-            "Role": user_role,
-            "ID": user_id,
-            "IncludeInactive": int(include_inactive or 0),
-        },
-    ).mappings().all()
-
+def _allowed_school_ids(conn, include_inactive: int = 0) -> frozenset[int]:
     # Assumes SP returns ID = MOENumber for schools
-    return {int(r["ID"]) for r in rows if r.get("ID") is not None}
+    return entitlements_for().ids("School", include_inactive, conn=conn)
 
 # =========================
 # Page Routes
@@ -472,11 +839,10 @@ def view_class(moe_number,class_id, term, year):
         filter_type = request.args.get("filter", "all")
         order_by    = request.args.get("order_by", "last")
 
-        # ---------- Cache lookup ----------
-        cache_key   = f"{class_id}_{term}_{year}_{filter_type}"
-        class_cache = session.get("class_cache", {})
-        cached      = class_cache.get(cache_key)
-        
+        # ---------- Cache key (server-side class result cache) ----------
+        cache_key = class_cache_key(class_id, term, year, filter_type, session.get("user_email"))
+        session.pop("class_cache", None)  # legacy: pivot tables used to live in the session
+
         engine = get_db_engine()
         with engine.begin() as conn:
 
@@ -515,12 +881,8 @@ def view_class(moe_number,class_id, term, year):
         # ❌ No valid cache → fetch from DB
         engine = get_db_engine()
         with engine.begin() as conn:
-            # Scenarios
-            scenario_result = conn.execute(
-                text("EXEC FlaskHelperFunctions @Request = :request"),
-                {"request": "Scenario"}
-            )
-            scenarios = [dict(row._mapping) for row in scenario_result]
+            # Scenarios (reference data, cached)
+            scenarios = reference_rows("Scenario", conn=conn)
 
            
             result = conn.execute(
@@ -666,21 +1028,16 @@ def view_class(moe_number,class_id, term, year):
             if not comp_df_sorted.empty and {"label","CompetencyID"} <= set(comp_df_sorted.columns):
                 competency_id_map = comp_df_sorted.set_index("label")["CompetencyID"].to_dict()
 
-            # Autofill map
-            auto_result = conn.execute(
-                text("EXEC FlaskHelperFunctions @Request = :request"),
-                {"request": "AutoMappedCompetencies"}
-            )
+            # Autofill map (reference data, cached)
             header_map = defaultdict(list)
-            for row in auto_result:
-                header_map[row.HeaderPre].append(row.HeaderPost)
+            for row in reference_rows("AutoMappedCompetencies", conn=conn):
+                header_map[row["HeaderPre"]].append(row["HeaderPost"])
 
-            # Cache it
+            # Cache it (server-side; print view and inline edits reuse it)
             expiry_time = datetime.now(timezone.utc) + timedelta(minutes=15)
-            class_cache[cache_key] = {
+            class_result_cache.put(cache_key, {
                 "timestamp": datetime.now(timezone.utc).isoformat(),
                 "expires": expiry_time.isoformat(),
-                "students": pivot_df.to_dict(),  # raw table
                 "competencies": comp_df_sorted.to_dict(orient="records"),
                 "filter": filter_type,
                 "student_competencies": pivot_df.to_dict(orient="records"),  # for cached branch
@@ -689,8 +1046,7 @@ def view_class(moe_number,class_id, term, year):
                 "school_name": school_name,
                 "scenarios": scenarios,
                 "autofill_map": dict(header_map)
-            }
-            session["class_cache"] = class_cache
+            })
             target = "Basic awareness of potential water-related hazards"
             cols_list = list(pivot_df.columns)
 
@@ -754,31 +1110,7 @@ def view_class(moe_number,class_id, term, year):
 
 
 def _entities_for_user(conn, entity_type: str, include_inactive: int = 0) -> list[dict]:
-    user_id   = session.get("user_id")
-    user_role = session.get("user_role")
-
-    try:
-        user_id = int(user_id) if user_id is not None else None
-    except (TypeError, ValueError):
-        user_id = None
-
-    sql = text("""
-        SET NOCOUNT ON;
-        EXEC dbo.FlaskGetEntities
-            @EntityType      = :EntityType,
-            @Role            = :Role,
-            @ID              = :ID,
-            @IncludeInactive = :IncludeInactive;
-    """)
-
-    rows = conn.execute(sql, {
-        "EntityType": entity_type,
-        "Role": user_role,
-        "ID": user_id,
-        "IncludeInactive": int(include_inactive or 0),
-    }).mappings().all()
-
-    return [{"id": int(r["ID"]), "description": str(r["Description"])} for r in rows]
+    return entitlements_for().entities(entity_type, include_inactive, conn=conn)
 
 @class_bp.route("/FilterClasses", methods=["GET", "POST"])
 @login_required
@@ -1067,27 +1399,16 @@ def update_competency():
                 }
             )
             current_app.logger.info("✅ Stored procedure executed")
+        mark_report_data_changed()
 
-        class_cache = session.get("class_cache", {})
-        updated_keys = 0
-        updated_students = 0
-
-        for key, cache in class_cache.items():
-            if key.startswith(f"{class_id}_{term}_{year}_"):
-                students = cache.get("student_competencies", [])
-                for student in students:
-                    if str(student.get("NSN")) == str(nsn):
-                        current_app.logger.info(f"✏️ Updating cache for NSN {nsn}, header {header_name}")
-                        student[header_name] = status
-                        updated_students += 1
-                updated_keys += 1
-
-        session["class_cache"] = class_cache
+        updated_keys, updated_students = class_result_cache.patch_students(
+            class_cache_prefix(class_id, term, year), nsn, {header_name: status}
+        )
         current_app.logger.info(f"✅ Cache edited for {updated_keys} key(s), {updated_students} student(s)")
 
         return jsonify({"success": True})
     except Exception as e:
-        current_app.logger.execute("❌ Exception occurred during update_competency")
+        current_app.logger.exception("❌ Exception occurred during update_competency")
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -1124,30 +1445,18 @@ def update_scenario():
                 }
             )
             current_app.logger.info("✅ Stored procedure executed")
+        mark_report_data_changed()
 
-        # ✏️ Inline update of session cache
-        class_cache = session.get("class_cache", {})
-        prefix = f"{class_id}_{term}_{year}_"
-        updates = 0
-
-        for key in list(class_cache):
-            if key.startswith(prefix):
-                entry = class_cache[key]
-                students = entry.get("student_competencies", [])
-                for student in students:
-                    if isinstance(student, dict) and str(student.get("NSN")) == str(nsn):
-                        current_app.logger.info(f"✏️ Updating scenario cache for NSN {nsn}, header {header} in key {key}")
-                        student[header] = str(value)
-                        updates += 1
-                class_cache[key] = entry  # save updated version
-
-        session["class_cache"] = class_cache
+        # ✏️ Inline update of the server-side class cache
+        updates, _ = class_result_cache.patch_students(
+            class_cache_prefix(class_id, term, year), nsn, {header: str(value)}
+        )
         current_app.logger.info(f"✅ Scenario cache updated in {updates} cache keys")
 
         return jsonify(success=True)
 
     except Exception as e:
-        current_app.logger.execute("❌ Scenario update failed")
+        current_app.logger.exception("❌ Scenario update failed")
         traceback.print_exc()
         return jsonify(success=False, error=str(e)), 500
 
@@ -1683,6 +1992,7 @@ def delete_class():
                 text("EXEC dbo.DeleteClass @ClassID=:cid, @Term=:term, @CalendarYear=:year"),
                 {"cid": class_id, "term": term, "year": year},
             )
+        mark_report_data_changed()
 
         return jsonify({"ok": True})
 
@@ -2075,10 +2385,7 @@ def search_students():
 @class_bp.route("/ethnicities")
 @login_required
 def ethnicities():
-    engine = get_db_engine()
-    with engine.begin() as conn:
-        rows = conn.execute(text("EXEC FlaskHelperFunctions @Request='EthnicityDropdown'")).fetchall()
-    return jsonify([{"id": r._mapping["EthnicityID"], "desc": r._mapping["Description"]} for r in rows])
+    return jsonify(ethnicity_options())
 
    
    
@@ -2106,12 +2413,9 @@ def export_class_excel():
         if df.empty:
             df = pd.DataFrame(columns=["No results"])
 
-        bio = excel_bytes_writer(df, sheet_name="Class List")
         fname =_safe_filename(f"{meta['SchoolName']} - {meta['ClassName']} - Class List (T{term} {year}).xlsx")
-        return send_file(
-            bio,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            as_attachment=True,
+        return send_workbook(
+            lambda wb: write_compact_sheet(wb, df, sheet_name="Class List"),
             download_name=fname
         )
     except Exception:
@@ -2261,7 +2565,6 @@ def export_achievements_excel():
                 )
 
         # ---------- Write Excel with Title + 2-row header ----------
-        bio = io.BytesIO()
         sheet = "Achievements"
 
         def split_header(col_name: str) -> tuple[str, str]:
@@ -2281,11 +2584,9 @@ def export_achievements_excel():
         HEADER_SUB_ROW = 1
         DATA_START_ROW = 2
 
-        with pd.ExcelWriter(bio, engine="xlsxwriter") as writer:
-            df.to_excel(writer, index=False, header=False, sheet_name=sheet, startrow=DATA_START_ROW)
-
-            wb = writer.book
-            ws = writer.sheets[sheet]
+        def write_sheet(wb):
+            ws = wb.add_worksheet(sheet)
+            fmts = FormatCache(wb)
 
             last_col = max(0, len(df.columns) - 1)
 
@@ -2300,47 +2601,27 @@ def export_achievements_excel():
             ]
             title_text = "\n".join([ln for ln in title_lines if ln])
 
-            title_fmt = wb.add_format({
+            title_fmt = fmts.get({
                 "bold": True, "font_size": 12, "align": "left",
                 "valign": "top", "text_wrap": True,
             })
 
-            # Title across first 3 cols (or more if you want)
-            ws.merge_range(TITLE_ROW, 0, TITLE_ROW, min(2, last_col), title_text, title_fmt)
-
             # Formats
-            header_row1_rot = wb.add_format({
+            header_row1_rot = fmts.get({
                 "bold": True, "valign": "top", "align": "center",
                 "text_wrap": True, "border": 1, "bg_color": "#F2F2F2",
                 "rotation": 90
             })
-            header_row2_h = wb.add_format({
+            header_row2_h = fmts.get({
                 "bold": True, "valign": "top", "align": "center",
                 "text_wrap": True, "border": 1, "bg_color": "#F2F2F2"
             })
-            id_header_fmt = wb.add_format({
+            id_header_fmt = fmts.get({
                 "bold": True, "valign": "vcenter", "align": "left",
                 "text_wrap": False, "border": 1, "bg_color": "#F2F2F2"
             })
-            cell_text_fmt = wb.add_format({"valign": "bottom", "text_wrap": True})
-            cell_center_fmt = wb.add_format({"valign": "vcenter", "align": "center"})
-
-            # Row heights
-            ws.set_row(TITLE_ROW, 70)
-            ws.set_row(HEADER_BASE_ROW, 120)
-            ws.set_row(HEADER_SUB_ROW, 20)
-            ws.set_default_row(17)
-
-            # Identity headers in HEADER_SUB_ROW
-            for j, name in enumerate(["LastName", "PreferredName", "YearLevel"]):
-                if j <= last_col:
-                    ws.write(HEADER_SUB_ROW, j, name, id_header_fmt)
-
-            # D.. rotated base header row and subheader row
-            for j in range(DATA_START_COL, last_col + 1):
-                base, sub = split_header(df.columns[j])
-                ws.write(HEADER_BASE_ROW, j, base, header_row1_rot)
-                ws.write(HEADER_SUB_ROW, j, sub, header_row2_h)
+            cell_text_fmt = fmts.get({"valign": "bottom", "text_wrap": True})
+            cell_center_fmt = fmts.get({"valign": "vcenter", "align": "center"})
 
             # Column widths + formats
             width_map = {"LastName": 16, "PreferredName": 14, "YearLevel": 10}
@@ -2359,21 +2640,34 @@ def export_achievements_excel():
                 )
                 ws.set_column(j, j, width, col_fmt)
 
+            # Row heights
+            ws.set_row(TITLE_ROW, 70)
+            ws.set_row(HEADER_BASE_ROW, 120)
+            ws.set_row(HEADER_SUB_ROW, 20)
+            ws.set_default_row(17)
+
+            # Title across first 3 cols, then D.. rotated base headers (same row)
+            ws.merge_range(TITLE_ROW, 0, TITLE_ROW, min(2, last_col), title_text, title_fmt)
+            headers = [split_header(df.columns[j]) for j in range(DATA_START_COL, last_col + 1)]
+            if headers:
+                ws.write_row(HEADER_BASE_ROW, DATA_START_COL, [b for b, _ in headers], header_row1_rot)
+
+            # Identity headers + subheaders in HEADER_SUB_ROW
+            id_names = ["LastName", "PreferredName", "YearLevel"][:last_col + 1]
+            ws.write_row(HEADER_SUB_ROW, 0, id_names, id_header_fmt)
+            if headers:
+                ws.write_row(HEADER_SUB_ROW, DATA_START_COL, [sub for _, sub in headers], header_row2_h)
+
+            write_frame_rows(ws, frame_rows(df), start_row=DATA_START_ROW)
+
             # Freeze panes just below header rows
             ws.freeze_panes(DATA_START_ROW, DATA_START_COL)
 
-        bio.seek(0)
-
         fname = _safe_filename(
             f"{meta.get('SchoolName','')} - {meta.get('ClassName','')} - Achievements (T{term} {year}).xlsx"
         )
 
-        return send_file(
-            bio,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            as_attachment=True,
-            download_name=fname
-        )
+        return send_workbook(write_sheet, download_name=fname)
 
     except Exception as e:
         current_app.logger.exception("❌ export_achievements_excel failed: %s", str(e))
@@ -2407,18 +2701,6 @@ def preview_upload():
         sh = xlrd.open_workbook(file_contents=b.read()).sheet_by_index(0)
         return sh.nrows - 1 if sh.nrows else 0
 
-    FIELD_SYNONYMS = {
-        "NSN": {"nsn","studentid","studentnumber","studentno","nznsn"},
-        "FirstName": {"firstname","first","givenname","given"},
-        "LastName": {"lastname","surname","familyname","last"},
-        "PreferredName": {"preferredname","preferred","nickname","prefname"},
-        "DateOfBirth": {"dateofbirth","dob","birthdate","birth","datebirth"},
-        "YearLevel": {"yearlevel","year","grade","yrlevel","yeargroup"},
-        "Ethnicity": {"ethnicity"},
-    }
-    def norm(s):
-        return re.sub(r'[^a-z0-9]+', '', str(s or '').lower())
-
     try:
         f = request.files.get("file")
         if not f or f.filename == "":
@@ -2460,7 +2742,7 @@ def preview_upload():
         header_row_idx = None
         for c_idx in range(df.shape[1]):
             col_as_str = df.iloc[:, c_idx].astype(str)
-            hits = col_as_str.apply(lambda v: bool(range_pat.match(v)))
+            hits = col_as_str.str.match(range_pat)
             if hits.any():
                 first_comp_col_idx = c_idx
                 header_row_idx = hits.idxmax()  # row index containing first match
@@ -2499,16 +2781,7 @@ def preview_upload():
             comp_start = int(first_comp_col_idx)
 
         # Map non-competency headers to canonical names
-        field_mapping = {}
-        for h in non_comp_names:
-            n = norm(h)
-            mapped = None
-            if n:
-                for canon, syns in FIELD_SYNONYMS.items():
-                    if n == norm(canon) or any(n == s or s in n or n in s for s in syns):
-                        mapped = canon
-                        break
-            field_mapping[h] = mapped
+        field_mapping = map_field_headers(non_comp_names)
 
         # Rename to canonical
         rename_map = {h: field_mapping[h] for h in non_comp_names if field_mapping[h] and field_mapping[h] != h}
@@ -2737,200 +3010,41 @@ def export_achievements_changes_excel():
         id_cols = [c for c in ["LastName", "PreferredName", "YearLevel"] if c in df.columns]
         rest_cols = [c for c in df.columns if c not in id_cols]
 
-        # -------------------------------------------------
-        # Layout rows
-        # -------------------------------------------------
-        DATA_START_COL = len(id_cols)
-
-        DATA_START_COL = 3  # D; identity are A..C
-        TITLE_ROW = 0
-        HEADER_BASE_ROW = 0
-        HEADER_SUB_ROW = 1
-        DATA_START_ROW = 2
-
         # -------------------------------------------------
         # Convert achievement states
         # 0 = blank
         # 1 = Y
         # 2 = Y highlighted yellow
         # -------------------------------------------------
-        def is_achievement_state(series):
-            uniq = set(series.dropna().astype(str).str.strip().unique())
-            return uniq.issubset({"0", "1", "2", "0.0", "1.0", "2.0"})
-
-        highlight_cells = set()
-
-        for col_idx, col in enumerate(rest_cols, start=len(id_cols)):
-            s = df[col]
-
-            if is_achievement_state(s):
-                original_vals = s.copy()
-
-                df[col] = (
-                    s.replace({
-                        2: "Y", 2.0: "Y", "2": "Y", "2.0": "Y",
-                        1: "Y", 1.0: "Y", "1": "Y", "1.0": "Y",
-                        0: "", 0.0: "", "0": "", "0.0": ""
-                    })
-                    .fillna("")
-                )
-
-                for row_idx, raw_val in enumerate(original_vals):
-                    raw_str = str(raw_val).strip() if pd.notna(raw_val) else ""
-                    if raw_str in {"2", "2.0"}:
-                        highlight_cells.add((DATA_START_ROW + row_idx, col_idx))
+        highlight_mask = _convert_achievement_states(df, rest_cols)
 
         # -------------------------------------------------
         # Write Excel
         # -------------------------------------------------
-        bio = io.BytesIO()
-        sheet = "Achievement Changes"
-
-        def split_header_from_meta(col_name):
-            meta_row = col_meta.get(col_name)
-            if meta_row:
-                return meta_row.get("base", str(col_name)), meta_row.get("sub", "")
-
-            s = str(col_name).strip()
-            m = re.match(r"^(.*?)\s*(?:\((.*?)\))?\s*$", s)
-
-            base = ((m.group(1) if m else s) or "").strip()
-            sub = ((m.group(2) or "") if m and m.lastindex and m.lastindex >= 2 else "").strip()
+        school_name = meta.get("SchoolName", "")
+        class_name = meta.get("ClassName", "")
+        teacher_name = meta.get("TeacherName", "")
+
+        title_lines = [
+            f"{school_name} — {class_name}".strip(" —"),
+            f"Teacher: {teacher_name}" if teacher_name else "",
+            f"Term {term}, {year}",
+            "Yellow Y = achieved in this term"
+        ]
 
-            return base, sub
+        title_text = "\n".join([line for line in title_lines if line])
 
-        with pd.ExcelWriter(bio, engine="xlsxwriter") as writer:
-            df.to_excel(
-                writer,
-                index=False,
-                header=False,
-                sheet_name=sheet,
-                startrow=DATA_START_ROW
+        def write_sheet(wb):
+            _write_achievement_changes_sheet(
+                wb, FormatCache(wb), "Achievement Changes", df, col_meta, id_cols,
+                title_text, highlight_mask, title_last_col=2, freeze=False,
             )
 
-            wb = writer.book
-            ws = writer.sheets[sheet]
-
-            last_col = max(0, len(df.columns) - 1)
-
-            school_name = meta.get("SchoolName", "")
-            class_name = meta.get("ClassName", "")
-            teacher_name = meta.get("TeacherName", "")
-
-            title_lines = [
-                f"{school_name} — {class_name}".strip(" —"),
-                f"Teacher: {teacher_name}" if teacher_name else "",
-                f"Term {term}, {year}",
-                "Yellow Y = achieved in this term"
-            ]
-
-            title_text = "\n".join([line for line in title_lines if line])
-
-            title_fmt = wb.add_format({
-                "bold": True,
-                "font_size": 12,
-                "align": "left",
-                "valign": "top",
-                "text_wrap": True
-            })
-
-            header_rotated_fmt = wb.add_format({
-                "bold": True,
-                "valign": "bottom",
-                "align": "center",
-                "text_wrap": True,
-                "border": 1,
-                "bg_color": "#F2F2F2",
-                "rotation": 90
-            })
-
-            header_sub_fmt = wb.add_format({
-                "bold": True,
-                "valign": "vcenter",
-                "align": "center",
-                "text_wrap": True,
-                "border": 1,
-                "bg_color": "#F2F2F2"
-            })
-
-            id_header_fmt = wb.add_format({
-                "bold": True,
-                "valign": "vcenter",
-                "align": "left",
-                "text_wrap": False,
-                "border": 1,
-                "bg_color": "#F2F2F2"
-            })
-
-            cell_text_fmt = wb.add_format({
-                "valign": "vcenter",
-                "text_wrap": False
-            })
-
-            cell_center_fmt = wb.add_format({
-                "valign": "vcenter",
-                "align": "center"
-            })
-
-            highlight_y_fmt = wb.add_format({
-                "valign": "vcenter",
-                "align": "center",
-                "bg_color": "#FFF59D",
-                "border": 1
-            })
-
-            # Row heights
-            ws.set_row(TITLE_ROW, 70)
-            ws.set_row(1, 8)
-            ws.set_row(HEADER_BASE_ROW, 120)
-            ws.set_row(HEADER_SUB_ROW, 24)
-            ws.set_default_row(17)
-            ws.merge_range(TITLE_ROW, 0, TITLE_ROW, DATA_START_COL-1, title_text, title_fmt)
-            # ID headers: LastName, PreferredName, YearLevel
-            for j, name in enumerate(id_cols):
-                ws.write(HEADER_SUB_ROW, j, name, id_header_fmt)
-
-            # Competency headers
-            for j in range(DATA_START_COL, last_col + 1):
-                base, sub = split_header_from_meta(df.columns[j])
-                ws.write(HEADER_BASE_ROW, j, base, header_rotated_fmt)
-                ws.write(HEADER_SUB_ROW, j, sub, header_sub_fmt)
-
-            # Column widths
-            width_map = {
-                "LastName": 16,
-                "PreferredName": 16,
-                "YearLevel": 10
-            }
-            
-            for j, col in enumerate(df.columns):
-                if col in id_cols:
-                    width = width_map.get(col, 14)
-                    fmt = cell_text_fmt if col != "YearLevel" else cell_center_fmt
-                else:
-                    width = 6
-                    fmt = cell_center_fmt
-
-                ws.set_column(j, j, width, fmt)
-
-            # Highlight Y values achieved in selected term
-            for r, c in highlight_cells:
-                ws.write(r, c, "Y", highlight_y_fmt)
-
-
-
-        bio.seek(0)
-
         fname = _safe_filename(
             f"{meta.get('SchoolName','')} - {meta.get('ClassName','')} - Achievement Changes (T{term} {year}).xlsx"
         )
 
-        return send_file(
-            bio,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            as_attachment=True,
-            download_name=fname
-        )
+        return send_workbook(write_sheet, download_name=fname)
 
     except Exception as e:
         current_app.logger.exception(
@@ -2973,9 +3087,8 @@ def export_visible_class_records_excel():
                 "error": "No class IDs supplied"
             }), 400
 
-        # Always validate server-side
-        for class_id in class_ids:
-            _ensure_authorised_for_class(engine, class_id)
+        # Always validate server-side (one school check for the whole set)
+        _ensure_authorised_for_classes(engine, class_ids, school)
 
         class_ids_csv = ",".join(str(x) for x in class_ids)
 
@@ -3003,7 +3116,6 @@ def export_visible_class_records_excel():
                 "error": "No matching classes found"
             }), 404
 
-        bio = io.BytesIO()
         used_sheet_names = set()
 
         def safe_sheet_name(name):
@@ -3022,455 +3134,207 @@ def export_visible_class_records_excel():
             used_sheet_names.add(name.lower())
             return name
 
-        def sort_tuple_from_key(sk):
-            try:
-                yg, comp = str(sk).split("_", 1)
-                return int(yg), int(comp)
-            except Exception:
-                return 999, 999
+        threshold_value = request.values.get("threshold_percent")
+        threshold_operator = request.values.get("threshold_operator", "lte")
 
-        def clean_col(c):
-            s = str(c)
-            s = re.sub(r"<br\s*/?>", " ", s, flags=re.I)
-            return s.strip()
+        if threshold_value not in [None, ""]:
+            op_symbol = "≤" if threshold_operator == "lte" else "≥"
+            filter_text = f"Filtered to classes where % with any new achievement {op_symbol} {threshold_value}%"
+        else:
+            filter_text = "All classes shown"
 
-        def build_class_export_df(conn, class_id):
-            df_long = pd.read_sql(
+        school_name = class_meta_df["SchoolName"].dropna().iloc[0] \
+            if "SchoolName" in class_meta_df.columns and not class_meta_df["SchoolName"].dropna().empty \
+            else f"School {school}"
+
+        def write_overview(wb, fmts, conn):
+            df_overview = pd.read_sql(
                 text("""
-                    EXEC FlaskExportAchievementsChanges
-                        @ClassID = :cid,
+                    EXEC FlaskHelperFunctionsSpecific
+                        @Request = 'ClassOverviewExport',
                         @Term = :term,
-                        @Year = :year
+                        @CalendarYear = :year,
+                        @MOENumber = :school
                 """),
                 conn,
                 params={
-                    "cid": class_id,
                     "term": term,
-                    "year": year
+                    "year": year,
+                    "school": school
                 }
             )
 
-            col_meta = {}
-
-            if df_long is None or df_long.empty:
-                return pd.DataFrame(columns=["LastName", "PreferredName", "YearLevel"]), col_meta
+            if df_overview is None or df_overview.empty:
+                return
 
-            required_cols = {
-                "SortKey", "NSN", "PreferredName", "LastName",
-                "YearLevelID", "CompetencyName", "CompetencyStatus"
-            }
+            visible_class_ids = set(class_meta_df["ClassID"].astype(int).tolist())
 
-            missing = required_cols.difference(df_long.columns)
-            if missing:
-                raise ValueError(
-                    f"Stored procedure is missing expected columns: {', '.join(sorted(missing))}"
-                )
-
-            df_long["SortKey"] = df_long["SortKey"].astype(str).str.strip()
-            df_long["CompetencyName"] = df_long["CompetencyName"].astype(str).str.strip()
-            df_long["CompetencyStatus"] = pd.to_numeric(
-                df_long["CompetencyStatus"],
-                errors="coerce"
-            ).fillna(0).astype(int)
-
-            df = (
-                df_long.pivot_table(
-                    index=["NSN", "LastName", "PreferredName", "YearLevelID"],
-                    columns=["SortKey", "CompetencyName"],
-                    values="CompetencyStatus",
-                    aggfunc="max",
-                    fill_value=0
-                )
-                .reset_index()
+            df_overview["Included in export"] = np.where(
+                df_overview["ClassID"].astype(int).isin(visible_class_ids), "Yes", "No"
             )
 
-            df.columns.name = None
-
-            # Fix tuple identity columns e.g. ('LastName', '')
-            df.columns = [
-                c[0] if isinstance(c, tuple) and (c[1] is None or c[1] == "") else c
-                for c in df.columns
+            df_overview["% with any new achievement"] = (
+                df_overview["StudentsWithAnyNewAchievement"] /
+                df_overview["StudentCount"].replace({0: pd.NA})
+            ).fillna(0)
+
+            df_overview.rename(columns={
+                "ClassName": "Class name",
+                "TeacherName": "Teacher",
+                "YearLevels": "Year levels",
+                "StudentCount": "Students",
+                "StudentsWithAnyNewAchievement": "Students with any new achievement"
+            }, inplace=True)
+
+            overview_cols = [
+                "Class name",
+                "Teacher",
+                "Year levels",
+                "Students",
+                "Students with any new achievement",
+                "% with any new achievement",
+                "Included in export"
             ]
 
-            id_cols_raw = [c for c in df.columns if not isinstance(c, tuple)]
-            ach_cols_raw = [c for c in df.columns if isinstance(c, tuple)]
-
-            ach_cols_raw = sorted(
-                ach_cols_raw,
-                key=lambda c: (
-                    sort_tuple_from_key(c[0])[0],
-                    sort_tuple_from_key(c[0])[1],
-                    str(c[1]).lower()
-                )
-            )
-
-            df = df[id_cols_raw + ach_cols_raw]
-
-            flat_cols = []
-            used = set()
-
-            for c in df.columns:
-                if isinstance(c, tuple):
-                    sort_key, display = c
-                    display = str(display).strip()
-
-                    flat_name = display
-                    i = 2
-                    while flat_name in used:
-                        flat_name = f"{display} [{i}]"
-                        i += 1
-
-                    used.add(flat_name)
-
-                    m = re.match(r"^(.*?)\s*\((.*?)\)\s*$", display)
-                    if m:
-                        base = (m.group(1) or "").strip()
-                        sub = (m.group(2) or "").strip()
-                    else:
-                        base = display
-                        sub = ""
-
-                    col_meta[flat_name] = {
-                        "sort_key": sort_key,
-                        "base": base,
-                        "sub": sub
-                    }
-
-                    flat_cols.append(flat_name)
-                else:
-                    flat_cols.append(c)
-
-            df.columns = flat_cols
-
-            df.drop(columns=["NSN"], errors="ignore", inplace=True)
-            df.rename(columns={c: clean_col(c) for c in df.columns}, inplace=True)
-
-            if "YearLevelID" in df.columns:
-                df.rename(columns={"YearLevelID": "YearLevel"}, inplace=True)
-
-            def display_col_sort_key(col_name):
-                meta_row = col_meta.get(col_name, {})
-                sort_key = meta_row.get("sort_key", "")
-
-                try:
-                    yg, comp = str(sort_key).split("_", 1)
-                    return int(yg), int(comp), meta_row.get("base", str(col_name)).lower()
-                except Exception:
-                    return 999, 999, str(col_name).lower()
-
-            id_cols = [c for c in ["LastName", "PreferredName", "YearLevel"] if c in df.columns]
-            ach_cols = [c for c in df.columns if c not in id_cols]
-            ach_cols = sorted(ach_cols, key=display_col_sort_key)
-
-            df = df[id_cols + ach_cols]
-
-            sort_cols = [c for c in ["LastName", "PreferredName", "YearLevel"] if c in df.columns]
-            if sort_cols:
-                df = df.sort_values(by=sort_cols, kind="stable").reset_index(drop=True)
-
-            return df, col_meta
+            df_overview = df_overview[[c for c in overview_cols if c in df_overview.columns]]
 
-        def is_achievement_state(series):
-            uniq = set(series.dropna().astype(str).str.strip().unique())
-            return uniq.issubset({"0", "1", "2", "0.0", "1.0", "2.0"})
-
-        def split_header_from_meta(col_name, col_meta):
-            meta_row = col_meta.get(col_name)
-            if meta_row:
-                return meta_row.get("base", str(col_name)), meta_row.get("sub", "")
-
-            s = str(col_name).strip()
-            m = re.match(r"^(.*?)\s*(?:\((.*?)\))?\s*$", s)
-            base = ((m.group(1) if m else s) or "").strip()
-            sub = ((m.group(2) or "") if m and m.lastindex and m.lastindex >= 2 else "").strip()
-            return base, sub
-        threshold_value = request.values.get("threshold_percent")
-        threshold_operator = request.values.get("threshold_operator", "lte")
-
-        if threshold_value not in [None, ""]:
-            op_symbol = "≤" if threshold_operator == "lte" else "≥"
-            filter_text = f"Filtered to classes where % with any new achievement {op_symbol} {threshold_value}%"
-        else:
-            filter_text = "All classes shown"
-        with pd.ExcelWriter(bio, engine="xlsxwriter") as writer:
-            wb = writer.book
+            ws_overview = wb.add_worksheet("Overview")
 
-            title_fmt = wb.add_format({
+            overview_title_fmt = fmts.get({
                 "bold": True,
-                "font_size": 12,
+                "font_size": 14,
                 "align": "left",
-                "valign": "top",
-                "text_wrap": True
+                "valign": "vcenter"
             })
 
-            header_rotated_fmt = wb.add_format({
+            overview_header_fmt = fmts.get({
                 "bold": True,
-                "valign": "bottom",
-                "align": "center",
-                "text_wrap": True,
+                "bg_color": "#1a427d",
+                "font_color": "#FFFFFF",
                 "border": 1,
-                "bg_color": "#F2F2F2",
-                "rotation": 90
-            })
-
-            header_sub_fmt = wb.add_format({
-                "bold": True,
-                "valign": "vcenter",
                 "align": "center",
-                "text_wrap": True,
-                "border": 1,
-                "bg_color": "#F2F2F2"
-            })
-
-            id_header_fmt = wb.add_format({
-                "bold": True,
                 "valign": "vcenter",
-                "align": "left",
-                "border": 1,
-                "bg_color": "#F2F2F2"
-            })
-
-            cell_text_fmt = wb.add_format({
-                "valign": "vcenter",
-                "text_wrap": False
-            })
-
-            cell_center_fmt = wb.add_format({
-                "valign": "vcenter",
-                "align": "center"
+                "text_wrap": True
             })
 
-            highlight_y_fmt = wb.add_format({
-                "valign": "vcenter",
+            overview_pct_fmt = fmts.get({
+                "num_format": "0%",
                 "align": "center",
-                "bg_color": "#FFF59D",
-                "border": 1
+                "valign": "vcenter"
             })
 
-            TITLE_ROW = 0
-            HEADER_BASE_ROW = 0
-            HEADER_SUB_ROW = 1
-            DATA_START_ROW = 2
-
-            with engine.begin() as conn:
-                df_overview = pd.read_sql(
-                    text("""
-                        EXEC FlaskHelperFunctionsSpecific
-                            @Request = 'ClassOverviewExport',
-                            @Term = :term,
-                            @CalendarYear = :year,
-                            @MOENumber = :school
-                    """),
-                    conn,
-                    params={
-                        "term": term,
-                        "year": year,
-                        "school": school
-                    }
-                )
+            for col_num, col_name in enumerate(df_overview.columns):
+                if col_name == "% with any new achievement":
+                    ws_overview.set_column(col_num, col_num, 16, overview_pct_fmt)
+                elif col_name in ["Class name", "Teacher"]:
+                    ws_overview.set_column(col_num, col_num, 24)
+                elif col_name == "Year levels":
+                    ws_overview.set_column(col_num, col_num, 14)
+                else:
+                    ws_overview.set_column(col_num, col_num, 18)
 
-                if df_overview is not None and not df_overview.empty:
-                    visible_class_ids = set(class_meta_df["ClassID"].astype(int).tolist())
-
-                    df_overview["Included in export"] = df_overview["ClassID"].astype(int).apply(
-                        lambda x: "Yes" if x in visible_class_ids else "No"
-                    )
-
-                    df_overview["% with any new achievement"] = (
-                        df_overview["StudentsWithAnyNewAchievement"] /
-                        df_overview["StudentCount"].replace({0: pd.NA})
-                    ).fillna(0)
-
-                    df_overview.rename(columns={
-                        "ClassName": "Class name",
-                        "TeacherName": "Teacher",
-                        "YearLevels": "Year levels",
-                        "StudentCount": "Students",
-                        "StudentsWithAnyNewAchievement": "Students with any new achievement"
-                    }, inplace=True)
-
-                    overview_cols = [
-                        "Class name",
-                        "Teacher",
-                        "Year levels",
-                        "Students",
-                        "Students with any new achievement",
-                        "% with any new achievement",
-                        "Included in export"
-                    ]
-
-                    df_overview = df_overview[[c for c in overview_cols if c in df_overview.columns]]
-
-                    df_overview.to_excel(
-                        writer,
-                        index=False,
-                        sheet_name="Overview",
-                        startrow=2
-                    )
-
-                    ws_overview = writer.sheets["Overview"]
-
-                    overview_title_fmt = wb.add_format({
-                        "bold": True,
-                        "font_size": 14,
-                        "align": "left",
-                        "valign": "vcenter"
-                    })
-
-                    overview_header_fmt = wb.add_format({
-                        "bold": True,
-                        "bg_color": "#1a427d",
-                        "font_color": "#FFFFFF",
-                        "border": 1,
-                        "align": "center",
-                        "valign": "vcenter",
-                        "text_wrap": True
-                    })
-
-                    overview_pct_fmt = wb.add_format({
-                        "num_format": "0%",
-                        "align": "center",
-                        "valign": "vcenter"
-                    })
-                    school_name = class_meta_df["SchoolName"].dropna().iloc[0] \
-                        if "SchoolName" in class_meta_df.columns and not class_meta_df["SchoolName"].dropna().empty \
-                        else f"School {school}"
-                    ws_overview.write(0, 0, f"{school_name} — Term {term}, {year}", overview_title_fmt)
-                    ws_overview.write(1, 0, filter_text)
-
-                    for col_num, value in enumerate(df_overview.columns):
-                        ws_overview.write(2, col_num, value, overview_header_fmt)
-
-                    for col_num, col_name in enumerate(df_overview.columns):
-                        if col_name == "% with any new achievement":
-                            ws_overview.set_column(col_num, col_num, 16, overview_pct_fmt)
-                        elif col_name in ["Class name", "Teacher"]:
-                            ws_overview.set_column(col_num, col_num, 24)
-                        elif col_name == "Year levels":
-                            ws_overview.set_column(col_num, col_num, 14)
-                        else:
-                            ws_overview.set_column(col_num, col_num, 18)
-
-                    ws_overview.freeze_panes(3, 0)
-                    
-                for _, class_row in class_meta_df.iterrows():
-                    class_id = int(class_row["ClassID"])
-                    class_name = class_row.get("ClassName", "")
-                    teacher_name = class_row.get("TeacherName", "")
-                    school_name = class_row.get("SchoolName", "")
-
-                    df, col_meta = build_class_export_df(conn, class_id)
-
-                    id_cols = [c for c in ["LastName", "PreferredName", "YearLevel"] if c in df.columns]
-                    rest_cols = [c for c in df.columns if c not in id_cols]
-                    DATA_START_COL = len(id_cols)
-
-                    highlight_cells = set()
-
-                    for col_idx, col in enumerate(rest_cols, start=len(id_cols)):
-                        s = df[col]
-
-                        if is_achievement_state(s):
-                            original_vals = s.copy()
-
-                            df[col] = (
-                                s.replace({
-                                    2: "Y", 2.0: "Y", "2": "Y", "2.0": "Y",
-                                    1: "Y", 1.0: "Y", "1": "Y", "1.0": "Y",
-                                    0: "", 0.0: "", "0": "", "0.0": ""
-                                })
-                                .fillna("")
-                            )
-
-                            for row_idx, raw_val in enumerate(original_vals):
-                                raw_str = str(raw_val).strip() if pd.notna(raw_val) else ""
-                                if raw_str in {"2", "2.0"}:
-                                    highlight_cells.add((DATA_START_ROW + row_idx, col_idx))
-
-                    sheet_name = safe_sheet_name(f"{class_name}" or f"Class {class_id}")
-
-                    df.to_excel(
-                        writer,
-                        index=False,
-                        header=False,
-                        sheet_name=sheet_name,
-                        startrow=DATA_START_ROW
-                    )
-
-                    ws = writer.sheets[sheet_name]
-                    last_col = max(0, len(df.columns) - 1)
-
-                    title_lines = [
-                        f"{school_name} — {class_name}".strip(" —"),
-                        f"Teacher: {teacher_name}" if teacher_name else "",
-                        f"Term {term}, {year}",
-                        "Yellow Y = achieved in this term"
-                    ]
-
-                    title_text = "\n".join([line for line in title_lines if line])
-
-                    ws.merge_range(
-                        TITLE_ROW,
-                        0,
-                        TITLE_ROW,
-                        max(DATA_START_COL - 1, 0),
-                        title_text,
-                        title_fmt
-                    )
-
-                    ws.set_row(TITLE_ROW, 70)
-                    ws.set_row(1, 8)
-                    ws.set_row(HEADER_BASE_ROW, 120)
-                    ws.set_row(HEADER_SUB_ROW, 24)
-                    ws.set_default_row(17)
-
-                    for j, name in enumerate(id_cols):
-                        ws.write(HEADER_SUB_ROW, j, name, id_header_fmt)
-
-                    for j in range(DATA_START_COL, last_col + 1):
-                        base, sub = split_header_from_meta(df.columns[j], col_meta)
-                        ws.write(HEADER_BASE_ROW, j, base, header_rotated_fmt)
-                        ws.write(HEADER_SUB_ROW, j, sub, header_sub_fmt)
-
-                    width_map = {
-                        "LastName": 16,
-                        "PreferredName": 16,
-                        "YearLevel": 10
-                    }
+            ws_overview.write(0, 0, f"{school_name} — Term {term}, {year}", overview_title_fmt)
+            ws_overview.write(1, 0, filter_text)
+            ws_overview.write_row(2, 0, list(df_overview.columns), overview_header_fmt)
+            write_frame_rows(ws_overview, frame_rows(df_overview), start_row=3)
 
-                    for j, col in enumerate(df.columns):
-                        if col in id_cols:
-                            width = width_map.get(col, 14)
-                            fmt = cell_text_fmt if col != "YearLevel" else cell_center_fmt
-                        else:
-                            width = 6
-                            fmt = cell_center_fmt
+            ws_overview.freeze_panes(3, 0)
 
-                        ws.set_column(j, j, width, fmt)
+        def write_workbook(wb, progress=None):
+            fmts = FormatCache(wb)
 
-                    for r, c in highlight_cells:
-                        ws.write(r, c, "Y", highlight_y_fmt)
+            with engine.begin() as conn:
+                write_overview(wb, fmts, conn)
 
-                    ws.freeze_panes(DATA_START_ROW, DATA_START_COL)
+            # All classes' achievement-change rows in one round trip, split per class
+            changes_by_class = _load_achievement_changes(
+                engine, class_meta_df["ClassID"].astype(int).tolist(), term, year
+            )
 
-        bio.seek(0)
+            # Frames are built in parallel; xlsxwriter writes stay on this thread
+            sheets = _build_class_sheets(class_meta_df, changes_by_class, term, year, progress)
 
-        school_name = class_meta_df["SchoolName"].dropna().iloc[0] if "SchoolName" in class_meta_df.columns and not class_meta_df["SchoolName"].dropna().empty else f"School {school}"
+            for sheet in sheets:
+                _write_achievement_changes_sheet(
+                    wb, fmts, safe_sheet_name(f"{sheet['class_name']}" or f"Class {sheet['class_id']}"),
+                    sheet["df"], sheet["col_meta"], sheet["id_cols"], sheet["title_text"],
+                    sheet["highlight_mask"], title_last_col=max(len(sheet["id_cols"]) - 1, 0),
+                )
 
         fname = _safe_filename(
             f"{school_name} - Visible Class Records (T{term} {year}).xlsx"
         )
 
-        return send_file(
-            bio,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            as_attachment=True,
-            download_name=fname
-        )
+        # Large schools: build in the background and hand back a job to poll
+        if request.values.get("background") == "1":
+            def run_export(job):
+                job.update(message="Building class sheets")
+                wb = new_workbook(job.path("export.xlsx"))
+                try:
+                    write_workbook(wb, progress=job.progress)
+                finally:
+                    wb.close()
+                return "export.xlsx"
+
+            job_id = submit_job(
+                "visible_class_records_excel",
+                session.get("user_email"),
+                run_export,
+                meta={"download_name": fname, "classes": int(len(class_meta_df))},
+            )
+            return jsonify({
+                "success": True,
+                "job_id": job_id,
+                "status_url": url_for("class_bp.export_job_status", job_id=job_id),
+                "download_url": url_for("class_bp.export_job_download", job_id=job_id),
+            }), 202
+
+        return send_workbook(write_workbook, download_name=fname)
 
     except Exception as e:
         current_app.logger.exception("❌ export_visible_class_records_excel failed: %s", str(e))
         return jsonify({
             "success": False,
             "error": "Export failed. See server logs for details."
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@class_bp.route("/export_jobs/<job_id>", methods=["GET"])
+@login_required
+def export_job_status(job_id):
+    try:
+        state = job_for_owner(job_id, session.get("user_email"))
+    except ValueError:
+        state = None
+    if not state:
+        return jsonify({"success": False, "error": "Export not found or expired."}), 404
+
+    return jsonify({
+        "success": state.get("status") != "failed",
+        "status": state.get("status"),
+        "current": state.get("current", 0),
+        "total": state.get("total", 0),
+        "message": state.get("message", ""),
+        "error": "Export failed. See server logs for details." if state.get("status") == "failed" else None,
+        "download_url": url_for("class_bp.export_job_download", job_id=job_id)
+        if state.get("status") == "done" else None,
+    })
+
+
+@class_bp.route("/export_jobs/<job_id>/download", methods=["GET"])
+@login_required
+def export_job_download(job_id):
+    try:
+        state = job_for_owner(job_id, session.get("user_email"))
+        path = job_file(job_id, state.get("result") or "") if state and state.get("status") == "done" else None
+    except ValueError:
+        path = None
+    if not path or not os.path.exists(path):
+        return jsonify({"success": False, "error": "Export not ready or expired."}), 404
+
+    return send_file(
+        path,
+        mimetype=XLSX_MIMETYPE,
+        as_attachment=True,
+        download_name=(state.get("meta") or {}).get("download_name") or "export.xlsx"
+    )
@@ -1,19 +1,285 @@
 from flask.sessions import SessionInterface, SessionMixin
 from uuid import uuid4
+import hashlib
+import os
 import pickle
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
 from datetime import datetime, timedelta
+
+import msgspec
 from sqlalchemy import text
 
+
+# Requests that never need the session row (no DB read, no write, no cookie change).
+# open_session runs before URL matching, so these are matched on the path.
+SKIP_PATHS = {"/__instructions_ping", "/favicon.ico"}
+
+
+# -----------------------------
+# Serialization
+# -----------------------------
+# Stored blobs start with a one-byte tag so old pickled rows keep loading:
+#   b"m" msgpack   b"M" zlib(msgpack)   b"p" pickle   b"P" zlib(pickle)
+# Legacy rows are raw pickle (protocol >= 2 starts with b"\x80").
+
+_MSGPACK_ENCODER = msgspec.msgpack.Encoder()
+_MSGPACK_DECODER = msgspec.msgpack.Decoder()
+
+
+def encode_session(data: dict) -> bytes:
+    """
+    Encode session data as a tagged payload. msgpack is used when it
+    round-trips exactly (tuples, Decimals, numpy/pandas values don't),
+    otherwise pickle.
+    """
+    try:
+        raw = _MSGPACK_ENCODER.encode(data)
+        if _MSGPACK_DECODER.decode(raw) == data:
+            return b"m" + raw
+    except (TypeError, ValueError, msgspec.MsgspecError):
+        pass
+    return b"p" + pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def compress_session(payload: bytes, min_size: int) -> bytes:
+    if min_size and len(payload) >= min_size:
+        packed = zlib.compress(payload[1:], 6)
+        if len(packed) < len(payload) - 1:
+            return payload[:1].upper() + packed
+    return payload
+
+
+def decode_session(blob: bytes) -> dict:
+    blob = bytes(blob)
+    tag, body = blob[:1], blob[1:]
+    if tag in (b"M", b"P"):
+        body = zlib.decompress(body)
+        tag = tag.lower()
+    if tag == b"m":
+        return _MSGPACK_DECODER.decode(body)
+    if tag == b"p":
+        return pickle.loads(body)
+    return pickle.loads(blob)
+
+
+def _digest(payload: bytes) -> str:
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+# -----------------------------
+# Per-worker session cache
+# -----------------------------
+class SessionCache:
+    """
+    TTL + LRU cache of encoded session payloads for this worker.
+
+    Workers share a stamp directory: every DB write records the payload
+    digest in <stamp_dir>/<sid>, and a cache hit is only trusted when the
+    stamp still matches, so a login/logout in the other gunicorn worker is
+    never served stale. A cleared session's stamp is removed, and stamps
+    not rewritten for stamp_max_age_seconds (the session lifetime) are swept
+    every STAMP_SWEEP_INTERVAL_SECONDS. The dir is 0700: the file names are
+    session ids.
+    """
+
+    STAMP_SWEEP_INTERVAL_SECONDS = 3600
+
+    def __init__(self, max_entries=2000, ttl_seconds=300, stamp_dir=None, stamp_max_age_seconds=86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stamp_dir = stamp_dir
+        self.stamp_max_age_seconds = stamp_max_age_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = 0.0
+        if stamp_dir:
+            try:
+                os.makedirs(stamp_dir, mode=0o700, exist_ok=True)
+                os.chmod(stamp_dir, 0o700)  # makedirs leaves existing dirs as they were
+            except OSError:
+                # without stamps cached sessions can't be checked: don't cache
+                self.stamp_dir = None
+                self.ttl_seconds = 0
+
+    def _stamp_path(self, sid):
+        safe = "".join(ch for ch in sid if ch.isalnum() or ch == "-")
+        return os.path.join(self.stamp_dir, safe) if safe else None
+
+    def read_stamp(self, sid):
+        if not self.stamp_dir:
+            return None
+        path = self._stamp_path(sid)
+        try:
+            with open(path, "r", encoding="ascii") as fh:
+                return fh.read().strip() or None
+        except (OSError, TypeError):
+            return None
+
+    def write_stamp(self, sid, digest):
+        if not self.stamp_dir:
+            return
+        path = self._stamp_path(sid)
+        if not path:
+            return
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(tmp, "w", encoding="ascii") as fh:
+                fh.write(digest)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def remove_stamp(self, sid):
+        if not self.stamp_dir:
+            return
+        path = self._stamp_path(sid)
+        if not path:
+            return
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def sweep_stamps(self, force=False) -> int:
+        """Remove stamps (and stray temp files) older than the session lifetime."""
+        if not self.stamp_dir:
+            return 0
+        now = time.time()
+        if not force and now - self._last_sweep < self.STAMP_SWEEP_INTERVAL_SECONDS:
+            return 0
+        if not self._sweep_lock.acquire(blocking=False):
+            return 0
+        removed = 0
+        try:
+            self._last_sweep = now
+            try:
+                names = os.listdir(self.stamp_dir)
+            except OSError:
+                return 0
+            for name in names:
+                path = os.path.join(self.stamp_dir, name)
+                try:
+                    if now - os.stat(path).st_mtime > self.stamp_max_age_seconds:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+        finally:
+            self._sweep_lock.release()
+        return removed
+
+    def get(self, sid):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry["cached_at"] + self.ttl_seconds < now or (
+                entry["expiry"] is not None and entry["expiry"] <= datetime.utcnow()
+            ):
+                self._entries.pop(sid, None)
+                return None
+            self._entries.move_to_end(sid)
+        if self.stamp_dir and self.read_stamp(sid) != entry["digest"]:
+            self.discard(sid)
+            return None
+        return entry
+
+    def put(self, sid, payload, digest, expiry, written_at):
+        entry = {
+            "payload": payload,
+            "digest": digest,
+            "expiry": expiry,
+            "written_at": written_at,
+            "cached_at": time.monotonic(),
+        }
+        with self._lock:
+            self._entries[sid] = entry
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SessionStats:
+    FIELDS = (
+        "cache_hits", "cache_misses", "db_reads", "db_read_errors",
+        "db_writes", "db_write_errors", "writes_skipped", "skipped_requests",
+        "bytes_read", "bytes_written",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {name: 0 for name in self.FIELDS}
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+# -----------------------------
+# Session + interface
+# -----------------------------
 class StoredProcSession(dict, SessionMixin):
-    def __init__(self, initial=None, sid=None, expiry=None):
+    def __init__(self, initial=None, sid=None, expiry=None, digest=None, written_at=None, skip_save=False):
         self.sid = sid
         self.expiry = expiry
+        self.digest = digest          # digest of the payload last stored in the DB
+        self.written_at = written_at  # when this worker last wrote the row (None if unknown)
+        self.skip_save = skip_save
         dict.__init__(self, initial or {})
 
+
 class StoredProcSessionInterface(SessionInterface):
-    def __init__(self, db_engine, default_timeout=timedelta(days=1)):
+    """
+    Sessions stored in SQL via FlaskSessionGet / FlaskSessionSave.
+
+    - Decoded sessions are cached per worker (SessionCache), so most requests
+      don't read the row at all.
+    - The row is only written when its contents changed, or when the sliding
+      expiry is more than `refresh_after` stale.
+    - Static files and the instructions health-check never touch the DB.
+    """
+
+    def __init__(
+        self,
+        db_engine,
+        default_timeout=timedelta(days=1),
+        refresh_after=timedelta(minutes=15),
+        compress_min_bytes=1024,
+        cache_max_entries=2000,
+        cache_ttl_seconds=300,
+        stamp_dir=None,
+    ):
         self.db_engine = db_engine
         self.default_timeout = default_timeout
+        self.refresh_after = refresh_after
+        self.compress_min_bytes = compress_min_bytes
+        if stamp_dir is None:
+            stamp_dir = os.getenv(
+                "SESSION_STAMP_DIR",
+                os.path.join(tempfile.gettempdir(), "wsfl_session_stamps"),
+            )
+        self.cache = SessionCache(
+            cache_max_entries, cache_ttl_seconds, stamp_dir,
+            stamp_max_age_seconds=default_timeout.total_seconds(),
+        )
+        self.stats = SessionStats()
 
     def generate_sid(self):
         return str(uuid4())
@@ -21,58 +287,125 @@ class StoredProcSessionInterface(SessionInterface):
     def get_expiration_time(self, app, session):
         return datetime.utcnow() + self.default_timeout
 
+    def _should_skip(self, app, request):
+        path = request.path
+        static_prefix = (app.static_url_path or "/static").rstrip("/") + "/"
+        return path in SKIP_PATHS or path.startswith(static_prefix)
+
     def open_session(self, app, request):
         cookie_name = app.config.get("SESSION_COOKIE_NAME", "session")
         sid = request.cookies.get(cookie_name)
 
+        if self._should_skip(app, request):
+            self.stats.incr("skipped_requests")
+            return StoredProcSession(sid=sid, skip_save=True)
+
         if not sid:
             sid = self.generate_sid()
             return StoredProcSession(sid=sid)
 
+        cached = self.cache.get(sid)
+        if cached is not None:
+            try:
+                data = decode_session(cached["payload"])
+                self.stats.incr("cache_hits")
+                return StoredProcSession(
+                    data, sid=sid, expiry=cached["expiry"],
+                    digest=cached["digest"], written_at=cached["written_at"],
+                )
+            except Exception as e:
+                print(f"⚠️ open_session: error decoding cached session — {e}")
+                self.cache.discard(sid)
+
+        self.stats.incr("cache_misses")
+
         try:
             with self.db_engine.connect() as conn:
                 result = conn.execute(
                     text("EXEC FlaskSessionGet @session_id = :sid"),
                     {"sid": sid}
                 ).fetchone()
+            self.stats.incr("db_reads")
 
-                if result and result[1]:  # Use tuple access if row is not a dict
-                    expiry = result[2]
-                    try:
-                        data = pickle.loads(result[1])
-                        return StoredProcSession(data, sid=sid, expiry=expiry)
-                    except Exception as e:
-                        print(f"⚠️ open_session: error unpickling session data — {e}")
-                else:
-                    print("❌ open_session: no session found in DB")
+            if result and result[1]:  # Use tuple access if row is not a dict
+                expiry = result[2]
+                try:
+                    data = decode_session(result[1])
+                    self.stats.incr("bytes_read", len(result[1]))
+                    payload = encode_session(data)
+                    digest = _digest(payload)
+                    self.cache.put(sid, payload, digest, expiry, None)
+                    self.cache.write_stamp(sid, digest)
+                    return StoredProcSession(data, sid=sid, expiry=expiry, digest=digest)
+                except Exception as e:
+                    print(f"⚠️ open_session: error decoding session data — {e}")
+            else:
+                print("❌ open_session: no session found in DB")
 
         except Exception as e:
+            self.stats.incr("db_read_errors")
             print(f"❌ open_session: database error — {e}")
 
         return StoredProcSession(sid=sid)
 
+    def _needs_refresh(self, session, now):
+        """True when the stored expiry has slid far enough behind to re-save it."""
+        if session.written_at is not None:
+            return now - session.written_at >= self.refresh_after
+        if session.expiry is None:
+            return True
+        return (now + self.default_timeout) - session.expiry >= self.refresh_after
+
     def save_session(self, app, session, response):
+        if getattr(session, "skip_save", False):
+            return
+
         cookie_name = app.config.get("SESSION_COOKIE_NAME", "session")
         domain = self.get_cookie_domain(app)
 
         if not session:
+            if session.digest is not None:
+                self.cache.discard(session.sid)
+                # No stamp: the other worker's cached copy stops matching
+                self.cache.remove_stamp(session.sid)
             response.delete_cookie(cookie_name, domain=domain)
             return
 
+        now = datetime.utcnow()
+
+        try:
+            payload = encode_session(dict(session))
+        except Exception as e:
+            print(f"❌ save_session: error encoding session — {e}")
+            return
+
+        digest = _digest(payload)
+        if digest == session.digest and not self._needs_refresh(session, now):
+            self.stats.incr("writes_skipped")
+            return
+
         expiry = self.get_expiration_time(app, session)
 
         try:
-            val = pickle.dumps(dict(session))
+            val = compress_session(payload, self.compress_min_bytes)
 
             with self.db_engine.begin() as conn:
                 conn.execute(
                     text("EXEC FlaskSessionSave @session_id = :sid, @data = :data, @expiry = :expiry"),
                     {"sid": session.sid, "data": val, "expiry": expiry}
                 )
+            self.stats.incr("db_writes")
+            self.stats.incr("bytes_written", len(val))
         except Exception as e:
+            self.stats.incr("db_write_errors")
+            self.cache.discard(session.sid)
             print(f"❌ save_session: error saving session — {e}")
             return
 
+        self.cache.put(session.sid, payload, digest, expiry, now)
+        self.cache.write_stamp(session.sid, digest)
+        self.cache.sweep_stamps()
+
         response.set_cookie(
             cookie_name,
             session.sid,
@@ -80,3 +413,8 @@ class StoredProcSessionInterface(SessionInterface):
             httponly=True,
             domain=domain
         )
+
+    def metrics(self):
+        data = self.stats.as_dict()
+        data["cached_sessions"] = len(self.cache)
+        return data
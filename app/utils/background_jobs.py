@@ -0,0 +1,304 @@
+# app/utils/background_jobs.py
+"""
+Small background-job runner for work that can outlive a request (large
+Excel exports, PDF/PNG reports etc.). No broker: jobs run on a bounded thread pool in the
+worker that accepted them, and their state lives on disk so a status poll or
+download landing on the other gunicorn worker still finds them:
+
+    <BACKGROUND_JOB_DIR>/<job_id>/job.json     status, progress, owner, result
+    <BACKGROUND_JOB_DIR>/<job_id>/<file>       output artifact(s)
+
+Jobs older than BACKGROUND_JOB_TTL_HOURS (default 6) are removed
+opportunistically whenever a new job is submitted.
+
+job.json records the owning worker's pid and a heartbeat, refreshed every
+BACKGROUND_JOB_HEARTBEAT_SECONDS while the job is queued or running. A job
+whose owner has died (gunicorn restart, worker timeout) or whose heartbeat
+is older than BACKGROUND_JOB_STALE_SECONDS is reported as failed by
+get_job(), so pollers stop waiting on it.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+JOB_DIR = os.getenv(
+    "BACKGROUND_JOB_DIR",
+    os.path.join(tempfile.gettempdir(), "wsfl_jobs"),
+)
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+JOB_WORKERS = max(1, int(_env_float("BACKGROUND_JOB_WORKERS", 2)))
+# Admin batches (minutes per run) get their own pool so /Reports and export
+# jobs on the default pool never queue behind them
+BATCH_JOB_WORKERS = max(1, int(_env_float("BACKGROUND_BATCH_WORKERS", 1)))
+_POOL_SIZES = {"default": JOB_WORKERS, "batch": BATCH_JOB_WORKERS}
+JOB_TTL_SECONDS = _env_float("BACKGROUND_JOB_TTL_HOURS", 6) * 3600
+JOB_HEARTBEAT_SECONDS = max(1.0, _env_float("BACKGROUND_JOB_HEARTBEAT_SECONDS", 15))
+JOB_STALE_SECONDS = max(JOB_HEARTBEAT_SECONDS * 2, _env_float("BACKGROUND_JOB_STALE_SECONDS", 120))
+
+_CLEANUP_INTERVAL_SECONDS = 600
+_last_cleanup = 0.0
+_cleanup_lock = threading.Lock()
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_FILE_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+_executors = {}  # pool name -> ThreadPoolExecutor
+_executor_lock = threading.Lock()
+
+_active = {}  # job_id -> Job, queued or running in this process
+_active_lock = threading.Lock()
+_heartbeat = None
+
+# Terminal states
+DONE = "done"
+FAILED = "failed"
+
+
+def _reset_after_fork():
+    # Threads don't survive fork; the child builds its own pool on first use.
+    global _executors, _executor_lock, _active, _active_lock, _heartbeat
+    _executors = {}
+    _executor_lock = threading.Lock()
+    _active = {}
+    _active_lock = threading.Lock()
+    _heartbeat = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_executor(pool: str = "default"):
+    with _executor_lock:
+        executor = _executors.get(pool)
+        if executor is None:
+            executor = _executors[pool] = ThreadPoolExecutor(
+                max_workers=_POOL_SIZES[pool], thread_name_prefix=f"wsfl-job-{pool}",
+            )
+        return executor
+
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        with _active_lock:
+            jobs = list(_active.values())
+        for job in jobs:
+            try:
+                job.update(heartbeat_at=time.time())
+            except OSError:
+                pass  # job dir removed under us; the job's own update will fail too
+
+
+def _ensure_heartbeat():
+    global _heartbeat
+    with _active_lock:
+        if _heartbeat is None or not _heartbeat.is_alive():
+            _heartbeat = threading.Thread(target=_heartbeat_loop, name="wsfl-job-heartbeat", daemon=True)
+            _heartbeat.start()
+
+
+# -----------------------------
+# Paths / state file
+# -----------------------------
+def job_dir(job_id: str) -> str:
+    if not job_id or not _ID_RE.match(str(job_id)):
+        raise ValueError("Invalid job id")
+    return os.path.join(JOB_DIR, job_id)
+
+
+def job_file(job_id: str, filename: str) -> str:
+    if not _FILE_RE.match(filename or "") or filename == "job.json":
+        raise ValueError("Invalid job file name")
+    return os.path.join(job_dir(job_id), filename)
+
+
+def _write_state(job_id: str, state: dict) -> None:
+    path = os.path.join(job_dir(job_id), "job.json")
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(state, fh, default=str)
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except PermissionError:
+        return True
+    except (OSError, TypeError, ValueError):
+        return False
+    return True
+
+
+def _orphaned(state: dict) -> bool:
+    """True if a queued/running job's owner is gone or has stopped heartbeating."""
+    if state.get("status") in (DONE, FAILED):
+        return False
+    pid = state.get("pid")
+    if pid is not None and not _pid_alive(pid):
+        return True
+    beat = state.get("heartbeat_at") or state.get("updated_at") or 0
+    return time.time() - float(beat) > JOB_STALE_SECONDS
+
+
+def get_job(job_id: str):
+    """Return the job's state dict, or None if unknown/expired."""
+    try:
+        with open(os.path.join(job_dir(job_id), "job.json"), "r", encoding="utf-8") as fh:
+            state = json.load(fh)
+    except (ValueError, OSError):
+        return None
+    if _orphaned(state):
+        state["status"] = FAILED
+        state["error"] = "The worker running this job stopped before it finished."
+    return state
+
+
+def job_for_owner(job_id: str, owner):
+    """get_job, but only if the job was submitted by owner (case-insensitive)."""
+    state = get_job(job_id)
+    if not state:
+        return None
+    if (state.get("owner") or "").strip().lower() != (owner or "").strip().lower():
+        return None
+    return state
+
+
+# -----------------------------
+# Job handle (passed to the worker function)
+# -----------------------------
+class Job:
+    def __init__(self, job_id: str, state: dict):
+        self.id = job_id
+        self._state = state
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def path(self, filename: str) -> str:
+        return job_file(self.id, filename)
+
+    def update(self, **fields) -> None:
+        with self._lock:
+            self._state.update(fields)
+            self._state["updated_at"] = time.time()
+            _write_state(self.id, self._state)
+
+    def progress(self, current: int, total: int, message: str = None) -> None:
+        """Record progress; flushed to disk at most twice a second (always at the end)."""
+        now = time.monotonic()
+        if current < total and now - self._last_flush < 0.5:
+            return
+        self._last_flush = now
+        fields = {"current": int(current), "total": int(total)}
+        if message:
+            fields["message"] = message
+        self.update(**fields)
+
+
+# -----------------------------
+# Submit
+# -----------------------------
+def submit_job(kind: str, owner, fn, meta: dict = None, pool: str = "default") -> str:
+    """
+    Run fn(job) on the background pool inside the current app context.
+    fn returns the job result: a file name inside the job dir, or any other
+    JSON-serialisable value (e.g. a dict describing the output), or None.
+    pool="batch" queues long admin batches on their own pool
+    (BACKGROUND_BATCH_WORKERS). Returns the job id.
+    """
+    if pool not in _POOL_SIZES:
+        raise ValueError(f"Unknown job pool {pool!r}")
+    cleanup_expired()
+
+    job_id = uuid.uuid4().hex
+    os.makedirs(job_dir(job_id), exist_ok=True)
+    state = {
+        "id": job_id,
+        "kind": kind,
+        "owner": (owner or "").strip().lower(),
+        "status": "queued",
+        "current": 0,
+        "total": 0,
+        "message": "",
+        "result": None,
+        "error": None,
+        "meta": meta or {},
+        "pid": os.getpid(),
+        "created_at": time.time(),
+        "updated_at": time.time(),
+        "heartbeat_at": time.time(),
+    }
+    _write_state(job_id, state)
+
+    app = current_app._get_current_object()
+    job = Job(job_id, state)
+
+    def run():
+        with app.app_context():
+            started = time.perf_counter()
+            try:
+                job.update(status="running", started_at=time.time())
+                result = fn(job)
+                job.update(
+                    status=DONE, result=result, finished_at=time.time(),
+                    elapsed_s=round(time.perf_counter() - started, 3),
+                )
+            except Exception as e:
+                app.logger.error("❌ background job %s (%s) failed: %s\n%s",
+                                 job_id, kind, e, traceback.format_exc())
+                job.update(status=FAILED, error=str(e)[:500], finished_at=time.time())
+            finally:
+                with _active_lock:
+                    _active.pop(job_id, None)
+
+    with _active_lock:
+        _active[job_id] = job
+    _ensure_heartbeat()
+    _get_executor(pool).submit(run)
+    return job_id
+
+
+def cleanup_expired(force: bool = False) -> int:
+    """Remove job dirs older than the TTL. Returns the number removed."""
+    global _last_cleanup
+    now = time.time()
+    if not force and now - _last_cleanup < _CLEANUP_INTERVAL_SECONDS:
+        return 0
+    if not _cleanup_lock.acquire(blocking=False):
+        return 0
+    removed = 0
+    try:
+        _last_cleanup = now
+        try:
+            entries = os.listdir(JOB_DIR)
+        except OSError:
+            return 0
+        for entry in entries:
+            path = os.path.join(JOB_DIR, entry)
+            try:
+                if now - os.stat(path).st_mtime > JOB_TTL_SECONDS:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                continue
+    finally:
+        _cleanup_lock.release()
+    return removed
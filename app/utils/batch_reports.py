@@ -0,0 +1,485 @@
+# app/utils/batch_reports.py
+"""
+Batch mode for /Reports: one report type for every funder / provider /
+region in a single run (the termly pack), instead of an admin clicking
+through the page once per entity.
+
+Each item replays the same show_report POST the page sends, through
+new_reports() in its own request context, so batch output is exactly what
+the page would produce (and lands in / is served from the report cache).
+
+- Items run on a process pool (BATCH_REPORT_WORKERS, default up to 4).
+  Matplotlib isn't thread-safe, so processes rather than threads. Workers
+  are spawned (BATCH_REPORT_START_METHOD): the batch runs on a background
+  job thread of a threaded gunicorn worker, and a fork from there can
+  inherit locks other threads hold.
+- Shared datasets (e.g. GetFunderNationalRates_All for the funder charts)
+  are fetched once in the parent before the pool starts and handed to each
+  worker as it starts, instead of every item running the proc again.
+- An item still running after BATCH_REPORT_ITEM_TIMEOUT_S is marked failed;
+  the pool is replaced and the items it was still working on are re-run.
+- Output is a ZIP (one PDF per item, PNG if the report has no PDF, plus
+  manifest.json) or a single merged PDF when pypdf is installed.
+- The manifest records per-item status, elapsed time and errors; one
+  failed funder doesn't stop the batch.
+
+Entry points:
+    flask --app run batch-reports funder_ytd_vs_target --year 2025 --term 2 --out pack.zip
+    POST /Reporting/batch    (ADM, a background job on the separate "batch" pool,
+                              one batch at a time per worker by default)
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import time
+import traceback
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import click
+from flask import current_app, session
+from flask.cli import with_appcontext
+from sqlalchemy import text
+
+from app.utils.database import get_db_engine
+from app.utils.entitlements import entitlements_for
+from app.utils.rates_data import rates_frame, seed_rates_frame
+from app.utils.report_cache import REPORT_DIR
+
+try:
+    from pypdf import PdfWriter
+except ImportError:  # merged PDF output is optional
+    PdfWriter = None
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+BATCH_REPORT_WORKERS = max(1, int(_env_float("BATCH_REPORT_WORKERS", min(4, os.cpu_count() or 1))))
+BATCH_REPORT_START_METHOD = os.getenv("BATCH_REPORT_START_METHOD", "spawn")
+BATCH_REPORT_ITEM_TIMEOUT_S = max(1.0, _env_float("BATCH_REPORT_ITEM_TIMEOUT_S", 600))
+
+# report type -> entity it is run for
+BATCH_REPORT_TYPES = {
+    "funder_ytd_vs_target": "Funder",
+    "funder_ytd_vs_funder_ly": "Funder",
+    "ly_funder_vs_ly_national_vs_target": "Funder",
+    "funder_missing_data": "Funder",
+    "funder_missing_classes": "Funder",
+    "funder_student_count": "Funder",
+    "funder_progress_summary": "Funder",
+    "funder_teacher_review_summary": "Funder",
+    "funder_competency_icons": "Funder",
+    "provider_ytd_vs_target": "Provider",
+    "provider_missing_classes": "Provider",
+    "region_ly_vs_target": "Region",
+    "region_ytd": "Region",
+    "region_coverage_report": "Region",
+}
+
+# report type -> rates datasets every item filters (fetched once up front)
+_SHARED_DATASETS = {
+    "funder_ytd_vs_target": ("FunderNationalRates",),
+    "funder_ytd_vs_funder_ly": ("FunderNationalRates",),
+}
+
+BATCH_FORMATS = ("zip", "pdf")
+
+# Set in the parent before the pool starts (used as-is by forked workers);
+# spawned workers build their own
+_BATCH_APP = None
+
+
+# -----------------------------
+# Targets
+# -----------------------------
+def batch_targets(scope: str, role="ADM", user_id=None) -> list[dict]:
+    """[{id, description}] of every entity a batch of this scope runs for."""
+    if scope == "Region":
+        with get_db_engine().connect() as conn:
+            rows = conn.execute(
+                text("EXEC dbo.FlaskHelperFunctions @Request = 'AllRegions'")
+            ).mappings().all()
+        return [
+            {"id": r.get("id"), "description": str(r.get("description") or "").strip()}
+            for r in rows
+            if r.get("description")
+        ]
+    return entitlements_for(role, user_id).entities(scope)
+
+
+def _item_form(report_type, scope, target, year, term) -> dict:
+    form = {
+        "action": "show_report",
+        "ajax": "1",
+        "report_category": "visual",
+        "report_option": report_type,
+        "year": str(year),
+        "term": str(term),
+    }
+    if scope == "Funder":
+        form["funder_name"] = target["description"]
+    elif scope == "Provider":
+        form["provider_id"] = str(target["id"])
+        form["provider_name"] = target["description"]
+    elif scope == "Region":
+        form["region_name"] = target["description"]
+    return form
+
+
+def _warm_shared_datasets(report_type, year, term) -> list:
+    """Fetch the report type's shared datasets; returns the seeds for _init_worker."""
+    seeds = []
+    names = _SHARED_DATASETS.get(report_type, ())
+    if names:
+        params = {"Term": int(term), "CalendarYear": int(year)}
+        with get_db_engine().connect() as conn:
+            for name in names:
+                seeds.append((name, params, rates_frame(name, conn, **params).rows()))
+    return seeds
+
+
+# -----------------------------
+# Worker (runs in the pool)
+# -----------------------------
+def _worker_app():
+    global _BATCH_APP
+    if _BATCH_APP is None:
+        from app import create_app
+
+        _BATCH_APP = create_app()
+    return _BATCH_APP
+
+
+def _init_worker(seeds):
+    """Pool initializer: put the parent's shared datasets in this worker's rates cache."""
+    if not seeds:
+        return
+    with _worker_app().app_context():
+        for name, params, rows in seeds:
+            seed_rates_frame(name, rows, **params)
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _failed_item(task, error) -> dict:
+    return {
+        "id": task["target"]["id"],
+        "label": task["target"]["description"],
+        "status": "failed",
+        "error": error,
+    }
+
+
+def _kill_pool(pool):
+    # shutdown() alone waits for (or leaves behind) a worker that never returns
+    for proc in list((getattr(pool, "_processes", None) or {}).values()):
+        if proc.is_alive():
+            proc.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_pool(tasks, workers, seeds, on_item):
+    """
+    Run tasks through _render_item, at most `workers` at a time, calling
+    on_item(item) as each finishes. A task running longer than
+    BATCH_REPORT_ITEM_TIMEOUT_S is reported failed and its pool replaced;
+    the other tasks that pool was running go back on the queue.
+    """
+    ctx = multiprocessing.get_context(BATCH_REPORT_START_METHOD)
+    queue = deque(tasks)
+    while queue:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                   initializer=_init_worker, initargs=(seeds,))
+        # start the workers (imports, create_app, seeds) before items are timed
+        wait([pool.submit(_worker_ready) for _ in range(workers)], timeout=BATCH_REPORT_ITEM_TIMEOUT_S)
+        running = {}  # future -> (task, submitted at)
+        timed_out = False
+        try:
+            while queue or running:
+                while queue and len(running) < workers:
+                    task = queue.popleft()
+                    try:
+                        running[pool.submit(_render_item, task)] = (task, time.monotonic())
+                    except BrokenProcessPool as e:
+                        on_item(_failed_item(task, f"worker process died: {e}"))
+                if not running:
+                    continue
+
+                oldest = min(started for _, started in running.values())
+                timeout = max(0.1, oldest + BATCH_REPORT_ITEM_TIMEOUT_S - time.monotonic())
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task, _ = running.pop(future)
+                    try:
+                        item = future.result()
+                    except BrokenProcessPool as e:
+                        item = _failed_item(task, f"worker process died: {e}")
+                    on_item(item)
+
+                now = time.monotonic()
+                expired = [f for f, (_, started) in running.items()
+                           if now - started >= BATCH_REPORT_ITEM_TIMEOUT_S]
+                if expired:
+                    for future in expired:
+                        task, _ = running.pop(future)
+                        on_item(_failed_item(task, f"timed out after {int(BATCH_REPORT_ITEM_TIMEOUT_S)}s"))
+                    queue.extendleft(reversed([task for task, _ in running.values()]))
+                    timed_out = True
+                    break
+        finally:
+            if timed_out:
+                _kill_pool(pool)
+            else:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _render_item(task: dict) -> dict:
+    """Build one report through new_reports(); never raises."""
+    started = time.perf_counter()
+    out = {
+        "id": task["target"]["id"],
+        "label": task["target"]["description"],
+        "status": "failed",
+        "error": None,
+        "cached": False,
+    }
+    try:
+        app = _worker_app()
+        with app.test_request_context(
+            "/Reports",
+            method="POST",
+            data=task["form"],
+            headers={"X-Requested-With": "fetch", "Accept": "application/json"},
+        ):
+            session.update(task["session"])
+            resp = app.make_response(app.view_functions["report_bp.new_reports"]())
+            data = resp.get_json(silent=True) or {}
+            if resp.status_code >= 400 or not data.get("ok"):
+                raise RuntimeError(data.get("error") or f"HTTP {resp.status_code}")
+
+            out["cached"] = bool(data.get("cached"))
+            if not data.get("display"):
+                out["status"] = "no_data"
+                out["error"] = data.get("no_data_banner")
+            else:
+                out.update({
+                    "status": "ok",
+                    "report_id": session.get("report_id"),
+                    "png_filename": session.get("report_png_filename"),
+                    "pdf_filename": session.get("report_pdf_filename"),
+                })
+    except Exception as e:
+        out["error"] = str(e)[:500]
+        out["traceback"] = traceback.format_exc()[-2000:]
+    out["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    out["pid"] = os.getpid()
+    return out
+
+
+# -----------------------------
+# Output
+# -----------------------------
+def _item_artifact(item):
+    """(path, suffix) of the file to ship for an item, or (None, None)."""
+    report_id = item.get("report_id")
+    if not report_id:
+        return None, None
+    for suffix in (".pdf", ".png"):
+        path = REPORT_DIR / f"{report_id}{suffix}"
+        if path.exists():
+            return path, suffix
+    return None, None
+
+
+def _unique_name(item, suffix, used):
+    stem = (item.get(f"{suffix[1:]}_filename") or f"{item['label']}{suffix}").rsplit(".", 1)[0]
+    name = f"{stem}{suffix}"
+    n = 2
+    while name in used:
+        name = f"{stem}_{n}{suffix}"
+        n += 1
+    used.add(name)
+    return name
+
+
+def _write_zip(items, manifest, out_path):
+    used = set()
+    with zipfile.ZipFile(out_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for item in items:
+            path, suffix = _item_artifact(item)
+            if path is None:
+                continue
+            item["file"] = _unique_name(item, suffix, used)
+            # PDFs/PNGs are already compressed
+            zf.write(path, item["file"], compress_type=zipfile.ZIP_STORED)
+        zf.writestr("manifest.json", json.dumps(manifest, indent=2, default=str))
+
+
+def _write_merged_pdf(items, out_path):
+    writer = PdfWriter()
+    for item in items:
+        path, suffix = _item_artifact(item)
+        if suffix != ".pdf":
+            continue
+        writer.append(str(path))
+        item["file"] = os.path.basename(out_path)
+    with open(out_path, "wb") as fh:
+        writer.write(fh)
+
+
+# -----------------------------
+# Run
+# -----------------------------
+def run_batch(
+    report_type: str,
+    year: int,
+    term: int,
+    out_path: str,
+    *,
+    session_data: dict,
+    fmt: str = "zip",
+    workers: int = None,
+    progress=None,
+) -> dict:
+    """
+    Render report_type for every target into out_path (.zip or merged .pdf).
+    session_data is the (ADM) session each item runs under. progress(done,
+    total, message) is called as items finish. Returns the manifest dict.
+    """
+    global _BATCH_APP
+
+    scope = BATCH_REPORT_TYPES.get(report_type)
+    if scope is None:
+        raise ValueError(f"{report_type} can't be run as a batch")
+    if fmt not in BATCH_FORMATS:
+        raise ValueError(f"Unknown batch format {fmt!r}")
+    if fmt == "pdf" and PdfWriter is None:
+        current_app.logger.warning("⚠️ pypdf not installed, batch %s written as a ZIP", report_type)
+        fmt = "zip"
+        out_path = os.path.splitext(out_path)[0] + ".zip"
+
+    app = current_app._get_current_object()
+    started = time.perf_counter()
+
+    targets = batch_targets(scope, session_data.get("user_role") or "ADM", session_data.get("user_id"))
+    snapshot = {k: v for k, v in session_data.items()
+                if k not in ("report_id", "report_png_filename", "report_pdf_filename")}
+    tasks = [
+        {"target": t, "form": _item_form(report_type, scope, t, year, term), "session": snapshot}
+        for t in targets
+    ]
+    total = len(tasks)
+    current_app.logger.info("📦 batch %s | %s targets=%d T%s %s", report_type, scope, total, term, year)
+
+    t_shared = time.perf_counter()
+    seeds = _warm_shared_datasets(report_type, year, term)
+    shared_ms = round((time.perf_counter() - t_shared) * 1000, 1)
+
+    items = []
+    if progress:
+        progress(0, total, f"Rendering {total} reports")
+    if tasks:
+        workers = max(1, min(int(workers or BATCH_REPORT_WORKERS), total))
+        _BATCH_APP = app
+
+        def on_item(item):
+            items.append(item)
+            if item["status"] == "failed":
+                current_app.logger.warning("❌ batch %s | %s: %s",
+                                           report_type, item["label"], item.get("error"))
+            if progress:
+                progress(len(items), total, item["label"])
+
+        try:
+            _run_pool(tasks, workers, seeds, on_item)
+        finally:
+            _BATCH_APP = None
+
+    order = {t["id"]: i for i, t in enumerate(targets)}
+    items.sort(key=lambda it: order.get(it["id"], len(order)))
+
+    counts = {}
+    for item in items:
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+    manifest = {
+        "report_type": report_type,
+        "scope": scope,
+        "year": year,
+        "term": term,
+        "format": fmt,
+        "workers": workers if tasks else 0,
+        "total": total,
+        "counts": counts,
+        "shared_fetch_ms": shared_ms,
+        "items": items,
+    }
+
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    if fmt == "pdf":
+        _write_merged_pdf(items, tmp)
+    else:
+        manifest["elapsed_s"] = round(time.perf_counter() - started, 3)
+        _write_zip(items, manifest, tmp)
+    shutil.move(tmp, out_path)
+
+    manifest["elapsed_s"] = round(time.perf_counter() - started, 3)
+    manifest["file"] = os.path.basename(out_path)
+    current_app.logger.info(
+        "✅ batch %s done in %.1fs | %s", report_type, manifest["elapsed_s"], counts,
+    )
+    return manifest
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+@click.command("batch-reports")
+@click.argument("report_type", type=click.Choice(sorted(BATCH_REPORT_TYPES)))
+@click.option("--year", type=int, required=True)
+@click.option("--term", type=int, required=True)
+@click.option("--out", "out_path", required=True, type=click.Path(dir_okay=False),
+              help="Output .zip (or .pdf with --format pdf).")
+@click.option("--format", "fmt", type=click.Choice(BATCH_FORMATS), default="zip", show_default=True)
+@click.option("--workers", type=int, default=None, help="Process pool size (default BATCH_REPORT_WORKERS).")
+@click.option("--email", default=lambda: os.getenv("EMAIL"),
+              help="Logged as the requesting user (default $EMAIL).")
+@with_appcontext
+def batch_reports_command(report_type, year, term, out_path, fmt, workers, email):
+    """Render REPORT_TYPE for every funder / provider / region."""
+    session_data = {
+        "logged_in": True,
+        "user_role": "ADM",
+        "user_admin": 1,
+        "user_email": email,
+        "user_id": None,
+        "desc": "",
+        "nearest_year": year,
+        "nearest_term": term,
+    }
+
+    def echo_progress(done, total, message):
+        click.echo(f"[{done}/{total}] {message}")
+
+    manifest = run_batch(
+        report_type, year, term, out_path,
+        session_data=session_data, fmt=fmt, workers=workers, progress=echo_progress,
+    )
+    for item in manifest["items"]:
+        line = f"{item['status']:>8}  {item.get('elapsed_ms', 0):>9.1f} ms  {item['label']}"
+        if item["status"] != "ok" and item.get("error"):
+            line += f"  ({item['error']})"
+        click.echo(line)
+    click.echo(
+        f"{manifest['total']} items in {manifest['elapsed_s']}s "
+        f"(shared fetch {manifest['shared_fetch_ms']} ms) -> {out_path} {manifest['counts']}"
+    )
@@ -27,6 +27,8 @@ from dotenv import load_dotenv
 from flask import Flask
 from flask_mail import Mail, Message
 
+from app.utils.email_outbox import outbox, queue_email
+
 # =========================
 # Load environment variables
 # =========================
@@ -164,8 +166,8 @@ def send_bounce_notifications(mail: Mail, rows: List[Dict[str, str]]) -> None:
             body=build_bounce_email_body(items),
         )
 
-        mail.send(msg)
-        print(f"Sent bounce notification to {to_address} (original sender: {sender_email})")
+        queue_email(msg, mail=mail, kind="bounce_notification")
+        print(f"Queued bounce notification to {to_address} (original sender: {sender_email})")
 
         # DEBUG: send only one email
         if DEBUG_EMAIL:
@@ -191,3 +193,4 @@ if __name__ == "__main__":
             raise RuntimeError("Missing EMAIL or WSNZADMINPASS environment variables.")
 
         send_bounce_notifications(mail, BOUNCED_ROWS)
+        print(f"Outbox: {outbox.drain()}")
@@ -0,0 +1,268 @@
+# app/utils/class_cache.py
+"""
+Server-side cache for pivoted class results (view_class / print view).
+
+Entries used to live in session["class_cache"], which got pickled into the
+session table on every request. They now live here instead:
+
+- in-memory LRU per worker, bounded by entry count
+- optional disk backing (CLASS_CACHE_DIR, default <tmp>/wsfl_class_cache) so
+  both gunicorn workers see the same entries; a memory hit is re-validated
+  against the file's mtime so a patch made in the other worker is picked up.
+  Entries hold pupil names/NSNs and are unpickled, so the dir is 0700, files
+  are 0600, and only files owned by this user (and not group/world
+  writable) are ever loaded; if the dir can't be made private the cache
+  stays memory-only
+- TTL taken from each entry's "expires" ISO timestamp
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+def class_cache_prefix(class_id, term, year) -> str:
+    return f"{class_id}_{term}_{year}_"
+
+
+def class_cache_key(class_id, term, year, filter_type, email) -> str:
+    """Key per class/term/year/filter, scoped to the user the proc ran for."""
+    who = hashlib.sha1((email or "").strip().lower().encode("utf-8")).hexdigest()[:12]
+    return f"{class_cache_prefix(class_id, term, year)}{filter_type}__{who}"
+
+
+def _is_expired(entry) -> bool:
+    expires = entry.get("expires")
+    if not expires:
+        return False
+    try:
+        when = datetime.fromisoformat(expires)
+    except (TypeError, ValueError):
+        return True
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when <= datetime.now(timezone.utc)
+
+
+def _owned_by_us(st) -> bool:
+    return not hasattr(os, "getuid") or st.st_uid == os.getuid()
+
+
+class ClassResultCache:
+    def __init__(self, max_entries=256, disk_dir=None, max_disk_entries=2000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.disk_dir = disk_dir
+        self._mem = OrderedDict()  # key -> (entry, mtime_ns or None)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "disk_hits": 0, "puts": 0, "patches": 0, "evictions": 0}
+        if disk_dir and not self._prepare(disk_dir):
+            self.disk_dir = None
+
+    @staticmethod
+    def _prepare(disk_dir) -> bool:
+        """Create the disk dir, private to this user; False if that isn't possible."""
+        try:
+            os.makedirs(disk_dir, mode=0o700, exist_ok=True)
+            os.chmod(disk_dir, 0o700)  # makedirs leaves existing dirs as they were
+            return _owned_by_us(os.stat(disk_dir)) and os.access(disk_dir, os.W_OK)
+        except OSError:
+            return False
+
+    # ---------- disk helpers ----------
+    def _path(self, key):
+        safe = "".join(ch if ch.isalnum() or ch in "_-" else "-" for ch in key)
+        return os.path.join(self.disk_dir, f"{safe}.pkl")
+
+    def _disk_mtime(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            return os.stat(self._path(key)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _disk_read(self, key):
+        try:
+            fd = os.open(self._path(key), os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+        except OSError:
+            return None, None
+        try:
+            st = os.fstat(fd)
+            if not _owned_by_us(st) or st.st_mode & 0o022:
+                return None, None  # never unpickle a file someone else could have written
+            with os.fdopen(fd, "rb") as fh:
+                fd = None
+                return pickle.load(fh), st.st_mtime_ns
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None, None
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def _disk_write(self, key, entry):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as fh:
+                pickle.dump(entry, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return None
+
+    def _disk_remove(self, key):
+        if not self.disk_dir:
+            return
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _disk_keys(self, prefix=""):
+        if not self.disk_dir:
+            return []
+        try:
+            names = os.listdir(self.disk_dir)
+        except OSError:
+            return []
+        return [n[:-4] for n in names if n.endswith(".pkl") and n.startswith(prefix)]
+
+    def _disk_trim(self):
+        if not self.disk_dir:
+            return
+        try:
+            files = [
+                os.path.join(self.disk_dir, n)
+                for n in os.listdir(self.disk_dir) if n.endswith(".pkl")
+            ]
+            if len(files) <= self.max_disk_entries:
+                return
+            files.sort(key=lambda p: os.stat(p).st_mtime_ns)
+            for path in files[: len(files) - self.max_disk_entries]:
+                os.remove(path)
+        except OSError:
+            pass
+
+    # ---------- memory helpers ----------
+    def _remember(self, key, entry, mtime):
+        with self._lock:
+            self._mem[key] = (entry, mtime)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _forget(self, key):
+        with self._lock:
+            self._mem.pop(key, None)
+
+    # ---------- public API ----------
+    def get(self, key):
+        """Return the cached entry (a dict) or None if missing/expired."""
+        with self._lock:
+            held = self._mem.get(key)
+            if held is not None:
+                self._mem.move_to_end(key)
+
+        if held is not None:
+            entry, mtime = held
+            if _is_expired(entry):
+                self.delete(key)
+            elif not self.disk_dir or self._disk_mtime(key) == mtime:
+                self._stats["hits"] += 1
+                return entry
+            else:
+                self._forget(key)
+
+        if self.disk_dir:
+            entry, mtime = self._disk_read(key)
+            if entry is not None:
+                if _is_expired(entry):
+                    self.delete(key)
+                else:
+                    self._remember(key, entry, mtime)
+                    self._stats["disk_hits"] += 1
+                    return entry
+
+        self._stats["misses"] += 1
+        return None
+
+    def put(self, key, entry):
+        mtime = self._disk_write(key, entry)
+        self._remember(key, entry, mtime)
+        self._stats["puts"] += 1
+        if self._stats["puts"] % 50 == 0:
+            self._disk_trim()
+
+    def delete(self, key):
+        self._forget(key)
+        self._disk_remove(key)
+
+    def keys_with_prefix(self, prefix):
+        with self._lock:
+            keys = {k for k in self._mem if k.startswith(prefix)}
+        keys.update(self._disk_keys(prefix))
+        return sorted(keys)
+
+    def invalidate_prefix(self, prefix) -> int:
+        keys = self.keys_with_prefix(prefix)
+        for key in keys:
+            self.delete(key)
+        return len(keys)
+
+    def patch_students(self, prefix, nsn, updates: dict):
+        """
+        Apply {header: value} to every cached student row with this NSN in
+        every entry under prefix (all filters, all users). Returns
+        (entries_touched, students_updated).
+        """
+        touched = 0
+        updated = 0
+        for key in self.keys_with_prefix(prefix):
+            entry = self.get(key)
+            if entry is None:
+                continue
+            hit = 0
+            for student in entry.get("student_competencies", []):
+                if isinstance(student, dict) and str(student.get("NSN")) == str(nsn):
+                    student.update(updates)
+                    hit += 1
+            if hit:
+                self.put(key, entry)
+                updated += hit
+            touched += 1
+        self._stats["patches"] += 1
+        return touched, updated
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["memory_entries"] = len(self._mem)
+        data["disk_dir"] = self.disk_dir
+        return data
+
+
+def _default_cache():
+    disk_dir = os.getenv(
+        "CLASS_CACHE_DIR",
+        os.path.join(tempfile.gettempdir(), "wsfl_class_cache"),
+    )
+    try:
+        max_entries = int(os.getenv("CLASS_CACHE_MAX_ENTRIES", "256"))
+    except ValueError:
+        max_entries = 256
+    return ClassResultCache(max_entries=max_entries, disk_dir=disk_dir or None)
+
+
+class_result_cache = _default_cache()
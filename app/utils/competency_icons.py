@@ -19,6 +19,7 @@ from app.report_utils.SHP_RoundRect import rounded_rect_polygon
 from app.report_utils.helpers import load_ppmori_fonts
 from app.utils.database import get_db_engine
 from app.utils.funder_missing_plot import add_full_width_footer_svg
+from app.utils.icon_cache import icon_cache
 
 # =========================================================
 # Settings
@@ -212,13 +213,16 @@ def trim_white_border(img, threshold=0.99):
     y1, x1 = coords.max(axis=0) + 1
     return img[y0:y1, x0:x1]
 
-def draw_image_square(ax, image_bytes, x, y, size=0.1, zorder=20000):
+def _decode_icon(image_bytes):
+    return trim_white_border(mpimg.imread(io.BytesIO(image_bytes)))
+
+
+def draw_image_square(ax, image_bytes, x, y, size=0.1, zorder=20000, icon_id=None):
     if image_bytes is None:
         return
 
-    fp = io.BytesIO(image_bytes)
-    img = mpimg.imread(fp)
-    img = trim_white_border(img)
+    # decoded + trimmed once per distinct image (see app.utils.icon_cache)
+    img = icon_cache.get(bytes(image_bytes), icon_id=icon_id, decode=_decode_icon)
 
     fig_w, fig_h = ax.figure.get_size_inches()
     img_h = size * (fig_w / fig_h)
@@ -420,6 +424,7 @@ def draw_image_grid_auto(
             x=img_x,
             y=img_y,
             size=img_w,
+            icon_id=row.get("CompetencyID"),
         )
 
         if draw_labels:
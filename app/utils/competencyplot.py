@@ -4,7 +4,8 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import textwrap
 import os
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from app.utils.database import get_engine_for_url
 from matplotlib.backends.backend_pdf import PdfPages
 
 # ========== CONFIGURATION ==========
@@ -23,7 +24,7 @@ def get_db_engine():
         "@heimatau.database.windows.net:1433/WSFL"
         "?driver=ODBC+Driver+18+for+SQL+Server"
     )
-    return create_engine(connection_string, fast_executemany=True)
+    return get_engine_for_url(connection_string, fast_executemany=True)
 
 def get_all_competencies(con, year, term):
     with con.connect() as connection:
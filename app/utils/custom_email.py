@@ -5,6 +5,8 @@ from flask import current_app, render_template, url_for
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 import os
 
+from app.utils.email_outbox import queue_email
+
 
 def send_reset_email(mail, email, token):
     reset_url = url_for(
@@ -38,7 +40,7 @@ def send_reset_email(mail, email, token):
             headers={"Content-ID": "<wsfl_logo>"},
         )
 
-    mail.send(msg)
+    return queue_email(msg, mail=mail, kind="password_reset")
     
     
 def generate_reset_token(secret_key, email):
@@ -129,7 +131,7 @@ def send_survey_invite_email(
             headers={"Content-ID": "<wsfl_logo>"}
         )
 
-    mail.send(msg)
+    return queue_email(msg, mail=mail, kind="survey_invite")
     
     
 def send_survey_reminder_email(
@@ -177,7 +179,7 @@ def send_survey_reminder_email(
             headers={"Content-ID": "<wsfl_logo>"}
         )
 
-    mail.send(msg)
+    return queue_email(msg, mail=mail, kind="survey_reminder")
 
 def send_survey_invitation_email(mail, email, firstname, lastname, role, user_id, survey_id, requested_by, from_org):
     # Generate tokenized one-time link
@@ -215,7 +217,7 @@ def send_survey_invitation_email(mail, email, firstname, lastname, role, user_id
             headers={"Content-ID": "<wsfl_logo>"},
         )
 
-    mail.send(msg)
+    return queue_email(msg, mail=mail, kind="survey_invitation")
 
 
 def send_feedback_email(mail, user_email, issue_text, display_name, role, is_admin, desc, screenshot_file=None):
@@ -266,7 +268,7 @@ def send_feedback_email(mail, user_email, issue_text, display_name, role, is_adm
                    headers={"Content-ID": "<wsfl_logo>"})
     
     
-    mail.send(msg)
+    return queue_email(msg, mail=mail, kind="feedback")
     
     
 def send_elearning_reminder_email(
@@ -326,7 +328,7 @@ def send_elearning_reminder_email(
     with current_app.open_resource("static/eLearningGuide.pdf") as pdf_fp:
         msg.attach("eLearningGuide.pdf", "application/pdf", pdf_fp.read())
 
-    mail.send(msg)
+    return queue_email(msg, mail=mail, kind="elearning_reminder")
 
 
 
@@ -412,5 +414,5 @@ def send_class_list_reminder_email(
                 fp.read(),
             )
 
-    mail.send(msg)
+    return queue_email(msg, mail=mail, kind="class_list_reminder")
     
\ No newline at end of file
@@ -1,35 +1,224 @@
 import os
+import threading
+import time
 from flask import current_app
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
 import os, traceback
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
-from sqlalchemy import create_engine
-import os, urllib.parse
-from dotenv import load_dotenv
+
+# --- engine registry ---------------------------------------------------------
+# One pooled engine per (URL, options) per process. Every get_db_engine() /
+# get_engine() helper in the app resolves here, so connections are reused
+# across requests instead of paying a fresh ODBC/TLS handshake each time.
+
+_ENGINES: dict = {}
+_ENGINES_LOCK = threading.Lock()
+_ENGINES_PID = os.getpid()
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def pool_settings():
+    """
+    Pool sizing per worker process. gunicorn runs N threads per worker, so the
+    steady-state pool only needs one connection per thread (+1 for background
+    work); overflow absorbs short bursts.
+    """
+    threads = _env_int("GUNICORN_THREADS", 4)
+    return {
+        "pool_size": _env_int("DB_POOL_SIZE", threads + 1),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", threads),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 300),
+    }
+
+
+class _PoolStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.wait_count = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+
+    def record_wait(self, seconds):
+        with self.lock:
+            self.wait_count += 1
+            self.wait_total_s += seconds
+            if seconds > self.wait_max_s:
+                self.wait_max_s = seconds
+
+    def bump(self, field):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def as_dict(self):
+        with self.lock:
+            avg = self.wait_total_s / self.wait_count if self.wait_count else 0.0
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "wait_avg_ms": round(avg * 1000, 3),
+                "wait_max_ms": round(self.wait_max_s * 1000, 3),
+                "wait_total_ms": round(self.wait_total_s * 1000, 3),
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            stats = getattr(self, "_wsfl_stats", None)
+            if stats is not None:
+                stats.record_wait(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool._wsfl_stats = getattr(self, "_wsfl_stats", None)
+        return pool
+
+
+def _attach_stats(engine):
+    engine.pool._wsfl_stats = _PoolStats()
+
+    def _counter(field):
+        def _listener(*_args):
+            stats = getattr(engine.pool, "_wsfl_stats", None)
+            if stats is not None:
+                stats.bump(field)
+        return _listener
+
+    for evt, field in (
+        ("connect", "connects"),
+        ("checkout", "checkouts"),
+        ("checkin", "checkins"),
+        ("invalidate", "invalidations"),
+    ):
+        event.listen(engine, evt, _counter(field))
+
+
+def _reset_after_fork():
+    """
+    Runs in a freshly forked child (gunicorn --preload, multiprocessing).
+    Parent connections must never be used from the child, so drop the pool
+    references without closing the sockets the parent still owns. The engine
+    objects themselves stay registered (modules may hold them) with new pools.
+    """
+    global _ENGINES_PID, _ENGINES_LOCK
+    _ENGINES_LOCK = threading.Lock()
+    for engine in list(_ENGINES.values()):
+        try:
+            engine.dispose(close=False)
+            engine.pool._wsfl_stats = _PoolStats()
+        except Exception:
+            pass
+    _ENGINES_PID = os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_engine_for_url(db_url, **engine_kwargs) -> Engine:
+    """
+    Return the process-wide pooled engine for db_url, creating it on first use.
+    Extra engine_kwargs (e.g. fast_executemany=True) form part of the key.
+    """
+    if not db_url:
+        raise RuntimeError("Database URL is not set (DB_URL).")
+
+    if os.getpid() != _ENGINES_PID:
+        _reset_after_fork()
+
+    key = (db_url, tuple(sorted(engine_kwargs.items())))
+    engine = _ENGINES.get(key)
+    if engine is not None:
+        return engine
+
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            settings = pool_settings()
+            opts = {
+                "pool_pre_ping": True,
+                "future": True,
+                "pool_size": settings["pool_size"],
+                "max_overflow": settings["max_overflow"],
+                "pool_timeout": settings["pool_timeout"],
+                "pool_recycle": settings["pool_recycle"],
+            }
+            if db_url.startswith("sqlite"):
+                opts = {"future": True}
+            else:
+                opts["poolclass"] = TimedQueuePool
+            opts.update(engine_kwargs)
+            engine = create_engine(db_url, **opts)
+            _attach_stats(engine)
+            _ENGINES[key] = engine
+    return engine
+
 
 def get_db_engine():
-    load_dotenv()
+    return get_engine_for_url(os.getenv("DB_URL"))
 
-    #env = os.getenv("FLASK_ENV", "local").lower()
-    db_url = os.getenv("DB_URL")
-        
-    
-    
-    engine = create_engine(
-        db_url,
-        pool_pre_ping=True,
-        pool_recycle=300,
-        pool_size=5,
-        max_overflow=10,
-        pool_timeout=30,
-        future=True,
-    )
-    
 
+def dispose_engines():
+    """Close every pooled connection in this process (shutdown / tests)."""
+    with _ENGINES_LOCK:
+        for engine in _ENGINES.values():
+            engine.dispose()
+        _ENGINES.clear()
+
+
+def pool_stats():
+    """Snapshot of every registered engine's pool for the metrics endpoint."""
+    out = []
+    for (db_url, kwargs), engine in list(_ENGINES.items()):
+        pool = engine.pool
+        stats = getattr(pool, "_wsfl_stats", None)
+        entry = {
+            "url": engine.url.render_as_string(hide_password=True),
+            "options": dict(kwargs),
+            "status": pool.status(),
+        }
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            fn = getattr(pool, name, None)
+            if callable(fn):
+                entry[name] = fn()
+        if stats is not None:
+            entry.update(stats.as_dict())
+        out.append(entry)
+    return {"pid": os.getpid(), "settings": pool_settings(), "engines": out}
+
+
+def init_engine_registry(app):
+    """
+    Called once from create_app() (i.e. once per gunicorn worker). Warms the
+    default engine so the first request doesn't pay the pool setup cost.
+    """
+    engine = get_db_engine()
+    app.extensions["wsfl_engine"] = engine
     return engine
+
     
 # --- helpers (you can move this to a shared utils module) ------------------
 from sqlalchemy import text
@@ -38,7 +227,7 @@ from sqlalchemy import text
 def log_alert(email=None, role=None, entity_id=None, link=None, message=None):
     """
     Best-effort write to AUD_Alerts_Insert; never raises.
-    Creates its own engine, truncates long fields, logs failures to app logs.
+    Uses the shared engine, truncates long fields, logs failures to app logs.
     """
     try:
         # Sanitise & truncate (SP has @Link NVARCHAR(2048))
@@ -0,0 +1,579 @@
+# app/utils/email_outbox.py
+"""
+Outbound email queue.
+
+mail.send(msg) opened a new TLS session to the SMTP server for every
+message, inside the request. Messages are now spooled to disk and sent by a
+background dispatcher over one reused SMTP connection:
+
+    <EMAIL_OUTBOX_DIR>/pending/<due_ms>_<id>.json       waiting; name = when it is next due
+    <EMAIL_OUTBOX_DIR>/sending/<due_ms>_<id>.json.<pid> claimed (the rename is the claim)
+    <EMAIL_OUTBOX_DIR>/failed/<id>.json                 gave up; see "last_error"
+
+Spooled messages are whole MIME messages (temporary passwords, reset
+links): the spool is private to the app user (0700 dirs, 0600 files) and
+failed/ entries are deleted after EMAIL_OUTBOX_FAILED_KEEP_DAYS.
+EMAIL_OUTBOX_DIR defaults to the persistent disk (/var/data), so a
+redeploy doesn't lose queued mail; where that isn't writable (local runs)
+the spool falls back to the temp dir.
+
+- queue_email(msg) renders the message (MIME bytes + envelope) and returns
+  its id straight away; with EMAIL_OUTBOX=0, or if the spool can't be
+  written, it sends inline as before.
+- One dispatcher per host sends (the gunicorn workers take turns on a
+  lock file, so the connection and the rate limit are shared), at most
+  EMAIL_OUTBOX_RATE_PER_MIN messages a minute. The connection stays open
+  while messages keep coming and is closed after EMAIL_OUTBOX_IDLE_S.
+- Temporary failures (4xx, dropped connections) are retried with
+  exponential backoff from EMAIL_OUTBOX_BACKOFF_S, up to
+  EMAIL_OUTBOX_MAX_ATTEMPTS; permanent ones (5xx) go to failed/ straight
+  away and raise an AUD alert. Claims left behind by a dead process are
+  put back after EMAIL_OUTBOX_STALE_S.
+- Counters via outbox.metrics() (/admin/metrics). `flask email-outbox`
+  drains the queue in the foreground, e.g. against a local SMTP stub:
+
+      MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=0 flask --app run email-outbox --drain
+
+Usage:
+    queue_email(msg, mail=mail, kind="survey_invite")
+    outbox.drain()      # scripts: send everything due before exiting
+"""
+import base64
+import json
+import os
+import smtplib
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from flask_mail import BadHeaderError, Connection, sanitize_address, sanitize_addresses
+
+from app.utils.database import log_alert
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; every process then sends its own claims
+    fcntl = None
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+EMAIL_OUTBOX_ENABLED = os.getenv("EMAIL_OUTBOX", "1") == "1"
+EMAIL_OUTBOX_DIR = os.getenv("EMAIL_OUTBOX_DIR", "/var/data/wsfl_outbox")
+EMAIL_OUTBOX_FALLBACK_DIR = os.path.join(tempfile.gettempdir(), "wsfl_outbox")
+EMAIL_OUTBOX_RATE_PER_MIN = max(1.0, _env_float("EMAIL_OUTBOX_RATE_PER_MIN", 30))
+EMAIL_OUTBOX_BATCH = max(1, int(_env_float("EMAIL_OUTBOX_BATCH", 50)))
+EMAIL_OUTBOX_MAX_ATTEMPTS = max(1, int(_env_float("EMAIL_OUTBOX_MAX_ATTEMPTS", 8)))
+EMAIL_OUTBOX_BACKOFF_S = _env_float("EMAIL_OUTBOX_BACKOFF_S", 30)
+EMAIL_OUTBOX_MAX_BACKOFF_S = _env_float("EMAIL_OUTBOX_MAX_BACKOFF_S", 3600)
+EMAIL_OUTBOX_POLL_S = _env_float("EMAIL_OUTBOX_POLL_S", 2)
+EMAIL_OUTBOX_IDLE_S = _env_float("EMAIL_OUTBOX_IDLE_S", 30)
+EMAIL_OUTBOX_STALE_S = _env_float("EMAIL_OUTBOX_STALE_S", 900)
+EMAIL_OUTBOX_FAILED_KEEP_DAYS = _env_float("EMAIL_OUTBOX_FAILED_KEEP_DAYS", 14)
+
+
+class _ConnectError(Exception):
+    """Couldn't open / log in to the SMTP server (not the message's fault)."""
+
+
+def _is_permanent(e: Exception) -> bool:
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in e.recipients.values())
+    if isinstance(e, smtplib.SMTPResponseException):
+        return e.smtp_code >= 500
+    return isinstance(e, (BadHeaderError, ValueError, KeyError))
+
+
+def _backoff(attempts: int) -> float:
+    return min(EMAIL_OUTBOX_MAX_BACKOFF_S, EMAIL_OUTBOX_BACKOFF_S * (2 ** max(0, attempts - 1)))
+
+
+class EmailOutbox:
+    def __init__(self, root, fallback_root=None):
+        self.root = None
+        self._lock = threading.Lock()            # stats + thread start
+        self._dispatch_lock = threading.Lock()   # one dispatch_once() at a time per process
+        self._wake = threading.Event()
+        self._thread = None
+        self._leader_fd = None
+        self._host = None
+        self._host_sent = 0
+        self._host_used_at = 0.0
+        self._next_send_at = 0.0
+        self._paused_until = 0.0
+        self._connect_failures = 0
+        self._stats = {
+            "queued": 0, "sent": 0, "retries": 0, "failed": 0, "inline": 0,
+            "connections": 0, "connect_errors": 0, "requeued_stale": 0, "expired": 0,
+            "send_ms_total": 0.0,
+        }
+        self._last_error = None
+        for candidate in (root, fallback_root):
+            if candidate and self._prepare(candidate):
+                self.root = candidate
+                break
+        if self.root is not None and self.root != root:
+            print(f"⚠️ email outbox: {root} not writable, spooling to {self.root}")
+
+    @staticmethod
+    def _prepare(root) -> bool:
+        """Create the spool dirs, private to this user; False if that isn't possible."""
+        try:
+            for path in (root, *(os.path.join(root, sub) for sub in ("pending", "sending", "failed"))):
+                os.makedirs(path, mode=0o700, exist_ok=True)
+                os.chmod(path, 0o700)  # makedirs leaves existing dirs as they were
+            return os.access(root, os.W_OK)
+        except OSError:
+            return False
+
+    def _dir(self, sub):
+        return os.path.join(self.root, sub)
+
+    def _bump(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    # ---------- enqueue ----------
+    def enqueue(self, msg, *, kind=None) -> str:
+        """Spool msg (needs an app context); returns its id. Raises like mail.send on a bad message."""
+        if self.root is None:
+            raise OSError("email outbox spool is not writable")
+        assert msg.send_to, "No recipients have been added"
+        assert msg.sender, (
+            "The message does not specify a sender and a default sender "
+            "has not been configured"
+        )
+        if msg.has_bad_headers():
+            raise BadHeaderError
+        if msg.date is None:
+            msg.date = time.time()
+
+        msg_id = uuid.uuid4().hex
+        record = {
+            "id": msg_id,
+            "kind": kind,
+            "subject": msg.subject,
+            "from": sanitize_address(msg.sender),
+            "to": sanitize_addresses(msg.send_to),
+            "raw": base64.b64encode(msg.as_bytes()).decode("ascii"),
+            "mail_options": list(msg.mail_options or []),
+            "rcpt_options": list(msg.rcpt_options or []),
+            "attempts": 0,
+            "created_at": time.time(),
+            "last_error": None,
+        }
+        self._write(self._dir("pending"), self._pending_name(time.time(), msg_id), record)
+        self._bump("queued")
+        self.start(current_app._get_current_object())
+        self._wake.set()
+        return msg_id
+
+    @staticmethod
+    def _pending_name(due_at: float, msg_id: str) -> str:
+        return f"{int(due_at * 1000):015d}_{msg_id}.json"
+
+    def _write(self, folder, name, record):
+        tmp = os.path.join(folder, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(record, fh)
+        os.replace(tmp, os.path.join(folder, name))
+
+    # ---------- dispatcher thread ----------
+    def start(self, app) -> None:
+        """Start this process's dispatcher thread (idempotent)."""
+        if self.root is None:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, args=(app,), name="wsfl-email-outbox", daemon=True,
+            )
+            self._thread.start()
+
+    def _become_leader(self) -> None:
+        # Blocks until no other process on this host is dispatching
+        if fcntl is None:
+            return
+        fd = os.open(os.path.join(self.root, "dispatcher.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        self._leader_fd = fd
+
+    def _run(self, app):
+        with app.app_context():
+            try:
+                self._become_leader()
+            except OSError as e:
+                app.logger.warning("⚠️ email outbox: no dispatcher lock (%s); sending anyway", e)
+            app.logger.info("📮 email outbox dispatcher running | pid=%s", os.getpid())
+            self.requeue_stale()
+            self.expire_failed()
+            last_stale_check = time.monotonic()
+            while True:
+                try:
+                    handled = self.dispatch_once()
+                except Exception as e:
+                    app.logger.error("❌ email outbox dispatch failed: %s\n%s", e, traceback.format_exc())
+                    handled = 0
+                if handled:
+                    continue
+                if time.monotonic() - last_stale_check > 60:
+                    self.requeue_stale()
+                    self.expire_failed()
+                    last_stale_check = time.monotonic()
+                self._close_if_idle()
+                self._wake.wait(self._idle_wait())
+                self._wake.clear()
+
+    def _idle_wait(self) -> float:
+        wait = EMAIL_OUTBOX_POLL_S
+        if self._host is not None:
+            wait = min(wait, max(0.1, self._host_used_at + EMAIL_OUTBOX_IDLE_S - time.monotonic()))
+        return wait
+
+    # ---------- claiming ----------
+    def _claim_due(self, limit):
+        now_ms = int(time.time() * 1000)
+        try:
+            names = sorted(n for n in os.listdir(self._dir("pending")) if n.endswith(".json"))
+        except OSError:
+            return []
+        claimed = []
+        for name in names:
+            if len(claimed) >= limit:
+                break
+            try:
+                if int(name.split("_", 1)[0]) > now_ms:
+                    break  # sorted by due time: nothing after this is due either
+            except ValueError:
+                continue
+            src = os.path.join(self._dir("pending"), name)
+            dst = os.path.join(self._dir("sending"), f"{name}.{os.getpid()}")
+            try:
+                os.rename(src, dst)
+                os.utime(dst)  # claim time, for requeue_stale()
+            except OSError:
+                continue  # another process got it
+            claimed.append(dst)
+        return claimed
+
+    def requeue_stale(self) -> int:
+        """Put claims older than EMAIL_OUTBOX_STALE_S (dead dispatcher) back in pending/."""
+        if self.root is None:
+            return 0
+        moved = 0
+        now = time.time()
+        try:
+            names = os.listdir(self._dir("sending"))
+        except OSError:
+            return 0
+        for name in names:
+            path = os.path.join(self._dir("sending"), name)
+            try:
+                if now - os.stat(path).st_mtime < EMAIL_OUTBOX_STALE_S:
+                    continue
+                os.rename(path, os.path.join(self._dir("pending"), name.rsplit(".", 1)[0]))
+                moved += 1
+            except OSError:
+                continue
+        if moved:
+            self._bump("requeued_stale", moved)
+        return moved
+
+    def expire_failed(self) -> int:
+        """Delete failed/ entries older than EMAIL_OUTBOX_FAILED_KEEP_DAYS."""
+        if self.root is None:
+            return 0
+        removed = 0
+        cutoff = time.time() - EMAIL_OUTBOX_FAILED_KEEP_DAYS * 86400
+        try:
+            names = os.listdir(self._dir("failed"))
+        except OSError:
+            return 0
+        for name in names:
+            path = os.path.join(self._dir("failed"), name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            self._bump("expired", removed)
+        return removed
+
+    # ---------- sending ----------
+    def _connect(self):
+        if self._host is not None:
+            return self._host
+        state = current_app.extensions["mail"]
+        if state.suppress:
+            return None
+        try:
+            self._host = Connection(state).configure_host()
+        except Exception as e:
+            self._bump("connect_errors")
+            raise _ConnectError(str(e)) from e
+        self._host_sent = 0
+        self._bump("connections")
+        return self._host
+
+    def _disconnect(self):
+        host, self._host = self._host, None
+        if host is not None:
+            try:
+                host.quit()
+            except Exception:
+                try:
+                    host.close()
+                except Exception:
+                    pass
+
+    def _close_if_idle(self):
+        if self._host is not None and time.monotonic() - self._host_used_at >= EMAIL_OUTBOX_IDLE_S:
+            self._disconnect()
+
+    def _rate_wait(self):
+        interval = 60.0 / EMAIL_OUTBOX_RATE_PER_MIN
+        now = time.monotonic()
+        if self._next_send_at > now:
+            time.sleep(self._next_send_at - now)
+            now = self._next_send_at
+        self._next_send_at = now + interval
+
+    def _deliver(self, record):
+        raw = base64.b64decode(record["raw"])
+        for attempt in (1, 2):
+            host = self._connect()
+            if host is None:  # MAIL_SUPPRESS_SEND
+                return
+            try:
+                host.sendmail(record["from"], record["to"], raw,
+                              record.get("mail_options") or [], record.get("rcpt_options") or [])
+                break
+            except smtplib.SMTPServerDisconnected:
+                # idle connection dropped by the server: reconnect once
+                self._disconnect()
+                if attempt == 2:
+                    raise
+        self._host_used_at = time.monotonic()
+        self._host_sent += 1
+        max_emails = current_app.extensions["mail"].max_emails
+        if max_emails and self._host_sent >= max_emails:
+            self._disconnect()
+
+    def dispatch_once(self, limit=None) -> int:
+        """Claim and send the messages due now; returns how many were handled."""
+        if self.root is None or time.monotonic() < self._paused_until:
+            return 0
+        with self._dispatch_lock:
+            claimed = self._claim_due(limit or EMAIL_OUTBOX_BATCH)
+            for i, path in enumerate(claimed):
+                try:
+                    with open(path, "r", encoding="utf-8") as fh:
+                        record = json.load(fh)
+                except (OSError, ValueError) as e:
+                    current_app.logger.error("❌ email outbox: unreadable %s: %s", path, e)
+                    self._move_failed(path, {"id": os.path.basename(path), "last_error": str(e)})
+                    continue
+
+                self._rate_wait()
+                t0 = time.perf_counter()
+                try:
+                    self._deliver(record)
+                except _ConnectError as e:
+                    # Not this message's fault: hand the batch back untouched and pause
+                    self._connect_failures += 1
+                    pause = _backoff(self._connect_failures)
+                    self._paused_until = time.monotonic() + pause
+                    self._last_error = f"connect: {e}"
+                    current_app.logger.warning("⚠️ email outbox: SMTP connect failed (%s); retrying in %.0f s",
+                                               e, pause)
+                    for rest in claimed[i:]:
+                        self._release(rest)
+                    return i
+                except Exception as e:
+                    if not isinstance(e, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                        self._disconnect()  # the session state is unknown; start a fresh one
+                    self._failed_attempt(path, record, e)
+                    continue
+
+                self._connect_failures = 0
+                with self._lock:
+                    self._stats["sent"] += 1
+                    self._stats["send_ms_total"] += (time.perf_counter() - t0) * 1000
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            return len(claimed)
+
+    def _release(self, path):
+        name = os.path.basename(path).rsplit(".", 1)[0]
+        try:
+            os.rename(path, os.path.join(self._dir("pending"), name))
+        except OSError:
+            pass
+
+    def _failed_attempt(self, path, record, e):
+        record["attempts"] = int(record.get("attempts") or 0) + 1
+        record["last_error"] = f"{type(e).__name__}: {e}"[:1000]
+        self._last_error = record["last_error"]
+
+        if _is_permanent(e) or record["attempts"] >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+            self._move_failed(path, record)
+            current_app.logger.error("❌ email outbox: giving up on %s to %s after %d attempt(s): %s",
+                                     record.get("kind") or "email", record.get("to"), record["attempts"],
+                                     record["last_error"])
+            log_alert(
+                link="email_outbox",
+                message=(f"Email not sent ({record.get('kind') or 'email'}) to {record.get('to')} | "
+                         f"subject={record.get('subject')!r} | attempts={record['attempts']} | "
+                         f"{record['last_error']}")[:4000],
+            )
+            return
+
+        due = time.time() + _backoff(record["attempts"])
+        try:
+            self._write(self._dir("pending"), self._pending_name(due, record["id"]), record)
+            os.remove(path)
+        except OSError:
+            pass
+        self._bump("retries")
+        current_app.logger.warning("⚠️ email outbox: %s to %s failed (attempt %d), retrying: %s",
+                                   record.get("kind") or "email", record.get("to"), record["attempts"],
+                                   record["last_error"])
+
+    def _move_failed(self, path, record):
+        try:
+            self._write(self._dir("failed"), f"{record['id']}.json", record)
+            os.remove(path)
+        except OSError:
+            pass
+        self._bump("failed")
+
+    # ---------- foreground ----------
+    def drain(self, timeout=None) -> dict:
+        """Send everything that is due now, in this thread (scripts / CLI); needs an app context."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self.requeue_stale()
+            self.expire_failed()
+            while self.dispatch_once():
+                if deadline is not None and time.monotonic() > deadline:
+                    break
+        finally:
+            with self._dispatch_lock:
+                self._disconnect()
+        return self.metrics()
+
+    def retry_failed(self) -> int:
+        """Move failed/ messages back to pending/ with a fresh attempt count."""
+        if self.root is None:
+            return 0
+        moved = 0
+        for name in os.listdir(self._dir("failed")):
+            path = os.path.join(self._dir("failed"), name)
+            try:
+                with open(path, "r", encoding="utf-8") as fh:
+                    record = json.load(fh)
+                if "raw" not in record:
+                    continue
+                record["attempts"] = 0
+                self._write(self._dir("pending"), self._pending_name(time.time(), record["id"]), record)
+                os.remove(path)
+                moved += 1
+            except (OSError, ValueError, KeyError):
+                continue
+        self._wake.set()
+        return moved
+
+    def _count(self, sub):
+        try:
+            return sum(1 for n in os.listdir(self._dir(sub)) if not n.startswith("."))
+        except (OSError, TypeError):
+            return 0
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self._stats)
+        data["send_ms_avg"] = round(data.pop("send_ms_total") / data["sent"], 1) if data["sent"] else None
+        data["enabled"] = EMAIL_OUTBOX_ENABLED and self.root is not None
+        data["dir"] = self.root
+        data["pending"] = self._count("pending")
+        data["sending"] = self._count("sending")
+        data["failed_on_disk"] = self._count("failed")
+        data["dispatcher"] = bool(self._thread and self._thread.is_alive())
+        data["leader"] = self._leader_fd is not None
+        data["connected"] = self._host is not None
+        data["last_error"] = self._last_error
+        return data
+
+    def _reset_after_fork(self):
+        # Threads, sockets and the dispatcher lock don't carry over to a child
+        self._lock = threading.Lock()
+        self._dispatch_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._host = None
+        if self._leader_fd is not None:
+            try:
+                os.close(self._leader_fd)
+            except OSError:
+                pass
+        self._leader_fd = None
+
+
+outbox = EmailOutbox(
+    EMAIL_OUTBOX_DIR,
+    # an explicit EMAIL_OUTBOX_DIR that can't be written means send inline
+    fallback_root=None if os.getenv("EMAIL_OUTBOX_DIR") else EMAIL_OUTBOX_FALLBACK_DIR,
+)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=outbox._reset_after_fork)
+
+
+def queue_email(msg, *, mail=None, kind=None):
+    """
+    Queue msg for the dispatcher and return its outbox id. Sends inline
+    (returns None) when the outbox is off or its spool can't be written.
+    """
+    if EMAIL_OUTBOX_ENABLED and outbox.root is not None:
+        try:
+            return outbox.enqueue(msg, kind=kind)
+        except OSError as e:
+            current_app.logger.warning("⚠️ email outbox unavailable (%s); sending inline", e)
+    (mail or current_app.extensions["mail"]).send(msg)
+    outbox._bump("inline")
+    return None
+
+
+def email_status(*outbox_ids) -> str:
+    """
+    "queued" if queue_email() spooled any of these (its return values), "sent"
+    if they went out inline; for the "... queued." / "... sent." messages.
+    """
+    return "queued" if any(outbox_ids) else "sent"
+
+
+@click.command("email-outbox")
+@click.option("--drain", is_flag=True, help="Send everything due now, then exit.")
+@click.option("--retry-failed", is_flag=True, help="Move failed messages back into the queue first.")
+@with_appcontext
+def email_outbox_command(drain, retry_failed):
+    """Show (and optionally drain) the outbound email queue."""
+    if retry_failed:
+        click.echo(f"requeued {outbox.retry_failed()} failed message(s)")
+    data = outbox.drain() if drain else outbox.metrics()
+    click.echo(json.dumps(data, indent=2, default=str))
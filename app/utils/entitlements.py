@@ -0,0 +1,239 @@
+# app/utils/entitlements.py
+"""
+Per-user entitlement cache over dbo.FlaskGetEntities.
+
+FlaskGetEntities resolves which funders / providers / schools / groups a
+role + user id may see. It was called on every class view, export, survey
+view and dropdown; now each (role, user id, entity type, include_inactive)
+is resolved once and kept for ENTITLEMENT_TTL seconds (default 600) as a
+frozenset of integer ids plus the ordered [{id, description}] list.
+
+- is_allowed(entity_type, id) is a set lookup.
+- invalidate_entitlements() is called by the write routes that change who
+  can see what (provider <-> school assignments, provider add/delete). It
+  bumps a stamp file in ENTITLEMENT_STAMP_DIR so the other gunicorn worker
+  drops its entries too.
+- forget_user(role, user_id) runs at login so a fresh login always
+  re-resolves.
+
+Usage:
+    ents = entitlements_for()                      # current session user
+    if not ents.is_allowed("School", moe_number): abort(403)
+    schools = ents.entities("School", conn=conn)   # [{id, description}]
+"""
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import session
+from sqlalchemy import text
+
+from app.utils.database import get_db_engine
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+ENTITLEMENT_TTL = _env_float("ENTITLEMENT_TTL", 600)
+ENTITLEMENT_MAX_ENTRIES = int(_env_float("ENTITLEMENT_MAX_ENTRIES", 2048))
+_STAMP_NAME = "generation"
+
+_ENTITIES_SQL = text("""
+    SET NOCOUNT ON;
+    EXEC dbo.FlaskGetEntities
+        @EntityType      = :EntityType,
+        @Role            = :Role,
+        @ID              = :ID,
+        @IncludeInactive = :IncludeInactive;
+""")
+
+
+def _as_int(value):
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class _Entry:
+    __slots__ = ("ids", "entities", "expires", "generation")
+
+    def __init__(self, ids, entities, expires, generation):
+        self.ids = ids
+        self.entities = entities
+        self.expires = expires
+        self.generation = generation
+
+
+class EntitlementCache:
+    def __init__(self, ttl=600, max_entries=2048, stamp_dir=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stamp_dir = stamp_dir
+        self._entries = OrderedDict()  # (role, user_id, entity_type, inactive) -> _Entry
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "loads": 0, "load_errors": 0, "invalidations": 0}
+        if stamp_dir:
+            try:
+                os.makedirs(stamp_dir, exist_ok=True)
+            except OSError:
+                self.stamp_dir = None
+
+    # ---------- cross-worker generation stamp ----------
+    def _generation(self):
+        if not self.stamp_dir:
+            return 0
+        try:
+            return os.stat(os.path.join(self.stamp_dir, _STAMP_NAME)).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _bump_generation(self):
+        if not self.stamp_dir:
+            return
+        path = os.path.join(self.stamp_dir, _STAMP_NAME)
+        try:
+            with open(path, "a", encoding="ascii"):
+                pass
+            now = time.time_ns()
+            os.utime(path, ns=(now, now))
+        except OSError:
+            pass
+
+    # ---------- lookups ----------
+    def get(self, role, user_id, entity_type, include_inactive=0, conn=None) -> _Entry:
+        key = (role or "", _as_int(user_id), entity_type, int(include_inactive or 0))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None and entry.expires > time.monotonic() and entry.generation == self._generation():
+            with self._lock:
+                self._stats["hits"] += 1
+            return entry
+
+        with self._lock:
+            self._stats["misses"] += 1
+        generation = self._generation()
+        try:
+            entry = self._load(key, conn, generation)
+        except Exception:
+            with self._lock:
+                self._stats["load_errors"] += 1
+            raise
+
+        with self._lock:
+            self._stats["loads"] += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _load(self, key, conn, generation) -> _Entry:
+        role, user_id, entity_type, include_inactive = key
+        params = {
+            "EntityType": entity_type,
+            "Role": role or None,
+            "ID": user_id,
+            "IncludeInactive": include_inactive,
+        }
+        if conn is not None:
+            rows = conn.execute(_ENTITIES_SQL, params).mappings().all()
+        else:
+            with get_db_engine().connect() as own:
+                rows = own.execute(_ENTITIES_SQL, params).mappings().all()
+
+        entities = []
+        for r in rows:
+            entity_id = _as_int(r.get("ID"))
+            if entity_id is None:
+                continue
+            entities.append((entity_id, str(r.get("Description"))))
+        return _Entry(
+            ids=frozenset(e[0] for e in entities),
+            entities=tuple(entities),
+            expires=time.monotonic() + self.ttl,
+            generation=generation,
+        )
+
+    # ---------- invalidation ----------
+    def forget_user(self, role, user_id) -> int:
+        """Drop every cached entity type for one user (e.g. on login)."""
+        prefix = (role or "", _as_int(user_id))
+        with self._lock:
+            doomed = [k for k in self._entries if k[:2] == prefix]
+            for k in doomed:
+                self._entries.pop(k, None)
+        return len(doomed)
+
+    def invalidate(self) -> int:
+        """Drop everything, here and (via the stamp file) in the other workers."""
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+        self._bump_generation()
+        return dropped
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["entries"] = len(self._entries)
+        lookups = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / lookups, 3) if lookups else None
+        return data
+
+
+entitlement_cache = EntitlementCache(
+    ttl=ENTITLEMENT_TTL,
+    max_entries=ENTITLEMENT_MAX_ENTRIES,
+    stamp_dir=os.getenv(
+        "ENTITLEMENT_STAMP_DIR",
+        os.path.join(tempfile.gettempdir(), "wsfl_entitlement_stamps"),
+    ) or None,
+)
+
+
+class Entitlements:
+    """What one role + user id may see. Cheap to create; data lives in entitlement_cache."""
+
+    def __init__(self, role, user_id):
+        self.role = role
+        self.user_id = _as_int(user_id)
+
+    def ids(self, entity_type: str, include_inactive: int = 0, conn=None) -> frozenset:
+        return entitlement_cache.get(self.role, self.user_id, entity_type, include_inactive, conn).ids
+
+    def entities(self, entity_type: str, include_inactive: int = 0, conn=None) -> list[dict]:
+        entry = entitlement_cache.get(self.role, self.user_id, entity_type, include_inactive, conn)
+        return [{"id": i, "description": d} for i, d in entry.entities]
+
+    def is_allowed(self, entity_type: str, entity_id, include_inactive: int = 0, conn=None) -> bool:
+        entity_id = _as_int(entity_id)
+        if entity_id is None:
+            return False
+        return entity_id in self.ids(entity_type, include_inactive, conn)
+
+
+def entitlements_for(role=None, user_id=None) -> Entitlements:
+    """Entitlements for role/user_id, defaulting to the logged-in session user."""
+    if role is None:
+        role = session.get("user_role")
+        if user_id is None:
+            user_id = session.get("user_id")
+    return Entitlements(role, user_id)
+
+
+def forget_user(role, user_id) -> int:
+    return entitlement_cache.forget_user(role, user_id)
+
+
+def invalidate_entitlements() -> int:
+    return entitlement_cache.invalidate()
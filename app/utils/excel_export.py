@@ -0,0 +1,183 @@
+# app/utils/excel_export.py
+"""
+Shared xlsxwriter helpers for the Excel downloads (class upload results and
+the view_class exports).
+
+- Workbooks are opened in constant_memory mode: each row is flushed to a
+  temp file as soon as the next one starts, so rows must be written top to
+  bottom (title/header rows first, then data via write_frame_rows).
+- Formats are cached per workbook (FormatCache) instead of re-created per cell.
+- Per-cell highlighting is driven by boolean masks computed once per column
+  (error_field_mask, truthy_mask) rather than string checks inside the loop.
+- send_workbook builds into an unnamed temp file and hands that to send_file,
+  so the response is streamed from disk instead of held in a BytesIO.
+
+Note: xlsxwriter doesn't support add_table() in constant_memory mode; use a
+header format + autofilter instead.
+"""
+import re
+import tempfile
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+from flask import send_file
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+TRUTHY_STRINGS = ("1", "true", "yes")
+
+
+# -----------------------------
+# Workbook / response
+# -----------------------------
+def new_workbook(target, constant_memory: bool = True):
+    """Open an xlsxwriter Workbook on a path or file object."""
+    options = {"constant_memory": bool(constant_memory)}
+    if constant_memory:
+        options["tmpdir"] = tempfile.gettempdir()
+    return xlsxwriter.Workbook(target, options)
+
+
+def build_workbook_file(write, constant_memory: bool = True):
+    """
+    Run write(workbook) against a fresh workbook backed by an anonymous temp
+    file and return that file, rewound and ready to send. The file is removed
+    as soon as it is closed.
+    """
+    fh = tempfile.TemporaryFile(suffix=".xlsx")
+    try:
+        wb = new_workbook(fh, constant_memory=constant_memory)
+        try:
+            write(wb)
+        finally:
+            wb.close()
+        fh.seek(0)
+        return fh
+    except Exception:
+        fh.close()
+        raise
+
+
+def send_workbook(write, download_name: str, constant_memory: bool = True):
+    """build_workbook_file + send_file as an .xlsx attachment."""
+    fh = build_workbook_file(write, constant_memory=constant_memory)
+    return send_file(
+        fh,
+        mimetype=XLSX_MIMETYPE,
+        as_attachment=True,
+        download_name=download_name,
+    )
+
+
+# -----------------------------
+# Formats
+# -----------------------------
+class FormatCache:
+    """workbook.add_format() keyed by its properties, so each style is created once."""
+
+    def __init__(self, workbook):
+        self.workbook = workbook
+        self._formats = {}
+
+    def get(self, props=None, **extra):
+        merged = dict(props or {})
+        merged.update(extra)
+        if not merged:
+            return None
+        key = tuple(sorted(merged.items()))
+        fmt = self._formats.get(key)
+        if fmt is None:
+            fmt = self.workbook.add_format(merged)
+            self._formats[key] = fmt
+        return fmt
+
+    def __len__(self):
+        return len(self._formats)
+
+
+# -----------------------------
+# Masks
+# -----------------------------
+def truthy_mask(series: pd.Series) -> np.ndarray:
+    """True where the value reads as 1/true/yes (case-insensitive)."""
+    return series.astype(str).str.strip().str.lower().isin(TRUTHY_STRINGS).to_numpy()
+
+
+def error_field_mask(df: pd.DataFrame, columns, error_col: str = "ErrorFields") -> np.ndarray:
+    """
+    rows x columns boolean matrix: True where the column name appears in the
+    row's comma-separated error_col list (case-insensitive).
+    """
+    mask = np.zeros((len(df), len(columns)), dtype=bool)
+    if error_col not in df.columns or not len(df):
+        return mask
+    fields = (
+        df[error_col].where(df[error_col].notna(), "").astype(str).str.lower()
+        .str.replace(r"\s*,\s*", ",", regex=True).str.strip()
+    )
+    wrapped = "," + fields + ","
+    for j, col in enumerate(columns):
+        mask[:, j] = wrapped.str.contains(f",{re.escape(str(col).lower())},", regex=True).to_numpy()
+    return mask
+
+
+# -----------------------------
+# Rows
+# -----------------------------
+def frame_rows(df: pd.DataFrame, columns=None) -> list:
+    """DataFrame -> list of row lists with plain Python values (NaN/NA -> None)."""
+    columns = list(df.columns) if columns is None else list(columns)
+    if not columns:
+        return [[] for _ in range(len(df))]
+    cols = []
+    for col in columns:
+        s = df[col]
+        cols.append(s.astype(object).where(s.notna(), None).tolist())
+    return [list(r) for r in zip(*cols)]
+
+
+def write_row_runs(ws, row: int, first_col: int, values, formats=None):
+    """
+    write_row for a row whose cells may have different formats: consecutive
+    cells sharing a format go out in one write_row call. formats may be None
+    (column formats apply) or a list aligned with values.
+    """
+    if formats is None:
+        ws.write_row(row, first_col, values)
+        return
+    n = len(values)
+    start = 0
+    while start < n:
+        fmt = formats[start]
+        end = start + 1
+        while end < n and formats[end] is fmt:
+            end += 1
+        chunk = values[start:end]
+        if fmt is None:
+            ws.write_row(row, first_col + start, chunk)
+        else:
+            ws.write_row(row, first_col + start, chunk, fmt)
+        start = end
+
+
+def write_frame_rows(ws, rows, start_row: int = 0, first_col: int = 0,
+                     base_formats=None, highlight_mask=None, highlight_format=None):
+    """
+    Write pre-built rows (see frame_rows) from start_row down.
+
+    base_formats    : per-column format list (None entries = leave to set_column)
+    highlight_mask  : optional rows x cols bool array; True cells get highlight_format
+    """
+    ncols = len(rows[0]) if rows else 0
+    base = list(base_formats) if base_formats is not None else [None] * ncols
+    plain = base if any(f is not None for f in base) else None
+    has_mask = highlight_mask is not None and highlight_format is not None and highlight_mask.any()
+
+    for i, values in enumerate(rows):
+        if has_mask and highlight_mask[i].any():
+            fmts = [highlight_format if hit else f for hit, f in zip(highlight_mask[i], base)]
+        else:
+            fmts = plain
+        write_row_runs(ws, start_row + i, first_col, values, fmts)
+    return start_row + len(rows)
@@ -0,0 +1,186 @@
+# app/utils/figure_export.py
+"""
+Figure export stage for /Reports.
+
+export_figure() draws a Matplotlib figure once with Agg and takes both
+raster outputs from that one pixel buffer:
+
+    <out_dir>/<report_id>.png           full-resolution PNG (download)
+    <out_dir>/<report_id>.preview.png   downsampled copy for the page
+    <out_dir>/<report_id>.pdf           vector PDF (optional)
+
+"Tight" exports compute the bounding box once from the same render: the PNG
+is cropped to it and the PDF is saved with it, instead of savefig(...,
+bbox_inches="tight") laying the figure out again for every format.
+
+Timings per report type and stage are kept in render_timings
+(/admin/metrics -> "report_render").
+"""
+import io
+import os
+import threading
+import time
+from pathlib import Path
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+PREVIEW_MAX_PX = int(_env_float("REPORT_PREVIEW_MAX_PX", 1600))
+
+
+class RenderTimings:
+    """count / avg / max milliseconds per (report type, stage)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def record(self, report_type, stage: str, seconds: float) -> None:
+        ms = seconds * 1000.0
+        with self._lock:
+            slot = self._data.setdefault(report_type or "unknown", {}).setdefault(
+                stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0}
+            )
+            slot["count"] += 1
+            slot["total_ms"] += ms
+            slot["last_ms"] = ms
+            slot["max_ms"] = max(slot["max_ms"], ms)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                report_type: {
+                    stage: {
+                        "count": s["count"],
+                        "avg_ms": round(s["total_ms"] / s["count"], 1),
+                        "max_ms": round(s["max_ms"], 1),
+                        "last_ms": round(s["last_ms"], 1),
+                    }
+                    for stage, s in stages.items()
+                }
+                for report_type, stages in self._data.items()
+            }
+
+
+render_timings = RenderTimings()
+
+
+def preview_path(out_dir: Path, report_id: str) -> Path:
+    return Path(out_dir) / f"{report_id}.preview.png"
+
+
+def _agg_canvas(fig):
+    canvas = fig.canvas
+    if not isinstance(canvas, FigureCanvasAgg):
+        canvas = FigureCanvasAgg(fig)
+    return canvas
+
+
+def _tight_pixel_box(fig, bbox, dpi, size):
+    """bbox (inches, origin bottom-left) -> PIL crop box, or None if it leaves the canvas."""
+    width, height = size
+    fig_h_in = height / dpi
+    box = (
+        int(round(bbox.x0 * dpi)),
+        int(round((fig_h_in - bbox.y1) * dpi)),
+        int(round(bbox.x1 * dpi)),
+        int(round((fig_h_in - bbox.y0) * dpi)),
+    )
+    if box[0] < 0 or box[1] < 0 or box[2] > width or box[3] > height:
+        return None
+    return box
+
+
+def _save_png(image, path: Path, compress_level: int = 6) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    image.save(tmp, format="PNG", compress_level=compress_level)
+    os.replace(tmp, path)
+
+
+def export_figure(
+    fig,
+    out_dir: Path,
+    report_id: str,
+    *,
+    report_type: str = None,
+    dpi: int = 200,
+    pdf: bool = True,
+    tight: bool = False,
+    preview_max_px: int = PREVIEW_MAX_PX,
+) -> dict:
+    """
+    Write <report_id>.png, .preview.png and (if pdf) .pdf for fig.
+    Returns {"png", "preview", "pdf", "timings_ms"}. The caller still owns
+    (and closes) the figure.
+    """
+    out_dir = Path(out_dir)
+    png_path = out_dir / f"{report_id}.png"
+    prev_path = preview_path(out_dir, report_id)
+    pdf_path = out_dir / f"{report_id}.pdf" if pdf else None
+    timings = {}
+
+    # ---- one raster draw ----
+    t0 = time.perf_counter()
+    original_dpi = fig.dpi
+    canvas = _agg_canvas(fig)
+    bbox_inches = None
+    box = None
+    try:
+        fig.dpi = dpi
+        canvas.draw()
+        size = canvas.get_width_height()
+        image = Image.frombuffer("RGBA", size, canvas.buffer_rgba(), "raw", "RGBA", 0, 1).copy()
+        if tight:
+            bbox_inches = fig.get_tightbbox(canvas.get_renderer())
+            box = _tight_pixel_box(fig, bbox_inches, dpi, size)
+            if box is not None:
+                image = image.crop(box)
+    finally:
+        fig.dpi = original_dpi
+
+    if tight and box is None:
+        # Artists stick out past the canvas: let savefig grow it like before
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=dpi, bbox_inches=bbox_inches, pad_inches=0)
+        buf.seek(0)
+        image = Image.open(buf)
+        image.load()
+
+    _save_png(image, png_path)
+    timings["raster"] = time.perf_counter() - t0
+
+    # ---- preview from the same pixels ----
+    t1 = time.perf_counter()
+    preview = image
+    if preview_max_px and max(image.size) > preview_max_px:
+        preview = image.copy()
+        preview.thumbnail((preview_max_px, preview_max_px), Image.LANCZOS, reducing_gap=2.0)
+    _save_png(preview, prev_path, compress_level=3)
+    timings["preview"] = time.perf_counter() - t1
+
+    # ---- vector PDF, reusing the layout box ----
+    if pdf_path is not None:
+        t2 = time.perf_counter()
+        if tight:
+            fig.savefig(pdf_path, format="pdf", bbox_inches=bbox_inches, pad_inches=0)
+        else:
+            fig.savefig(pdf_path, format="pdf")
+        timings["pdf"] = time.perf_counter() - t2
+
+    for stage, seconds in timings.items():
+        render_timings.record(report_type, stage, seconds)
+
+    return {
+        "png": png_path,
+        "preview": prev_path,
+        "pdf": pdf_path,
+        "timings_ms": {k: round(v * 1000, 1) for k, v in timings.items()},
+    }
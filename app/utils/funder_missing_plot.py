@@ -3,11 +3,14 @@
 from pathlib import Path
 import os
 import re
+import threading
 import xml.etree.ElementTree as ET
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle
+from matplotlib.path import Path as MplPath
 import matplotlib.patches as mpatches
 import matplotlib.patches as patches
 from svgpath2mpl import parse_path
@@ -71,14 +74,10 @@ def _parse_svg_viewbox(svg_path: str, debug: bool = False):
         print(f"[svg-footer] Parsing viewBox from: {svg_path}")
         print(f"[svg-footer] Exists? {os.path.exists(svg_path)}")
 
-    tree = ET.parse(svg_path)
-    root = tree.getroot()
+    return _svg_root_viewbox(ET.parse(svg_path).getroot(), debug=debug)
 
-    # Default namespace handling
-    tag = root.tag
-    m = re.match(r"\{(.*)\}", tag)
-    ns = m.group(1) if m else "http://www.w3.org/2000/svg"
 
+def _svg_root_viewbox(root, debug: bool = False):
     viewBox = root.attrib.get("viewBox")
     if debug:
         print(f"[svg-footer] root tag: {root.tag}")
@@ -114,6 +113,86 @@ def _parse_svg_viewbox(svg_path: str, debug: bool = False):
     return 0.0, 0.0, 100.0, 20.0
 
 
+# ---------- parsed SVG footers ----------
+# footer.svg is one large <path>; parse_path() on it dominated every page
+# that carries the footer. Each file is parsed once per process (re-parsed
+# if its mtime changes) into read-only matplotlib Paths; pages only create
+# the PathPatch artists.
+class _SvgFooter:
+    __slots__ = ("viewbox", "shapes", "xlim", "ylim")
+
+    def __init__(self, viewbox, shapes, xlim, ylim):
+        self.viewbox = viewbox  # (min_x, min_y, vb_w, vb_h)
+        self.shapes = shapes    # ((Path, fill, stroke), ...)
+        self.xlim = xlim        # vertex extent, SVG units
+        self.ylim = ylim
+
+
+_SVG_FOOTERS = {}  # abs path -> (mtime_ns, _SvgFooter)
+_SVG_FOOTERS_LOCK = threading.Lock()
+
+
+def _parse_svg_footer(svg_path: str, debug: bool = False) -> _SvgFooter:
+    root = ET.parse(svg_path).getroot()
+    viewbox = _svg_root_viewbox(root, debug=debug)
+
+    m = re.match(r"\{(.*)\}", root.tag)
+    ns = m.group(1) if m else "http://www.w3.org/2000/svg"
+    path_tag = f"{{{ns}}}path"
+
+    shapes = []
+    for path_el in root.iter(path_tag):
+        d = path_el.attrib.get("d")
+        if not d:
+            continue
+
+        parsed = parse_path(d)
+        mpl_path = MplPath(parsed.vertices, parsed.codes, readonly=True)
+
+        style = path_el.attrib.get("style", "")
+        stroke = path_el.attrib.get("stroke", "#1a427d")
+        fill = path_el.attrib.get("fill", "none")
+
+        if "fill:" in style:
+            m_fill = re.search(r"fill:([^;]+)", style)
+            if m_fill:
+                fill = m_fill.group(1).strip()
+
+        if "stroke:" in style:
+            m_stroke = re.search(r"stroke:([^;]+)", style)
+            if m_stroke:
+                stroke = m_stroke.group(1).strip()
+
+        shapes.append((mpl_path, fill, stroke))
+
+    if shapes:
+        verts = np.concatenate([p.vertices for p, _, _ in shapes])
+        xlim = (float(verts[:, 0].min()), float(verts[:, 0].max()))
+        ylim = (float(verts[:, 1].min()), float(verts[:, 1].max()))
+    else:
+        xlim = ylim = None
+    return _SvgFooter(viewbox, tuple(shapes), xlim, ylim)
+
+
+def load_svg_footer(footer_svg, debug: bool = False) -> _SvgFooter:
+    """Parsed footer for footer_svg, from the per-process cache when the file is unchanged."""
+    key = os.path.abspath(str(footer_svg))
+    mtime = os.stat(key).st_mtime_ns
+    cached = _SVG_FOOTERS.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with _SVG_FOOTERS_LOCK:
+        cached = _SVG_FOOTERS.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        footer = _parse_svg_footer(key, debug=debug)
+        _SVG_FOOTERS[key] = (mtime, footer)
+    if debug:
+        print(f"[svg-footer] parsed {key}: {len(footer.shapes)} paths")
+    return footer
+
+
 def add_full_width_footer_svg(
     fig: plt.Figure,
     footer_svg: str,
@@ -137,8 +216,10 @@ def add_full_width_footer_svg(
     if debug:
         print(f"[svg-footer] Figure size: {width_in:.2f} x {height_in:.2f} in")
 
+    footer = load_svg_footer(footer_svg, debug=debug)
+
     # --- SVG viewBox for aspect ratio ---
-    min_x, min_y, vb_w, vb_h = _parse_svg_viewbox(footer_svg, debug=debug)
+    min_x, min_y, vb_w, vb_h = footer.viewbox
     svg_aspect = vb_h / vb_w
 
     # Height needed if width fits exactly
@@ -179,43 +260,8 @@ def add_full_width_footer_svg(
 
     ax.axis("off")
 
-    # --- Parse SVG paths ---
-    tree = ET.parse(footer_svg)
-    root = tree.getroot()
-
-    m = re.match(r"\{(.*)\}", root.tag)
-    ns = m.group(1) if m else "http://www.w3.org/2000/svg"
-    path_tag = f"{{{ns}}}path"
-
-    all_x, all_y = [], []
-    path_count = 0
-
-    for path_el in root.iter(path_tag):
-        d = path_el.attrib.get("d")
-        if not d:
-            continue
-
-        path_count += 1
-        mpl_path = parse_path(d)
-
-        verts = mpl_path.vertices
-        all_x.extend(verts[:, 0])
-        all_y.extend(verts[:, 1])
-
-        style = path_el.attrib.get("style", "")
-        stroke = path_el.attrib.get("stroke", "#1a427d")
-        fill = path_el.attrib.get("fill", "none")
-
-        if "fill:" in style:
-            m_fill = re.search(r"fill:([^;]+)", style)
-            if m_fill:
-                fill = m_fill.group(1).strip()
-
-        if "stroke:" in style:
-            m_stroke = re.search(r"stroke:([^;]+)", style)
-            if m_stroke:
-                stroke = m_stroke.group(1).strip()
-
+    # --- Paths (parsed once, see load_svg_footer) ---
+    for mpl_path, fill, stroke in footer.shapes:
         if col_master is not None:
             fill = stroke = col_master
 
@@ -225,19 +271,21 @@ def add_full_width_footer_svg(
             edgecolor=None if stroke in ("none", "transparent") else stroke,
             linewidth=0,
         )
-        ax.add_patch(patch)
+        # add_artist, not add_patch: add_patch walks every bezier segment to
+        # update data limits, and the limits are set from footer.xlim/ylim below
+        ax.add_artist(patch)
 
     if debug:
-        print(f"[svg-footer] Total paths drawn: {path_count}")
+        print(f"[svg-footer] Total paths drawn: {len(footer.shapes)}")
 
-    if path_count == 0:
+    if not footer.shapes:
         if debug:
             print("[svg-footer] ⚠ No <path> elements found.")
         return
 
     # --- Set limits: full width, crop bottom if needed ---
-    xmin, xmax = min(all_x), max(all_x)
-    ymin, ymax = min(all_y), max(all_y)
+    xmin, xmax = footer.xlim
+    ymin, ymax = footer.ylim
 
     ax.set_xlim(xmin, xmax)
 
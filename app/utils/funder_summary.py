@@ -11,7 +11,7 @@ from app.report_utils.FNT_PolygonText import draw_text_in_polygon
 from app.report_utils.SHP_RoundRect import rounded_rect_polygon
 from app.report_utils.TAB_DataframeTable import draw_dataframe_table_v2
 from app.report_utils.helpers import load_ppmori_fonts
-from app.report_utils.pdf_builder import close_pdf, new_page, open_pdf, save_page
+from app.report_utils.pdf_builder import PageSpec, close_pdf, open_pdf, render_pages
 
 
 # ============================================================
@@ -245,6 +245,227 @@ def _overall_totals_from_terms(term_blocks: List[Tuple[int, int, pd.DataFrame]])
     return out
 
 
+# ------------------------------------------------------------
+# Page drawing (PageSpec: may run in a page worker process)
+# ------------------------------------------------------------
+def _progress_row_highlight(row: pd.Series, r: int) -> Optional[Tuple[str, str]]:
+    try:
+        if COL_NO_PROGRESS in row and pd.notna(row[COL_NO_PROGRESS]):
+            if int(row[COL_NO_PROGRESS]) > 0:
+                return "#f4f6ff", "#111111"
+    except Exception:
+        pass
+    return None
+
+
+def _draw_progress_page(
+    *,
+    fig,
+    ax,
+    family: str,
+    title: str,
+    df_page: pd.DataFrame,
+    cols: List[Dict[str, Any]],
+    merge_first: bool,
+    term_summary_text: str,
+    note_text: str,
+    overall_summary_text: Optional[str] = None,
+):
+    """
+    One table page of the progress summary (a PageSpec draw function).
+    overall_summary_text is only passed for the last rendered page.
+    """
+    # ---- Consistent geometry for bottom section (SINGLE source of truth)
+    # These are AXES FRACTIONS (0..1)
+    TABLE_X = 0.02
+    TABLE_W = 0.96
+    TABLE_Y = 0.12
+    TABLE_H = 0.80
+
+    BAR_W = 0.96
+    GAP = 0.010  # ✅ this controls ALL the gaps
+
+    BAR_H_TERM = 0.022
+    BAR_H_NOTE = 0.025
+    BAR_H_OVER = 0.022
+
+    # ---- Header bar
+    header_poly = rounded_rect_polygon(
+        cx=0.5,
+        cy=0.955,
+        width=0.96,
+        height=0.055,
+        ratio=0.45,
+        corners_round=[1, 3],
+        n_arc=64,
+    )
+    ax.add_patch(
+        mpatches.Polygon(
+            list(header_poly.exterior.coords),
+            closed=True,
+            facecolor="#1a427d",
+            edgecolor="#1a427d",
+            linewidth=1.5,
+            transform=ax.transAxes,
+        )
+    )
+
+    draw_text_in_polygon(
+        ax,
+        poly=header_poly,
+        text=title,
+        fontfamily=family,
+        fontsize=20,
+        fontweight="semibold",
+        color="#ffffff",
+        pad_frac=0.05,
+        wrap=True,
+        autoshrink=True,
+        clip_to_polygon=True,
+        max_lines=None,
+    )
+
+    # ---- Table
+    draw_dataframe_table_v2(
+        ax,
+        df=df_page,
+        x=TABLE_X,
+        y=TABLE_Y,
+        width=TABLE_W,
+        height=TABLE_H,
+        header_height_frac=0.042,
+        columns=cols,
+        base_row_facecolor="#ffffff",
+        row_color_fn=_progress_row_highlight,
+        merge_col_indices=[0] if merge_first else None,
+        shift=False,
+    )
+
+    # ============================================================
+    # Bottom section with CONSISTENT gaps
+    # table -> term summary == term summary -> note == note -> overall
+    # ============================================================
+    table_bottom_y = TABLE_Y
+
+    # Term summary sits GAP below table
+    term_top = table_bottom_y - GAP
+    term_cy = term_top - (BAR_H_TERM / 2)
+
+    # Note sits GAP below term summary
+    note_top = (term_cy - BAR_H_TERM / 2) - GAP
+    note_cy = note_top - (BAR_H_NOTE / 2)
+
+    # Overall sits GAP below note
+    over_top = (note_cy - BAR_H_NOTE / 2) - GAP
+    over_cy = over_top - (BAR_H_OVER / 2)
+
+    # ---- Term summary bar
+    term_sum_poly = rounded_rect_polygon(
+        cx=0.5,
+        cy=term_cy,
+        width=BAR_W,
+        height=BAR_H_TERM,
+        ratio=0.45,
+        corners_round=[1, 3],
+        n_arc=64,
+    )
+    ax.add_patch(
+        mpatches.Polygon(
+            list(term_sum_poly.exterior.coords),
+            closed=True,
+            facecolor="#eef2ff",
+            edgecolor="#1a427d",
+            linewidth=1.2,
+            transform=ax.transAxes,
+        )
+    )
+    draw_text_in_polygon(
+        ax,
+        poly=term_sum_poly,
+        text=term_summary_text,
+        fontfamily=family,
+        fontsize=12,
+        fontweight="semibold",
+        color="#1a427d",
+        pad_frac=0.06,
+        wrap=False,
+        autoshrink=True,
+        clip_to_polygon=True,
+        max_lines=1,
+    )
+
+    # ---- Definition note bar
+    note_poly = rounded_rect_polygon(
+        cx=0.5,
+        cy=note_cy,
+        width=BAR_W,
+        height=BAR_H_NOTE,
+        ratio=0.45,
+        corners_round=[1, 3],
+        n_arc=64,
+    )
+    ax.add_patch(
+        mpatches.Polygon(
+            list(note_poly.exterior.coords),
+            closed=True,
+            facecolor="#1a427d",
+            edgecolor="#1a427d",
+            linewidth=1,
+            transform=ax.transAxes,
+        )
+    )
+    draw_text_in_polygon(
+        ax,
+        poly=note_poly,
+        text=note_text,
+        fontfamily=family,
+        fontsize=10,
+        fontweight="semibold",
+        color="#ffffff",
+        pad_frac=0.10,
+        wrap=True,
+        autoshrink=True,
+        clip_to_polygon=True,
+        max_lines=2,
+    )
+
+    # ---- Overall summary (LAST RENDERED PAGE ONLY)
+    if overall_summary_text:
+        overall_poly = rounded_rect_polygon(
+            cx=0.5,
+            cy=over_cy,
+            width=BAR_W,
+            height=BAR_H_OVER,
+            ratio=0.45,
+            corners_round=[1, 3],
+            n_arc=64,
+        )
+        ax.add_patch(
+            mpatches.Polygon(
+                list(overall_poly.exterior.coords),
+                closed=True,
+                facecolor="#eef2ff",
+                edgecolor="#1a427d",
+                linewidth=1.2,
+                transform=ax.transAxes,
+            )
+        )
+        draw_text_in_polygon(
+            ax,
+            poly=overall_poly,
+            text=overall_summary_text,
+            fontfamily=family,
+            fontsize=12,
+            fontweight="semibold",
+            color="#1a427d",
+            pad_frac=0.06,
+            wrap=False,
+            autoshrink=True,
+            clip_to_polygon=True,
+            max_lines=1,
+        )
+
+
 # ------------------------------------------------------------
 # Public PDF builder
 # ------------------------------------------------------------
@@ -329,16 +550,6 @@ def build_funder_progress_summary_pdf(
 
     last_key = render_plan[-1] if render_plan else None
 
-    pdf, w, h, _dpi = open_pdf(
-        filename=str(out_pdf_path),
-        page_size=page_size,
-        orientation=orientation,
-        dpi=dpi,
-    )
-
-    preview_fig = None
-    page_count = 0
-
     table_columns = [
         {"key": COL_PROVIDER, "label": "Provider", "width_frac": 0.22, "align": "left", "wrap": True, "max_lines": 3},
         {"key": COL_SCHOOL, "label": "School", "width_frac": 0.22, "align": "left", "wrap": True, "max_lines": 3},
@@ -362,29 +573,14 @@ def build_funder_progress_summary_pdf(
         keys = set(df.columns)
         return [c for c in table_columns if c["key"] in keys]
 
-    def row_highlight(row: pd.Series, r: int) -> Optional[Tuple[str, str]]:
-        try:
-            if COL_NO_PROGRESS in row and pd.notna(row[COL_NO_PROGRESS]):
-                if int(row[COL_NO_PROGRESS]) > 0:
-                    return "#f4f6ff", "#111111"
-        except Exception:
-            pass
-        return None
-
-    # ---- Consistent geometry for bottom section (SINGLE source of truth)
-    # These are AXES FRACTIONS (0..1)
-    TABLE_X = 0.02
-    TABLE_W = 0.96
-    TABLE_Y = 0.12
-    TABLE_H = 0.80
-
-    BAR_W = 0.96
-    GAP = 0.010  # ✅ this controls ALL the gaps
-
-    BAR_H_TERM = 0.022
-    BAR_H_NOTE = 0.025
-    BAR_H_OVER = 0.022
+    note_text = (
+        "For a student to progress they need to have at least one new competency marked as achieved. "
+        f"For a class to be edited {threshold * 100:.0f}% of students must be marked as complete. "
+        "For a class to have no progress no students have had a new competency marked as achieved."
+    )
+    footer = str(footer_png) if footer_png else None
 
+    specs: List[PageSpec] = []
     for (year, term, df_term) in term_blocks:
         if df_term is None or df_term.empty:
             continue
@@ -410,218 +606,41 @@ def build_funder_progress_summary_pdf(
         provider_col = COL_PROVIDER if COL_PROVIDER in df_term.columns else None
 
         for term_page_idx, df_page in enumerate(pages, start=1):
-            page_count += 1
             is_last_rendered_page = (last_key == (year, term, term_page_idx))
 
-            fig, ax = new_page(w, h, dpi)
-
-            # ---- Header bar
-            header_poly = rounded_rect_polygon(
-                cx=0.5,
-                cy=0.955,
-                width=0.96,
-                height=0.055,
-                ratio=0.45,
-                corners_round=[1, 3],
-                n_arc=64,
-            )
-            ax.add_patch(
-                mpatches.Polygon(
-                    list(header_poly.exterior.coords),
-                    closed=True,
-                    facecolor="#1a427d",
-                    edgecolor="#1a427d",
-                    linewidth=1.5,
-                    transform=ax.transAxes,
-                )
-            )
-
             title = f"{funder_name} - {year} Term {term}"
             if len(pages) > 1:
                 title = f"{title} (Page {term_page_idx} of {len(pages)})"
 
-            draw_text_in_polygon(
-                ax,
-                poly=header_poly,
-                text=title,
-                fontfamily=family,
-                fontsize=20,
-                fontweight="semibold",
-                color="#ffffff",
-                pad_frac=0.05,
-                wrap=True,
-                autoshrink=True,
-                clip_to_polygon=True,
-                max_lines=None,
-            )
-
-            # ---- Table
-            cols = _filter_table_columns(df_page)
-
-            merge_first = bool(provider_col) and (provider_col in df_page.columns)
-            merge_key = provider_col or ""
-            draw_dataframe_table_v2(
-                ax,
-                df=df_page,
-                x=TABLE_X,
-                y=TABLE_Y,
-                width=TABLE_W,
-                height=TABLE_H,
-                header_height_frac=0.042,
-                columns=cols,
-                base_row_facecolor="#ffffff",
-                row_color_fn=row_highlight,
-                merge_col_indices=[0] if merge_first else None,
-                shift=False,
-            )
-
-            # ============================================================
-            # Bottom section with CONSISTENT gaps
-            # table -> term summary == term summary -> note == note -> overall
-            # ============================================================
-            table_bottom_y = TABLE_Y
-
-            # Term summary sits GAP below table
-            term_top = table_bottom_y - GAP
-            term_cy = term_top - (BAR_H_TERM / 2)
-
-            # Note sits GAP below term summary
-            note_top = (term_cy - BAR_H_TERM / 2) - GAP
-            note_cy = note_top - (BAR_H_NOTE / 2)
-
-            # Overall sits GAP below note
-            over_top = (note_cy - BAR_H_NOTE / 2) - GAP
-            over_cy = over_top - (BAR_H_OVER / 2)
-
-            # ---- Term summary bar
-            term_sum_poly = rounded_rect_polygon(
-                cx=0.5,
-                cy=term_cy,
-                width=BAR_W,
-                height=BAR_H_TERM,
-                ratio=0.45,
-                corners_round=[1, 3],
-                n_arc=64,
-            )
-            ax.add_patch(
-                mpatches.Polygon(
-                    list(term_sum_poly.exterior.coords),
-                    closed=True,
-                    facecolor="#eef2ff",
-                    edgecolor="#1a427d",
-                    linewidth=1.2,
-                    transform=ax.transAxes,
-                )
-            )
-            draw_text_in_polygon(
-                ax,
-                poly=term_sum_poly,
-                text=term_summary_text,
-                fontfamily=family,
-                fontsize=12,
-                fontweight="semibold",
-                color="#1a427d",
-                pad_frac=0.06,
-                wrap=False,
-                autoshrink=True,
-                clip_to_polygon=True,
-                max_lines=1,
-            )
-
-            # ---- Definition note bar
-            note_poly = rounded_rect_polygon(
-                cx=0.5,
-                cy=note_cy,
-                width=BAR_W,
-                height=BAR_H_NOTE,
-                ratio=0.45,
-                corners_round=[1, 3],
-                n_arc=64,
-            )
-            ax.add_patch(
-                mpatches.Polygon(
-                    list(note_poly.exterior.coords),
-                    closed=True,
-                    facecolor="#1a427d",
-                    edgecolor="#1a427d",
-                    linewidth=1,
-                    transform=ax.transAxes,
-                )
-            )
-            note_text = (
-                "For a student to progress they need to have at least one new competency marked as achieved. "
-                f"For a class to be edited {threshold * 100:.0f}% of students must be marked as complete. "
-                "For a class to have no progress no students have had a new competency marked as achieved."
-            )
-            draw_text_in_polygon(
-                ax,
-                poly=note_poly,
-                text=note_text,
-                fontfamily=family,
-                fontsize=10,
-                fontweight="semibold",
-                color="#ffffff",
-                pad_frac=0.10,
-                wrap=True,
-                autoshrink=True,
-                clip_to_polygon=True,
-                max_lines=2,
-            )
-
-            # ---- Overall summary (LAST RENDERED PAGE ONLY)
-            if is_last_rendered_page:
-                overall_poly = rounded_rect_polygon(
-                    cx=0.5,
-                    cy=over_cy,
-                    width=BAR_W,
-                    height=BAR_H_OVER,
-                    ratio=0.45,
-                    corners_round=[1, 3],
-                    n_arc=64,
-                )
-                ax.add_patch(
-                    mpatches.Polygon(
-                        list(overall_poly.exterior.coords),
-                        closed=True,
-                        facecolor="#eef2ff",
-                        edgecolor="#1a427d",
-                        linewidth=1.2,
-                        transform=ax.transAxes,
-                    )
-                )
-                draw_text_in_polygon(
-                    ax,
-                    poly=overall_poly,
-                    text=overall_summary_text,
-                    fontfamily=family,
-                    fontsize=12,
-                    fontweight="semibold",
-                    color="#1a427d",
-                    pad_frac=0.06,
-                    wrap=False,
-                    autoshrink=True,
-                    clip_to_polygon=True,
-                    max_lines=1,
-                )
-
-            save_page(
-                pdf,
-                fig,
-                footer_png=str(footer_png) if footer_png else None,
-                width_in=w,
-                height_in=h,
-                footer_bottom_margin_frac=0.0,
+            specs.append(PageSpec(
+                _draw_progress_page,
+                dict(
+                    family=family,
+                    title=title,
+                    df_page=df_page,
+                    cols=_filter_table_columns(df_page),
+                    merge_first=bool(provider_col) and (provider_col in df_page.columns),
+                    term_summary_text=term_summary_text,
+                    note_text=note_text,
+                    overall_summary_text=overall_summary_text if is_last_rendered_page else None,
+                ),
+                footer_png=footer,
                 footer_max_height_frac=0.20,
-            )
+            ))
 
-            if preview_fig is None:
-                preview_fig = fig
-            else:
-                import matplotlib.pyplot as plt
-                plt.close(fig)
+    pdf, w, h, _dpi = open_pdf(
+        filename=str(out_pdf_path),
+        page_size=page_size,
+        orientation=orientation,
+        dpi=dpi,
+        parallel=True,
+    )
 
-    close_pdf(pdf)
-    meta["pages"] = page_count
+    try:
+        preview_fig = render_pages(pdf, specs, width_in=w, height_in=h, dpi=dpi, keep_first=True)
+    finally:
+        close_pdf(pdf)
+    meta["pages"] = len(specs)
     return preview_fig, meta
 
 
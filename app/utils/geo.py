@@ -1,14 +1,28 @@
 # app/utils/geo.py
+"""
+Map layers for the region report: regional council polygons (Stats NZ
+Datafinder) and lakes / rivers (LINZ), fetched over WFS.
+
+A local GeoPackage cache (app/static/geodata/nz_geodata.gpkg) makes the maps
+work offline. `flask --app run geodata-refresh` downloads the national
+layers once and stores them in EPSG:4326 (the CRS the region maps are drawn
+in), each also pre-simplified at GEODATA_TOLERANCES; every layer has the
+GeoPackage R-tree index, so loaders read only the features in their bbox.
+The loaders use the cache when it has the layer and fall back to WFS.
+"""
 from __future__ import annotations
 
 import io
+import json
 import os
 import re
+import time
 import xml.etree.ElementTree as ET
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Iterable, Optional, Tuple
 
+import click
 import geopandas as gpd
 import requests
 from shapely.geometry import box
@@ -24,6 +38,18 @@ DATAFINDER_WFS_BASE_DEFAULT = "https://datafinder.stats.govt.nz/services/wfs"
 # Some WFS services require namespace in typename, some don’t.
 # We’ll discover from GetCapabilities where possible.
 
+# Local cache
+GEODATA_DIR_DEFAULT = "app/static/geodata"
+GEODATA_FILE = "nz_geodata.gpkg"
+GEODATA_META = "nz_geodata.json"
+# Simplification tolerances (degrees) stored next to the full layers;
+# 0.002 is what the region maps ask for.
+GEODATA_TOLERANCES = (0.0005, 0.002, 0.01)
+
+LAYER_COUNCILS = "regional_councils"
+LAYER_LAKES = "lakes"
+LAYER_RIVERS = "rivers"
+
 
 # ----------------------------
 # Helpers
@@ -190,6 +216,150 @@ def _pick_typename(
     return f"layer-{layer_id}"
 
 
+# ----------------------------
+# Local cache (GeoPackage)
+# ----------------------------
+def _tol_token(tol: float) -> str:
+    return f"{float(tol):g}".replace(".", "p")
+
+
+def _layer_name(base: str, simplify_tol: float = 0.0) -> str:
+    if simplify_tol and float(simplify_tol) > 0:
+        return f"{base}_s{_tol_token(simplify_tol)}"
+    return base
+
+
+def _cache_paths(folder: str | Path) -> tuple[Path, Path]:
+    folder = Path(folder)
+    return folder / GEODATA_FILE, folder / GEODATA_META
+
+
+def geodata_cache_info(folder: str | Path = GEODATA_DIR_DEFAULT) -> Optional[dict]:
+    """The cache's metadata (layers, counts, refreshed_at), or None if there is no cache."""
+    gpkg, meta = _cache_paths(folder)
+    if not gpkg.exists() or not meta.exists():
+        return None
+    try:
+        with open(meta, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _read_cached_layer(
+    folder: str | Path,
+    base: str,
+    *,
+    simplify_tol: float = 0.0,
+    bbox_4326: Optional[Tuple[float, float, float, float]] = None,
+    debug: bool = False,
+) -> Optional[gpd.GeoDataFrame]:
+    """
+    The cached layer (pre-simplified at simplify_tol if that tolerance was
+    cached, else the full layer simplified here), bbox-filtered through the
+    R-tree index. None if the cache doesn't have the layer.
+    """
+    info = geodata_cache_info(folder)
+    if not info:
+        return None
+    layers = info.get("layers") or {}
+
+    name = _layer_name(base, simplify_tol)
+    simplify_here = False
+    if name not in layers:
+        if base not in layers:
+            return None
+        name, simplify_here = base, bool(simplify_tol and float(simplify_tol) > 0)
+
+    gpkg, _ = _cache_paths(folder)
+    bbox = tuple(map(float, bbox_4326)) if bbox_4326 is not None else None
+    t0 = time.perf_counter()
+    gdf = gpd.read_file(gpkg, layer=name, bbox=bbox)
+    if gdf.crs is None or gdf.crs.to_epsg() == 4326:
+        gdf = gdf.set_crs(epsg=4326, allow_override=True)
+
+    if simplify_here and len(gdf):
+        gdf["geometry"] = gdf.geometry.simplify(float(simplify_tol), preserve_topology=True)
+
+    if debug:
+        print(f"[geo] cache {name} bbox={bbox} -> {len(gdf)} features in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    return gdf
+
+
+def refresh_geodata_cache(
+    folder: str | Path = GEODATA_DIR_DEFAULT,
+    *,
+    tolerances: Iterable[float] = GEODATA_TOLERANCES,
+    datafinder_layer_id: int = 120945,
+    linz_lakes_layer_id: int = 50293,
+    linz_rivers_layer_id: int = 50328,
+    debug: bool = False,
+) -> dict:
+    """
+    Download the national council / lake / river layers over WFS and
+    (re)write the local GeoPackage. The new file is built next to the old
+    one and swapped in, so readers never see a half-written cache.
+    Returns the metadata written to nz_geodata.json.
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    gpkg, meta_path = _cache_paths(folder)
+    tolerances = sorted({float(t) for t in tolerances if float(t) > 0})
+
+    councils = load_regional_councils(
+        use_internet=True,
+        prefer_local=False,
+        datafinder_layer_id=int(datafinder_layer_id),
+        debug=debug,
+    )
+    lakes, rivers = load_lakes_and_rivers(
+        prefer_local=False,
+        linz_lakes_layer_id=int(linz_lakes_layer_id),
+        linz_rivers_layer_id=int(linz_rivers_layer_id),
+        debug=debug,
+    )
+
+    # still ends in .gpkg, or pyogrio warns about the extension on every layer
+    stem, ext = os.path.splitext(GEODATA_FILE)
+    tmp = folder / f".{stem}.{os.getpid()}.tmp{ext}"
+    tmp.unlink(missing_ok=True)
+    layers = {}
+    try:
+        for base, gdf in ((LAYER_COUNCILS, councils), (LAYER_LAKES, lakes), (LAYER_RIVERS, rivers)):
+            gdf = gdf if gdf.crs is not None else gdf.set_crs(epsg=4326)
+            gdf = gdf.to_crs(epsg=4326)
+            for tol in [0.0] + tolerances:
+                out = gdf
+                if tol > 0:
+                    out = gdf.copy()
+                    out["geometry"] = gdf.geometry.simplify(tol, preserve_topology=True)
+                name = _layer_name(base, tol)
+                out.to_file(tmp, layer=name, driver="GPKG", layer_options={"SPATIAL_INDEX": "YES"})
+                layers[name] = {"features": int(len(out)), "simplify_tol_deg": tol}
+                if debug:
+                    print(f"[geo] wrote {name}: {len(out)} features")
+        os.replace(tmp, gpkg)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    meta = {
+        "refreshed_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "crs": "EPSG:4326",
+        "sources": {
+            LAYER_COUNCILS: f"datafinder layer-{int(datafinder_layer_id)}",
+            LAYER_LAKES: f"linz layer-{int(linz_lakes_layer_id)}",
+            LAYER_RIVERS: f"linz layer-{int(linz_rivers_layer_id)}",
+        },
+        "tolerances": tolerances,
+        "layers": layers,
+    }
+    tmp_meta = meta_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_meta, "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, indent=2)
+    os.replace(tmp_meta, meta_path)
+    return meta
+
+
 # ----------------------------
 # Public loaders
 # ----------------------------
@@ -205,11 +375,14 @@ def load_lakes_and_rivers(
 ) -> tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
     """
     Returns (lakes_gdf, rivers_gdf) in EPSG:4326 unless service returns otherwise.
-    If prefer_local=True and geopackage/files exist, you can implement local caching later.
+    With prefer_local=True they come from the local GeoPackage cache when it
+    has them (see refresh_geodata_cache), otherwise from LINZ WFS.
     """
-    # Local caching hook (optional)
-    # For now: always WFS if prefer_local is False; if prefer_local True but no local files, WFS.
-    _ = Path(local_folder)
+    if prefer_local:
+        lakes = _read_cached_layer(local_folder, LAYER_LAKES, bbox_4326=bbox_4326, debug=debug)
+        rivers = _read_cached_layer(local_folder, LAYER_RIVERS, bbox_4326=bbox_4326, debug=debug)
+        if lakes is not None and rivers is not None:
+            return lakes, rivers
 
     linz_key = _env("LINZ_KEY", "LINZ_API_KEY")
     base = _wfs_base_with_key(_env("LINZ_WFS_BASE") or LINZ_WFS_BASE_DEFAULT, linz_key)
@@ -259,16 +432,36 @@ def load_regional_councils(
     datafinder_layer_id: int = 120945,
     bbox_4326: Optional[Tuple[float, float, float, float]] = None,
     datafinder_typename: Optional[str] = None,
+    local_folder: str | Path = GEODATA_DIR_DEFAULT,
+    prefer_local: bool = True,
 ) -> gpd.GeoDataFrame:
     """
     Stats NZ Datafinder: Regional council 2025 clipped (layer 120945).
 
+    With prefer_local=True the polygons come from the local GeoPackage cache
+    when it has them (pre-simplified if simplify_tol_deg is one of the cached
+    tolerances); use_internet=False never goes to WFS.
+
     IMPORTANT:
     - Datafinder in your tests returns 401 if you use ?key=... query param.
     - So we build base as .../services;key=KEY/wfs (path style).
     """
+    if prefer_local or not use_internet:
+        gdf = _read_cached_layer(
+            local_folder,
+            LAYER_COUNCILS,
+            simplify_tol=float(simplify_tol_deg or 0.0),
+            bbox_4326=bbox_4326,
+            debug=debug,
+        )
+        if gdf is not None:
+            return gdf
+
     if not use_internet:
-        raise RuntimeError("load_regional_councils(use_internet=False) not implemented (no local councils cache).")
+        raise RuntimeError(
+            f"No regional councils in the local geodata cache ({Path(local_folder) / GEODATA_FILE}); "
+            "run `flask --app run geodata-refresh` or allow use_internet."
+        )
 
     df_key = _env("DATAFINDER_KEY", "DATAFINDER_API_KEY")
     df_base_env = _env("DATAFINDER_WFS_BASE") or DATAFINDER_WFS_BASE_DEFAULT
@@ -303,4 +496,23 @@ def load_regional_councils(
         except Exception:
             pass
 
-    return gdf
\ No newline at end of file
+    return gdf
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+@click.command("geodata-refresh")
+@click.option("--folder", default=GEODATA_DIR_DEFAULT, show_default=True, type=click.Path(file_okay=False))
+@click.option("--tolerance", "tolerances", type=float, multiple=True,
+              help="Simplification tolerance in degrees (repeatable; default GEODATA_TOLERANCES).")
+@click.option("--debug", is_flag=True)
+def geodata_refresh_command(folder, tolerances, debug):
+    """Download council / lake / river layers into the local GeoPackage cache."""
+    t0 = time.perf_counter()
+    meta = refresh_geodata_cache(folder, tolerances=tolerances or GEODATA_TOLERANCES, debug=debug)
+    for name, layer in meta["layers"].items():
+        click.echo(f"{name:<28} {layer['features']:>7} features")
+    gpkg, _ = _cache_paths(folder)
+    size_mb = gpkg.stat().st_size / 1e6
+    click.echo(f"✅ {gpkg} ({size_mb:.1f} MB) refreshed in {time.perf_counter() - t0:.1f}s")
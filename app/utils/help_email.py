@@ -20,7 +20,9 @@ import traceback
 from pathlib import Path
 
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from app.utils.database import get_engine_for_url
+from app.utils.email_outbox import outbox, queue_email
 
 from flask import Flask
 from flask_mail import Mail, Message
@@ -79,7 +81,7 @@ def get_engine():
     db_url = os.getenv("DB_URL_CUSTOM")
     if not db_url:
         raise RuntimeError("DB_URL_CUSTOM is not set in environment variables.")
-    return create_engine(db_url, pool_pre_ping=True, future=True)
+    return get_engine_for_url(db_url)
 
 
 def normalize_email(e: str) -> str:
@@ -191,7 +193,7 @@ def send_email(*, to_addr: str, subject: str, html_body: str, attachments: list[
         with path.open("rb") as f:
             msg.attach(filename=path.name, content_type=ctype, data=f.read())
 
-    mail.send(msg)
+    queue_email(msg, mail=mail, kind="help_email")
 
 
 # =========================
@@ -258,6 +260,10 @@ def run_batch():
                 print(f"❌ Failed for recipient={real_to}: {e}")
                 print(traceback.format_exc())
 
+    # Queued above; send them now over one connection before the script exits
+    with app.app_context():
+        outbox.drain()
+
     print(f"Done. Sent={sent}, Failed={failed}, Skipped={skipped}, TotalRows={len(df)}")
 
 
@@ -0,0 +1,146 @@
+# app/utils/icon_cache.py
+"""
+Decoded-icon cache for the competency icon reports.
+
+GetCompetencyIcons returns each icon as PNG bytes; every report build used
+to imread() and trim_white_border() every icon again. Decoded, trimmed
+arrays are now kept
+
+- in memory per process (LRU, ICON_CACHE_MAX_ENTRIES), and
+- on disk as ICON_CACHE_DIR/c<CompetencyID>_<sha256[:24]>.npy, loaded
+  memory-mapped, so the other gunicorn worker and later restarts skip the
+  decode too.
+
+The key is the image bytes' hash, so an icon is only decoded again when it
+actually changes; storing a new version for a competency removes that
+competency's old .npy files.
+
+Usage:
+    img = icon_cache.get(image_bytes, icon_id=row.get("CompetencyID"), decode=decode_fn)
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+ICON_CACHE_DIR = Path(os.getenv(
+    "ICON_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "wsfl_icon_cache"),
+))
+ICON_CACHE_MAX_ENTRIES = int(_env_float("ICON_CACHE_MAX_ENTRIES", 512))
+
+
+def _icon_prefix(icon_id) -> str:
+    try:
+        return f"c{int(icon_id)}_"
+    except (TypeError, ValueError):
+        return "icon_"
+
+
+class IconCache:
+    def __init__(self, root: Path, max_entries=512):
+        self.root = root
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # digest -> read-only ndarray
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "decodes": 0, "decode_ms_total": 0.0, "disk_errors": 0}
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            self.root = None
+
+    def get(self, image_bytes: bytes, *, icon_id=None, decode) -> np.ndarray:
+        """Decoded (and trimmed) icon for image_bytes; decode(bytes) runs only on a miss."""
+        digest = hashlib.sha256(image_bytes).hexdigest()[:24]
+        with self._lock:
+            img = self._entries.get(digest)
+            if img is not None:
+                self._entries.move_to_end(digest)
+                self._stats["hits"] += 1
+                return img
+
+        img = self._load(digest)
+        if img is not None:
+            self._bump("disk_hits")
+        else:
+            t0 = time.perf_counter()
+            img = np.ascontiguousarray(decode(image_bytes))
+            with self._lock:
+                self._stats["decodes"] += 1
+                self._stats["decode_ms_total"] += (time.perf_counter() - t0) * 1000
+            self._store(digest, icon_id, img)
+            img.setflags(write=False)
+
+        with self._lock:
+            self._entries[digest] = img
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return img
+
+    # ---------- disk ----------
+    def _load(self, digest):
+        if self.root is None:
+            return None
+        try:
+            matches = list(self.root.glob(f"*_{digest}.npy"))
+            if not matches:
+                return None
+            return np.load(matches[0], mmap_mode="r", allow_pickle=False)
+        except (OSError, ValueError):
+            self._bump("disk_errors")
+            return None
+
+    def _store(self, digest, icon_id, img):
+        if self.root is None:
+            return
+        prefix = _icon_prefix(icon_id)
+        path = self.root / f"{prefix}{digest}.npy"
+        tmp = self.root / f"{prefix}{digest}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+        try:
+            np.save(tmp, img, allow_pickle=False)
+            os.replace(tmp, path)
+            if prefix != "icon_":
+                # this competency's previous icon(s)
+                for old in self.root.glob(f"{prefix}*.npy"):
+                    if old != path and ".tmp." not in old.name:
+                        old.unlink(missing_ok=True)
+        except OSError:
+            self._bump("disk_errors")
+            try:
+                tmp.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _bump(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["entries"] = len(self._entries)
+        data["decode_ms_total"] = round(data["decode_ms_total"], 1)
+        lookups = data["hits"] + data["disk_hits"] + data["decodes"]
+        data["hit_rate"] = round((data["hits"] + data["disk_hits"]) / lookups, 3) if lookups else None
+        return data
+
+
+icon_cache = IconCache(ICON_CACHE_DIR, max_entries=ICON_CACHE_MAX_ENTRIES)
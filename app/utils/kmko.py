@@ -22,7 +22,8 @@ from urllib.parse import quote_plus
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from app.utils.database import get_engine_for_url
 from dotenv import load_dotenv
 
 # Your existing report utils (same style as your funder_missing_plot)
@@ -44,7 +45,7 @@ def get_db_engine():
 
     db_url = os.getenv("DB_URL")
     if db_url:
-        return create_engine(db_url, pool_pre_ping=True, future=True)
+        return get_engine_for_url(db_url)
 
     server = os.getenv("AZURE_SQL_SERVER") or os.getenv("DB_SERVER") or os.getenv("SQL_SERVER")
     database = os.getenv("AZURE_SQL_DATABASE") or os.getenv("DB_NAME") or os.getenv("SQL_DATABASE")
@@ -69,7 +70,7 @@ def get_db_engine():
         "TrustServerCertificate=no;"
         "Connection Timeout=30;"
     )
-    return create_engine(f"mssql+pyodbc:///?odbc_connect={params}", pool_pre_ping=True, future=True)
+    return get_engine_for_url(f"mssql+pyodbc:///?odbc_connect={params}")
 
 
 def fetch_kmko_counts(engine) -> pd.DataFrame:
@@ -13,7 +13,7 @@ from app.report_utils.FNT_PolygonText import draw_text_in_polygon
 from app.report_utils.SHP_RoundRect import rounded_rect_polygon
 from app.report_utils.TAB_DataframeTable import draw_dataframe_table_v2
 from app.report_utils.helpers import load_ppmori_fonts
-from app.report_utils.pdf_builder import close_pdf, new_page, open_pdf
+from app.report_utils.pdf_builder import PageSpec, close_pdf, open_pdf, render_pages
 from app.utils.funder_missing_plot import add_full_width_footer_svg
 
 
@@ -108,6 +108,166 @@ def _make_missing_df(
     )
 
 
+# ------------------------------------------------------------
+# Page drawing (PageSpec: may run in a page worker process)
+# ------------------------------------------------------------
+def _draw_missing_classes_page(
+    *,
+    fig,
+    ax,
+    family: str,
+    title: str,
+    df_page: pd.DataFrame,
+    cols: List[Dict[str, Any]],
+    merge_cols: List[int],
+    threshold: float,
+    page_idx: int,
+    n_pages: int,
+    footer_svg_path: Path,
+    table_x: float,
+    table_y: float,
+    table_w: float,
+    table_h: float,
+    header_height_frac: float,
+):
+    """One page of the missing-classes table (a PageSpec draw function)."""
+    c_master = "#1a427d"
+
+    ax.set_axis_off()
+
+    # header band
+    poly = rounded_rect_polygon(
+        cx=0.5,
+        cy=0.955,
+        width=0.90,
+        height=0.05,
+        ratio=0.45,
+        corners_round=[1, 3],
+        n_arc=64,
+    )
+    ax.add_patch(
+        mpatches.Polygon(
+            list(poly.exterior.coords),
+            closed=True,
+            facecolor=c_master,
+            edgecolor=c_master,
+            linewidth=1.5,
+            transform=ax.transAxes,
+        )
+    )
+
+    draw_text_in_polygon(
+        ax,
+        poly=poly,
+        text=title,
+        fontfamily=family,
+        fontsize=18,
+        fontweight="semibold",
+        color="#ffffff",
+        pad_frac=0.05,
+        wrap=True,
+        autoshrink=True,
+        clip_to_polygon=True,
+        max_lines=None,
+    )
+
+    draw_dataframe_table_v2(
+        ax,
+        df=df_page,
+        x=table_x,
+        y=table_y,
+        width=table_w,
+        height=table_h,
+        header_height_frac=header_height_frac,
+        columns=cols,
+        base_row_facecolor="#ffffff",
+        row_alt_facecolor=None,
+        wrap=True,
+        max_wrap_lines=3,
+        merge_col_indices=merge_cols,
+        shift=False,
+    )
+
+
+    pct = int(round(threshold * 100))
+    fs = 12 # <- one font size for both pills
+
+    # ---- left pill (message) ----
+    poly_left = rounded_rect_polygon(
+        cx=0.27,          # left-ish
+        cy=0.055,
+        width=0.44,       # wider for the long message
+        height=0.015,
+        ratio=0.45,
+        corners_round=[1,3],  # or keep [1,3] if you want only 2 corners rounded
+        n_arc=64,
+    )
+    ax.add_patch(
+        mpatches.Polygon(
+            list(poly_left.exterior.coords),
+            closed=True,
+            facecolor=c_master,
+            edgecolor=c_master,
+            linewidth=1.5,
+            transform=ax.transAxes,
+        )
+    )
+    draw_text_in_polygon(
+        ax,
+        poly=poly_left,
+        text=f"Classes with less than {pct}% of students edited.",
+        fontfamily=family,
+        fontsize=fs,          # same
+        color="#ffffff",
+        pad_frac=0.06,
+        wrap=False,
+        autoshrink=True,     # <- forces same size
+        clip_to_polygon=True,
+        max_lines=1,
+    )
+
+    # ---- right pill (page x of y) ----
+    poly_right = rounded_rect_polygon(
+        cx=0.88,          # right-ish
+        cy=0.055,
+        width=0.14,       # narrower for the page text
+        height=0.015,
+        ratio=0.45,
+        corners_round=[2, 4],
+        n_arc=64,
+    )
+    ax.add_patch(
+        mpatches.Polygon(
+            list(poly_right.exterior.coords),
+            closed=True,
+            facecolor=c_master,
+            edgecolor=c_master,
+            linewidth=1.5,
+            transform=ax.transAxes,
+        )
+    )
+    draw_text_in_polygon(
+        ax,
+        poly=poly_right,
+        text=f"Page {page_idx} of {n_pages}",
+        fontfamily=family,
+        fontsize=fs,          # same
+        color="#ffffff",
+        pad_frac=0.10,
+        wrap=False,
+        autoshrink=True,     # <- forces same size
+        clip_to_polygon=True,
+        max_lines=1,
+    )
+    add_full_width_footer_svg(
+        fig,
+        footer_svg_path,
+        bottom_margin_frac=0.0,
+        max_footer_height_frac=0.20,
+        col_master=f"{c_master}80",
+    )
+
+
 # ------------------------------------------------------------
 # Public PDF builder
 # ------------------------------------------------------------
@@ -230,15 +390,6 @@ def build_missing_classes_pdf(
     pages = paginate_rows(df, rows_per_page=rows_per_page)
     meta["pages"] = len(pages)
 
-    pdf, w, h, _dpi = open_pdf(
-        filename=str(out_pdf_path),
-        page_size=page_size,
-        orientation=orientation,
-        dpi=dpi,
-    )
-
-    preview_fig = None
-
     def make_columns(df_page: pd.DataFrame) -> List[Dict[str, Any]]:
         cols: List[Dict[str, Any]] = []
 
@@ -281,166 +432,46 @@ def build_missing_classes_pdf(
         # make it robust when running from anywhere
         footer_svg_path = Path(__file__).resolve().parents[1] / "static" / footer_svg_path.name
 
-    c_master = "#1a427d"
-
-    for page_idx, df_page in enumerate(pages, start=1):
-        fig, ax = new_page(w, h, dpi)
-        ax.set_axis_off()
-
-        # header band
-        poly = rounded_rect_polygon(
-            cx=0.5,
-            cy=0.955,
-            width=0.90,
-            height=0.05,
-            ratio=0.45,
-            corners_round=[1, 3],
-            n_arc=64,
-        )
-        ax.add_patch(
-            mpatches.Polygon(
-                list(poly.exterior.coords),
-                closed=True,
-                facecolor=c_master,
-                edgecolor=c_master,
-                linewidth=1.5,
-                transform=ax.transAxes,
-            )
-        )
-
-        title = f"{title_prefix} (Term {term}, {calendar_year})"
-        if len(pages) > 1:
-            title = f"{title}"
-
-        draw_text_in_polygon(
-            ax,
-            poly=poly,
-            text=title,
-            fontfamily=family,
-            fontsize=18,
-            fontweight="semibold",
-            color="#ffffff",
-            pad_frac=0.05,
-            wrap=True,
-            autoshrink=True,
-            clip_to_polygon=True,
-            max_lines=None,
-        )
-
-        cols = make_columns(df_page)
-
-        # merge indices depend on visible columns
-        if mode in ("funder", "provider"):
-            merge_cols = [0, 1]  # (Provider/Funder) + School
-        else:
-            merge_cols = [0]     # School only
-
-        draw_dataframe_table_v2(
-            ax,
-            df=df_page,
-            x=table_x,
-            y=table_y,
-            width=table_w,
-            height=table_h,
-            header_height_frac=header_height_frac,
-            columns=cols,
-            base_row_facecolor="#ffffff",
-            row_alt_facecolor=None,
-            wrap=True,
-            max_wrap_lines=3,
-            merge_col_indices=merge_cols,
-            shift=False,
-        )
-
-        
-        pct = int(round(threshold * 100))
-        fs = 12 # <- one font size for both pills
-
-        # ---- left pill (message) ----
-        poly_left = rounded_rect_polygon(
-            cx=0.27,          # left-ish
-            cy=0.055,
-            width=0.44,       # wider for the long message
-            height=0.015,
-            ratio=0.45,
-            corners_round=[1,3],  # or keep [1,3] if you want only 2 corners rounded
-            n_arc=64,
-        )
-        ax.add_patch(
-            mpatches.Polygon(
-                list(poly_left.exterior.coords),
-                closed=True,
-                facecolor=c_master,
-                edgecolor=c_master,
-                linewidth=1.5,
-                transform=ax.transAxes,
-            )
-        )
-        draw_text_in_polygon(
-            ax,
-            poly=poly_left,
-            text=f"Classes with less than {pct}% of students edited.",
-            fontfamily=family,
-            fontsize=fs,          # same
-            color="#ffffff",
-            pad_frac=0.06,
-            wrap=False,
-            autoshrink=True,     # <- forces same size
-            clip_to_polygon=True,
-            max_lines=1,
-        )
-
-        # ---- right pill (page x of y) ----
-        poly_right = rounded_rect_polygon(
-            cx=0.88,          # right-ish
-            cy=0.055,
-            width=0.14,       # narrower for the page text
-            height=0.015,
-            ratio=0.45,
-            corners_round=[2, 4],
-            n_arc=64,
-        )
-        ax.add_patch(
-            mpatches.Polygon(
-                list(poly_right.exterior.coords),
-                closed=True,
-                facecolor=c_master,
-                edgecolor=c_master,
-                linewidth=1.5,
-                transform=ax.transAxes,
-            )
-        )
-        draw_text_in_polygon(
-            ax,
-            poly=poly_right,
-            text=f"Page {page_idx} of {len(pages)}",
-            fontfamily=family,
-            fontsize=fs,          # same
-            color="#ffffff",
-            pad_frac=0.10,
-            wrap=False,
-            autoshrink=True,     # <- forces same size
-            clip_to_polygon=True,
-            max_lines=1,
-        )
-        add_full_width_footer_svg(
-            fig,
-            footer_svg_path,
-            bottom_margin_frac=0.0,
-            max_footer_height_frac=0.20,
-            col_master=f"{c_master}80",
+    # merge indices depend on visible columns
+    if mode in ("funder", "provider"):
+        merge_cols = [0, 1]  # (Provider/Funder) + School
+    else:
+        merge_cols = [0]     # School only
+
+    specs = [
+        PageSpec(
+            _draw_missing_classes_page,
+            dict(
+                family=family,
+                title=f"{title_prefix} (Term {term}, {calendar_year})",
+                df_page=df_page,
+                cols=make_columns(df_page),
+                merge_cols=merge_cols,
+                threshold=threshold,
+                page_idx=page_idx,
+                n_pages=len(pages),
+                footer_svg_path=footer_svg_path,
+                table_x=table_x,
+                table_y=table_y,
+                table_w=table_w,
+                table_h=table_h,
+                header_height_frac=header_height_frac,
+            ),
         )
+        for page_idx, df_page in enumerate(pages, start=1)
+    ]
+    pdf, w, h, _dpi = open_pdf(
+        filename=str(out_pdf_path),
+        page_size=page_size,
+        orientation=orientation,
+        dpi=dpi,
+        parallel=True,
+    )
 
-        # ✅ write page to PDF
-        pdf.savefig(fig, dpi=dpi)
-
-        if page_idx == 1:
-            preview_fig = fig
-        else:
-            import matplotlib.pyplot as plt
-            plt.close(fig)
-
-    close_pdf(pdf)
+    try:
+        preview_fig = render_pages(pdf, specs, width_in=w, height_in=h, dpi=dpi, keep_first=True)
+    finally:
+        close_pdf(pdf)
     return preview_fig, meta
 
 
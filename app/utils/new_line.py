@@ -8,7 +8,7 @@ matplotlib.use("Agg")
 
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-import matplotlib.font_manager as fm
+from app.report_utils.helpers import register_font_dir
 import pandas as pd
 from sqlalchemy import text
 
@@ -16,17 +16,14 @@ from app.utils.database import get_db_engine
 
 
 def use_ppmori(font_dir="app/static/fonts"):
-    font_paths = list(Path(font_dir).glob("*.otf")) + list(Path(font_dir).glob("*.ttf"))
-    for p in font_paths:
-        fm.fontManager.addfont(str(p))
-    if not font_paths:
+    info = register_font_dir(font_dir)  # once per process
+    if not info.paths:
         raise FileNotFoundError(f"No .otf/.ttf files found in {font_dir}")
-    fam_name = fm.FontProperties(fname=str(font_paths[0])).get_name()
+    fam_name = info.family
     plt.rcParams["font.family"] = [fam_name]
     plt.rcParams["font.sans-serif"] = [fam_name]
     plt.rcParams["pdf.fonttype"] = 42
     plt.rcParams["ps.fonttype"] = 42
-    print(f"✅ Using font family: {fam_name}")
 
 
 def create_pdf_figure() -> tuple[plt.Figure, plt.Axes]:
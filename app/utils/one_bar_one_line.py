@@ -140,28 +140,25 @@ matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from app.utils.database import get_engine_for_url
 from sqlalchemy.exc import ProgrammingError, DBAPIError
 from dotenv import load_dotenv
-from pathlib import Path
-from matplotlib import font_manager as fm
+from app.report_utils.helpers import register_font_dir
 
 A4_PORTRAIT = (8.27, 11.69)
 load_dotenv()  # expects DB_URL
 
 # ---------- font ----------
 def use_ppmori(font_dir="app/static/fonts"):
-    font_paths = list(Path(font_dir).glob("*.otf")) + list(Path(font_dir).glob("*.ttf"))
-    for p in font_paths:
-        fm.fontManager.addfont(str(p))
-    if not font_paths:
+    info = register_font_dir(font_dir)  # once per process
+    if not info.paths:
         raise FileNotFoundError(f"No .otf/.ttf files found in {font_dir}")
-    fam_name = fm.FontProperties(fname=str(font_paths[0])).get_name()
+    fam_name = info.family
     plt.rcParams["font.family"] = [fam_name]
     plt.rcParams["font.sans-serif"] = [fam_name]
     plt.rcParams["pdf.fonttype"] = 42
-    plt.rcParams["ps.fonttype"]  = 42
-    print(f"✅ Using font family: {fam_name}")
+    plt.rcParams["ps.fonttype"] = 42
 
 # ---------- canonical keys ----------
 TARGET_KEY   = "wsnz target"
@@ -587,7 +584,7 @@ def build_engine():
     db_url = os.getenv("DB_URL")
     if not db_url:
         raise RuntimeError("Missing DB_URL in .env")
-    return create_engine(db_url, pool_pre_ping=True, fast_executemany=True)
+    return get_engine_for_url(db_url, fast_executemany=True)
 
 def get_rates(engine, year: int, term: int, subject_id: int, mode: str, *, region_name: str | None = None) -> pd.DataFrame:
     mode = (mode or "").strip().lower()
@@ -16,7 +16,8 @@ from matplotlib.path import Path as MplPath
 from matplotlib.patches import PathPatch
 import pandas as pd
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from app.utils.database import get_engine_for_url
 
 import pythoncom
 import win32com.client
@@ -102,7 +103,7 @@ def get_db_engine():
     db_conn = os.getenv("DB_URL")
     if not db_conn:
         raise ValueError("DB_URL not found in environment variables.")
-    return create_engine(db_conn, future=True)
+    return get_engine_for_url(db_conn)
 
 def load_linegraph_df(refresh: bool = False) -> pd.DataFrame:
     engine = get_db_engine()
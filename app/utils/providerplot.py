@@ -3,7 +3,8 @@ matplotlib.use('Agg')  # Prevent GUI backend errors in web servers
 import matplotlib.pyplot as plt
 import pandas as pd
 import os
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from app.utils.database import get_engine_for_url
 import textwrap
 from datetime import date, datetime
 import pytz
@@ -32,7 +33,7 @@ def get_db_engine():
         "@heimatau.database.windows.net:1433/WSFL"
         "?driver=ODBC+Driver+18+for+SQL+Server"
     )
-    return create_engine(connection_string, fast_executemany=True)
+    return get_engine_for_url(connection_string, fast_executemany=True)
 
 def load_competencies(con, calendaryear, term):
     with con.connect() as connection:
@@ -0,0 +1,238 @@
+# app/utils/rates_data.py
+"""
+Term/year-scoped cache of the achievement-rate procs behind /Reports.
+
+Several report types read the same national result sets and only differ in
+how they filter them (GetFunderNationalRates_All is the whole country, then
+narrowed to one funder in Python). Each proc is now run once per
+(params, data version) and kept as a RatesFrame:
+
+- the rows as returned (list of dicts, original types; callers get copies),
+- a DataFrame over them with lazily built per-column indexes
+  (FunderID / ProviderID / YearGroupID / CompetencyID / ResultType ...),
+  so report variants are index lookups rather than scans.
+
+The data version is the report cache's (DB watermark + local write stamp,
+see app.utils.report_cache), so rates and rendered reports go stale together.
+
+Usage:
+    rates = rates_frame("FunderNationalRates", conn=conn, Term=2, CalendarYear=2025)
+    rows = rates.rows(FunderID=12, ResultType=("Funder Rate (YTD)", "Funder Rate (LY)"))
+    rows = rates.rows_any({"FunderID": 12}, {"ResultType": "WSNZ Target"})
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from app.utils.report_cache import report_cache
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+@dataclass(frozen=True)
+class RatesProc:
+    proc: str
+    params: tuple
+    # Some pyodbc/proc combinations return no result set through text();
+    # retry with exec_driver_sql and positional params (provider rates do this)
+    driver_fallback: bool = False
+
+    def sql(self) -> str:
+        args = ", ".join(f"@{p} = :{p}" for p in self.params)
+        return f"SET NOCOUNT ON; EXEC {self.proc} {args};"
+
+
+RATES_PROCS = {
+    "FunderNationalRates": RatesProc("dbo.GetFunderNationalRates_All", ("Term", "CalendarYear")),
+    "NationalRates": RatesProc("GetNationalRates", ("CalendarYear", "Term")),
+    "NationalRatesKaiako": RatesProc("GetNationalRates_Kaiako", ("CalendarYear", "Term")),
+    "ProviderNationalRates": RatesProc(
+        "dbo.GetProviderNationalRates", ("Term", "CalendarYear", "ProviderID", "FunderID"),
+        driver_fallback=True,
+    ),
+    "SchoolNationalRates": RatesProc("dbo.GetSchoolNationalRates", ("CalendarYear", "Term", "MoeNumber")),
+    "RegionalCouncilRates": RatesProc("dbo.GetRegionalCouncilRates", ("CalendarYear", "Term", "Region")),
+    "RegionalCouncilRatesKaiako": RatesProc("dbo.GetRegionalCouncilRates_kaiako", ("CalendarYear", "Term", "Region")),
+}
+
+
+class RatesFrame:
+    def __init__(self, rows):
+        self._rows = [dict(r) for r in rows]
+        self.frame = pd.DataFrame(self._rows)
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _index(self, column):
+        idx = self._indexes.get(column)
+        if idx is None:
+            if column in self.frame.columns:
+                idx = self.frame.groupby(column, sort=False).indices
+            else:
+                idx = {}
+            with self._lock:
+                self._indexes[column] = idx
+        return idx
+
+    def _positions(self, where: dict) -> np.ndarray:
+        """Row positions matching every column=value(s) in where (tuple/list/set = any of)."""
+        positions = None
+        for column, wanted in where.items():
+            idx = self._index(column)
+            values = wanted if isinstance(wanted, (tuple, list, set, frozenset)) else (wanted,)
+            hits = [idx[v] for v in values if v in idx]
+            col_pos = np.unique(np.concatenate(hits)) if hits else np.empty(0, dtype=np.int64)
+            positions = col_pos if positions is None else np.intersect1d(positions, col_pos)
+            if not len(positions):
+                break
+        if positions is None:
+            return np.arange(len(self._rows))
+        return positions
+
+    def rows(self, **where) -> list[dict]:
+        """Copies of the matching rows, in proc order (all rows if no filter)."""
+        return [dict(self._rows[i]) for i in self._positions(where)]
+
+    def rows_any(self, *conditions: dict) -> list[dict]:
+        """Rows matching any of the where-dicts (OR of ANDs), in proc order."""
+        hits = [self._positions(c) for c in conditions]
+        if not hits:
+            return []
+        positions = np.unique(np.concatenate(hits))
+        return [dict(self._rows[i]) for i in positions]
+
+    def unique(self, columns) -> list[tuple]:
+        """Distinct combinations of columns, in first-seen order."""
+        columns = [c for c in columns if c in self.frame.columns]
+        if not columns or self.frame.empty:
+            return []
+        distinct = self.frame[columns].drop_duplicates()
+        return [tuple(None if pd.isna(v) else v for v in row)
+                for row in distinct.itertuples(index=False, name=None)]
+
+
+class RatesCache:
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._stats = {"hits": 0, "misses": 0, "loads": 0, "load_ms_total": 0.0}
+
+    def get(self, key, loader) -> RatesFrame:
+        with self._lock:
+            frame = self._entries.get(key)
+            if frame is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return frame
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                frame = self._entries.get(key)
+                if frame is not None:
+                    self._stats["hits"] += 1
+                    return frame
+                self._stats["misses"] += 1
+
+            t0 = time.perf_counter()
+            frame = RatesFrame(loader())
+            with self._lock:
+                self._stats["loads"] += 1
+                self._stats["load_ms_total"] += (time.perf_counter() - t0) * 1000
+                self._entries[key] = frame
+                while len(self._entries) > self.max_entries:
+                    old_key, _ = self._entries.popitem(last=False)
+                    self._load_locks.pop(old_key, None)
+            return frame
+
+    def put(self, key, rows) -> RatesFrame:
+        """Cache rows fetched elsewhere (e.g. by the batch parent) under key."""
+        frame = RatesFrame(rows)
+        with self._lock:
+            self._entries[key] = frame
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._load_locks.pop(old_key, None)
+        return frame
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _reset_locks(self):
+        # after fork: a lock held by another thread in the parent stays held
+        # (load locks are held for the whole proc fetch)
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        for frame in self._entries.values():
+            frame._lock = threading.Lock()
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["entries"] = len(self._entries)
+            data["rows_cached"] = sum(len(f) for f in self._entries.values())
+        data["load_ms_total"] = round(data["load_ms_total"], 1)
+        lookups = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / lookups, 3) if lookups else None
+        return data
+
+
+rates_cache = RatesCache(max_entries=int(_env_float("RATES_CACHE_MAX_ENTRIES", 64)))
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=rates_cache._reset_locks)
+
+
+def _rates_key(name: str, params: dict):
+    spec = RATES_PROCS[name]
+    missing = set(spec.params) - set(params)
+    unknown = set(params) - set(spec.params)
+    if missing or unknown:
+        raise ValueError(f"{name} takes {', '.join(spec.params)}")
+
+    bind = {p: params[p] for p in spec.params}
+    return spec, bind, (spec.proc, tuple(bind.items()), report_cache.data_version())
+
+
+def seed_rates_frame(name: str, rows, **params) -> RatesFrame:
+    """Cache rows for a RATES_PROCS entry as if rates_frame() had run the proc."""
+    _, _, key = _rates_key(name, params)
+    return rates_cache.put(key, rows)
+
+
+def rates_frame(name: str, conn, **params) -> RatesFrame:
+    """RatesFrame for a RATES_PROCS entry; on a miss the proc runs on conn."""
+    spec, bind, key = _rates_key(name, params)
+
+    def load():
+        rows = conn.execute(text(spec.sql()), bind).mappings().all()
+        if rows or not spec.driver_fallback:
+            return rows
+        placeholders = ", ".join(f"@{p}=?" for p in spec.params)
+        res = conn.exec_driver_sql(
+            f"SET NOCOUNT ON; EXEC {spec.proc} {placeholders}",
+            tuple(bind[p] for p in spec.params),
+        )
+        if getattr(res, "cursor", None) and res.cursor.description:
+            cols = [d[0] for d in res.cursor.description]
+            return [dict(zip(cols, row)) for row in res.fetchall()]
+        return []
+
+    return rates_cache.get(key, load)
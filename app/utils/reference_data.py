@@ -0,0 +1,256 @@
+# app/utils/reference_data.py
+"""
+Cache for near-static lookup procs (dropdowns, scenarios, auto-mapped
+competencies, school types, courses, groups, APR statuses).
+
+- Each lookup is a RefQuery (proc, @Request, params, TTL, invalidation tags);
+  entries are keyed by (proc, request, params).
+- Per-key load lock: when an entry expires only one thread runs the proc,
+  the rest wait for its result (no stampede on a cold cache).
+- invalidate_reference_data("providers", ...) is called by the admin write
+  routes. Tags are also stamped in REFERENCE_STAMP_DIR so entries loaded in
+  the other gunicorn worker are dropped too.
+- Hit/miss/load counters are exposed via reference_cache.metrics()
+  (/admin/metrics).
+
+Usage:
+    rows = reference_rows("EthnicityDropdown")            # list of dicts
+    rows = reference_rows("ProvidersByFunder", Number=12)
+"""
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from sqlalchemy import text
+
+from app.utils.database import get_db_engine
+
+HOUR = 3600
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+DEFAULT_TTL = _env_float("REFERENCE_CACHE_TTL", 900)
+
+
+@dataclass(frozen=True)
+class RefQuery:
+    proc: str
+    request: str | None = None
+    tags: tuple = ()
+    ttl: float | None = None          # None -> DEFAULT_TTL
+    params: tuple = field(default=())  # allowed extra @params, e.g. ("Number",)
+
+    def sql(self, param_names) -> str:
+        parts = []
+        if self.request is not None:
+            parts.append("@Request = :Request")
+        parts.extend(f"@{name} = :{name}" for name in param_names)
+        return f"EXEC {self.proc} " + ", ".join(parts) if parts else f"EXEC {self.proc}"
+
+
+REFERENCE_QUERIES = {
+    # FlaskHelperFunctions dropdowns
+    "EthnicityDropdown": RefQuery("FlaskHelperFunctions", "EthnicityDropdown", ("ethnicity",), 6 * HOUR),
+    "FunderDropdown": RefQuery("FlaskHelperFunctions", "FunderDropdown", ("funders",)),
+    "ProviderDropdown": RefQuery("FlaskHelperFunctions", "ProviderDropdown", ("providers",)),
+    "ProvidersByFunder": RefQuery("FlaskHelperFunctions", "ProvidersByFunder", ("providers",), params=("Number",)),
+    "SchoolDropdown": RefQuery("FlaskHelperFunctions", "SchoolDropdown", ("schools",)),
+    "SchoolDropdownAll": RefQuery("FlaskHelperFunctions", "SchoolDropdownAll", ("schools",)),
+    "SchoolTypeDropdown": RefQuery("FlaskHelperFunctions", "SchoolTypeDropdown", ("school_types",), HOUR),
+    "Scenario": RefQuery("FlaskHelperFunctions", "Scenario", ("scenarios",), 6 * HOUR),
+    "AutoMappedCompetencies": RefQuery("FlaskHelperFunctions", "AutoMappedCompetencies", ("competencies",), HOUR),
+    # Other procs
+    "GetSchoolTypeDropdown": RefQuery("FlaskSchoolTypeChanger", "GetSchoolTypeDropdown", ("school_types",), HOUR),
+    "ActiveCourses": RefQuery("FlaskHelperFunctionsSpecific", "ActiveCourses", ("courses",)),
+    "FlaskGetAllGroups": RefQuery("FlaskGetAllGroups", None, ("groups",)),
+    "APR_AllDropdowns": RefQuery("dbo.APR_AllDropdowns", None, ("apr",), HOUR),
+}
+
+
+class ReferenceDataCache:
+    def __init__(self, max_entries=512, stamp_dir=None):
+        self.max_entries = max_entries
+        self.stamp_dir = stamp_dir
+        self._entries = OrderedDict()  # key -> {"rows", "expires", "tags", "versions"}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._stats = {
+            "hits": 0, "misses": 0, "loads": 0, "load_errors": 0,
+            "coalesced": 0, "invalidations": 0, "load_ms_total": 0.0,
+        }
+        if stamp_dir:
+            try:
+                os.makedirs(stamp_dir, exist_ok=True)
+            except OSError:
+                self.stamp_dir = None
+
+    # ---------- cross-worker tag stamps ----------
+    def _tag_version(self, tag):
+        if not self.stamp_dir:
+            return 0
+        try:
+            return os.stat(os.path.join(self.stamp_dir, tag)).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _bump_tag(self, tag):
+        if not self.stamp_dir:
+            return
+        path = os.path.join(self.stamp_dir, tag)
+        try:
+            with open(path, "a", encoding="ascii"):
+                pass
+            now = time.time_ns()
+            os.utime(path, ns=(now, now))
+        except OSError:
+            pass
+
+    def _fresh(self, entry):
+        if entry["expires"] <= time.monotonic():
+            return False
+        return all(self._tag_version(t) == v for t, v in entry["versions"].items())
+
+    def _bump(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    # ---------- public API ----------
+    def get(self, key, loader, ttl=None, tags=()):
+        """Return cached rows for key, calling loader() once on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None and self._fresh(entry):
+            self._bump("hits")
+            return entry["rows"]
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        waited = not load_lock.acquire(blocking=False)
+        if waited:
+            load_lock.acquire()
+        try:
+            # Another thread may have loaded it while we waited
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and self._fresh(entry):
+                self._bump("coalesced" if waited else "hits")
+                return entry["rows"]
+
+            self._bump("misses")
+            versions = {t: self._tag_version(t) for t in tags}
+            t0 = time.perf_counter()
+            try:
+                rows = loader()
+            except Exception:
+                self._bump("load_errors")
+                raise
+            self._bump("loads")
+            self._bump("load_ms_total", (time.perf_counter() - t0) * 1000)
+
+            with self._lock:
+                self._entries[key] = {
+                    "rows": rows,
+                    "expires": time.monotonic() + (DEFAULT_TTL if ttl is None else ttl),
+                    "tags": tuple(tags),
+                    "versions": versions,
+                }
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    old_key, _ = self._entries.popitem(last=False)
+                    self._load_locks.pop(old_key, None)
+            return rows
+        finally:
+            load_lock.release()
+
+    def invalidate(self, *tags) -> int:
+        """Drop every entry carrying any of tags (here and, via stamps, in other workers)."""
+        wanted = set(tags)
+        with self._lock:
+            doomed = [k for k, e in self._entries.items() if wanted.intersection(e["tags"])]
+            for k in doomed:
+                self._entries.pop(k, None)
+            self._stats["invalidations"] += 1
+        for tag in wanted:
+            self._bump_tag(tag)
+        return len(doomed)
+
+    def discard(self, key) -> None:
+        """Forget one entry in this worker only (e.g. a lookup that found nothing)."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._load_locks.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["entries"] = len(self._entries)
+        data["load_ms_total"] = round(data["load_ms_total"], 1)
+        lookups = data["hits"] + data["misses"] + data["coalesced"]
+        data["hit_rate"] = round((data["hits"] + data["coalesced"]) / lookups, 3) if lookups else None
+        return data
+
+
+reference_cache = ReferenceDataCache(
+    max_entries=int(_env_float("REFERENCE_CACHE_MAX_ENTRIES", 512)),
+    stamp_dir=os.getenv(
+        "REFERENCE_STAMP_DIR",
+        os.path.join(tempfile.gettempdir(), "wsfl_reference_stamps"),
+    ) or None,
+)
+
+
+def reference_rows(name: str, conn=None, **params) -> list:
+    """
+    Rows (list of dicts) for a REFERENCE_QUERIES lookup. On a miss the proc
+    runs on conn if given, otherwise on a pooled connection. Callers get
+    their own copies, so mutating the result never touches the cache.
+    """
+    query = REFERENCE_QUERIES[name]
+    unknown = set(params) - set(query.params)
+    if unknown:
+        raise ValueError(f"{name} does not take {', '.join(sorted(unknown))}")
+
+    names = [p for p in query.params if p in params]
+    key = (query.proc, query.request, tuple((p, params[p]) for p in names))
+    bind = {p: params[p] for p in names}
+    if query.request is not None:
+        bind["Request"] = query.request
+
+    def load():
+        stmt = text(query.sql(names))
+        if conn is not None:
+            result = conn.execute(stmt, bind)
+            return tuple(dict(r) for r in result.mappings().all())
+        with get_db_engine().connect() as own:
+            return tuple(dict(r) for r in own.execute(stmt, bind).mappings().all())
+
+    rows = reference_cache.get(key, load, ttl=query.ttl, tags=query.tags)
+    return [dict(r) for r in rows]
+
+
+def invalidate_reference_data(*tags) -> int:
+    return reference_cache.invalidate(*tags)
+
+
+def ethnicity_options() -> list:
+    """[{id, desc}] for the ethnicity dropdowns (student search, edit modals)."""
+    return [
+        {"id": r.get("EthnicityID"), "desc": r.get("Description")}
+        for r in reference_rows("EthnicityDropdown")
+    ]
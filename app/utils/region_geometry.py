@@ -0,0 +1,331 @@
+# app/utils/region_geometry.py
+"""
+Per-worker memo of the geometry behind the region maps.
+
+Every region map used to re-read the national council layer (twice: once
+for the region polygon, once for the context councils), re-normalise every
+council name, dissolve, reproject and .cx-clip councils and water again.
+This keeps, per worker process:
+
+- the council layer per (tolerance, CRS) with an STRtree over it and the
+  normalised names computed once (CouncilLayer),
+- each region's dissolved polygon and bounds per (region, tolerance, CRS),
+- lakes / rivers per map bbox, already projected and clipped.
+
+Keys include the local GeoPackage's mtime (app.utils.geo cache), so
+`geodata-refresh` invalidates everything; layers that came from WFS are
+refetched after REGION_GEOMETRY_TTL_S. Callers get copies of polygons and
+must treat layers / water frames as read-only.
+
+Usage:
+    region_poly = region_geometry.region_polygon("Waikato", simplify_tol=0.002)
+    councils = region_geometry.context_councils(bbox, crs=region_poly.crs)
+    lakes, rivers = region_geometry.water(bbox, crs=region_poly.crs)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+import geopandas as gpd
+import numpy as np
+from shapely import STRtree
+from shapely.geometry import box
+
+from app.utils.geo import (
+    DEFAULT_NAME_FIELD,
+    GEODATA_DIR_DEFAULT,
+    GEODATA_FILE,
+    load_lakes_and_rivers,
+    load_regional_councils,
+)
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+REGION_GEOMETRY_MAX_ENTRIES = int(_env_float("REGION_GEOMETRY_MAX_ENTRIES", 128))
+REGION_GEOMETRY_TTL_S = _env_float("REGION_GEOMETRY_TTL_S", 24 * 3600)
+
+BBox = Tuple[float, float, float, float]
+
+
+# ----------------------------
+# Region names
+# ----------------------------
+def detect_region_name_col(gdf, preferred: str | None = None) -> str:
+    if preferred and preferred in gdf.columns:
+        return preferred
+
+    candidates = [
+        preferred,
+        DEFAULT_NAME_FIELD,
+        "REGC2025_V1_00_NAME",
+        "RegionName",
+        "REGC2025_2",
+        "REGC2025_1",
+        "NAME",
+        "Name",
+        "REGION",
+        "REGIONNAME",
+        "Description",
+        "DESC",
+    ]
+    for c in candidates:
+        if c and c in gdf.columns:
+            return c
+
+    non_geom = [c for c in gdf.columns if c.lower() != "geometry"]
+    for c in non_geom:
+        try:
+            if gdf[c].dtype == "object":
+                return c
+        except Exception:
+            pass
+
+    raise RuntimeError(f"Could not detect region name column. Columns: {list(gdf.columns)}")
+
+
+def norm_region_name(s: str) -> str:
+    s = (s or "").strip().lower()
+    for suf in [" regional council", " region", " district council", " city council"]:
+        if s.endswith(suf):
+            s = s[: -len(suf)].strip()
+    s = " ".join(s.split())
+    return s
+
+
+# ----------------------------
+# Cached shapes
+# ----------------------------
+@dataclass
+class CouncilLayer:
+    gdf: gpd.GeoDataFrame
+    tree: STRtree
+    name_col: str
+    norm_names: np.ndarray  # norm_region_name() of each row, in row order
+
+    @classmethod
+    def build(cls, gdf: gpd.GeoDataFrame, name_col: str, norm_names=None) -> "CouncilLayer":
+        if norm_names is None:
+            names = gdf[name_col].astype("string")
+            norm_names = np.array([norm_region_name(str(x)) for x in names], dtype=object)
+        return cls(gdf, STRtree(gdf.geometry.values), name_col, norm_names)
+
+    def query(self, bbox: BBox) -> gpd.GeoDataFrame:
+        """Rows intersecting bbox, in layer order (what .cx[...] returns)."""
+        idx = self.tree.query(box(*bbox), predicate="intersects")
+        return self.gdf.iloc[np.sort(idx)]
+
+
+@dataclass
+class RegionShape:
+    gdf: gpd.GeoDataFrame  # dissolved, one row
+    bounds: BBox
+
+
+class RegionGeometryCache:
+    def __init__(self, max_entries=128, ttl_s=24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_s = max(1.0, float(ttl_s))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._stats = {"hits": 0, "misses": 0, "loads": 0, "load_ms_total": 0.0}
+
+    def _get(self, key, loader):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return value
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                value = self._entries.get(key)
+                if value is not None:
+                    self._stats["hits"] += 1
+                    return value
+                self._stats["misses"] += 1
+
+            t0 = time.perf_counter()
+            value = loader()
+            with self._lock:
+                self._stats["loads"] += 1
+                self._stats["load_ms_total"] += (time.perf_counter() - t0) * 1000
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    old_key, _ = self._entries.popitem(last=False)
+                    self._load_locks.pop(old_key, None)
+            return value
+
+    def _source_stamp(self, folder) -> tuple:
+        try:
+            return ("gpkg", os.stat(Path(folder) / GEODATA_FILE).st_mtime_ns)
+        except OSError:
+            return ("wfs", int(time.time() // self.ttl_s))
+
+    # ---------- councils ----------
+    def _councils(
+        self,
+        *,
+        simplify_tol: float = 0.002,
+        crs=None,
+        name_field: str = DEFAULT_NAME_FIELD,
+        local_folder=GEODATA_DIR_DEFAULT,
+        use_internet: bool = True,
+        datafinder_layer_id: int = 120945,
+        bbox_4326: Optional[BBox] = None,
+        debug: bool = False,
+        debug_folder=None,
+    ):
+        base_key = (
+            "councils",
+            float(simplify_tol or 0.0),
+            int(datafinder_layer_id),
+            tuple(map(float, bbox_4326)) if bbox_4326 is not None else None,
+            name_field,
+            str(local_folder),
+            self._source_stamp(local_folder),
+        )
+
+        def load_base():
+            gdf = load_regional_councils(
+                debug=debug,
+                debug_folder=debug_folder,
+                simplify_tol_deg=float(simplify_tol or 0.0),
+                use_internet=use_internet,
+                datafinder_layer_id=int(datafinder_layer_id),
+                bbox_4326=bbox_4326,
+                local_folder=local_folder,
+            )
+            if gdf.crs is None:
+                gdf = gdf.set_crs(epsg=4326)
+            return CouncilLayer.build(gdf, detect_region_name_col(gdf, preferred=name_field))
+
+        layer = self._get(base_key, load_base)
+        if crs is None or str(crs) == str(layer.gdf.crs):
+            return base_key, layer
+
+        key = base_key + (str(crs),)
+        return key, self._get(
+            key, lambda: CouncilLayer.build(layer.gdf.to_crs(crs), layer.name_col, layer.norm_names)
+        )
+
+    def councils(self, **kwargs) -> CouncilLayer:
+        """The council layer (in crs, if given) with its STRtree; read-only."""
+        return self._councils(**kwargs)[1]
+
+    def context_councils(self, bbox: BBox, **kwargs) -> gpd.GeoDataFrame:
+        """Councils intersecting bbox (in the layer's / crs= coordinates)."""
+        return self.councils(**kwargs).query(tuple(map(float, bbox)))
+
+    # ---------- regions ----------
+    def _region(self, region_name: str, **kwargs) -> RegionShape:
+        layer_key, layer = self._councils(**kwargs)
+        target = norm_region_name(region_name)
+
+        def load():
+            mask = layer.norm_names == target
+            if not mask.any():
+                mask = np.array([target in n for n in layer.norm_names], dtype=bool)
+
+            out = layer.gdf.iloc[np.flatnonzero(mask)].copy()
+            if out.empty:
+                names = layer.gdf[layer.name_col].astype("string")
+                sample = sorted(names.dropna().unique().tolist())[:30]
+                raise RuntimeError(
+                    f"Region '{region_name}' not found in polygons using column '{layer.name_col}'. Examples: {sample}"
+                )
+
+            out = out.dissolve(by=layer.name_col).reset_index()
+            return RegionShape(out, tuple(map(float, out.total_bounds)))
+
+        return self._get(layer_key + ("region", target), load)
+
+    def region_polygon(self, region_name: str, **kwargs) -> gpd.GeoDataFrame:
+        """The region's dissolved polygon (a copy) as a one-row GeoDataFrame."""
+        return self._region(region_name, **kwargs).gdf.copy()
+
+    def region_bounds(self, region_name: str, **kwargs) -> BBox:
+        return self._region(region_name, **kwargs).bounds
+
+    # ---------- water ----------
+    def water(
+        self,
+        bbox: BBox,
+        *,
+        crs,
+        local_folder=GEODATA_DIR_DEFAULT,
+        prefer_local: bool = True,
+        debug: bool = False,
+    ) -> Tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+        """(lakes, rivers) in crs, clipped to bbox (given in crs); read-only."""
+        bbox = tuple(round(float(v), 9) for v in bbox)
+        key = ("water", bbox, str(crs), str(local_folder), bool(prefer_local), self._source_stamp(local_folder))
+
+        def load():
+            bbox_series = gpd.GeoSeries([box(*bbox)], crs=crs).to_crs("EPSG:4326")
+            wminx, wminy, wmaxx, wmaxy = bbox_series.total_bounds
+            lakes, rivers = load_lakes_and_rivers(
+                bbox_4326=(float(wminx), float(wminy), float(wmaxx), float(wmaxy)),
+                local_folder=local_folder,
+                prefer_local=prefer_local,
+                debug=debug,
+            )
+            out = []
+            for gdf in (lakes, rivers):
+                if gdf is None:
+                    gdf = gpd.GeoDataFrame(geometry=[], crs="EPSG:4326")
+                if gdf.crs is None:
+                    gdf = gdf.set_crs(epsg=4326)
+                if str(gdf.crs) != str(crs):
+                    gdf = gdf.to_crs(crs)
+                if len(gdf):
+                    gdf = gdf.cx[bbox[0]:bbox[2], bbox[1]:bbox[3]]
+                out.append(gdf)
+            return tuple(out)
+
+        return self._get(key, load)
+
+    # ---------- admin ----------
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._load_locks.clear()
+
+    def _reset_locks(self):
+        # after fork: a lock held by another thread in the parent stays held
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self._stats)
+            kinds = {}
+            for key in self._entries:
+                kind = "region" if "region" in key else key[0]
+                kinds[kind] = kinds.get(kind, 0) + 1
+            data["entries"] = len(self._entries)
+        data["by_kind"] = kinds
+        data["load_ms_total"] = round(data["load_ms_total"], 1)
+        lookups = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / lookups, 3) if lookups else None
+        return data
+
+
+region_geometry = RegionGeometryCache(
+    max_entries=REGION_GEOMETRY_MAX_ENTRIES,
+    ttl_s=REGION_GEOMETRY_TTL_S,
+)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=region_geometry._reset_locks)
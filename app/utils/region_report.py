@@ -14,16 +14,17 @@ import matplotlib.image as mpimg
 import matplotlib.colors as mcolors
 
 from sqlalchemy import text
-from shapely.geometry import box as shp_box
 import geopandas as gpd
 
 from app.report_utils.helpers import load_ppmori_fonts
-from app.report_utils.pdf_builder import open_pdf, new_page, close_pdf, save_page
+from app.report_utils.pdf_builder import PageSpec, open_pdf, new_page, close_pdf, render_pages, save_page
 from app.utils.funder_missing_plot import add_full_width_footer_svg
 from app.report_utils.CHT_Comparison import make_difference_df, draw_comparison
 from app.utils.one_bar_one_line import provider_portrait_with_target
-from app.utils.geo import load_lakes_and_rivers, load_regional_councils, DEFAULT_NAME_FIELD
+from app.utils.geo import DEFAULT_NAME_FIELD
+from app.utils.region_geometry import region_geometry
 from app.utils.database import get_db_engine
+from app.utils.rates_data import rates_frame
 # ✅ Use the shared chart component + bucket labels
 from app.report_utils.CHT_CircleProportions import (
     circle_plot,
@@ -153,51 +154,6 @@ def _expand_bbox_frac(bbox: MapBBox, frac: float) -> MapBBox:
     return (minx - pad, miny - pad, maxx + pad, maxy + pad)
 
 
-# =============================================================================
-# Region name normalization
-# =============================================================================
-def _detect_region_name_col(gdf, preferred: str | None = None) -> str:
-    if preferred and preferred in gdf.columns:
-        return preferred
-
-    candidates = [
-        preferred,
-        DEFAULT_NAME_FIELD,
-        "REGC2025_V1_00_NAME",
-        "RegionName",
-        "REGC2025_2",
-        "REGC2025_1",
-        "NAME",
-        "Name",
-        "REGION",
-        "REGIONNAME",
-        "Description",
-        "DESC",
-    ]
-    for c in candidates:
-        if c and c in gdf.columns:
-            return c
-
-    non_geom = [c for c in gdf.columns if c.lower() != "geometry"]
-    for c in non_geom:
-        try:
-            if gdf[c].dtype == "object":
-                return c
-        except Exception:
-            pass
-
-    raise RuntimeError(f"Could not detect region name column. Columns: {list(gdf.columns)}")
-
-
-def _norm_region_name(s: str) -> str:
-    s = (s or "").strip().lower()
-    for suf in [" regional council", " region", " district council", " city council"]:
-        if s.endswith(suf):
-            s = s[: -len(suf)].strip()
-    s = " ".join(s.split())
-    return s
-
-
 # =============================================================================
 # Data loaders
 # =============================================================================
@@ -296,15 +252,11 @@ def _load_region_school_gap(conn, region, funding_year_start=2025, funding_year_
 
 
 def _load_region_rates(conn, *, year: int, term: int, region_name: str) -> pd.DataFrame:
-    sql = text(
-        """
-        EXEC dbo.GetRegionalCouncilRates
-            @calendaryear = :year,
-            @term         = :term,
-            @region       = :region_name
-        """
-    )
-    df = pd.read_sql(sql, conn, params={"year": int(year), "term": int(term), "region_name": region_name.strip()})
+    # Shared with the /Reports region charts (one fetch per term/year/region/data version)
+    df = pd.DataFrame(rates_frame(
+        "RegionalCouncilRates", conn,
+        CalendarYear=int(year), Term=int(term), Region=region_name.strip(),
+    ).rows())
 
     needed = {"YearGroupDesc", "CompetencyDesc", "ResultType", "Rate"}
     missing = needed - set(df.columns)
@@ -323,31 +275,17 @@ def _load_region_polygon(
     datafinder_layer_id: int = 120945,
     bbox_4326: Optional[Tuple[float, float, float, float]] = None,
 ):
-    gdf = load_regional_councils(
-        debug=bool(debug_boundaries),
-        debug_folder=debug_folder,
-        simplify_tol_deg=0.002,
+    return region_geometry.region_polygon(
+        region_name,
+        simplify_tol=0.002,
+        name_field=name_field,
         use_internet=bool(use_internet),
         datafinder_layer_id=int(datafinder_layer_id),
         bbox_4326=bbox_4326,
+        debug=bool(debug_boundaries),
+        debug_folder=debug_folder,
     )
 
-    detected = _detect_region_name_col(gdf, preferred=name_field)
-    s = gdf[detected].astype("string")
-    target = _norm_region_name(region_name)
-
-    mask = s.map(lambda x: _norm_region_name(str(x))) == target
-    if not mask.any():
-        mask = s.map(lambda x: target in _norm_region_name(str(x)))
-
-    out = gdf.loc[mask].copy()
-    if out.empty:
-        sample = sorted(s.dropna().unique().tolist())[:30]
-        raise RuntimeError(f"Region '{region_name}' not found in polygons using column '{detected}'. Examples: {sample}")
-
-    out = out.dissolve(by=detected).reset_index()
-    return out
-
 
 # =============================================================================
 # Header
@@ -406,19 +344,10 @@ def _load_region_kaiako_rates(conn, *, year: int, term: int, region_name: str) -
     })
     
     if df.shape[0] > 0:
-        sql = text("""
-            EXEC dbo.GetRegionalCouncilRates_kaiako
-                @calendaryear = :year,
-                @term = :term,
-                @region = :region
-        """)
-
-        df = pd.read_sql(sql, conn, params={
-            "year": year,
-            "term": term,
-            "region": region_name
-        })
-        return df
+        return pd.DataFrame(rates_frame(
+            "RegionalCouncilRatesKaiako", conn,
+            CalendarYear=year, Term=term, Region=region_name,
+        ).rows())
 
     return None
 
@@ -612,6 +541,15 @@ def ensure_bucket_column(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def _school_gap_rows_fit(*, y_top: float, y_bottom: float, row_h: float, show_title: bool = True) -> int:
+    """Data rows _draw_region_school_gap_table fits on a page (same geometry as it draws)."""
+    title_gap = 0.03 if show_title else 0.0
+    header_gap = 0.028
+    line_gap = 0.014
+    y = y_top - title_gap - header_gap
+    return max(0, int((y - y_bottom - line_gap) // row_h))
+
+
 def _draw_region_school_gap_table(
     ax,
     *,
@@ -716,8 +654,7 @@ def _draw_region_school_gap_table(
         zorder=4500,
     )
 
-    available_height = y - y_bottom - line_gap
-    rows_fit = max(0, int(available_height // row_h))
+    rows_fit = _school_gap_rows_fit(y_top=y_top, y_bottom=y_bottom, row_h=row_h, show_title=show_title)
 
     if df.empty:
         ax.text(
@@ -795,6 +732,73 @@ def _draw_region_school_gap_table(
 
     return len(show)
 
+# School-list pages: table geometry (rows per page follows from it)
+_GAP_PAGE_Y_TOP = 0.90
+_GAP_PAGE_Y_BOTTOM = 0.08
+_GAP_PAGE_ROW_H = 0.022
+
+
+def _draw_school_gap_page(
+    *,
+    fig,
+    ax,
+    family: str,
+    region_name: str,
+    df_page: pd.DataFrame,
+    footer_svg_path: Path,
+):
+    """
+    One school-list page (a PageSpec draw function). The page is drawn on a
+    scratch figure and placed on fig as a full-page image.
+    """
+    w, h = fig.get_size_inches()
+    dpi = fig.dpi
+
+    src, ax_src = new_page(w, h, dpi)
+    ax_src.set_axis_off()
+    ax_src.set_xlim(0, 1)
+    ax_src.set_ylim(0, 1)
+
+    add_footer_behind(
+        src,
+        footer_svg_path,
+        bottom_margin_frac=0.0,
+        max_footer_height_frac=0.15,
+        col_master=f"{C_MASTER}80",
+    )
+
+    ax_master = src.add_axes([0, 0, 1, 1], zorder=10_000)
+    ax_master.set_axis_off()
+    ax_master.patch.set_alpha(0.0)
+
+    title = f"{region_name} School List"
+    _draw_header(ax_master, family=family, title=title)
+
+    _draw_region_school_gap_table(
+        ax_src,
+        family=family,
+        df=df_page,
+        x0=0.06,
+        x1=0.56,
+        x2=0.84,
+        y_top=_GAP_PAGE_Y_TOP,
+        y_bottom=_GAP_PAGE_Y_BOTTOM,
+        row_h=_GAP_PAGE_ROW_H,
+        fontsize=8.4,
+        title=f"{region_name} – Schools not currently supported",
+        show_title=False,
+    )
+
+    buf = io.BytesIO()
+    src.savefig(buf, format="png", dpi=dpi, bbox_inches=None, pad_inches=0, transparent=False)
+    plt.close(src)
+
+    ax.set_axis_off()
+    ax.set_position([0, 0, 1, 1])
+    img = mpimg.imread(io.BytesIO(buf.getvalue()))
+    ax.imshow(img, extent=(0, 1, 0, 1), transform=ax.transAxes, aspect="auto")
+
+
 def _add_region_school_gap_pages(
     pdf,
     *,
@@ -807,87 +811,32 @@ def _add_region_school_gap_pages(
     dpi: int,
 ) -> int:
     """
-    Add as many school-gap pages as needed.
-    Returns number of pages added.
+    Add as many school-gap pages as needed (page-parallel when pdf is a
+    ParallelPdfPages). Returns number of pages added.
     """
-    pages_added = 0
-    start = 0
-
     if df is None:
         df = pd.DataFrame(columns=["School", "TerritorialAuthority", "PoolStatus"])
 
-    while True:
-        fig, ax = new_page(w, h, dpi)
-        ax.set_axis_off()
-        ax.set_xlim(0, 1)
-        ax.set_ylim(0, 1)
-
-        add_footer_behind(
-            fig,
-            footer_svg_path,
-            bottom_margin_frac=0.0,
-            max_footer_height_frac=0.15,
-            col_master=f"{C_MASTER}80",
-        )
-
-        ax_master = fig.add_axes([0, 0, 1, 1], zorder=10_000)
-        ax_master.set_axis_off()
-        ax_master.patch.set_alpha(0.0)
-
-        title = f"{region_name} School List"
-        _draw_header(ax_master, family=family, title=title)
-
-        remaining = df.iloc[start:].reset_index(drop=True)
+    rows_fit = _school_gap_rows_fit(
+        y_top=_GAP_PAGE_Y_TOP, y_bottom=_GAP_PAGE_Y_BOTTOM, row_h=_GAP_PAGE_ROW_H, show_title=False,
+    )
+    if df.empty or rows_fit <= 0:
+        chunks = [df.reset_index(drop=True)]
+    else:
+        chunks = [
+            df.iloc[start:start + rows_fit].reset_index(drop=True)
+            for start in range(0, len(df), rows_fit)
+        ]
 
-        drawn = _draw_region_school_gap_table(
-            ax,
-            family=family,
-            df=remaining,
-            x0=0.06,
-            x1=0.56,
-            x2=0.84,
-            y_top=0.90,
-            y_bottom=0.08,
-            row_h=0.022,
-            fontsize=8.4,
-            title=f"{region_name} – Schools not currently supported",
-            show_title=False,
+    specs = [
+        PageSpec(
+            _draw_school_gap_page,
+            dict(family=family, region_name=region_name, df_page=chunk, footer_svg_path=footer_svg_path),
         )
-
-        fig.canvas.draw()
-
-        buf = io.BytesIO()
-        fig.savefig(buf, format="png", dpi=dpi, bbox_inches=None, pad_inches=0, transparent=False)
-        png = buf.getvalue()
-
-        fig_r, ax_r = new_page(w, h, dpi)
-        ax_r.set_axis_off()
-        ax_r.set_position([0, 0, 1, 1])
-
-        try:
-            fig_r.subplots_adjust(left=0, right=1, bottom=0, top=1)
-        except Exception:
-            pass
-
-        img = mpimg.imread(io.BytesIO(png))
-        ax_r.imshow(img, extent=(0, 1, 0, 1), transform=ax_r.transAxes, aspect="auto")
-
-        fig_r.canvas.draw()
-        save_page(pdf, fig_r, full_bleed=True)
-
-        plt.close(fig_r)
-        plt.close(fig)
-
-        pages_added += 1
-
-        if drawn <= 0:
-            break
-
-        start += drawn
-        if start >= len(df):
-            break
-
-    return pages_added
+        for chunk in chunks
+    ]
+    render_pages(pdf, specs, width_in=w, height_in=h, dpi=dpi)
+    return len(specs)
 
 
 # =============================================================================
@@ -932,21 +881,17 @@ def _draw_region_map_page(
 
     # Context councils
     if draw_context_councils:
-        councils = load_regional_councils(
-            debug=bool(context_debug_boundaries),
-            debug_folder=context_debug_folder,
-            simplify_tol_deg=0.002,
+        councils = region_geometry.context_councils(
+            bbox_region,
+            crs=region_crs,
+            simplify_tol=0.002,
             use_internet=bool(councils_use_internet),
             datafinder_layer_id=int(councils_datafinder_layer_id),
             bbox_4326=councils_bbox_4326,
+            debug=bool(context_debug_boundaries),
+            debug_folder=context_debug_folder,
         )
-        if councils is not None and len(councils):
-            if councils.crs is None:
-                councils = councils.set_crs(epsg=4326)
-            if str(councils.crs) != str(region_crs):
-                councils = councils.to_crs(region_crs)
-
-            councils = councils.cx[bminx:bmaxx, bminy:bmaxy]
+        if len(councils):
             councils.plot(
                 ax=ax_map,
                 facecolor=CONTEXT_FILL,
@@ -968,38 +913,14 @@ def _draw_region_map_page(
     # Water layers
     if draw_water:
         try:
-            bbox_geom = shp_box(bminx, bminy, bmaxx, bmaxy)
-            bbox_series = gpd.GeoSeries([bbox_geom], crs=region_crs).to_crs("EPSG:4326")
-            wminx, wminy, wmaxx, wmaxy = bbox_series.total_bounds
-            bbox_4326 = (float(wminx), float(wminy), float(wmaxx), float(wmaxy))
-
-            lakes_gdf, rivers_gdf = load_lakes_and_rivers(
-                bbox_4326=bbox_4326,
+            lakes_gdf, rivers_gdf = region_geometry.water(
+                bbox_region,
+                crs=region_crs,
                 local_folder=water_local_folder,
                 prefer_local=prefer_local_water,
                 debug=True,
             )
 
-            if lakes_gdf is None:
-                lakes_gdf = gpd.GeoDataFrame(geometry=[], crs="EPSG:4326")
-            if rivers_gdf is None:
-                rivers_gdf = gpd.GeoDataFrame(geometry=[], crs="EPSG:4326")
-
-            if lakes_gdf.crs is None:
-                lakes_gdf = lakes_gdf.set_crs(epsg=4326)
-            if rivers_gdf.crs is None:
-                rivers_gdf = rivers_gdf.set_crs(epsg=4326)
-
-            if str(lakes_gdf.crs) != str(region_crs):
-                lakes_gdf = lakes_gdf.to_crs(region_crs)
-            if str(rivers_gdf.crs) != str(region_crs):
-                rivers_gdf = rivers_gdf.to_crs(region_crs)
-
-            if len(lakes_gdf):
-                lakes_gdf = lakes_gdf.cx[bminx:bmaxx, bminy:bmaxy]
-            if len(rivers_gdf):
-                rivers_gdf = rivers_gdf.cx[bminx:bmaxx, bminy:bmaxy]
-
             if len(lakes_gdf):
                 lakes_gdf.plot(ax=ax_map, facecolor="#ffffff", edgecolor="none", alpha=1, zorder=2)
             if len(rivers_gdf):
@@ -1200,382 +1121,384 @@ def build_region_report_pdf(
         page_size=page_size,
         orientation=orientation,
         dpi=dpi,
+        parallel=True,
     )
 
-    footer_svg_path = Path(footer_svg)
-    if not footer_svg_path.is_absolute():
-        footer_svg_path = Path(__file__).resolve().parents[1] / "static" / footer_svg_path.name
+    try:
+        footer_svg_path = Path(footer_svg)
+        if not footer_svg_path.is_absolute():
+            footer_svg_path = Path(__file__).resolve().parents[1] / "static" / footer_svg_path.name
 
-    preview_fig = None
+        preview_fig = None
 
-    # =========================================================
-    # PAGE 1 (map)
-    # =========================================================
-    fig1, ax_master = new_page(w, h, dpi)
-    ax_master.set_axis_off()
-
-    df_summary = get_region_school_summary(conn, region_name)
-
-    stats = stats_from_summary_row(
-        df_summary,
-        bucket_map={
-            "All schools": "TotalSchools",
-            "Equity Index 446+": "TotalSchools446+",
-            "Supported 24/25": "TotalSchoolsSupportedLY",
-            "Supported 25/26": "TotalSchoolsSupportedTY",
-        },
-        colours={
-            "All schools": "#1a427d",
-            "Equity Index 446+": "#3C7EBD",
-            "Supported 24/25": "#24ABE2",
-            "Supported 25/26": "#b1d6ed",
-        },
-        total_col="TotalSchools",
-    )
+        # =========================================================
+        # PAGE 1 (map)
+        # =========================================================
+        fig1, ax_master = new_page(w, h, dpi)
+        ax_master.set_axis_off()
 
-    circle_plot(
-        ax_master,
-        stats=stats,
-        fontfamily=family,
-        show_circle_pct=False,
-        height=0.15,
-    )
+        df_summary = get_region_school_summary(conn, region_name)
+
+        stats = stats_from_summary_row(
+            df_summary,
+            bucket_map={
+                "All schools": "TotalSchools",
+                "Equity Index 446+": "TotalSchools446+",
+                "Supported 24/25": "TotalSchoolsSupportedLY",
+                "Supported 25/26": "TotalSchoolsSupportedTY",
+            },
+            colours={
+                "All schools": "#1a427d",
+                "Equity Index 446+": "#3C7EBD",
+                "Supported 24/25": "#24ABE2",
+                "Supported 25/26": "#b1d6ed",
+            },
+            total_col="TotalSchools",
+        )
 
-    title1 = f"{region_name} – School Coverage"
-    _draw_header(ax_master, family=family, title=title1)
+        circle_plot(
+            ax_master,
+            stats=stats,
+            fontfamily=family,
+            show_circle_pct=False,
+            height=0.15,
+        )
 
-    add_footer_behind(
-        fig1,
-        footer_svg_path,
-        bottom_margin_frac=0.0,
-        max_footer_height_frac=0.13,
-        col_master=f"{C_MASTER}80",
-    )
+        title1 = f"{region_name} – School Coverage"
+        _draw_header(ax_master, family=family, title=title1)
 
-    school_gap_df = _load_region_school_gap(
-        conn,
-        region=region_name,
-        funding_year_start=2025,
-        funding_year_end=2026,
-    )
+        add_footer_behind(
+            fig1,
+            footer_svg_path,
+            bottom_margin_frac=0.0,
+            max_footer_height_frac=0.13,
+            col_master=f"{C_MASTER}80",
+        )
 
-    rows_drawn_on_page1 = _draw_region_school_gap_table(
-        ax_master,
-        family=family,
-        df=school_gap_df,
-        x0=0.06,
-        x1=0.56,
-        x2=0.84,
-        y_top=0.72,
-        y_bottom=0.08,
-        row_h=0.022,
-        fontsize=8.2,
-        title=f"{region_name} – Schools not currently supported",
-        show_title=True,
-    )
+        school_gap_df = _load_region_school_gap(
+            conn,
+            region=region_name,
+            funding_year_start=2025,
+            funding_year_end=2026,
+        )
 
-    """
-    ax_master.set_zorder(10_000)
-    ax_master.patch.set_alpha(0.0)
-    ax_map = fig1.add_axes(list(map_axes_rect), zorder=100)
-    ax_map.patch.set_alpha(1.0)
-    ax_map.set_facecolor("white")
-    if debug_axes_boxes:
-        ax_map.patch.set_alpha(0.12)
-        ax_map.patch.set_edgecolor("red")
-        ax_map.patch.set_linewidth(2)
-
-    _draw_region_map_page(
-        ax_map=ax_map,
-        region_poly=region_poly,
-        schools_df=schools,
-        map_bbox=map_bbox,
-        pad_frac=map_pad_frac,
-        draw_water=draw_water,
-        water_local_folder=water_local_folder,
-        prefer_local_water=prefer_local_water,
-        show_region_outline=show_region_outline,
-        debug_water=True,
-        draw_context_councils=draw_context_councils,
-        context_debug_boundaries=bool(debug_boundaries),
-        context_debug_folder=councils_folder,
-        fill_axes_box=bool(fill_map_axes_box),
-        councils_use_internet=councils_use_internet,
-        councils_datafinder_layer_id=councils_datafinder_layer_id,
-        councils_bbox_4326=councils_bbox_4326,
-    )
-    title1 = f"{region_name} – School Coverage Map"
-    _draw_header(ax_master, family=family, title=title1)
-    # ✅ NEW: compute bucket stats + draw proportional circles with shared fitted label fontsize
-    stats = compute_bucket_stats(
-        schools,
-        colours={
-            BUCKET_CURRENT: EDGE_CURRENT,
-            BUCKET_PREV: EDGE_PREV,
-            BUCKET_NEVER: EDGE_NEVER,
-        },
-    )
-    circle_plot(
-        ax_master,
-        stats=stats,
-        fontfamily=family,
-        top_y=0.92,
-        height=0.15,
-        gap_between_polygons=0.05,
-        polygon_text_size=None,  # auto-fit ONE fontsize using longest label
-        polygon_text_max=18.0,
-        polygon_text_min=8.0,
-    )
-    if draw_key:
-        _draw_key_stack(
+        rows_drawn_on_page1 = _draw_region_school_gap_table(
             ax_master,
             family=family,
-            schools_df=schools,
-            x=0.06,
-            y_top=0.84,
-            w=0.32,
-            h_item=0.042,
-            gap=0.010,
-            fontsize_title=11,
-            fontsize_item=9.2,
-            show_pool_breakdown=True,
+            df=school_gap_df,
+            x0=0.06,
+            x1=0.56,
+            x2=0.84,
+            y_top=0.72,
+            y_bottom=0.08,
+            row_h=0.022,
+            fontsize=8.2,
+            title=f"{region_name} – Schools not currently supported",
+            show_title=True,
         )
-    """
-
-    fig1.canvas.draw()
-
-    # Small preview copy of page 1
-    preview_buf = io.BytesIO()
-    fig1.savefig(
-        preview_buf,
-        format="png",
-        dpi=80,              # small preview only
-        bbox_inches=None,
-        pad_inches=0,
-        transparent=False,
-    )
-    preview_buf.seek(0)
-
-    preview_img = mpimg.imread(preview_buf)
-    preview_buf.close()
 
-    preview_fig, preview_ax = plt.subplots(figsize=(8.27, 11.69), dpi=100)
-    preview_fig.subplots_adjust(left=0, right=1, bottom=0, top=1)
-    preview_ax.set_axis_off()
+        """
+        ax_master.set_zorder(10_000)
+        ax_master.patch.set_alpha(0.0)
+        ax_map = fig1.add_axes(list(map_axes_rect), zorder=100)
+        ax_map.patch.set_alpha(1.0)
+        ax_map.set_facecolor("white")
+        if debug_axes_boxes:
+            ax_map.patch.set_alpha(0.12)
+            ax_map.patch.set_edgecolor("red")
+            ax_map.patch.set_linewidth(2)
+
+        _draw_region_map_page(
+            ax_map=ax_map,
+            region_poly=region_poly,
+            schools_df=schools,
+            map_bbox=map_bbox,
+            pad_frac=map_pad_frac,
+            draw_water=draw_water,
+            water_local_folder=water_local_folder,
+            prefer_local_water=prefer_local_water,
+            show_region_outline=show_region_outline,
+            debug_water=True,
+            draw_context_councils=draw_context_councils,
+            context_debug_boundaries=bool(debug_boundaries),
+            context_debug_folder=councils_folder,
+            fill_axes_box=bool(fill_map_axes_box),
+            councils_use_internet=councils_use_internet,
+            councils_datafinder_layer_id=councils_datafinder_layer_id,
+            councils_bbox_4326=councils_bbox_4326,
+        )
+        title1 = f"{region_name} – School Coverage Map"
+        _draw_header(ax_master, family=family, title=title1)
+        # ✅ NEW: compute bucket stats + draw proportional circles with shared fitted label fontsize
+        stats = compute_bucket_stats(
+            schools,
+            colours={
+                BUCKET_CURRENT: EDGE_CURRENT,
+                BUCKET_PREV: EDGE_PREV,
+                BUCKET_NEVER: EDGE_NEVER,
+            },
+        )
+        circle_plot(
+            ax_master,
+            stats=stats,
+            fontfamily=family,
+            top_y=0.92,
+            height=0.15,
+            gap_between_polygons=0.05,
+            polygon_text_size=None,  # auto-fit ONE fontsize using longest label
+            polygon_text_max=18.0,
+            polygon_text_min=8.0,
+        )
+        if draw_key:
+            _draw_key_stack(
+                ax_master,
+                family=family,
+                schools_df=schools,
+                x=0.06,
+                y_top=0.84,
+                w=0.32,
+                h_item=0.042,
+                gap=0.010,
+                fontsize_title=11,
+                fontsize_item=9.2,
+                show_pool_breakdown=True,
+            )
+        """
 
-    preview_ax.imshow(
-        preview_img,
-        extent=(0, 1, 0, 1),
-        transform=preview_ax.transAxes,
-        aspect="auto",
-    )
+        fig1.canvas.draw()
 
-    if rasterize_page1:
-        buf1 = io.BytesIO()
+        # Small preview copy of page 1
+        preview_buf = io.BytesIO()
         fig1.savefig(
-            buf1,
+            preview_buf,
             format="png",
-            dpi=dpi,
+            dpi=80,              # small preview only
             bbox_inches=None,
             pad_inches=0,
             transparent=False,
         )
-        buf1.seek(0)
+        preview_buf.seek(0)
 
-        img1 = mpimg.imread(buf1)
-        buf1.close()
+        preview_img = mpimg.imread(preview_buf)
+        preview_buf.close()
 
-        fig1b, ax1b = new_page(w, h, dpi)
-        ax1b.set_axis_off()
-        ax1b.set_position([0, 0, 1, 1])
+        preview_fig, preview_ax = plt.subplots(figsize=(8.27, 11.69), dpi=100)
+        preview_fig.subplots_adjust(left=0, right=1, bottom=0, top=1)
+        preview_ax.set_axis_off()
 
-        try:
-            fig1b.subplots_adjust(left=0, right=1, bottom=0, top=1)
-        except Exception:
-            pass
-
-        ax1b.imshow(
-            img1,
+        preview_ax.imshow(
+            preview_img,
             extent=(0, 1, 0, 1),
-            transform=ax1b.transAxes,
+            transform=preview_ax.transAxes,
             aspect="auto",
         )
 
-        fig1b.canvas.draw()
-        save_page(pdf, fig1b, full_bleed=True)
-        plt.close(fig1b)
-    else:
-        save_page(pdf, fig1, full_bleed=True)
-
-    plt.close(fig1)
-
-    remaining_school_gap_df = school_gap_df.iloc[rows_drawn_on_page1:].reset_index(drop=True)
-
-    gap_pages = 0
-    if not remaining_school_gap_df.empty:
-        gap_pages = _add_region_school_gap_pages(
-            pdf,
-            df=remaining_school_gap_df,
-            family=family,
-            region_name=region_name,
-            footer_svg_path=footer_svg_path,
-            w=w,
-            h=h,
-            dpi=dpi,
-        )
-
-    # =========================================================
-    # PAGE 2 (chart)
-    # =========================================================
-    fig2 = provider_portrait_with_target(
-        rates_df,
-        term=int(term),
-        year=int(calendar_year),
-        mode="region",
-        region_name=region_name,
-        bar_series=bar_series,
-        debug=False,
-        title="",
-    )
-
-    ax_master2 = fig2.add_axes([0, 0, 1, 1], zorder=10_000)
-    ax_master2.set_axis_off()
-    ax_master2.patch.set_alpha(0.0)
-
-    title2 = f"{region_name} Summary"
-    _draw_header(ax_master2, family=family, title=title2)
-
-    add_footer_behind(
-        fig2,
-        footer_svg_path,
-        bottom_margin_frac=0.0,
-        max_footer_height_frac=0.15,
-        col_master=f"{C_MASTER}80",
-    )
-
-    fig2.canvas.draw()
-    save_page(pdf, fig2, full_bleed=True)
-    plt.close(fig2)
-
-    # =========================================================
-    # PAGE 3 (region vs national difference)
-    # =========================================================
-    fig3, ax3 = new_page(w, h, dpi)
-    ax3.set_axis_off()
-    ax3.set_xlim(0, 1)
-    ax3.set_ylim(0, 1)
-
-    add_footer_behind(
-        fig3,
-        footer_svg_path,
-        bottom_margin_frac=0.0,
-        max_footer_height_frac=0.15,
-        col_master=f"{C_MASTER}80",
-    )
-
-    draw_comparison(
-        ax3,
-        x=0.05,
-        y=0.13,
-        width=0.90,
-        height=0.78,
-        df=comparison_df,
-        text_area=0.5,
-        label_col="Label",
-        diff_col="Difference",
-        group_col="YearGroupDesc",
-        left_color="#C97A6B",   # worse than national
-        right_color="#2EBDC2",  # better than national
-        line_color="#6c757d",   # 0 line
-        fontsize=8,
-        sort_by_abs=False,
-        debug=False,
-    )
+        if rasterize_page1:
+            buf1 = io.BytesIO()
+            fig1.savefig(
+                buf1,
+                format="png",
+                dpi=dpi,
+                bbox_inches=None,
+                pad_inches=0,
+                transparent=False,
+            )
+            buf1.seek(0)
 
-    ax_master3 = fig3.add_axes([0, 0, 1, 1], zorder=10_000)
-    ax_master3.set_axis_off()
-    ax_master3.patch.set_alpha(0.0)
+            img1 = mpimg.imread(buf1)
+            buf1.close()
 
-    title3 = f"{region_name} National Difference"
-    _draw_header(ax_master3, family=family, title=title3)
+            fig1b, ax1b = new_page(w, h, dpi)
+            ax1b.set_axis_off()
+            ax1b.set_position([0, 0, 1, 1])
 
-    fig3.canvas.draw()
-    save_page(pdf, fig3, full_bleed=True)
-    plt.close(fig3)
+            try:
+                fig1b.subplots_adjust(left=0, right=1, bottom=0, top=1)
+            except Exception:
+                pass
 
-    # =========================================================
-    # PAGE 4 (chart)
-    # =========================================================
-    # Load region kaiako vs instructor dataset
-    kaiako_rates_df = _load_region_kaiako_rates(
-        conn,
-        year=calendar_year,
-        term=term,
-        region_name=region_name,
-    )
+            ax1b.imshow(
+                img1,
+                extent=(0, 1, 0, 1),
+                transform=ax1b.transAxes,
+                aspect="auto",
+            )
 
-    if kaiako_rates_df is not None:
-        # Which series to draw
-        vars_to_plot = [
-            "Region Instructor-Led Rate (YTD)",
-            "Region Kaiako-Led Rate (YTD)",
-        ]
+            fig1b.canvas.draw()
+            save_page(pdf, fig1b, full_bleed=True)
+            plt.close(fig1b)
+        else:
+            save_page(pdf, fig1, full_bleed=True)
+
+        plt.close(fig1)
+
+        remaining_school_gap_df = school_gap_df.iloc[rows_drawn_on_page1:].reset_index(drop=True)
+
+        gap_pages = 0
+        if not remaining_school_gap_df.empty:
+            gap_pages = _add_region_school_gap_pages(
+                pdf,
+                df=remaining_school_gap_df,
+                family=family,
+                region_name=region_name,
+                footer_svg_path=footer_svg_path,
+                w=w,
+                h=h,
+                dpi=dpi,
+            )
 
-        colors_dict = {
-            "Region Instructor-Led Rate (YTD)": "#2EBDC2",
-            "Region Kaiako-Led Rate (YTD)": "#BBE6E9",
-        }
+        # =========================================================
+        # PAGE 2 (chart)
+        # =========================================================
+        fig2 = provider_portrait_with_target(
+            rates_df,
+            term=int(term),
+            year=int(calendar_year),
+            mode="region",
+            region_name=region_name,
+            bar_series=bar_series,
+            debug=False,
+            title="",
+        )
 
-        # Compute row heights per year group (required by make_figure)
-        df2 = kaiako_rates_df[["CompetencyDesc", "YearGroupDesc"]].drop_duplicates()
+        ax_master2 = fig2.add_axes([0, 0, 1, 1], zorder=10_000)
+        ax_master2.set_axis_off()
+        ax_master2.patch.set_alpha(0.0)
 
-        row_heights = (
-            df2["YearGroupDesc"].value_counts().sort_index()
-            / df2["YearGroupDesc"].value_counts().sum()
-        )
+        title2 = f"{region_name} Summary"
+        _draw_header(ax_master2, family=family, title=title2)
 
-        # Create the chart figure
-        fig4 = make_figure_region(
-            kaiako_rates_df,
-            DEBUG=False,
-            PAGE_SIZE=(8.27, 11.69),
-            HEADER_SPACE=0.08,
-            FOOTER_SPACE=0.13,
-            subtitle_space=0.05,
-            row_heights=row_heights,
-            BUFFER=0.0,
-            vars_to_plot=vars_to_plot,
-            colors_dict=colors_dict,
+        add_footer_behind(
+            fig2,
+            footer_svg_path,
+            bottom_margin_frac=0.0,
+            max_footer_height_frac=0.15,
+            col_master=f"{C_MASTER}80",
         )
 
-        # Add header overlay
-        ax_master4 = fig4.add_axes([0, 0, 1, 1], zorder=10_000)
-        ax_master4.set_axis_off()
-        ax_master4.patch.set_alpha(0)
+        fig2.canvas.draw()
+        save_page(pdf, fig2, full_bleed=True)
+        plt.close(fig2)
 
-        title4 = f"{region_name} – Instructor vs Kaiako Delivery"
-        _draw_header(ax_master4, family=family, title=title4)
+        # =========================================================
+        # PAGE 3 (region vs national difference)
+        # =========================================================
+        fig3, ax3 = new_page(w, h, dpi)
+        ax3.set_axis_off()
+        ax3.set_xlim(0, 1)
+        ax3.set_ylim(0, 1)
 
-        # Add footer
         add_footer_behind(
-            fig4,
+            fig3,
             footer_svg_path,
             bottom_margin_frac=0.0,
             max_footer_height_frac=0.15,
             col_master=f"{C_MASTER}80",
         )
 
-        fig4.canvas.draw()
+        draw_comparison(
+            ax3,
+            x=0.05,
+            y=0.13,
+            width=0.90,
+            height=0.78,
+            df=comparison_df,
+            text_area=0.5,
+            label_col="Label",
+            diff_col="Difference",
+            group_col="YearGroupDesc",
+            left_color="#C97A6B",   # worse than national
+            right_color="#2EBDC2",  # better than national
+            line_color="#6c757d",   # 0 line
+            fontsize=8,
+            sort_by_abs=False,
+            debug=False,
+        )
 
-        # Save page to PDF
-        save_page(pdf, fig4, full_bleed=True)
-        plt.close(fig4)
+        ax_master3 = fig3.add_axes([0, 0, 1, 1], zorder=10_000)
+        ax_master3.set_axis_off()
+        ax_master3.patch.set_alpha(0.0)
+
+        title3 = f"{region_name} National Difference"
+        _draw_header(ax_master3, family=family, title=title3)
+
+        fig3.canvas.draw()
+        save_page(pdf, fig3, full_bleed=True)
+        plt.close(fig3)
+
+        # =========================================================
+        # PAGE 4 (chart)
+        # =========================================================
+        # Load region kaiako vs instructor dataset
+        kaiako_rates_df = _load_region_kaiako_rates(
+            conn,
+            year=calendar_year,
+            term=term,
+            region_name=region_name,
+        )
 
-        meta["pages"] = 4 + gap_pages
-    else:
-        meta["pages"] = 3 + gap_pages
+        if kaiako_rates_df is not None:
+            # Which series to draw
+            vars_to_plot = [
+                "Region Instructor-Led Rate (YTD)",
+                "Region Kaiako-Led Rate (YTD)",
+            ]
+
+            colors_dict = {
+                "Region Instructor-Led Rate (YTD)": "#2EBDC2",
+                "Region Kaiako-Led Rate (YTD)": "#BBE6E9",
+            }
+
+            # Compute row heights per year group (required by make_figure)
+            df2 = kaiako_rates_df[["CompetencyDesc", "YearGroupDesc"]].drop_duplicates()
+
+            row_heights = (
+                df2["YearGroupDesc"].value_counts().sort_index()
+                / df2["YearGroupDesc"].value_counts().sum()
+            )
 
-    close_pdf(pdf)
+            # Create the chart figure
+            fig4 = make_figure_region(
+                kaiako_rates_df,
+                DEBUG=False,
+                PAGE_SIZE=(8.27, 11.69),
+                HEADER_SPACE=0.08,
+                FOOTER_SPACE=0.13,
+                subtitle_space=0.05,
+                row_heights=row_heights,
+                BUFFER=0.0,
+                vars_to_plot=vars_to_plot,
+                colors_dict=colors_dict,
+            )
+
+            # Add header overlay
+            ax_master4 = fig4.add_axes([0, 0, 1, 1], zorder=10_000)
+            ax_master4.set_axis_off()
+            ax_master4.patch.set_alpha(0)
+
+            title4 = f"{region_name} – Instructor vs Kaiako Delivery"
+            _draw_header(ax_master4, family=family, title=title4)
+
+            # Add footer
+            add_footer_behind(
+                fig4,
+                footer_svg_path,
+                bottom_margin_frac=0.0,
+                max_footer_height_frac=0.15,
+                col_master=f"{C_MASTER}80",
+            )
+
+            fig4.canvas.draw()
+
+            # Save page to PDF
+            save_page(pdf, fig4, full_bleed=True)
+            plt.close(fig4)
+
+            meta["pages"] = 4 + gap_pages
+        else:
+            meta["pages"] = 3 + gap_pages
+    finally:
+        close_pdf(pdf)
 
     return preview_fig, meta
 # =============================================================================
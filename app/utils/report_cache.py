@@ -0,0 +1,288 @@
+# app/utils/report_cache.py
+"""
+Content-addressed cache for rendered /Reports artifacts.
+
+Every report build writes REPORT_DIR/<report_id>.png/.pdf. For reports that
+don't depend on who asked (national rates, funder/provider/school charts,
+region summaries...) the same inputs give the same output, so the first
+build is kept as
+
+    REPORT_DIR/<digest>.png | .preview.png | .pdf | .json   (json = response payload)
+
+where digest = sha256(report parameters + data version). The digest doubles
+as the report_id, so download_pdf/download_png serve cached files as-is.
+
+Data version:
+- the DB watermark from dbo.FlaskReportDataWatermark (first column of the
+  first row, e.g. last achievement change), checked at most every
+  REPORT_WATERMARK_CHECK_SECONDS. If the proc isn't deployed it's retried
+  after 10 minutes and the version falls back to a REPORT_CACHE_TTL time
+  bucket instead;
+- plus a local stamp file bumped by mark_report_data_changed() from the
+  routes that change rates data (achievements, class lists, provider
+  deletes, school term moves).
+A new version gives new digests; old entries simply age out.
+
+Survey submissions only affect the survey-based reports, so they bump a
+separate stamp (mark_survey_data_changed()); report.py adds
+survey_data_version() to the cache parameters of those report types only.
+
+Disk quota: enforce_quota() keeps REPORT_DIR under REPORT_DIR_MAX_MB by
+deleting the least recently used files (cache hits touch their files).
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.utils.database import get_db_engine
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+REPORT_DIR = Path(os.getenv("REPORT_DIR", "/tmp/wsfl_reports"))
+REPORT_DIR.mkdir(parents=True, exist_ok=True)
+
+REPORT_CACHE_TTL = _env_float("REPORT_CACHE_TTL", 3600)
+REPORT_DIR_MAX_BYTES = int(_env_float("REPORT_DIR_MAX_MB", 2048) * 1024 * 1024)
+WATERMARK_CHECK_SECONDS = _env_float("REPORT_WATERMARK_CHECK_SECONDS", 60)
+
+_WATERMARK_PROC = "FlaskReportDataWatermark"
+_WATERMARK_RETRY_SECONDS = 600
+_STAMP_FILE = REPORT_DIR / ".data_stamp"
+_SURVEY_STAMP_FILE = REPORT_DIR / ".survey_stamp"
+_QUOTA_INTERVAL_SECONDS = 60
+_QUOTA_MIN_AGE_SECONDS = 300  # never evict files a request may still be writing/sending
+_ARTIFACT_SUFFIXES = (".png", ".preview.png", ".pdf")
+
+
+def _stamp(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _touch(path: Path) -> None:
+    try:
+        path.touch()
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+    except OSError:
+        pass
+
+
+class ReportKey:
+    __slots__ = ("digest", "version")
+
+    def __init__(self, digest: str, version: str):
+        self.digest = digest
+        self.version = version
+
+
+class ReportCache:
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._watermark = None
+        self._watermark_checked = 0.0
+        self._watermark_unavailable_until = 0.0
+        self._last_quota = 0.0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evicted_files": 0, "evicted_bytes": 0}
+
+    # ---------- data version ----------
+    def _db_watermark(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._watermark_checked < WATERMARK_CHECK_SECONDS:
+                return self._watermark
+            if now < self._watermark_unavailable_until:
+                return None
+
+        try:
+            with get_db_engine().connect() as conn:
+                row = conn.execute(text(f"SET NOCOUNT ON; EXEC dbo.{_WATERMARK_PROC}")).fetchone()
+            watermark = str(row[0]) if row is not None else ""
+        except DBAPIError as e:
+            current_app.logger.warning(
+                "⚠️ %s unavailable, report cache falls back to %ss buckets: %s",
+                _WATERMARK_PROC, int(REPORT_CACHE_TTL), e,
+            )
+            with self._lock:
+                self._watermark = None
+                self._watermark_unavailable_until = now + _WATERMARK_RETRY_SECONDS
+            return None
+
+        with self._lock:
+            self._watermark = watermark
+            self._watermark_checked = now
+        return watermark
+
+    def data_version(self) -> str:
+        watermark = self._db_watermark()
+        if watermark is None:
+            watermark = f"t{int(time.time() // max(REPORT_CACHE_TTL, 1))}"
+        return f"{watermark}:{_stamp(_STAMP_FILE)}"
+
+    def survey_data_version(self) -> str:
+        return str(_stamp(_SURVEY_STAMP_FILE))
+
+    def mark_data_changed(self) -> None:
+        _touch(_STAMP_FILE)
+
+    def mark_survey_data_changed(self) -> None:
+        _touch(_SURVEY_STAMP_FILE)
+
+    # ---------- entries ----------
+    def key_for(self, params: dict) -> ReportKey:
+        version = self.data_version()
+        blob = json.dumps({"params": params, "version": version}, sort_keys=True, default=str)
+        return ReportKey(hashlib.sha256(blob.encode("utf-8")).hexdigest()[:32], version)
+
+    def get(self, key: ReportKey):
+        """Cached payload dict (with report_id) for key, or None."""
+        meta_path = self.root / f"{key.digest}.json"
+        try:
+            with open(meta_path, "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+            files = [self.root / f"{key.digest}{suffix}" for suffix in meta.get("files", [])]
+            if not files or not all(f.exists() for f in files):
+                raise FileNotFoundError(key.digest)
+        except (OSError, ValueError):
+            self._bump("misses")
+            return None
+
+        now = time.time()
+        for path in [meta_path, *files]:
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+        self._bump("hits")
+        payload = dict(meta.get("payload") or {})
+        payload["report_id"] = key.digest
+        return payload
+
+    def put(self, key: ReportKey, report_id: str, payload: dict) -> bool:
+        """Keep REPORT_DIR/<report_id>.* as the cached artifacts for key."""
+        files = []
+        for suffix in _ARTIFACT_SUFFIXES:
+            src = self.root / f"{report_id}{suffix}"
+            if not src.exists():
+                continue
+            dst = self.root / f"{key.digest}{suffix}"
+            tmp = self.root / f"{key.digest}{suffix}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                try:
+                    os.link(src, tmp)
+                except OSError:
+                    shutil.copyfile(src, tmp)
+                os.replace(tmp, dst)
+            except OSError:
+                tmp.unlink(missing_ok=True)
+                return False
+            files.append(suffix)
+        if ".png" not in files:
+            return False
+
+        meta_path = self.root / f"{key.digest}.json"
+        tmp = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"version": key.version, "files": files, "payload": payload,
+                       "created_at": time.time()}, fh, default=str)
+        os.replace(tmp, meta_path)
+        self._bump("stores")
+        self.enforce_quota()
+        return True
+
+    # ---------- quota ----------
+    def enforce_quota(self, force: bool = False) -> int:
+        """Delete least recently used files until REPORT_DIR fits the quota."""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_quota < _QUOTA_INTERVAL_SECONDS:
+                return 0
+            self._last_quota = now
+
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                    total += st.st_size
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            return 0
+
+        if total <= self.max_bytes:
+            return 0
+
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        freed = 0
+        for mtime, size, path in sorted(entries):
+            if total <= target:
+                break
+            if now - mtime < _QUOTA_MIN_AGE_SECONDS:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            freed += size
+            removed += 1
+
+        with self._lock:
+            self._stats["evicted_files"] += removed
+            self._stats["evicted_bytes"] += freed
+        if removed:
+            current_app.logger.info("🧹 REPORT_DIR quota: removed %d files (%.1f MB)", removed, freed / 1e6)
+        return removed
+
+    def _reset_lock(self):
+        # after fork: a lock held by another thread in the parent stays held
+        self._lock = threading.Lock()
+
+    def _bump(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self._stats)
+        lookups = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / lookups, 3) if lookups else None
+        data["max_mb"] = round(self.max_bytes / (1024 * 1024), 1)
+        return data
+
+
+report_cache = ReportCache(REPORT_DIR, REPORT_DIR_MAX_BYTES)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=report_cache._reset_lock)
+
+
+def mark_report_data_changed() -> None:
+    """Called after writes that change rates data (new cache digests for every report)."""
+    report_cache.mark_data_changed()
+
+
+def mark_survey_data_changed() -> None:
+    """Called after survey submissions (new digests for the survey-based reports only)."""
+    report_cache.mark_survey_data_changed()
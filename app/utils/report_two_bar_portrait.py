@@ -4,7 +4,8 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import os
 import textwrap
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from app.utils.database import get_engine_for_url
 from datetime import datetime
 import pytz
 
@@ -63,7 +64,7 @@ def get_db_engine():
         "@heimatau.database.windows.net:1433/WSFL"
         "?driver=ODBC+Driver+18+for+SQL+Server"
     )
-    return create_engine(connection_string, fast_executemany=True)
+    return get_engine_for_url(connection_string, fast_executemany=True)
 
 def load_national_results(con, calendaryear: int, term: int, from_db: bool = True) -> pd.DataFrame:
     """
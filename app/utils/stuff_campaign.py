@@ -6,6 +6,7 @@ from typing import Any, Dict, List, Optional, Tuple
 import pandas as pd
 import matplotlib.patches as mpatches
 from sqlalchemy import text
+from app.utils.database import get_engine_for_url
 
 from app.report_utils.FNT_PolygonText import draw_text_in_polygon
 from app.report_utils.SHP_RoundRect import rounded_rect_polygon
@@ -250,14 +251,13 @@ def get_db_engine():
         "@heimatau.database.windows.net:1433/WSFL"
         "?driver=ODBC+Driver+18+for+SQL+Server"
     )
-    return create_engine(connection_string, pool_pre_ping=True, fast_executemany=True)
+    return get_engine_for_url(connection_string, fast_executemany=True)
 
 # ------------------------------------------------------------
 # Optional CLI runner
 # ------------------------------------------------------------
 if __name__ == "__main__":
     import os
-    from sqlalchemy import create_engine
     from dotenv import load_dotenv
 
     load_dotenv()
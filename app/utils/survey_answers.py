@@ -0,0 +1,381 @@
+# app/utils/survey_answers.py
+"""
+Survey submissions: posted answers -> answer rows -> database.
+
+Submissions used to make one round trip per answered question
+(SVY_InsertAnswer2, plus SVY_ResolveAndValidateOption per dropdown) on top
+of SVY_InsertRespondent and SVY_GetRespondentID: ~45 sequential calls to
+Azure SQL for a 40-question teacher assessment, all inside the transaction.
+
+Answers are now turned into rows in Python first (types and dropdown
+options come from the cached survey definition; only dropdown answers the
+cached options can't settle still go to SVY_ResolveAndValidateOption), and
+saved with a single call:
+
+    EXEC SVY_SubmitResponseJSON @SurveyID, @Email, @AnswersJSON
+      @AnswersJSON: [{"QuestionID", "AnswerLikert", "AnswerBoolean",
+                      "AnswerOptionID", "AnswerText"}, ...]   (nulls where unused)
+      returns one row with RespondentID
+      = SVY_InsertRespondent + SVY_GetRespondentID + SVY_InsertAnswer2 per row
+
+If the proc isn't deployed (or SURVEY_BULK_SUBMIT=0) the same rows go
+through the per-question path; a missing proc is re-checked after
+SURVEY_BULK_RETRY_S. Latency per path is in survey_submit_metrics()
+(/admin/metrics).
+run_benchmark() / python -m app.utils.survey_answers compares the two
+paths against a simulated round-trip latency.
+
+Usage:
+    with engine.connect() as conn:
+        rows = answer_rows(answers, survey_id, definition.type_map(), conn=conn)
+    respondent_id, path = save_submission(engine, survey_id, email, rows)
+"""
+import json
+import os
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.utils.survey_definitions import resolve_dropdown_option
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+SURVEY_BULK_SUBMIT = os.getenv("SURVEY_BULK_SUBMIT", "1") == "1"
+SURVEY_BULK_PROC = os.getenv("SURVEY_BULK_PROC", "SVY_SubmitResponseJSON")
+SURVEY_BULK_RETRY_S = _env_float("SURVEY_BULK_RETRY_S", 600)
+
+ANSWER_FIELDS = ("AnswerLikert", "AnswerBoolean", "AnswerOptionID", "AnswerText")
+
+TRUTHY = {"1", "true", "t", "yes", "y", "on"}
+FALSY = {"0", "false", "f", "no", "n", "off"}
+
+_LOCK = threading.Lock()
+_bulk_retry_at = 0.0  # monotonic time the bulk proc may be tried again
+_STATS = {
+    "bulk": 0, "bulk_ms_total": 0.0,
+    "per_question": 0, "per_question_ms_total": 0.0,
+    "bulk_missing": 0, "answers": 0, "ddl_proc_lookups": 0,
+}
+
+
+def _row(qid, **answer):
+    row = {"QuestionID": int(qid)}
+    for field in ANSWER_FIELDS:
+        row[field] = answer.get(field)
+    return row
+
+
+def _bool_answer(val) -> int:
+    v = str(val).strip().lower()
+    if v in TRUTHY:
+        return 1
+    if v in FALSY:
+        return 0
+    return 1 if v else 0
+
+
+def resolve_option_via_proc(conn, survey_id, qid, opt_id, val):
+    """SVY_ResolveAndValidateOption: OptionID for a posted dropdown answer, or None."""
+    with _LOCK:
+        _STATS["ddl_proc_lookups"] += 1
+    r = conn.execute(
+        text("""
+            DECLARE @Resolved INT, @IsValid BIT;
+            EXEC dbo.SVY_ResolveAndValidateOption
+                @SurveyID=:sid,
+                @QuestionID=:qid,
+                @PostedOptionID=:opt,
+                @PostedValue=:v,
+                @ResolvedOptionID=@Resolved OUTPUT,
+                @IsValid=@IsValid OUTPUT;
+            SELECT @Resolved AS Resolved;
+        """),
+        {"sid": survey_id, "qid": qid, "opt": opt_id, "v": val},
+    )
+    try:
+        row = r.fetchone()
+    finally:
+        r.close()
+    return row[0] if row else None
+
+
+def answer_rows(answers: dict, survey_id: int, qtype_map: dict, conn) -> list:
+    """
+    Answer rows for the parsed form ({"<qid>": {"value", "id"}}), by question
+    type; unanswered and unknown questions are skipped. Dropdowns are checked
+    against the cached options, falling back to the proc on conn.
+    """
+    rows = []
+    for qid_str, payload in answers.items():
+        qtype = qtype_map.get(qid_str)
+        if not qtype:
+            continue
+
+        qid = int(qid_str)
+        val = payload.get("value")
+        opt_id_raw = payload.get("id")
+        opt_id = int(opt_id_raw) if (opt_id_raw and opt_id_raw.isdigit()) else None
+
+        # ----- Likert
+        if qtype == "LIK":
+            if val:
+                rows.append(_row(qid, AnswerLikert=int(val)))
+
+        # ----- Dropdown
+        elif qtype == "DDL":
+            resolved = resolve_dropdown_option(survey_id, qid, opt_id, val, conn=conn)
+            if resolved is None:
+                resolved = resolve_option_via_proc(conn, survey_id, qid, opt_id, val)
+            if resolved is not None:
+                rows.append(_row(qid, AnswerOptionID=int(resolved), AnswerText=(val or None)))
+
+        # ----- Boolean / YesNo / Checkbox
+        elif qtype in ("BOOL", "YN", "CHK"):
+            if val is not None:
+                rows.append(_row(qid, AnswerBoolean=_bool_answer(val)))
+
+        # ----- Text
+        else:
+            if val:
+                rows.append(_row(qid, AnswerText=val))
+    return rows
+
+
+def guest_answer_rows(responses: dict) -> list:
+    """Rows for the legacy guest form ({"<qid>": value}): digits are Likert, the rest text."""
+    rows = []
+    for qid_str, value in responses.items():
+        qid = int(qid_str)
+        if value.isdigit():
+            rows.append(_row(qid, AnswerLikert=int(value)))
+        else:
+            rows.append(_row(qid, AnswerText=value))
+    return rows
+
+
+# -----------------------------
+# Saving
+# -----------------------------
+def _consume(r):
+    try:
+        while True:
+            if r.returns_rows:
+                r.fetchall()
+            if not r.nextset():
+                break
+    except Exception:
+        pass
+    finally:
+        r.close()
+
+
+def _is_missing_proc(e: DBAPIError) -> bool:
+    msg = str(getattr(e, "orig", e))
+    return "2812" in msg or "Could not find stored procedure" in msg
+
+
+def _bulk_enabled() -> bool:
+    return SURVEY_BULK_SUBMIT and time.monotonic() >= _bulk_retry_at
+
+
+def save_bulk(conn, survey_id: int, email: str, rows: list):
+    """Respondent + all answers in one SVY_SubmitResponseJSON call; returns RespondentID."""
+    r = conn.execute(
+        text(f"""
+            EXEC {SURVEY_BULK_PROC}
+                @SurveyID    = :sid,
+                @Email       = :email,
+                @AnswersJSON = :answers;
+        """),
+        {"sid": survey_id, "email": email, "answers": json.dumps(rows)},
+    )
+    try:
+        row = r.fetchone()
+    finally:
+        r.close()
+    return None if not row else row[0]
+
+
+def save_per_question(conn, survey_id: int, email: str, rows: list):
+    """Respondent, then one SVY_InsertAnswer2 per row; returns RespondentID."""
+    _consume(conn.execute(
+        text("""
+            EXEC SVY_InsertRespondent
+                @SurveyID = :sid,
+                @Email    = :email,
+                @RespondentID = NULL;
+        """),
+        {"sid": survey_id, "email": email},
+    ))
+
+    r = conn.execute(
+        text("""
+            EXEC SVY_GetRespondentID
+                @SurveyID = :sid,
+                @Email    = :email;
+        """),
+        {"sid": survey_id, "email": email},
+    )
+    try:
+        row = r.fetchone()
+    finally:
+        r.close()
+    respondent_id = None if not row else row[0]
+    if not respondent_id:
+        raise RuntimeError("Could not retrieve RespondentID")
+
+    for answer in rows:
+        fields = [f for f in ANSWER_FIELDS if answer.get(f) is not None]
+        assignments = ",\n".join(f"    @{f} = :{f}" for f in fields)
+        params = {"rid": respondent_id, "qid": answer["QuestionID"]}
+        params.update({f: answer[f] for f in fields})
+        _consume(conn.execute(
+            text(
+                "EXEC SVY_InsertAnswer2\n"
+                "    @RespondentID = :rid,\n"
+                "    @QuestionID   = :qid" + (",\n" + assignments if fields else "") + ";"
+            ),
+            params,
+        ))
+    return respondent_id
+
+
+def save_submission(engine, survey_id: int, email: str, rows: list):
+    """
+    Save a respondent's answers in one transaction: the bulk proc when
+    available, else per question (in a fresh transaction if the bulk proc
+    turns out to be missing). Returns (RespondentID, "bulk" | "per_question").
+    """
+    global _bulk_retry_at
+
+    if _bulk_enabled():
+        t0 = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                respondent_id = save_bulk(conn, survey_id, email, rows)
+        except DBAPIError as e:
+            if not _is_missing_proc(e):
+                raise
+            with _LOCK:
+                _STATS["bulk_missing"] += 1
+                _bulk_retry_at = time.monotonic() + SURVEY_BULK_RETRY_S
+        else:
+            if not respondent_id:
+                raise RuntimeError("Could not retrieve RespondentID")
+            _record("bulk", t0, len(rows))
+            return respondent_id, "bulk"
+
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        respondent_id = save_per_question(conn, survey_id, email, rows)
+    _record("per_question", t0, len(rows))
+    return respondent_id, "per_question"
+
+
+def _record(path, t0, n_answers):
+    with _LOCK:
+        _STATS[path] += 1
+        _STATS[f"{path}_ms_total"] += (time.perf_counter() - t0) * 1000
+        _STATS["answers"] += n_answers
+
+
+def survey_submit_metrics():
+    with _LOCK:
+        data = dict(_STATS)
+        data["bulk_available"] = _bulk_enabled()
+    for path in ("bulk", "per_question"):
+        total = data.pop(f"{path}_ms_total")
+        data[f"{path}_ms_avg"] = round(total / data[path], 1) if data[path] else None
+    return data
+
+
+# -----------------------------
+# Benchmark
+# -----------------------------
+class _SimulatedResult:
+    returns_rows = True
+
+    def __init__(self, row):
+        self._row = row
+
+    def fetchone(self):
+        return self._row
+
+    def fetchall(self):
+        return [self._row]
+
+    def nextset(self):
+        return False
+
+    def close(self):
+        pass
+
+
+class _SimulatedConnection:
+    """Answers every execute() with RespondentID 1 after one simulated round trip."""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.round_trips = 0
+
+    def execute(self, statement, params=None):
+        self.round_trips += 1
+        time.sleep(self.latency_s)
+        return _SimulatedResult((1,))
+
+
+def _synthetic_rows(questions: int) -> list:
+    rows = []
+    for qid in range(1, questions + 1):
+        kind = qid % 4
+        if kind == 0:
+            rows.append(_row(qid, AnswerLikert=qid % 5 + 1))
+        elif kind == 1:
+            rows.append(_row(qid, AnswerOptionID=qid, AnswerText=f"Option {qid}"))
+        elif kind == 2:
+            rows.append(_row(qid, AnswerBoolean=qid % 2))
+        else:
+            rows.append(_row(qid, AnswerText=f"Comment for question {qid}"))
+    return rows
+
+
+def run_benchmark(questions: int = 40, latency_ms: float = 15.0, repeats: int = 3) -> dict:
+    """
+    Submission time for the bulk and per-question paths against a simulated
+    database round trip of latency_ms. Calls save_bulk/save_per_question
+    directly, so survey_submit_metrics() isn't touched.
+    """
+    rows = _synthetic_rows(questions)
+    results = {}
+    for name, fn in (("bulk", save_bulk), ("per_question", save_per_question)):
+        best = float("inf")
+        for _ in range(repeats):
+            conn = _SimulatedConnection(latency_ms / 1000)
+            t0 = time.perf_counter()
+            fn(conn, 1, "benchmark@example.com", rows)
+            best = min(best, time.perf_counter() - t0)
+        results[name] = {"ms": round(best * 1000, 1), "round_trips": conn.round_trips}
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Benchmark survey submission paths with simulated latency.")
+    ap.add_argument("--questions", type=int, default=40)
+    ap.add_argument("--latency-ms", type=float, default=15.0, help="simulated database round trip")
+    ap.add_argument("--repeats", type=int, default=3)
+    args = ap.parse_args()
+
+    res = run_benchmark(args.questions, args.latency_ms, args.repeats)
+    for name, r in res.items():
+        print(f"{name:>12}: {r['ms']:.1f} ms  ({r['round_trips']} round trips)")
+    print(f"     speedup: {res['per_question']['ms'] / res['bulk']['ms']:.1f}x")
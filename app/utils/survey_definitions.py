@@ -0,0 +1,210 @@
+# app/utils/survey_definitions.py
+"""
+Compiled survey definitions for /Form/<routename>, /Form/guest/<id> and
+the submit routes.
+
+Every form load used to run SVY_GetSurveyIDByRouteName +
+SVY_GetSurveyQuestions and rebuild the question / likert-label structure;
+every submission resolved the route again and ran
+SVY_GetQuestionTypesBySurveyID. Definitions only change through the
+SurveyBuilder routes, so they are compiled once into a SurveyDefinition
+(ordered questions, type map, sorted likert labels, dropdown options) and
+kept in a ReferenceDataCache:
+
+- route name -> survey ID, and survey ID -> SurveyDefinition, tagged
+  "surveys" and "survey_<id>"; dropdown options per question are loaded
+  lazily into the same cache under the same tags.
+- invalidate_survey_definitions(survey_id) is called by the builder's
+  write routes; the tag stamps in SURVEY_STAMP_DIR drop the entries in the
+  other gunicorn worker too. SURVEY_CACHE_TTL is the backstop for edits
+  made straight in the database.
+- Unknown route names are not cached.
+
+Usage:
+    survey_id = survey_id_for_route("TeacherAssessment")
+    definition = survey_definition(survey_id)
+    questions = definition.template_questions()
+    qtype = definition.question_type(12)
+"""
+import os
+import tempfile
+from collections import namedtuple
+from dataclasses import dataclass
+
+from sqlalchemy import text
+
+from app.utils.database import get_db_engine
+from app.utils.reference_data import ReferenceDataCache
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+SURVEY_CACHE_TTL = _env_float("SURVEY_CACHE_TTL", 3600)
+
+Label = namedtuple("Label", ["pos", "text"])
+
+
+@dataclass(frozen=True)
+class SurveyQuestion:
+    id: int
+    text: str
+    code: str
+    labels: tuple = ()  # Label(pos, text), in position order (LIK only)
+
+
+@dataclass(frozen=True)
+class SurveyDefinition:
+    survey_id: int
+    questions: tuple         # SurveyQuestion, in SVY_GetSurveyQuestions order
+    question_types: tuple    # (QuestionID, QuestionCode) from SVY_GetQuestionTypesBySurveyID
+
+    def template_questions(self) -> list:
+        """[{id, text, type, labels}] as the survey_form_<id>.html templates expect (fresh copies)."""
+        return [
+            {"id": q.id, "text": q.text, "type": q.code, "labels": list(q.labels)}
+            for q in self.questions
+        ]
+
+    def question_type(self, question_id):
+        for qid, code in self.question_types:
+            if str(qid) == str(question_id):
+                return code
+        return None
+
+    def type_map(self) -> dict:
+        """{"<QuestionID>": QuestionCode}"""
+        return {str(qid): code for qid, code in self.question_types}
+
+
+survey_cache = ReferenceDataCache(
+    max_entries=int(_env_float("SURVEY_CACHE_MAX_ENTRIES", 1024)),
+    stamp_dir=os.getenv(
+        "SURVEY_STAMP_DIR",
+        os.path.join(tempfile.gettempdir(), "wsfl_survey_stamps"),
+    ) or None,
+)
+
+
+def _tags(survey_id) -> tuple:
+    return ("surveys", f"survey_{int(survey_id)}")
+
+
+def _run(conn, sql, params):
+    def fetch(c):
+        result = c.execute(text(sql), params)
+        try:
+            return result.fetchall()
+        finally:
+            result.close()
+
+    if conn is not None:
+        return fetch(conn)
+    with get_db_engine().connect() as own:
+        return fetch(own)
+
+
+def compile_survey(survey_id: int, question_rows, type_rows) -> SurveyDefinition:
+    """Build a SurveyDefinition from SVY_GetSurveyQuestions / SVY_GetQuestionTypesBySurveyID rows."""
+    order = []
+    by_id = {}
+    for qid, qtext, qcode, pos, label in question_rows:
+        q = by_id.get(qid)
+        if q is None:
+            q = by_id[qid] = {"text": qtext, "code": qcode, "labels": []}
+            order.append(qid)
+        if qcode == "LIK" and label is not None:
+            q["labels"].append(Label(pos, label))
+
+    questions = []
+    for qid in order:
+        q = by_id[qid]
+        labels = sorted(q["labels"], key=lambda L: (L.pos is None, L.pos))
+        questions.append(SurveyQuestion(qid, q["text"], q["code"], tuple(labels)))
+
+    types = tuple((r[0], r[1]) for r in type_rows)
+    return SurveyDefinition(int(survey_id), tuple(questions), types)
+
+
+def survey_id_for_route(routename: str, conn=None):
+    """SurveyID for a /Form/<routename> route name, or None if there is no such survey."""
+    key = ("route", routename)
+
+    def load():
+        rows = _run(conn, "EXEC SVY_GetSurveyIDByRouteName @RouteName = :routename", {"routename": routename})
+        if not rows:
+            return None
+        row = rows[0]
+        return getattr(row, "SurveyID", row[0])
+
+    survey_id = survey_cache.get(key, load, ttl=SURVEY_CACHE_TTL, tags=("surveys",))
+    if survey_id is None:
+        survey_cache.discard(key)
+    return survey_id
+
+
+def survey_definition(survey_id: int, conn=None) -> SurveyDefinition:
+    """Compiled definition of a survey (shared; treat as read-only)."""
+    survey_id = int(survey_id)
+
+    def load():
+        question_rows = _run(conn, "EXEC SVY_GetSurveyQuestions @SurveyID = :sid", {"sid": survey_id})
+        type_rows = _run(conn, "EXEC SVY_GetQuestionTypesBySurveyID @SurveyID = :sid", {"sid": survey_id})
+        return compile_survey(survey_id, question_rows, type_rows)
+
+    return survey_cache.get(("definition", survey_id), load, ttl=SURVEY_CACHE_TTL, tags=_tags(survey_id))
+
+
+def dropdown_options(survey_id: int, question_id: int, conn=None) -> list:
+    """[{id, value, label}] for a DDL question (SVY_GetOptions), fresh copies."""
+    survey_id, question_id = int(survey_id), int(question_id)
+
+    def load():
+        rows = _run(conn, "EXEC dbo.SVY_GetOptions @SurveyID=:sid, @QuestionID=:qid",
+                    {"sid": survey_id, "qid": question_id})
+        return tuple(
+            {"id": r._mapping["OptionID"], "value": r._mapping["OptionValue"], "label": r._mapping["Label"]}
+            for r in rows
+        )
+
+    options = survey_cache.get(("options", survey_id, question_id), load, ttl=SURVEY_CACHE_TTL,
+                               tags=_tags(survey_id))
+    return [dict(o) for o in options]
+
+
+def resolve_dropdown_option(survey_id: int, question_id: int, option_id, value, conn=None):
+    """
+    OptionID for a posted dropdown answer from the cached options: the posted
+    ID if it is one of the question's options (and matches the posted value,
+    when one is given), else the option whose value or label is the posted
+    value. None when the options can't settle it; callers then fall back to
+    SVY_ResolveAndValidateOption.
+    """
+    options = dropdown_options(survey_id, question_id, conn=conn)
+    value = None if value is None else str(value).strip()
+    if option_id is not None:
+        for o in options:
+            if str(o["id"]) == str(option_id):
+                if value and value not in (str(o["value"]), str(o["label"])):
+                    return None
+                return int(o["id"])
+        return None
+    if value:
+        matches = [o for o in options if value in (str(o["value"]), str(o["label"]))]
+        if len(matches) == 1:
+            return int(matches[0]["id"])
+    return None
+
+
+def invalidate_survey_definitions(survey_id=None) -> int:
+    """
+    Drop cached definitions (here and in the other workers): one survey's,
+    or all of them plus the route-name lookups when survey_id is None.
+    """
+    if survey_id is None:
+        return survey_cache.invalidate("surveys")
+    return survey_cache.invalidate(f"survey_{int(survey_id)}")
@@ -5,7 +5,8 @@ from matplotlib.backends.backend_pdf import PdfPages
 from matplotlib.patches import Rectangle
 import pandas as pd
 import os
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from app.utils.database import get_engine_for_url
 from dotenv import load_dotenv
 
 # ========== CONFIGURATION ==========
@@ -18,7 +19,7 @@ OUTPUT_FILE = f"FunderStudentCountsYTD_{YEAR}_T{TERM}.pdf"
 # ========== DATABASE ==========
 def get_db_engine():
     db_url = os.getenv("DB_URL_CUSTOM")
-    return create_engine(db_url, fast_executemany=True)
+    return get_engine_for_url(db_url, fast_executemany=True)
 
 def load_funder_data(engine, year, term):
     with engine.begin() as conn:
@@ -11,7 +11,7 @@ from app.report_utils.FNT_PolygonText import draw_text_in_polygon
 from app.report_utils.SHP_RoundRect import rounded_rect_polygon
 from app.report_utils.TAB_DataframeTable import draw_dataframe_table_v2
 from app.report_utils.helpers import load_ppmori_fonts
-from app.report_utils.pdf_builder import close_pdf, new_page, open_pdf, save_page
+from app.report_utils.pdf_builder import PageSpec, close_pdf, open_pdf, render_pages
 
 
 # ============================================================
@@ -441,6 +441,171 @@ def _draw_totals_table_page(
 
 
 
+# ------------------------------------------------------------
+# Page drawing (PageSpec: may run in a page worker process)
+# ------------------------------------------------------------
+def _assessment_row_highlight(row: pd.Series, r: int) -> Optional[Tuple[str, str]]:
+    try:
+        tot = int(row.get(COL_TOTAL_CLASSES, 0) or 0)
+        reviewed = int(row.get(COL_CLASSES_WITH_ANY_REVIEW, 0) or 0)
+        if tot > 0 and reviewed < tot:
+            return "#f4f6ff", "#111111"
+    except Exception:
+        pass
+    return None
+
+
+def _draw_assessment_page(
+    *,
+    fig,
+    ax,
+    family: str,
+    title: str,
+    df_page: pd.DataFrame,
+    cols: List[Dict[str, Any]],
+    term_text: str,
+    note_text: str,
+):
+    """One table page of the teacher assessment summary (a PageSpec draw function)."""
+    TABLE_X = 0.02
+    TABLE_W = 0.96
+    TABLE_Y = 0.12
+    TABLE_H = 0.80
+
+    BAR_W = 0.96
+    GAP = 0.010
+
+    BAR_H_TERM = 0.022
+    BAR_H_NOTE = 0.06
+
+    header_poly = rounded_rect_polygon(
+        cx=0.5,
+        cy=0.955,
+        width=0.96,
+        height=0.055,
+        ratio=0.45,
+        corners_round=[1, 3],
+        n_arc=64,
+    )
+    ax.add_patch(
+        mpatches.Polygon(
+            list(header_poly.exterior.coords),
+            closed=True,
+            facecolor="#1a427d",
+            edgecolor="#1a427d",
+            linewidth=1.5,
+            transform=ax.transAxes,
+        )
+    )
+
+    draw_text_in_polygon(
+        ax,
+        poly=header_poly,
+        text=title,
+        fontfamily=family,
+        fontsize=20,
+        fontweight="semibold",
+        color="#ffffff",
+        pad_frac=0.05,
+        wrap=True,
+        autoshrink=True,
+        clip_to_polygon=True,
+        max_lines=None,
+    )
+
+    draw_dataframe_table_v2(
+        ax,
+        df=df_page,
+        x=TABLE_X,
+        y=TABLE_Y,
+        width=TABLE_W,
+        height=TABLE_H,
+        header_height_frac=0.042,
+        columns=cols,
+        base_row_facecolor="#ffffff",
+        row_color_fn=_assessment_row_highlight,
+        wrap=True,
+        max_wrap_lines=10,
+        shift=True,
+    )
+
+    table_bottom_y = TABLE_Y
+
+    term_top = table_bottom_y - GAP
+    term_cy = term_top - (BAR_H_TERM / 2)
+
+    note_top = (term_cy - BAR_H_TERM / 2) - GAP
+    note_cy = note_top - (BAR_H_NOTE / 2)
+
+    term_sum_poly = rounded_rect_polygon(
+        cx=0.5,
+        cy=term_cy,
+        width=BAR_W,
+        height=BAR_H_TERM,
+        ratio=0.45,
+        corners_round=[1, 2],
+        n_arc=64,
+    )
+    ax.add_patch(
+        mpatches.Polygon(
+            list(term_sum_poly.exterior.coords),
+            closed=True,
+            facecolor="#eef2ff",
+            edgecolor="#1a427d",
+            linewidth=1.2,
+            transform=ax.transAxes,
+        )
+    )
+    draw_text_in_polygon(
+        ax,
+        poly=term_sum_poly,
+        text=term_text,
+        fontfamily=family,
+        fontsize=12,
+        fontweight="semibold",
+        color="#1a427d",
+        pad_frac=0.06,
+        wrap=False,
+        autoshrink=True,
+        clip_to_polygon=True,
+        max_lines=1,
+    )
+
+    note_poly = rounded_rect_polygon(
+        cx=0.5,
+        cy=note_cy,
+        width=BAR_W,
+        height=BAR_H_NOTE,
+        ratio=0.45,
+        corners_round=[4, 3],
+        n_arc=64,
+    )
+    ax.add_patch(
+        mpatches.Polygon(
+            list(note_poly.exterior.coords),
+            closed=True,
+            facecolor="#1a427d",
+            edgecolor="#1a427d",
+            linewidth=1.0,
+            transform=ax.transAxes,
+        )
+    )
+    draw_text_in_polygon(
+        ax,
+        poly=note_poly,
+        text=note_text,
+        fontfamily=family,
+        fontsize=12,
+        fontweight="semibold",
+        color="#ffffff",
+        pad_frac=0.04,
+        wrap=True,
+        autoshrink=True,
+        clip_to_polygon=True,
+        max_lines=6,
+    )
+
+
 # ------------------------------------------------------------
 # Public PDF builder
 # ------------------------------------------------------------
@@ -489,18 +654,6 @@ def build_funder_teacher_assessment_summary_pdf(
         for page_idx in range(1, len(pages_tmp) + 1):
             render_plan.append((y, t, page_idx))
 
-    last_key = render_plan[-1] if render_plan else None
-
-    pdf, w, h, _dpi = open_pdf(
-        filename=str(out_pdf_path),
-        page_size=page_size,
-        orientation=orientation,
-        dpi=dpi,
-    )
-
-    preview_fig = None
-    page_count = 0
-
     staff_col = {
         "key": COL_FUNDERSTAFF,
         "label": "Assigned Funder\nStaff Member",
@@ -540,27 +693,17 @@ def build_funder_teacher_assessment_summary_pdf(
         final_cols = [c for c in cols if c["key"] in keys]
         return final_cols
 
-    def row_highlight(row: pd.Series, r: int) -> Optional[Tuple[str, str]]:
-        try:
-            tot = int(row.get(COL_TOTAL_CLASSES, 0) or 0)
-            reviewed = int(row.get(COL_CLASSES_WITH_ANY_REVIEW, 0) or 0)
-            if tot > 0 and reviewed < tot:
-                return "#f4f6ff", "#111111"
-        except Exception:
-            pass
-        return None
-
-    TABLE_X = 0.02
-    TABLE_W = 0.96
-    TABLE_Y = 0.12
-    TABLE_H = 0.80
-
-    BAR_W = 0.96
-    GAP = 0.010
-
-    BAR_H_TERM = 0.022
-    BAR_H_NOTE = 0.06
+    note_text = (
+        f"Assigned Funder Staff Member is the {funder_name} staff member responsible for supporting this school (set in Provider Maintenance). "
+        "Total Classes is the number of classes recorded for the school in this term. "
+        "Classes Reviewed is the number of classes that have at least one teacher assessment completed. "
+        "Total Reviews is the total number of teacher assessments submitted for the school this term "
+        "(more than one teacher assessment can be submitted per class). "
+        "Lead classroom teacher and relief teacher reviews are shown separately based on the teacher role selected in the form."
+    )
+    footer = str(footer_png) if footer_png else None
 
+    specs: List[PageSpec] = []
     for (year, term, df_term) in term_blocks:
 
         if df_term is None or df_term.empty:
@@ -587,199 +730,46 @@ def build_funder_teacher_assessment_summary_pdf(
                 f"relief reviews: {ts['relief_reviews']}"
             )
 
-            page_count += 1
-            is_last_rendered_page = (last_key == (year, term, term_page_idx))
-
-            fig, ax = new_page(w, h, dpi)
-
-            header_poly = rounded_rect_polygon(
-                cx=0.5,
-                cy=0.955,
-                width=0.96,
-                height=0.055,
-                ratio=0.45,
-                corners_round=[1, 3],
-                n_arc=64,
-            )
-            ax.add_patch(
-                mpatches.Polygon(
-                    list(header_poly.exterior.coords),
-                    closed=True,
-                    facecolor="#1a427d",
-                    edgecolor="#1a427d",
-                    linewidth=1.5,
-                    transform=ax.transAxes,
-                )
-            )
-
             title = f"{funder_name} - Teacher Assessments (Term {term}, {year})"
             if len(pages) > 1:
                 title = f"{title} (Page {term_page_idx} of {len(pages)})"
 
-            draw_text_in_polygon(
-                ax,
-                poly=header_poly,
-                text=title,
-                fontfamily=family,
-                fontsize=20,
-                fontweight="semibold",
-                color="#ffffff",
-                pad_frac=0.05,
-                wrap=True,
-                autoshrink=True,
-                clip_to_polygon=True,
-                max_lines=None,
-            )
-
-            cols = _make_table_columns(df_page)
-            draw_dataframe_table_v2(
-                ax,
-                df=df_page,
-                x=TABLE_X,
-                y=TABLE_Y,
-                width=TABLE_W,
-                height=TABLE_H,
-                header_height_frac=0.042,
-                columns=cols,
-                base_row_facecolor="#ffffff",
-                row_color_fn=row_highlight,
-                wrap=True,
-                max_wrap_lines=10,
-                shift=True,
-            )
-
-            table_bottom_y = TABLE_Y
-
-            term_top = table_bottom_y - GAP
-            term_cy = term_top - (BAR_H_TERM / 2)
-
-            note_top = (term_cy - BAR_H_TERM / 2) - GAP
-            note_cy = note_top - (BAR_H_NOTE / 2)
-
-            term_sum_poly = rounded_rect_polygon(
-                cx=0.5,
-                cy=term_cy,
-                width=BAR_W,
-                height=BAR_H_TERM,
-                ratio=0.45,
-                corners_round=[1, 2],
-                n_arc=64,
-            )
-            ax.add_patch(
-                mpatches.Polygon(
-                    list(term_sum_poly.exterior.coords),
-                    closed=True,
-                    facecolor="#eef2ff",
-                    edgecolor="#1a427d",
-                    linewidth=1.2,
-                    transform=ax.transAxes,
-                )
-            )
-            draw_text_in_polygon(
-                ax,
-                poly=term_sum_poly,
-                text=term_text,
-                fontfamily=family,
-                fontsize=12,
-                fontweight="semibold",
-                color="#1a427d",
-                pad_frac=0.06,
-                wrap=False,
-                autoshrink=True,
-                clip_to_polygon=True,
-                max_lines=1,
-            )
-
-            note_poly = rounded_rect_polygon(
-                cx=0.5,
-                cy=note_cy,
-                width=BAR_W,
-                height=BAR_H_NOTE,
-                ratio=0.45,
-                corners_round=[4, 3],
-                n_arc=64,
-            )
-            ax.add_patch(
-                mpatches.Polygon(
-                    list(note_poly.exterior.coords),
-                    closed=True,
-                    facecolor="#1a427d",
-                    edgecolor="#1a427d",
-                    linewidth=1.0,
-                    transform=ax.transAxes,
-                )
-            )
-            note_text = (
-                f"Assigned Funder Staff Member is the {funder_name} staff member responsible for supporting this school (set in Provider Maintenance). "
-                "Total Classes is the number of classes recorded for the school in this term. "
-                "Classes Reviewed is the number of classes that have at least one teacher assessment completed. "
-                "Total Reviews is the total number of teacher assessments submitted for the school this term "
-                "(more than one teacher assessment can be submitted per class). "
-                "Lead classroom teacher and relief teacher reviews are shown separately based on the teacher role selected in the form."
-            )
-            draw_text_in_polygon(
-                ax,
-                poly=note_poly,
-                text=note_text,
-                fontfamily=family,
-                fontsize=12,
-                fontweight="semibold",
-                color="#ffffff",
-                pad_frac=0.04,
-                wrap=True,
-                autoshrink=True,
-                clip_to_polygon=True,
-                max_lines=6,
-            )
-
-            save_page(
-                pdf,
-                fig,
-                footer_png=str(footer_png) if footer_png else None,
-                width_in=w,
-                height_in=h,
-                footer_bottom_margin_frac=0.0,
+            specs.append(PageSpec(
+                _draw_assessment_page,
+                dict(
+                    family=family,
+                    title=title,
+                    df_page=df_page,
+                    cols=_make_table_columns(df_page),
+                    term_text=term_text,
+                    note_text=note_text,
+                ),
+                footer_png=footer,
                 footer_max_height_frac=0.20,
-            )
-
-            if preview_fig is None:
-                preview_fig = fig
-            else:
-                import matplotlib.pyplot as plt
-                plt.close(fig)
+            ))
 
     if df_totals is not None and not df_totals.empty:
         print("➡️ Rendering totals page with overall row only on this last page")
-
-        fig, ax = new_page(w, h, dpi)
-        _draw_totals_table_page(
-            fig=fig,
-            ax=ax,
-            family=family,
-            funder_name=funder_name,
-            df_totals=df_totals,
-        )
-
-        save_page(
-            pdf,
-            fig,
-            footer_png=str(footer_png) if footer_png else None,
-            width_in=w,
-            height_in=h,
-            footer_bottom_margin_frac=0.0,
+        specs.append(PageSpec(
+            _draw_totals_table_page,
+            dict(family=family, funder_name=funder_name, df_totals=df_totals),
+            footer_png=footer,
             footer_max_height_frac=0.20,
-        )
+        ))
 
-        page_count += 1
-
-        if preview_fig is None:
-            preview_fig = fig
-        else:
-            import matplotlib.pyplot as plt
-            plt.close(fig)
+    pdf, w, h, _dpi = open_pdf(
+        filename=str(out_pdf_path),
+        page_size=page_size,
+        orientation=orientation,
+        dpi=dpi,
+        parallel=True,
+    )
 
-    close_pdf(pdf)
-    meta["pages"] = page_count
+    try:
+        preview_fig = render_pages(pdf, specs, width_in=w, height_in=h, dpi=dpi, keep_first=True)
+    finally:
+        close_pdf(pdf)
+    meta["pages"] = len(specs)
   
 
     return preview_fig, meta
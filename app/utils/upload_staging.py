@@ -0,0 +1,191 @@
+# app/utils/upload_staging.py
+"""
+Server-side staging area for class-list uploads.
+
+The preview -> validate -> download -> submit steps used to carry the whole
+uploaded file (and the validated rows) in the session, which then got
+written to the session table on every request. Instead each upload gets an
+ID (kept in the session) and its tables are staged on disk here as
+zlib-compressed columnar msgpack:
+
+    <UPLOAD_STAGING_DIR>/<upload_id>/<name>.mpz
+
+Uploads older than UPLOAD_STAGING_TTL_HOURS (default 6) are removed
+opportunistically whenever something new is staged.
+
+Staged files hold pupil names, birthdates and NSNs, so the dirs are 0700
+and the files 0600 (same as the email outbox spool).
+"""
+import datetime as _dt
+import decimal
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+
+import msgspec
+import numpy as np
+import pandas as pd
+
+STAGING_DIR = os.getenv(
+    "UPLOAD_STAGING_DIR",
+    os.path.join(tempfile.gettempdir(), "wsfl_upload_staging"),
+)
+try:
+    STAGING_TTL_SECONDS = float(os.getenv("UPLOAD_STAGING_TTL_HOURS", "6")) * 3600
+except ValueError:
+    STAGING_TTL_SECONDS = 6 * 3600
+
+_CLEANUP_INTERVAL_SECONDS = 600
+_last_cleanup = 0.0
+_cleanup_lock = threading.Lock()
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_NAME_RE = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+def _enc_hook(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if isinstance(obj, (_dt.date, decimal.Decimal)):
+        return str(obj)
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    raise NotImplementedError(f"Cannot stage value of type {type(obj).__name__}")
+
+
+_ENCODER = msgspec.msgpack.Encoder(enc_hook=_enc_hook)
+_DECODER = msgspec.msgpack.Decoder()
+
+
+def new_upload_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _upload_dir(upload_id: str) -> str:
+    if not upload_id or not _ID_RE.match(str(upload_id)):
+        raise ValueError("Invalid upload id")
+    return os.path.join(STAGING_DIR, upload_id)
+
+
+def _file_path(upload_id: str, name: str) -> str:
+    if not _NAME_RE.match(name):
+        raise ValueError("Invalid staging name")
+    return os.path.join(_upload_dir(upload_id), f"{name}.mpz")
+
+
+def _private_dir(path: str) -> None:
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    os.chmod(path, 0o700)  # makedirs leaves existing dirs as they were
+
+
+def _write(upload_id: str, name: str, payload: dict) -> int:
+    path = _file_path(upload_id, name)
+    _private_dir(STAGING_DIR)
+    _private_dir(os.path.dirname(path))
+    blob = zlib.compress(_ENCODER.encode(payload), 6)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(blob)
+    os.replace(tmp, path)
+    cleanup_expired()
+    return len(blob)
+
+
+def _read(upload_id: str, name: str):
+    try:
+        path = _file_path(upload_id, name)
+        with open(path, "rb") as fh:
+            return _DECODER.decode(zlib.decompress(fh.read()))
+    except (ValueError, OSError, zlib.error, msgspec.DecodeError):
+        return None
+
+
+def stage_frame(upload_id: str, name: str, df: pd.DataFrame) -> int:
+    """Stage a DataFrame column-wise (column order preserved). Returns bytes written."""
+    payload = {
+        "columns": [str(c) for c in df.columns],
+        "data": [
+            [None if (v is None or (isinstance(v, float) and np.isnan(v))) else v for v in df[c].tolist()]
+            for c in df.columns
+        ],
+    }
+    return _write(upload_id, name, payload)
+
+
+def load_frame(upload_id: str, name: str):
+    """Return the staged DataFrame, or None if missing/expired."""
+    payload = _read(upload_id, name) if upload_id else None
+    if payload is None:
+        return None
+    columns = payload.get("columns", [])
+    data = payload.get("data", [])
+    return pd.DataFrame(dict(zip(columns, data)), columns=columns)
+
+
+def stage_records(upload_id: str, name: str, records: list) -> int:
+    """Stage a list of row dicts (e.g. proc results) in columnar form."""
+    columns = []
+    for row in records:
+        for key in row.keys():
+            if key not in columns:
+                columns.append(key)
+    payload = {
+        "columns": columns,
+        "data": [[row.get(c) for row in records] for c in columns],
+        "rows": len(records),
+    }
+    return _write(upload_id, name, payload)
+
+
+def load_records(upload_id: str, name: str):
+    """Return the staged rows as a list of dicts, or None if missing/expired."""
+    payload = _read(upload_id, name) if upload_id else None
+    if payload is None:
+        return None
+    columns = payload.get("columns", [])
+    data = payload.get("data", [])
+    n = payload.get("rows", len(data[0]) if data else 0)
+    return [{c: data[i][r] for i, c in enumerate(columns)} for r in range(n)]
+
+
+def discard_upload(upload_id: str) -> None:
+    try:
+        shutil.rmtree(_upload_dir(upload_id), ignore_errors=True)
+    except ValueError:
+        pass
+
+
+def cleanup_expired(force: bool = False) -> int:
+    """Remove staged uploads older than the TTL. Returns the number removed."""
+    global _last_cleanup
+    now = time.time()
+    if not force and now - _last_cleanup < _CLEANUP_INTERVAL_SECONDS:
+        return 0
+    if not _cleanup_lock.acquire(blocking=False):
+        return 0
+    removed = 0
+    try:
+        _last_cleanup = now
+        try:
+            entries = os.listdir(STAGING_DIR)
+        except OSError:
+            return 0
+        for entry in entries:
+            path = os.path.join(STAGING_DIR, entry)
+            try:
+                if now - os.stat(path).st_mtime > STAGING_TTL_SECONDS:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                continue
+    finally:
+        _cleanup_lock.release()
+    return removed
@@ -17,6 +17,7 @@ from dotenv import load_dotenv
 from html import escape as html_escape  # for safe HTML
 from flask import current_app, render_template, url_for
 from app.utils.database import get_db_engine
+from app.utils.email_outbox import email_status, queue_email
 
 # =====================================================
 # .env and constants
@@ -220,16 +221,18 @@ def create_user_and_send(mail, first_name, surname, email, moe_number, is_admin=
             headers={"Content-ID": "<wsfl_logo>"},
         )
 
-    mail.send(msg)
+    queue_email(msg, mail=mail, kind="account_invite")
     return temp_pw
 from email.message import EmailMessage
 from flask import current_app, url_for, render_template
 from sqlalchemy import text
 from .database import get_db_engine  # or whatever your helper is called
 def send_account_invites(mail, recipients, make_admin: bool, invited_by_name: str, invited_by_org: str | None = None):
+    """Activate and email each recipient; returns (sent, failed, email_status of the sent ones)."""
     engine = get_db_engine()
     sent = 0
     failed = 0
+    outbox_ids = []
 
     label_map = {
         "MOE": "school",
@@ -314,11 +317,11 @@ def send_account_invites(mail, recipients, make_admin: bool, invited_by_name: st
                     except Exception:
                         current_app.logger.exception("Failed to attach template for %s", email)
 
-                mail.send(msg)
+                outbox_ids.append(queue_email(msg, mail=mail, kind="account_invite"))
                 sent += 1
 
             except Exception:
                 current_app.logger.exception("Invite send failed for %s", email)
                 failed += 1
 
-    return sent, failed
\ No newline at end of file
+    return sent, failed, email_status(*outbox_ids)
\ No newline at end of file